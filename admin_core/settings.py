@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -70,6 +71,13 @@ DATABASES = {
         'PORT': os.getenv('DB_PORT'),
     }
 }
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # SQLite（本地开发）：事务开始即取得写锁，并发的先读后写事务（认领、合并执行、批量写回）排队等待，
+    # 而不是在读锁升级为写锁时直接报 database is locked
+    DATABASES['default']['OPTIONS'] = {
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': int(os.getenv('DB_SQLITE_TIMEOUT', 30)),
+    }
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -99,3 +107,52 @@ USE_TZ = True
 STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# 脚本执行配置
+SCRIPT_EXECUTION_MAX_WORKERS = int(os.getenv('SCRIPT_EXECUTION_MAX_WORKERS', 4))
+# 排队等待调度的执行数上限，超出时拒绝；排队的执行按优先级和脚本权重调度
+SCRIPT_EXECUTION_QUEUE_SIZE = int(os.getenv('SCRIPT_EXECUTION_QUEUE_SIZE', 100))
+# 执行请求限流（令牌桶，数据库中共享）：数量/时间单位（s、min、hour、day），数量即允许的突发请求数，为空不限流
+SCRIPT_RATE_LIMIT_CLIENT = os.getenv('SCRIPT_RATE_LIMIT_CLIENT', '60/min')
+SCRIPT_RATE_LIMIT_SCRIPT = os.getenv('SCRIPT_RATE_LIMIT_SCRIPT', '120/min')
+SCRIPT_RATE_LIMIT_GLOBAL = os.getenv('SCRIPT_RATE_LIMIT_GLOBAL', '600/min')
+# 未开启独立工作目录的脚本统一在该目录下执行
+SCRIPT_DEFAULT_CWD = os.getenv('SCRIPT_DEFAULT_CWD', tempfile.gettempdir())
+# 执行后端：thread 为进程内线程池，database 为数据库队列（需运行 python manage.py runworkers）
+SCRIPT_EXECUTION_BACKEND = os.getenv('SCRIPT_EXECUTION_BACKEND', 'thread')
+SCRIPT_WORKER_LEASE_SECONDS = int(os.getenv('SCRIPT_WORKER_LEASE_SECONDS', 60))
+SCRIPT_WORKER_POLL_INTERVAL = float(os.getenv('SCRIPT_WORKER_POLL_INTERVAL', 1.0))
+SCRIPT_WORKER_MAX_ATTEMPTS = int(os.getenv('SCRIPT_WORKER_MAX_ATTEMPTS', 3))
+# 执行引擎：thread 为每个脚本占用一个线程监管，asyncio 为单个事件循环监管所有脚本（不使用 Python 预热解释器）
+SCRIPT_EXECUTOR_ENGINE = os.getenv('SCRIPT_EXECUTOR_ENGINE', 'thread')
+SCRIPT_ASYNC_MAX_CONCURRENCY = int(os.getenv('SCRIPT_ASYNC_MAX_CONCURRENCY', 256))
+SCRIPT_ASYNC_DB_THREADS = int(os.getenv('SCRIPT_ASYNC_DB_THREADS', 4))
+# 执行结果延迟批量写回：攒满该条数或等待该秒数后写回一批，间隔不大于 0 时每条结果同步写回
+SCRIPT_COMPLETION_BATCH_SIZE = int(os.getenv('SCRIPT_COMPLETION_BATCH_SIZE', 100))
+SCRIPT_COMPLETION_FLUSH_INTERVAL = float(os.getenv('SCRIPT_COMPLETION_FLUSH_INTERVAL', 0.05))
+
+# 执行输出存储：超过内联阈值的标准输出分块压缩后转存，记录中仅保留预览
+SCRIPT_OUTPUT_INLINE_LIMIT = int(os.getenv('SCRIPT_OUTPUT_INLINE_LIMIT', 256 * 1024))
+SCRIPT_OUTPUT_PREVIEW_SIZE = int(os.getenv('SCRIPT_OUTPUT_PREVIEW_SIZE', 4 * 1024))
+SCRIPT_OUTPUT_BLOCK_SIZE = int(os.getenv('SCRIPT_OUTPUT_BLOCK_SIZE', 1024 * 1024))
+SCRIPT_OUTPUT_COMPRESSION = os.getenv('SCRIPT_OUTPUT_COMPRESSION', 'gzip')  # gzip 或 zstd（需安装 zstandard）
+SCRIPT_OUTPUT_STORAGE_DIR = os.getenv('SCRIPT_OUTPUT_STORAGE_DIR', str(BASE_DIR / 'storage' / 'script_outputs'))
+# 不小于该字节数的标准输出按内容去重，相同输出只存一份（script_output_blob），0 表示不去重
+SCRIPT_OUTPUT_DEDUP_MIN_SIZE = int(os.getenv('SCRIPT_OUTPUT_DEDUP_MIN_SIZE', 1024))
+# 按返回类型解析结构化结果的输出大小上限（字节），超过时不解析
+SCRIPT_RESULT_MAX_SIZE = int(os.getenv('SCRIPT_RESULT_MAX_SIZE', 1024 * 1024))
+
+# Python 预热解释器：开启后 python 脚本从预先导入常用模块的解释器 fork 执行
+SCRIPT_PYTHON_FORKSERVER_ENABLED = os.getenv('SCRIPT_PYTHON_FORKSERVER_ENABLED', 'False') == 'True'
+SCRIPT_PYTHON_PRELOAD_MODULES = [m for m in os.getenv('SCRIPT_PYTHON_PRELOAD_MODULES', 'json,datetime').split(',') if m]
+
+# 定时计划：runscheduler 进程在内存中按触发时间维护最小堆，只按该间隔增量同步计划变更
+SCRIPT_SCHEDULER_REFRESH_INTERVAL = int(os.getenv('SCRIPT_SCHEDULER_REFRESH_INTERVAL', 30))
+
+# 执行记录保留：pruneexecutions 按脚本的保留天数（未设置时用该全局值，0 表示永久保留）分批清理并汇总为每日统计
+SCRIPT_EXECUTION_RETENTION_DAYS = int(os.getenv('SCRIPT_EXECUTION_RETENTION_DAYS', 90))
+SCRIPT_RETENTION_BATCH_SIZE = int(os.getenv('SCRIPT_RETENTION_BATCH_SIZE', 500))
+# 结束超过该天数的执行，输出分块合并为每个输出流一块
+SCRIPT_OUTPUT_CHUNK_COMPACT_DAYS = int(os.getenv('SCRIPT_OUTPUT_CHUNK_COMPACT_DAYS', 1))
+# PostgreSQL 按月分区时预先创建的月份数
+SCRIPT_EXECUTION_PARTITION_MONTHS_AHEAD = int(os.getenv('SCRIPT_EXECUTION_PARTITION_MONTHS_AHEAD', 3))
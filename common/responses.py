@@ -27,6 +27,16 @@ class ApiResponse:
             'success': False
         }, status=status.HTTP_400_BAD_REQUEST)
 
+    @staticmethod
+    def too_many_requests(message: str = "请求过于频繁，请稍后重试", retry_after: int = 1, data: Any = None) -> Response:
+        """限流响应（HTTP 429），Retry-After 为建议的重试等待秒数"""
+        return Response({
+            'code': 429,
+            'message': message,
+            'data': data,
+            'success': False
+        }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(retry_after)})
+
     @staticmethod
     def paginated_response(queryset, page: int, page_size: int, serializer_class, request=None) -> Response:
         """分页响应"""
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class SystemConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'system'
+
+    def ready(self):
+        from .search import ensure_search_index
+        # 执行记录表由迁移创建后再建立全文索引，索引不由模型迁移管理
+        post_migrate.connect(ensure_search_index, sender=self, dispatch_uid='system_execution_search_index')
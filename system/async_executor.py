@@ -0,0 +1,297 @@
+import asyncio
+import codecs
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Dict, Any
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .script_executor import ScriptExecutor, kill_process_group
+from .watchdog import get_execution_watchdog
+
+logger = logging.getLogger(__name__)
+
+
+def _call_with_connection(func, *args):
+    close_old_connections()
+    return func(*args)
+
+
+async def run_blocking(func, *args):
+    """在事件循环的线程池中执行同步调用（数据库读写等），不阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(_call_with_connection, func, *args))
+
+
+class AsyncScriptExecutor(ScriptExecutor):
+    """
+    基于 asyncio 的脚本执行器：与 ScriptExecutor 的返回约定一致，但监管过程是协程，
+    多个脚本由同一个事件循环线程并发监管，不再每个脚本占用一个线程
+    - 子进程退出通过 pidfd 通知，之后用 wait4 回收并取得资源使用；内核不支持 pidfd 时退化为定时检查
+    - 不使用 Python 预热解释器，python 脚本同样以独立进程执行
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop = None
+        self._events = None
+
+    def execute(self, parameters: Dict[str, Any] = None) -> Tuple[bool, str, str, float]:
+        """同步调用：在共享事件循环中执行并等待结果，不能在事件循环线程内调用"""
+        return get_async_engine().run(self.execute_async(parameters))
+
+    async def execute_async(self, parameters: Dict[str, Any] = None) -> Tuple[bool, str, str, float]:
+        """
+        执行脚本
+        返回: (是否成功, 输出内容, 错误信息, 执行时间)
+        """
+        parameters = parameters or {}
+        start_time = time.time()
+        try:
+            if self.script_task.script_type not in ('bash', 'python'):
+                return False, "", "不支持的脚本类型", time.time() - start_time
+            return await self._supervise_async(self._popen(parameters), start_time)
+        except Exception as e:
+            return False, "", str(e), time.time() - start_time
+        finally:
+            self._cleanup()
+
+    def kill(self, reason: str):
+        """终止脚本进程组并唤醒监管协程，可由看门狗等其他线程调用"""
+        super().kill(reason)
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._events.put_nowait, ('kill', None))
+
+    async def _supervise_async(self, process, start_time: float) -> Tuple[bool, str, str, float]:
+        self.process = process
+        self._loop = asyncio.get_running_loop()
+        self._events = asyncio.Queue()
+        watchdog = get_execution_watchdog() if self.execution_id else None
+        if watchdog:
+            watchdog.register(self.execution_id, self, self.script_task.timeout + 2 * self.KILL_GRACE)
+        try:
+            stdout, stderr = await self._communicate_async(process)
+        finally:
+            if watchdog:
+                watchdog.unregister(self.execution_id)
+        return self._build_result(process, stdout, stderr, time.time() - start_time)
+
+    async def _communicate_async(self, process) -> Tuple[str, str]:
+        """
+        事件驱动地读取输出：管道数据、子进程退出、终止请求都投递到同一个事件队列
+        返回: (标准输出, 错误输出)
+        """
+        events = self._events
+        tasks = [
+            asyncio.create_task(self._read_pipe_async(stream, pipe, events))
+            for stream, pipe in (('stdout', process.stdout), ('stderr', process.stderr))
+        ]
+        exit_task = asyncio.create_task(self._wait_exit(process, events))
+
+        decoders = {stream: codecs.getincrementaldecoder('utf-8')(errors='replace') for stream in self.STREAMS}
+        collected = {stream: [] for stream in self.STREAMS}
+        open_streams = len(self.STREAMS)
+        deadline = time.monotonic() + self.script_task.timeout
+        drain_deadline = None
+        output_limit = self.script_task.output_limit * 1024 if self.script_task.output_limit else None
+        output_size = 0
+
+        try:
+            while open_streams:
+                now = time.monotonic()
+                if drain_deadline is None:
+                    if now > deadline:
+                        self.kill('timeout')
+                    if self.outcome or exit_task.done():
+                        # 脚本已退出或被终止，剩余输出最多再等待 KILL_GRACE
+                        drain_deadline = now + self.KILL_GRACE
+                elif now > drain_deadline:
+                    # 脚本派生的后台进程仍持有管道，结束整个进程组后不再等待
+                    kill_process_group(process)
+                    break
+
+                wait = (drain_deadline or deadline) - now
+                if self.output_recorder:
+                    wait = min(wait, self.output_recorder.FLUSH_INTERVAL)
+                try:
+                    kind, data = await asyncio.wait_for(events.get(), timeout=max(wait, 0))
+                except asyncio.TimeoutError:
+                    kind = None
+
+                if kind in self.STREAMS:
+                    if not data:
+                        open_streams -= 1
+                    if output_limit is not None:
+                        if output_size + len(data) > output_limit:
+                            # 只保留上限以内的输出，之后的数据丢弃
+                            data = data[:max(output_limit - output_size, 0)]
+                            self.kill('output_limit')
+                        output_size += len(data)
+                    self._emit(kind, decoders[kind].decode(data, final=not data), collected)
+
+                if self.output_recorder and self.output_recorder.flush_due():
+                    await run_blocking(self.output_recorder.write_chunks, self.output_recorder.take_chunks())
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        await exit_task
+        self._wait(process)
+        if self.output_recorder:
+            await run_blocking(self.output_recorder.write_chunks, self.output_recorder.take_chunks())
+        return ''.join(collected['stdout']), ''.join(collected['stderr'])
+
+    async def _read_pipe_async(self, stream: str, pipe, events: asyncio.Queue):
+        """读取管道直到 EOF，空字节串表示流结束"""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=2 * self.READ_SIZE)
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+        try:
+            while True:
+                data = await reader.read(self.READ_SIZE)
+                events.put_nowait((stream, data))
+                if not data:
+                    break
+        finally:
+            transport.close()
+
+    async def _wait_exit(self, process, events: asyncio.Queue):
+        """等待子进程退出但不回收，回收留给 _wait 以取得资源使用"""
+        try:
+            pidfd = os.pidfd_open(process.pid)
+        except (AttributeError, OSError):
+            pidfd = None
+
+        if pidfd is None:
+            while not self._exited(process):
+                await asyncio.sleep(self.POLL_INTERVAL)
+        else:
+            loop = asyncio.get_running_loop()
+            exited = loop.create_future()
+            loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+            try:
+                await exited
+            finally:
+                loop.remove_reader(pidfd)
+                os.close(pidfd)
+        events.put_nowait(('exit', None))
+
+
+class AsyncExecutionEngine:
+    """
+    asyncio 执行引擎：一个事件循环线程监管所有执行中的脚本，数据库读写交给少量线程
+    接口与 ScriptExecutionPool 一致，submit 接收协程函数
+    """
+
+    def __init__(self, max_concurrency: int, queue_size: int, db_threads: int):
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.db_threads = db_threads
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._running = 0
+        self._waiting = 0
+        self._submitted_count = 0
+        self._rejected_count = 0
+        self._completed_count = 0
+
+    def submit(self, func, *args) -> bool:
+        """
+        提交协程任务
+        返回: True 表示已接收，False 表示执行数和等待数都已满被拒绝
+        """
+        self._ensure_loop()
+        with self._lock:
+            if self._running + self._waiting >= self.max_concurrency + self.queue_size:
+                self._rejected_count += 1
+                return False
+            self._waiting += 1
+            self._submitted_count += 1
+        asyncio.run_coroutine_threadsafe(self._run_task(func, args), self._loop)
+        return True
+
+    def run(self, coroutine):
+        """在事件循环中执行协程并阻塞等待结果"""
+        self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def join(self):
+        """阻塞直到已提交的任务全部结束"""
+        with self._idle:
+            self._idle.wait_for(lambda: not self._running and not self._waiting)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'running_count': self._running,
+                'queue_depth': self._waiting,
+                'queue_capacity': self.queue_size,
+                'submitted_count': self._submitted_count,
+                'rejected_count': self._rejected_count,
+                'completed_count': self._completed_count,
+            }
+
+    async def _run_task(self, func, args):
+        async with self._semaphore:
+            with self._lock:
+                self._waiting -= 1
+                self._running += 1
+            try:
+                await func(*args)
+            except Exception:
+                logger.exception("脚本执行任务异常")
+            finally:
+                with self._idle:
+                    self._running -= 1
+                    self._completed_count += 1
+                    self._idle.notify_all()
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(ready,), name='script-async-engine',
+                                            daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def _run_loop(self, ready: threading.Event):
+        loop = asyncio.new_event_loop()
+        loop.set_default_executor(ThreadPoolExecutor(
+            max_workers=self.db_threads,
+            thread_name_prefix='script-async-db',
+            initializer=close_old_connections
+        ))
+        asyncio.set_event_loop(loop)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._loop = loop
+        ready.set()
+        loop.run_forever()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_async_engine() -> AsyncExecutionEngine:
+    """获取进程内共享的 asyncio 执行引擎"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AsyncExecutionEngine(
+                    max_concurrency=settings.SCRIPT_ASYNC_MAX_CONCURRENCY,
+                    queue_size=settings.SCRIPT_EXECUTION_QUEUE_SIZE,
+                    db_threads=settings.SCRIPT_ASYNC_DB_THREADS
+                )
+    return _engine
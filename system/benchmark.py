@@ -0,0 +1,366 @@
+"""
+脚本执行链路基准测试：执行器的进程启动耗时，以及经 ScriptTaskService.execute_script 的端到端吞吐
+
+服务层测试在当前配置的数据库中创建临时脚本（名称以 BENCH_PREFIX 开头）和执行记录，结束后删除。
+NoopScriptExecutor 不启动进程，只按参数生成输出并写入输出分块，用于把服务层和数据库的开销与进程启动开销分开测量。
+"""
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from . import dispatcher
+from .async_executor import AsyncScriptExecutor, AsyncExecutionEngine, run_blocking
+from .dispatcher import ExecutionDispatcher
+from .execution_pool import ScriptExecutionPool
+from .models import ScriptTask, ScriptExecution
+from .output_storage import release_output_refs
+from .retention import release_output_blobs
+from .script_executor import ScriptExecutor
+from .services import ScriptTaskService
+
+BENCH_PREFIX = '__bench__'
+
+# 输出大小由执行参数 bench_output_bytes 决定，bash 以同名变量读取，python 从 PARAMS 读取
+SCRIPT_CONTENTS = {
+    'bash': 'head -c "$bench_output_bytes" /dev/zero | tr "\\0" x',
+    'python': "import sys\nsys.stdout.write('x' * int(PARAMS['bench_output_bytes']))",
+}
+
+FINISHED_STATUSES = ('success', 'failed', 'timeout', 'cancelled', 'rejected')
+
+
+def summarize(values):
+    """一组耗时（秒）的分布，没有样本时返回 None"""
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return None
+    return {
+        'count': len(values),
+        'mean': statistics.mean(values),
+        'p50': values[len(values) // 2],
+        'p95': values[min(int(len(values) * 0.95), len(values) - 1)],
+        'p99': values[min(int(len(values) * 0.99), len(values) - 1)],
+        'max': values[-1],
+    }
+
+
+def current_rss():
+    """当前进程的常驻内存（字节），/proc 不可用时退化为峰值常驻内存"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssSampler:
+    """后台定期采样当前进程的常驻内存，记录峰值"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.baseline = current_rss()
+        self.peak = self.baseline
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name='bench-rss-sampler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+
+class NoopScriptExecutor(AsyncScriptExecutor):
+    """
+    不启动进程的执行器：立即成功，输出 bench_output_bytes 个字符并像真实执行一样分块写入输出记录器
+    同时提供同步和协程接口，线程池与 asyncio 执行引擎都可使用
+    """
+
+    def execute(self, parameters=None):
+        start_time = time.time()
+        output = self._generate(parameters)
+        if self.output_recorder:
+            self.output_recorder.flush()
+        return True, output, '', time.time() - start_time
+
+    async def execute_async(self, parameters=None):
+        start_time = time.time()
+        output = self._generate(parameters)
+        if self.output_recorder:
+            await run_blocking(self.output_recorder.write_chunks, self.output_recorder.take_chunks())
+        return True, output, '', time.time() - start_time
+
+    def _generate(self, parameters):
+        size = int((parameters or {}).get('bench_output_bytes', 0))
+        collected = {stream: [] for stream in self.STREAMS}
+        for offset in range(0, size, self.READ_SIZE):
+            self._emit('stdout', 'x' * min(self.READ_SIZE, size - offset), collected)
+            if self.output_recorder and self.output_recorder.flush_due():
+                self.output_recorder.write_chunks(self.output_recorder.take_chunks())
+        return ''.join(collected['stdout'])
+
+
+@contextmanager
+def execution_backend(engine, size):
+    """
+    临时替换进程内的执行调度器：绑定一个容量为 size 的新线程池或 asyncio 执行引擎，
+    各并发级别通过调整调度器的 capacity 限制在途执行数
+    返回调度器，结束后恢复原有的调度器
+    """
+    if engine == 'asyncio':
+        backend = AsyncExecutionEngine(
+            max_concurrency=size,
+            queue_size=size,
+            db_threads=settings.SCRIPT_ASYNC_DB_THREADS
+        )
+        target = ScriptTaskService._execute_script_coroutine
+    else:
+        backend = ScriptExecutionPool(max_workers=size, queue_size=size)
+        target = ScriptTaskService._execute_script_async
+    bench_dispatcher = ExecutionDispatcher(
+        backend,
+        capacity=size,
+        queue_size=size,
+        target=target,
+        is_async=engine == 'asyncio'
+    )
+
+    saved_dispatcher = dispatcher._dispatcher
+    dispatcher._dispatcher = bench_dispatcher
+    try:
+        with override_settings(SCRIPT_EXECUTION_BACKEND='thread', SCRIPT_EXECUTOR_ENGINE=engine):
+            yield bench_dispatcher
+    finally:
+        dispatcher._dispatcher = saved_dispatcher
+
+
+@contextmanager
+def executor_class(executor):
+    """executor 为 noop 时服务层改用 NoopScriptExecutor，real 时不做替换"""
+    saved = ScriptTaskService.__dict__['get_executor_class']
+    if executor == 'noop':
+        ScriptTaskService.get_executor_class = staticmethod(lambda: NoopScriptExecutor)
+    try:
+        yield
+    finally:
+        ScriptTaskService.get_executor_class = saved
+
+
+class ExecutionBenchmark:
+    """
+    基准测试场景为 脚本类型 × 输出大小 × 并发数 × 执行器 的组合
+    - spawn：直接调用 ScriptExecutor，不经过服务层和数据库，测量进程启动和输出读取的耗时
+    - service：经 execute_script 提交 并发数 × rounds 次执行，测量提交耗时、吞吐、排队时间、
+      服务层开销（端到端耗时减去排队时间和脚本执行时间）以及每个在途执行占用的内存
+    """
+
+    def __init__(self, script_types=('bash', 'python'), output_sizes=None, concurrency_levels=(1, 10, 50, 100, 500),
+                 executors=('noop', 'real'), engine='thread', spawn_runs=20, rounds=2, timeout=600, log=None):
+        self.script_types = script_types
+        self.output_sizes = output_sizes or {'tiny': 16, 'large': 1024 * 1024}
+        self.concurrency_levels = concurrency_levels
+        self.executors = executors
+        self.engine = engine
+        self.spawn_runs = spawn_runs
+        self.rounds = rounds
+        self.timeout = timeout
+        self.log = log or (lambda message: None)
+
+    def run(self):
+        results = {'environment': self.environment(), 'spawn': [], 'service': []}
+        scripts = self.create_scripts()
+        try:
+            with execution_backend(self.engine, max(self.concurrency_levels)) as bench_dispatcher:
+                for (script_type, output_name), script in scripts.items():
+                    output_bytes = self.output_sizes[output_name]
+                    self.log(f"spawn {script_type}/{output_name}")
+                    results['spawn'].append({
+                        'script_type': script_type,
+                        'output': output_name,
+                        'output_bytes': output_bytes,
+                        **self.measure_spawn(script, output_bytes),
+                    })
+                    for executor in self.executors:
+                        with executor_class(executor):
+                            for concurrency in self.concurrency_levels:
+                                self.log(f"service {script_type}/{output_name} executor={executor} "
+                                         f"concurrency={concurrency}")
+                                bench_dispatcher.capacity = concurrency
+                                bench_dispatcher.queue_size = concurrency * self.rounds
+                                results['service'].append({
+                                    'script_type': script_type,
+                                    'output': output_name,
+                                    'output_bytes': output_bytes,
+                                    'executor': executor,
+                                    'engine': self.engine,
+                                    'concurrency': concurrency,
+                                    **self.measure_service(script, output_bytes, concurrency),
+                                })
+        finally:
+            self.cleanup(scripts.values())
+        return results
+
+    def environment(self):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=5
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            commit = None
+        return {
+            'started_at': timezone.now().isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'database': connection.vendor,
+            'engine': self.engine,
+            'python_forkserver': settings.SCRIPT_PYTHON_FORKSERVER_ENABLED,
+            'rounds': self.rounds,
+        }
+
+    def create_scripts(self):
+        scripts = {}
+        for script_type in self.script_types:
+            for output_name in self.output_sizes:
+                scripts[(script_type, output_name)] = ScriptTask.objects.create(
+                    name=f'{BENCH_PREFIX}{script_type}-{output_name}-{uuid.uuid4().hex[:8]}',
+                    script_type=script_type,
+                    content=SCRIPT_CONTENTS[script_type],
+                    status='active',
+                    timeout=self.timeout
+                )
+        return scripts
+
+    @staticmethod
+    def cleanup(scripts):
+        """删除基准测试创建的脚本，执行记录和输出分块随之级联删除，再释放转存的输出文件和共享输出"""
+        script_ids = [script.id for script in scripts]
+        executions = ScriptExecution.objects.filter(script_task_id__in=script_ids)
+        paths = [
+            blob['path'] for blob in executions.filter(output_blob__isnull=False).values_list('output_blob', flat=True)
+        ]
+        refs = list(executions.filter(output_ref__isnull=False).values_list('output_ref_id', flat=True))
+        ScriptTask.objects.filter(id__in=script_ids).delete()
+        release_output_blobs(paths)
+        release_output_refs(refs)
+
+    def measure_spawn(self, script, output_bytes):
+        durations = []
+        failures = 0
+        for _ in range(self.spawn_runs):
+            started = time.perf_counter()
+            success, _, _, _ = ScriptExecutor(script).execute({'bench_output_bytes': output_bytes})
+            durations.append(time.perf_counter() - started)
+            failures += not success
+        return {'runs': self.spawn_runs, 'failures': failures, 'latency': summarize(durations)}
+
+    def measure_service(self, script, output_bytes, concurrency):
+        total = concurrency * self.rounds
+        submit_times = []
+        execution_ids = []
+        with RssSampler() as sampler:
+            started = time.perf_counter()
+            for index in range(total):
+                submitted = time.perf_counter()
+                # 每次的参数不同，避免相同执行被合并
+                execution, error = ScriptTaskService.execute_script(
+                    script.id, {'bench_output_bytes': output_bytes, 'bench_run': index}
+                )
+                submit_times.append(time.perf_counter() - submitted)
+                if execution:
+                    execution_ids.append(execution.id)
+            timed_out = not self.wait_finished(execution_ids)
+            wall_time = time.perf_counter() - started
+
+        rows = list(ScriptExecution.objects.filter(id__in=execution_ids).values(
+            'status', 'created_at', 'finished_at', 'queue_wait_time', 'execution_time', 'max_rss'
+        ))
+        finished = [row for row in rows if row['finished_at']]
+        end_to_end = [(row['finished_at'] - row['created_at']).total_seconds() for row in finished]
+        overhead = [
+            max((row['finished_at'] - row['created_at']).total_seconds()
+                - (row['queue_wait_time'] or 0) - (row['execution_time'] or 0), 0)
+            for row in finished
+        ]
+        child_rss = [row['max_rss'] for row in rows if row['max_rss']]
+        return {
+            'runs': total,
+            'submitted': len(execution_ids),
+            'success': sum(row['status'] == 'success' for row in rows),
+            'timed_out': timed_out,
+            'wall_time': wall_time,
+            'throughput': len(finished) / wall_time if wall_time else None,
+            'submit_latency': summarize(submit_times),
+            'end_to_end': summarize(end_to_end),
+            'queue_wait': summarize(row['queue_wait_time'] for row in finished),
+            'execution_time': summarize(row['execution_time'] for row in finished),
+            'service_overhead': summarize(overhead),
+            'rss_growth_bytes': sampler.peak - sampler.baseline,
+            'rss_per_inflight_bytes': (sampler.peak - sampler.baseline) / concurrency,
+            'child_max_rss_kb': statistics.mean(child_rss) if child_rss else None,
+        }
+
+    def wait_finished(self, execution_ids, interval=0.05):
+        """轮询直到执行全部结束，超时返回 False"""
+        deadline = time.monotonic() + self.timeout
+        pending = ScriptExecution.objects.filter(id__in=execution_ids).exclude(status__in=FINISHED_STATUSES)
+        while pending.exists():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(interval)
+        return True
+
+
+def compare_results(baseline, current):
+    """
+    按场景对比两次结果的关键指标
+    返回: 行列表，每行包含场景描述、指标名、基准值、当前值、变化百分比和是否变差（吞吐越高越好，其余越低越好）
+    """
+    def index(entries, keys):
+        return {tuple(entry[key] for key in keys): entry for entry in entries}
+
+    rows = []
+    for section, keys, metrics in (
+        ('spawn', ('script_type', 'output'), (('latency', 'p50'), ('latency', 'p95'))),
+        ('service', ('script_type', 'output', 'executor', 'concurrency'),
+         (('throughput', None), ('end_to_end', 'p95'), ('service_overhead', 'p50'), ('rss_per_inflight_bytes', None))),
+    ):
+        previous = index(baseline.get(section, []), keys)
+        for key, entry in index(current.get(section, []), keys).items():
+            if key not in previous:
+                continue
+            for metric, field in metrics:
+                old, new = previous[key].get(metric), entry.get(metric)
+                if field:
+                    old, new = (old or {}).get(field), (new or {}).get(field)
+                if old is None or new is None:
+                    continue
+                change = round((new - old) / old * 100, 1) if old else None
+                rows.append({
+                    'scenario': f"{section} {'/'.join(str(part) for part in key)}",
+                    'metric': f'{metric}.{field}' if field else metric,
+                    'baseline': old,
+                    'current': new,
+                    'change': change,
+                    'regression': bool(change) and (change < 0 if metric == 'throughput' else change > 0),
+                })
+    return rows
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+MACROS = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+MONTH_NAMES = {name: i for i, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1
+)}
+WEEKDAY_NAMES = {name: i for i, name in enumerate(['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}
+
+# 各字段的取值范围：分、时、日、月、星期（0 和 7 都表示星期日）
+FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+FIELD_NAMES = [None, None, None, MONTH_NAMES, WEEKDAY_NAMES]
+
+# 查找下一次执行时间的最远范围，超过仍找不到视为表达式不会触发（如 2 月 30 日）
+SEARCH_YEARS = 5
+
+
+class CronExpression:
+    """
+    标准 5 段 cron 表达式：分 时 日 月 星期
+    支持 *、数字、英文缩写、范围 a-b、列表 a,b、步长 */n 或 a-b/n，以及 @daily 等宏
+    日与星期同时限定时满足其一即可（与 Vixie cron 一致）
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = MACROS.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError("cron 表达式必须为 5 段：分 时 日 月 星期")
+
+        self.minutes, self.hours, self.days, self.months, weekdays = [
+            self._parse_field(field, FIELD_RANGES[i], FIELD_NAMES[i]) for i, field in enumerate(fields)
+        ]
+        self.weekdays = {0 if day == 7 else day for day in weekdays}
+        self.day_restricted = fields[2] != '*'
+        self.weekday_restricted = fields[4] != '*'
+
+    @staticmethod
+    def _parse_field(field, value_range, names):
+        low, high = value_range
+        values = set()
+        for part in field.lower().split(','):
+            expr, _, step = part.partition('/')
+            step = int(step) if step else 1
+            if step <= 0:
+                raise ValueError(f"cron 步长无效: {part}")
+
+            if expr == '*':
+                start, end = low, high
+            else:
+                first, _, last = expr.partition('-')
+                start = CronExpression._parse_value(first, names)
+                end = CronExpression._parse_value(last, names) if last else (high if step > 1 else start)
+            if start < low or end > high or start > end:
+                raise ValueError(f"cron 字段超出范围 {low}-{high}: {part}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    @staticmethod
+    def _parse_value(value, names):
+        if names and value in names:
+            return names[value]
+        if not value.isdigit():
+            raise ValueError(f"cron 字段无效: {value}")
+        return int(value)
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_match = moment.day in self.days
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def next_after(self, moment: datetime) -> datetime:
+        """计算严格晚于 moment 的下一次触发时间，按当前时区的本地时间匹配"""
+        local = timezone.localtime(moment).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        limit_year = local.year + SEARCH_YEARS
+
+        # 由大到小逐个字段跳到下一个可能的取值，而不是逐分钟尝试
+        while local.year <= limit_year:
+            if local.month not in self.months:
+                local = datetime(local.year + local.month // 12, local.month % 12 + 1, 1)
+                continue
+            if not self._day_matches(local):
+                local = datetime(local.year, local.month, local.day) + timedelta(days=1)
+                continue
+            if local.hour not in self.hours:
+                local = local.replace(minute=0) + timedelta(hours=1)
+                continue
+            later_minutes = [minute for minute in self.minutes if minute >= local.minute]
+            if not later_minutes:
+                local = local.replace(minute=0) + timedelta(hours=1)
+                continue
+            local = local.replace(minute=min(later_minutes))
+            return timezone.make_aware(local)
+        raise ValueError(f"cron 表达式在 {SEARCH_YEARS} 年内不会触发: {self.expression}")
+
+    def upcoming(self, moment: datetime, count: int):
+        """从 moment 之后依次列出 count 个触发时间"""
+        result = []
+        for _ in range(count):
+            moment = self.next_after(moment)
+            result.append(moment)
+        return result
@@ -0,0 +1,245 @@
+import heapq
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import Count
+
+from .models import ScriptExecution
+
+logger = logging.getLogger(__name__)
+
+# 调度所需的执行记录字段
+CANDIDATE_FIELDS = (
+    'id', 'script_task_id', 'priority', 'created_at', 'script_task__weight', 'script_task__max_concurrency'
+)
+
+
+class FairShareSelector:
+    """
+    从排队的执行中选择下一批交给执行后端
+    - 优先级严格从高到低：高优先级的执行全部选完或受并发上限阻塞后，低优先级才使用剩余槽位
+    - 同一优先级内按脚本权重做加权公平排队（start-time fair queuing）：每个脚本维护虚拟完成时间，
+      每选中一次增加 1/权重，每次选虚拟开始时间最小的脚本，相同时取排队最久的；
+      空闲后重新排队的脚本从当前虚拟时间开始，不累积空闲期间的份额
+    - 执行中数量（含本轮已选）达到 max_concurrency 的脚本本轮不再选择
+    选择器需在多次调度之间保留，虚拟时间才能反映各脚本已获得的执行次数
+    """
+
+    def __init__(self):
+        self._clocks = {}
+        self._finish_tags = {}
+
+    def select(self, candidates, running, limit):
+        """
+        candidates 为 CANDIDATE_FIELDS 字段的字典列表，running 为 {脚本ID: 执行中数量}
+        返回: 选中的执行ID列表，按选择顺序排列
+        """
+        load = dict(running)
+        levels = {}
+        for candidate in sorted(candidates, key=lambda item: (-item['priority'], item['created_at'])):
+            queues = levels.setdefault(candidate['priority'], {})
+            queues.setdefault(candidate['script_task_id'], deque()).append(candidate)
+
+        selected = []
+        for priority in sorted(levels, reverse=True):
+            if len(selected) >= limit:
+                break
+            clock = self._clocks.get(priority, 0.0)
+            finish_tags = self._finish_tags.setdefault(priority, {})
+            heap = [
+                (max(finish_tags.get(script_id, 0.0), clock), queue[0]['created_at'], str(script_id), script_id)
+                for script_id, queue in levels[priority].items()
+            ]
+            heapq.heapify(heap)
+
+            while heap and len(selected) < limit:
+                start, _, _, script_id = heapq.heappop(heap)
+                queue = levels[priority][script_id]
+                cap = queue[0]['script_task__max_concurrency']
+                if cap is not None and load.get(script_id, 0) >= cap:
+                    continue
+                candidate = queue.popleft()
+                selected.append(candidate['id'])
+                load[script_id] = load.get(script_id, 0) + 1
+                clock = start
+                finish_tags[script_id] = start + 1 / max(candidate['script_task__weight'] or 1, 1)
+                if queue:
+                    heapq.heappush(heap, (finish_tags[script_id], queue[0]['created_at'], str(script_id), script_id))
+
+            self._clocks[priority] = clock
+            # 虚拟完成时间不晚于当前虚拟时间的脚本与新脚本等价，不再保留
+            for script_id in [key for key, tag in finish_tags.items() if tag <= clock]:
+                del finish_tags[script_id]
+        return selected
+
+
+def count_running(script_ids, exclude_ids=()):
+    """各脚本在数据库中处于 running 状态的执行数，用于跨进程的并发上限判断"""
+    if not script_ids:
+        return {}
+    return dict(
+        ScriptExecution.objects.filter(script_task_id__in=script_ids, status='running')
+        .exclude(id__in=list(exclude_ids))
+        .values('script_task_id').annotate(running_count=Count('id'))
+        .values_list('script_task_id', 'running_count').order_by()
+    )
+
+
+class ExecutionDispatcher:
+    """
+    进程内执行调度器：排队的执行先进入调度器，执行后端有空闲槽位时按优先级和脚本权重选择下一批
+    - 执行后端只接收能立即开始的执行，排队顺序完全由调度器决定
+    - 设置了并发上限的脚本，同时计入其他进程中 running 状态的执行
+    - 被并发上限阻塞的执行每 RECHECK_INTERVAL 秒重新检查一次
+    """
+
+    RECHECK_INTERVAL = 1.0
+
+    def __init__(self, backend, capacity: int, queue_size: int, target, is_async=False):
+        self.backend = backend
+        self.capacity = capacity
+        self.queue_size = queue_size
+        self.target = target
+        self.is_async = is_async
+        self._waiting = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._thread = None
+        self._has_changes = False
+        self._selector = FairShareSelector()
+        self._rejected_count = 0
+        self._dispatched_count = 0
+
+    def submit(self, execution_id) -> bool:
+        """
+        登记排队中的执行
+        返回: True 表示已接收，False 表示等待数已满被拒绝
+        """
+        candidate = ScriptExecution.objects.filter(id=execution_id).values(*CANDIDATE_FIELDS).first()
+        if candidate is None:
+            return False
+        self._ensure_thread()
+        with self._changed:
+            if len(self._waiting) >= self.queue_size:
+                self._rejected_count += 1
+                return False
+            self._waiting[execution_id] = candidate
+            self._notify()
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            waiting_by_priority = {}
+            for candidate in self._waiting.values():
+                key = str(candidate['priority'])
+                waiting_by_priority[key] = waiting_by_priority.get(key, 0) + 1
+            return {
+                'dispatch_capacity': self.capacity,
+                'dispatch_waiting': len(self._waiting),
+                'dispatch_waiting_by_priority': waiting_by_priority,
+                'dispatch_inflight': len(self._inflight),
+                'dispatched_count': self._dispatched_count,
+                'dispatch_rejected_count': self._rejected_count,
+            }
+
+    def _notify(self):
+        self._has_changes = True
+        self._changed.notify()
+
+    def _finished(self, execution_id):
+        with self._changed:
+            self._inflight.pop(execution_id, None)
+            self._notify()
+
+    def _run(self, execution_id):
+        try:
+            self.target(execution_id)
+        finally:
+            self._finished(execution_id)
+
+    async def _run_async(self, execution_id):
+        try:
+            await self.target(execution_id)
+        finally:
+            self._finished(execution_id)
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._dispatch_loop, name='script-dispatcher', daemon=True)
+            self._thread.start()
+
+    def _dispatch_loop(self):
+        while True:
+            with self._changed:
+                # 有执行在等待时定期醒来，其他进程中的执行结束后受并发上限阻塞的执行也能继续调度
+                self._changed.wait_for(
+                    lambda: self._has_changes,
+                    timeout=self.RECHECK_INTERVAL if self._waiting else None
+                )
+                self._has_changes = False
+            try:
+                close_old_connections()
+                self._dispatch()
+            except Exception:
+                logger.exception("调度排队执行失败")
+            finally:
+                connections.close_all()
+
+    def _dispatch(self):
+        """在空闲槽位内选择并提交一批执行"""
+        with self._lock:
+            free = self.capacity - len(self._inflight)
+            if free <= 0 or not self._waiting:
+                return
+            candidates = list(self._waiting.values())
+            inflight = dict(self._inflight)
+
+        running = {}
+        for script_id in inflight.values():
+            running[script_id] = running.get(script_id, 0) + 1
+        capped = {
+            candidate['script_task_id'] for candidate in candidates
+            if candidate['script_task__max_concurrency'] is not None
+        }
+        for script_id, count in count_running(capped, inflight).items():
+            running[script_id] = running.get(script_id, 0) + count
+
+        for execution_id in self._selector.select(candidates, running, free):
+            with self._lock:
+                candidate = self._waiting.pop(execution_id)
+                self._inflight[execution_id] = candidate['script_task_id']
+            runner = self._run_async if self.is_async else self._run
+            if not self.backend.submit(runner, execution_id):
+                # 执行后端的队列满了（同一后端还有其他提交者），放回等待队列稍后重试
+                with self._lock:
+                    self._inflight.pop(execution_id, None)
+                    self._waiting[execution_id] = candidate
+                break
+            with self._lock:
+                self._dispatched_count += 1
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_execution_dispatcher(backend, capacity, target, is_async=False) -> ExecutionDispatcher:
+    """获取进程内共享的执行调度器，首次调用时绑定执行后端"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = ExecutionDispatcher(
+                    backend=backend,
+                    capacity=capacity,
+                    queue_size=settings.SCRIPT_EXECUTION_QUEUE_SIZE,
+                    target=target,
+                    is_async=is_async
+                )
+    return _dispatcher
@@ -0,0 +1,106 @@
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+
+class ScriptExecutionPool:
+    """脚本执行线程池：固定数量的工作线程 + 有界等待队列"""
+
+    def __init__(self, max_workers: int, queue_size: int):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._active_workers = 0
+        self._submitted_count = 0
+        self._rejected_count = 0
+        self._completed_count = 0
+
+    def submit(self, func, *args) -> bool:
+        """
+        提交任务
+        返回: True 表示已进入队列，False 表示队列已满被拒绝
+        """
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((func, args))
+        except queue.Full:
+            with self._lock:
+                self._rejected_count += 1
+            return False
+
+        with self._lock:
+            self._submitted_count += 1
+        return True
+
+    def join(self):
+        """阻塞直到队列中的任务全部执行完毕"""
+        self._queue.join()
+
+    def stats(self) -> dict:
+        """获取线程池运行状态"""
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'active_workers': self._active_workers,
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self.queue_size,
+                'submitted_count': self._submitted_count,
+                'rejected_count': self._rejected_count,
+                'completed_count': self._completed_count,
+            }
+
+    def _ensure_workers(self):
+        """按需启动工作线程"""
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            for index in range(len(self._threads), self.max_workers):
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    name=f'script-executor-{index}',
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker_loop(self):
+        """工作线程主循环"""
+        while True:
+            func, args = self._queue.get()
+            with self._lock:
+                self._active_workers += 1
+            try:
+                close_old_connections()
+                func(*args)
+            except Exception:
+                logger.exception("脚本执行任务异常")
+            finally:
+                # 每个任务结束后释放本线程持有的数据库连接
+                connections.close_all()
+                with self._lock:
+                    self._active_workers -= 1
+                    self._completed_count += 1
+                self._queue.task_done()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_execution_pool() -> ScriptExecutionPool:
+    """获取进程内共享的脚本执行线程池"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ScriptExecutionPool(
+                    max_workers=getattr(settings, 'SCRIPT_EXECUTION_MAX_WORKERS', 4),
+                    queue_size=getattr(settings, 'SCRIPT_EXECUTION_QUEUE_SIZE', 100),
+                )
+    return _pool
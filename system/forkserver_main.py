@@ -0,0 +1,231 @@
+"""
+Python 脚本预热解释器（forkserver）
+
+由 system.python_forkserver 以独立进程启动，不依赖 Django：
+启动时预先导入常用模块，之后每个执行请求从本进程 fork 出子进程运行脚本。
+
+用法: python3 forkserver_main.py <socket_path> [preload_module ...]
+
+请求协议（UNIX socket）：
+    8 字节大端长度 + 两个文件描述符（子进程的 stdout、stderr 写端）
+    随后为该长度的 JSON：{"code": 脚本内容, "hash": 内容哈希, "params": 参数字典, "cwd": 工作目录,
+                          "limits": {资源名: 上限}}
+响应为按行分隔的 JSON：
+    {"pid": 子进程号}
+    {"exit": 退出码, "rusage": 资源使用}
+"""
+import builtins
+import importlib
+import json
+import os
+import resource
+import select
+import signal
+import socket
+import struct
+import sys
+import traceback
+
+HEADER = struct.Struct('!Q')
+CODE_CACHE_SIZE = 256
+
+# 按内容哈希缓存编译结果，子进程 fork 后直接执行已编译的代码对象
+code_cache = {}
+
+
+def recv_exact(conn, size):
+    data = b''
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("请求不完整")
+        data += chunk
+    return data
+
+
+def rusage_to_dict(rusage):
+    return {
+        'ru_utime': rusage.ru_utime,
+        'ru_stime': rusage.ru_stime,
+        'ru_maxrss': rusage.ru_maxrss,
+        'ru_inblock': rusage.ru_inblock,
+        'ru_oublock': rusage.ru_oublock,
+    }
+
+
+def apply_resource_limits(limits):
+    """在子进程中设置资源上限，limits 为 {资源名（如 RLIMIT_AS）: 上限}，不会超过当前的硬限制"""
+    for name, value in (limits or {}).items():
+        resource_id = getattr(resource, name)
+        _, hard = resource.getrlimit(resource_id)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        # CPU 时间先到软限制收到 SIGXCPU，再多 1 秒到硬限制直接 SIGKILL
+        limit_hard = value + 1 if name == 'RLIMIT_CPU' and value != hard else value
+        resource.setrlimit(resource_id, (value, limit_hard))
+
+
+def compile_cached(request):
+    """编译脚本，语法错误留给子进程重新编译时输出"""
+    key = request.get('hash')
+    code = code_cache.get(key) if key else None
+    if code is None:
+        try:
+            code = compile(request['code'], 'script.py', 'exec')
+        except (SyntaxError, ValueError):
+            return None
+        if key:
+            if len(code_cache) >= CODE_CACHE_SIZE:
+                code_cache.pop(next(iter(code_cache)))
+            code_cache[key] = code
+    return code
+
+
+def run_child(request, code, stdout_fd, stderr_fd, inherited_fds):
+    """子进程：重定向标准流后执行脚本，不返回"""
+    exit_code = 0
+    try:
+        os.setsid()
+        apply_resource_limits(request.get('limits'))
+        for fd in inherited_fds:
+            os.close(fd)
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        for fd in (devnull, stdout_fd, stderr_fd):
+            os.close(fd)
+        sys.stdin = open(0, 'r', closefd=False)
+        sys.stdout = open(1, 'w', encoding='utf-8', closefd=False)
+        sys.stderr = open(2, 'w', encoding='utf-8', errors='backslashreplace', buffering=1, closefd=False)
+
+        os.chdir(request['cwd'])
+        sys.argv = ['script.py']
+        namespace = {
+            '__name__': '__main__',
+            '__builtins__': builtins,
+            'PARAMS': request['params'],
+            'json': json,
+            'sys': sys,
+            'os': os,
+        }
+        exec(code or compile(request['code'], 'script.py', 'exec'), namespace)
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        # 去掉本文件的调用帧，错误堆栈从用户脚本开始
+        exc_type, exc, tb = sys.exc_info()
+        traceback.print_exception(exc_type, exc, tb.tb_next)
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+def serve(socket_path, preload_modules):
+    for name in preload_modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"预加载模块 {name} 失败: {e}", file=sys.stderr, flush=True)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_r, False)
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+
+    parent_pid = os.getppid()
+    children = {}
+
+    print('ready', flush=True)
+    while True:
+        if os.getppid() != parent_pid:
+            # 启动本进程的执行器已退出
+            break
+        readable, _, _ = select.select([listener, wakeup_r], [], [], 1.0)
+
+        if wakeup_r in readable:
+            try:
+                os.read(wakeup_r, 4096)
+            except BlockingIOError:
+                pass
+        reap_children(children)
+
+        if listener in readable:
+            conn, _ = listener.accept()
+            try:
+                handle_request(conn, children, [listener.fileno(), wakeup_r, wakeup_w])
+            except Exception as e:
+                print(f"处理执行请求失败: {e}", file=sys.stderr, flush=True)
+                conn.close()
+
+
+def handle_request(conn, children, server_fds):
+    data, fds, _, _ = socket.recv_fds(conn, HEADER.size, 2)
+    if len(fds) != 2:
+        for fd in fds:
+            os.close(fd)
+        raise ConnectionError("缺少输出管道")
+    stdout_fd, stderr_fd = fds
+    try:
+        data += recv_exact(conn, HEADER.size - len(data))
+        (length,) = HEADER.unpack(data)
+        request = json.loads(recv_exact(conn, length))
+        code = compile_cached(request)
+
+        pid = os.fork()
+        if pid == 0:
+            run_child(request, code, stdout_fd, stderr_fd, server_fds + [conn.fileno()] + child_fds(children))
+    finally:
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+
+    children[pid] = conn
+    conn.sendall(json.dumps({'pid': pid}).encode() + b'\n')
+
+
+def child_fds(children):
+    return [conn.fileno() for conn in children.values()]
+
+
+def reap_children(children):
+    while children:
+        try:
+            pid, status, rusage = os.wait4(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        conn = children.pop(pid, None)
+        if conn is None:
+            continue
+        message = {'exit': os.waitstatus_to_exitcode(status), 'rusage': rusage_to_dict(rusage)}
+        try:
+            conn.sendall(json.dumps(message).encode() + b'\n')
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    serve(sys.argv[1], sys.argv[2:])
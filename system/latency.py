@@ -0,0 +1,90 @@
+import math
+from datetime import timedelta
+
+from django.utils import timezone
+
+# 对数分桶：相邻桶边界相差 2%，桶内取几何中点时相对误差约 1%，与历史数据量无关
+BUCKET_GROWTH = 1.02
+_LOG_GROWTH = math.log(BUCKET_GROWTH)
+
+# 统计窗口粒度：每个脚本每小时一行
+WINDOW_SIZE = timedelta(hours=1)
+
+# 查询时可选的时间范围
+LATENCY_RANGES = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30),
+}
+
+PERCENTILES = (50, 95, 99)
+
+
+def window_start(moment):
+    """所在统计窗口的起始时间（整点）"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def bucket_index(seconds: float) -> int:
+    """执行耗时（秒）对应的桶序号，按毫秒分桶，不足 1 毫秒的都落在 0 号桶"""
+    milliseconds = seconds * 1000
+    if milliseconds <= 1:
+        return 0
+    return math.ceil(math.log(milliseconds) / _LOG_GROWTH)
+
+
+def bucket_value(index: int) -> float:
+    """桶的代表值（秒），取桶上下边界的几何中点"""
+    if index <= 0:
+        return 0.001
+    return BUCKET_GROWTH ** (index - 0.5) / 1000
+
+
+def add_sample(histogram: dict, seconds: float):
+    """向直方图（{桶序号字符串: 次数}，可直接存入 JSONField）加入一个样本"""
+    key = str(bucket_index(seconds))
+    histogram[key] = histogram.get(key, 0) + 1
+
+
+def merge_histograms(histograms) -> dict:
+    """合并多个窗口的直方图"""
+    merged = {}
+    for histogram in histograms:
+        for key, count in (histogram or {}).items():
+            merged[key] = merged.get(key, 0) + count
+    return merged
+
+
+def compute_percentiles(histogram: dict, percentiles=PERCENTILES) -> dict:
+    """
+    从直方图计算分位数，耗时只与桶数有关
+    返回: {'p50': 秒, ...}，没有样本时值为 None
+    """
+    buckets = sorted((int(key), count) for key, count in histogram.items() if count)
+    total = sum(count for _, count in buckets)
+    result = {f'p{p}': None for p in percentiles}
+    if not total:
+        return result
+
+    for p in percentiles:
+        rank = max(math.ceil(total * p / 100), 1)
+        seen = 0
+        for index, count in buckets:
+            seen += count
+            if seen >= rank:
+                result[f'p{p}'] = round(bucket_value(index), 4)
+                break
+    return result
+
+
+def resolve_range(name):
+    """
+    解析查询的时间范围
+    返回: (起始窗口, 上一周期起始窗口, 时间范围)，名称无效时返回 None
+    """
+    span = LATENCY_RANGES.get(name)
+    if span is None:
+        return None
+    start = window_start(timezone.now()) + WINDOW_SIZE - span
+    return start, start - span, span
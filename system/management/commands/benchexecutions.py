@@ -0,0 +1,104 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from system.benchmark import ExecutionBenchmark, compare_results
+
+
+def parse_size(value):
+    """输出大小，支持 K/M 后缀"""
+    units = {'K': 1024, 'M': 1024 * 1024}
+    value = value.strip().upper()
+    if value[-1:] in units:
+        return int(value[:-1]) * units[value[-1]]
+    return int(value)
+
+
+class Command(BaseCommand):
+    help = ("脚本执行链路基准测试：执行器的进程启动耗时，以及经 execute_script 提交时的吞吐、排队时间、"
+            "服务层开销和每个在途执行的内存；会在当前数据库中创建并删除临时脚本，请在测试库上运行")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--script-types', default='bash,python', help="脚本类型，逗号分隔")
+        parser.add_argument('--outputs', default='tiny=16,large=1M',
+                            help="输出大小，名称=字节数，逗号分隔，字节数支持 K/M 后缀")
+        parser.add_argument('--concurrency', default='1,10,50,100,500', help="并发数，逗号分隔")
+        parser.add_argument('--executors', default='noop,real',
+                            help="执行器：noop 不启动进程，只测量服务层和数据库开销；real 为真实执行")
+        parser.add_argument('--engine', choices=['thread', 'asyncio'], default='thread', help="执行引擎")
+        parser.add_argument('--spawn-runs', type=int, default=20, help="直接调用执行器的次数")
+        parser.add_argument('--rounds', type=int, default=2, help="每个并发级别提交 并发数 × rounds 次执行")
+        parser.add_argument('--timeout', type=int, default=600, help="每个场景等待执行结束的最长时间(秒)")
+        parser.add_argument('--output', help="结果写入该 JSON 文件")
+        parser.add_argument('--compare', help="与之前保存的 JSON 结果对比")
+        parser.add_argument('--json', action='store_true', help="以 JSON 格式输出结果")
+
+    def handle(self, *args, **options):
+        try:
+            outputs = {}
+            for item in options['outputs'].split(','):
+                name, _, size = item.partition('=')
+                outputs[name.strip()] = parse_size(size)
+            concurrency_levels = [int(level) for level in options['concurrency'].split(',') if level]
+        except ValueError:
+            raise CommandError("--outputs 或 --concurrency 格式无效")
+        script_types = [item for item in options['script_types'].split(',') if item]
+        executors = [item for item in options['executors'].split(',') if item]
+        if set(script_types) - {'bash', 'python'}:
+            raise CommandError("--script-types 只支持 bash、python")
+        if set(executors) - {'noop', 'real'}:
+            raise CommandError("--executors 只支持 noop、real")
+        if not concurrency_levels or min(concurrency_levels) < 1:
+            raise CommandError("--concurrency 必须为正整数")
+
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+
+        benchmark = ExecutionBenchmark(
+            script_types=script_types,
+            output_sizes=outputs,
+            concurrency_levels=concurrency_levels,
+            executors=executors,
+            engine=options['engine'],
+            spawn_runs=options['spawn_runs'],
+            rounds=options['rounds'],
+            timeout=options['timeout'],
+            log=None if options['json'] else lambda message: self.stderr.write(message)
+        )
+        results = benchmark.run()
+        if baseline is not None:
+            results['comparison'] = compare_results(baseline, results)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(results, ensure_ascii=False, indent=2))
+            return
+        self.print_results(results)
+
+    def print_results(self, results):
+        for entry in results['spawn']:
+            latency = entry['latency']
+            self.stdout.write(
+                f"spawn {entry['script_type']}/{entry['output']}: p50={latency['p50'] * 1000:.1f} ms  "
+                f"p95={latency['p95'] * 1000:.1f} ms  失败={entry['failures']}"
+            )
+        for entry in results['service']:
+            overhead = entry['service_overhead'] or {}
+            end_to_end = entry['end_to_end'] or {}
+            self.stdout.write(
+                f"service {entry['script_type']}/{entry['output']} {entry['executor']} x{entry['concurrency']}: "
+                f"{entry['throughput'] or 0:.1f} 次/秒  端到端 p95={end_to_end.get('p95', 0) * 1000:.1f} ms  "
+                f"服务层开销 p50={overhead.get('p50', 0) * 1000:.1f} ms  "
+                f"在途内存={entry['rss_per_inflight_bytes'] / 1024:.0f} KB/个  "
+                f"成功 {entry['success']}/{entry['runs']}" + ("  [超时]" if entry['timed_out'] else "")
+            )
+        for row in results.get('comparison', []):
+            style = self.style.WARNING if row['regression'] else self.style.SUCCESS
+            change = f" ({row['change']:+.1f}%)" if row['change'] is not None else ""
+            self.stdout.write(style(
+                f"{row['scenario']} {row['metric']}: {row['baseline']:.4g} -> {row['current']:.4g}{change}"
+            ))
@@ -0,0 +1,83 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from system.models import ScriptTask
+from system.python_forkserver import PythonForkServer
+from system import script_executor
+
+
+class Command(BaseCommand):
+    help = "对比 python 脚本在独立进程启动与预热解释器 fork 两种方式下的执行耗时"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20, help="每种方式的执行次数")
+        parser.add_argument('--content', default='import json\nprint(json.dumps(PARAMS))',
+                            help="用于测试的脚本内容")
+        parser.add_argument('--preload', default='json',
+                            help="预热解释器预加载的模块，逗号分隔")
+        parser.add_argument('--json', action='store_true', help="以 JSON 格式输出结果")
+
+    def handle(self, *args, **options):
+        preload = [m for m in options['preload'].split(',') if m]
+        script = ScriptTask(name='benchmark', script_type='python', content=options['content'], timeout=60)
+        params = {'bench': 1}
+
+        with override_settings(SCRIPT_PYTHON_FORKSERVER_ENABLED=False):
+            spawn = self._measure(script, params, options['runs'])
+
+        forkserver = PythonForkServer(preload_modules=preload)
+        started = time.perf_counter()
+        forkserver.ensure_started()
+        warmup = time.perf_counter() - started
+
+        original = script_executor.get_python_forkserver
+        script_executor.get_python_forkserver = lambda: forkserver
+        try:
+            with override_settings(SCRIPT_PYTHON_FORKSERVER_ENABLED=True):
+                forked = self._measure(script, params, options['runs'])
+        finally:
+            script_executor.get_python_forkserver = original
+            forkserver.stop()
+
+        result = {
+            'runs': options['runs'],
+            'preload_modules': preload,
+            'forkserver_warmup_seconds': warmup,
+            'spawn': spawn,
+            'forkserver': forked,
+            'speedup_p50': spawn['p50'] / forked['p50'] if forked['p50'] else None,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f"预热解释器启动耗时: {warmup * 1000:.1f} ms（预加载: {', '.join(preload) or '无'}）")
+        for label, stats in (('独立进程', spawn), ('预热 fork', forked)):
+            self.stdout.write(
+                f"{label}: p50={stats['p50'] * 1000:.1f} ms  p95={stats['p95'] * 1000:.1f} ms  "
+                f"mean={stats['mean'] * 1000:.1f} ms  失败={stats['failures']}"
+            )
+        if result['speedup_p50']:
+            self.stdout.write(self.style.SUCCESS(f"p50 加速比: {result['speedup_p50']:.1f}x"))
+
+    @staticmethod
+    def _measure(script, params, runs):
+        durations = []
+        failures = 0
+        for _ in range(runs):
+            started = time.perf_counter()
+            success, _, _, _ = script_executor.ScriptExecutor(script).execute(params)
+            durations.append(time.perf_counter() - started)
+            if not success:
+                failures += 1
+        durations.sort()
+        return {
+            'mean': statistics.mean(durations),
+            'p50': durations[len(durations) // 2],
+            'p95': durations[min(int(len(durations) * 0.95), len(durations) - 1)],
+            'failures': failures,
+        }
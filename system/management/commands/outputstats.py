@@ -0,0 +1,63 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from system.output_dedup import get_dedup_stats, collect_garbage, backfill
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+class Command(BaseCommand):
+    help = "统计执行输出按内容去重的效果（去重比），可回填去重启用前的输出、回收无引用的共享输出"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true',
+                            help="把不小于 SCRIPT_OUTPUT_DEDUP_MIN_SIZE 且仍由执行记录自己保存的输出改为去重存储")
+        parser.add_argument('--gc', action='store_true',
+                            help="按实际引用修正共享输出的引用数，删除无引用的共享输出及其转存文件")
+        parser.add_argument('--batch-size', type=int, default=settings.SCRIPT_RETENTION_BATCH_SIZE,
+                            help="回填和回收时每批处理的记录数")
+        parser.add_argument('--top', type=int, default=10, help="列出被引用最多的共享输出数")
+        parser.add_argument('--json', action='store_true', help="以 JSON 输出统计结果")
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+        if options['backfill']:
+            result = backfill(options['batch_size'])
+            self.stderr.write(f"已回填 {result['converted']} 条执行记录，共 {format_bytes(result['bytes'])}")
+        if options['gc']:
+            result = collect_garbage(options['batch_size'])
+            self.stderr.write(f"已修正引用数 {result['corrected']} 个，删除共享输出 {result['purged']} 个")
+
+        stats = get_dedup_stats(options['top'])
+        if options['json']:
+            self.stdout.write(json.dumps(stats, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2))
+            return
+
+        ratio = f"{stats['dedup_ratio']:.2f}x" if stats['dedup_ratio'] else "-"
+        self.stdout.write(
+            f"共享输出 {stats['blob_count']} 个（转存 {stats['spilled_blob_count']} 个，"
+            f"无引用 {stats['unreferenced_blob_count']} 个），引用的执行记录 {stats['deduplicated_executions']} 条"
+        )
+        self.stdout.write(
+            f"逻辑大小 {format_bytes(stats['logical_bytes'])}，实际保存 {format_bytes(stats['stored_bytes'])}，"
+            f"节省 {format_bytes(stats['saved_bytes'])}，去重比 {ratio}"
+        )
+        self.stdout.write(
+            f"未去重的内联输出 {stats['inline_executions']} 条，共 {format_bytes(stats['inline_bytes'])}"
+        )
+        for blob in stats['top_blobs']:
+            self.stdout.write(
+                f"  {blob['checksum'][:12]}  引用 {blob['ref_count']:>6}  "
+                f"大小 {format_bytes(blob['size']):>10}  节省 {format_bytes(blob['saved_bytes'])}"
+            )
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from system import partitioning
+
+
+class Command(BaseCommand):
+    help = "PostgreSQL：把 script_execution 转换为按月分区的表，或预先创建后续月份的分区"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help="把现有表转换为分区表（持有排他锁，需在维护窗口执行）")
+        parser.add_argument('--months-ahead', type=int, default=settings.SCRIPT_EXECUTION_PARTITION_MONTHS_AHEAD,
+                            help="预先创建的月份数")
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            raise CommandError("表分区仅支持 PostgreSQL")
+
+        if partitioning.is_partitioned():
+            created = partitioning.ensure_partitions(options['months_ahead'])
+        elif options['convert']:
+            created = partitioning.convert_to_partitioned(options['months_ahead'])
+            self.stdout.write(self.style.SUCCESS("script_execution 已转换为分区表"))
+        else:
+            raise CommandError("script_execution 还不是分区表，需使用 --convert 转换")
+
+        for name in created:
+            self.stdout.write(f"已创建分区 {name}")
+        self.stdout.write(self.style.SUCCESS(f"当前分区: {', '.join(partitioning.list_partitions())}"))
@@ -0,0 +1,56 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from system import partitioning
+from system.rate_limit import prune_idle_buckets
+from system.retention import ExecutionRetention, get_retention_cutoffs
+
+
+class Command(BaseCommand):
+    help = "按保留天数分批清理过期的脚本执行记录，清理前汇总为每日统计，并合并已结束执行的输出分块、清理空闲的限流令牌桶"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SCRIPT_RETENTION_BATCH_SIZE,
+                            help="每批删除的记录数，每批一个短事务")
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="两批之间的休眠时间(秒)，降低对线上库的压力")
+        parser.add_argument('--archive', action='store_true',
+                            help="删除前把记录和错误输出归档到输出存储的 archive/ 目录，保留转存的输出文件")
+        parser.add_argument('--compact-days', type=int, default=settings.SCRIPT_OUTPUT_CHUNK_COMPACT_DAYS,
+                            help="合并结束超过该天数的执行的输出分块，小于 0 时不合并")
+        parser.add_argument('--dry-run', action='store_true', help="只统计将要清理的数量，不做修改")
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+        if (partitioning.is_supported() and partitioning.is_partitioned()
+                and not options['archive'] and not options['dry_run']):
+            # 整个月分区都过期时直接删除分区，剩余的再逐批清理
+            dropped = partitioning.drop_expired_partitions(get_retention_cutoffs(), options['batch_size'])
+            for name in dropped:
+                self.stdout.write(f"已删除分区 {name}")
+            partitioning.ensure_partitions(settings.SCRIPT_EXECUTION_PARTITION_MONTHS_AHEAD)
+
+        retention = ExecutionRetention(
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            archive=options['archive'],
+            dry_run=options['dry_run']
+        )
+        compact_before = None
+        if options['compact_days'] >= 0:
+            compact_before = timezone.now() - timedelta(days=options['compact_days'])
+        stats = retention.run(compact_before=compact_before)
+        # 已补满的限流令牌桶与新建的等价，一并清理，避免按客户端创建的桶无限增长
+        buckets_pruned = 0 if options['dry_run'] else prune_idle_buckets()
+
+        prefix = "[dry-run] 将" if options['dry_run'] else "已"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}清理执行记录 {stats['deleted']} 条，归档 {stats['archived']} 条，"
+            f"释放输出文件 {stats['blobs_released']} 个，合并输出分块 {stats['chunks_compacted']} 个，"
+            f"清理空闲限流令牌桶 {buckets_pruned} 个"
+        ))
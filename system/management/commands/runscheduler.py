@@ -0,0 +1,20 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from system.scheduler import ScriptScheduler
+
+
+class Command(BaseCommand):
+    help = "启动定时计划调度进程，按 cron 表达式或固定间隔触发脚本执行（可在多台主机同时运行）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refresh-interval', type=int, default=settings.SCRIPT_SCHEDULER_REFRESH_INTERVAL,
+                            help="增量同步计划变更的间隔(秒)")
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+        scheduler = ScriptScheduler(refresh_interval=options['refresh_interval'])
+        scheduler.run()
+        self.stdout.write(self.style.SUCCESS(f"调度进程 {scheduler.scheduler_id} 已退出"))
@@ -0,0 +1,36 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from system.worker import ExecutionWorker
+
+
+class Command(BaseCommand):
+    help = "启动脚本执行进程，从数据库队列中认领并执行脚本（需设置 SCRIPT_EXECUTION_BACKEND=database）"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.SCRIPT_EXECUTION_MAX_WORKERS,
+                            help="本进程同时执行的脚本数量")
+        parser.add_argument('--poll-interval', type=float, default=settings.SCRIPT_WORKER_POLL_INTERVAL,
+                            help="队列为空时的轮询间隔(秒)")
+        parser.add_argument('--lease', type=int, default=settings.SCRIPT_WORKER_LEASE_SECONDS,
+                            help="认领租约时长(秒)，超过该时长未续约的记录会被其他进程回收")
+        parser.add_argument('--max-attempts', type=int, default=settings.SCRIPT_WORKER_MAX_ATTEMPTS,
+                            help="单条记录的最大认领次数")
+
+    def handle(self, *args, **options):
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+        if settings.SCRIPT_EXECUTION_BACKEND != 'database':
+            self.stderr.write(self.style.WARNING(
+                "当前 SCRIPT_EXECUTION_BACKEND 不是 database，API 进程仍会在本地线程池中执行脚本"
+            ))
+
+        worker = ExecutionWorker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            lease_seconds=options['lease'],
+            max_attempts=options['max_attempts']
+        )
+        worker.run()
+        self.stdout.write(self.style.SUCCESS(f"执行进程 {worker.worker_id} 已退出"))
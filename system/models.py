@@ -1,5 +1,8 @@
 from django.db import models
 from common.models import BaseModel, ExecutableModel
+from .script_cache import compute_content_hash
+from .cron import CronExpression
+from datetime import timedelta
 import json
 
 
@@ -51,6 +54,14 @@ class ScriptTask(ExecutableModel):
         verbose_name="脚本内容",
         help_text="脚本的具体内容"
     )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name="内容哈希",
+        help_text="脚本内容的 SHA-256，保存时自动计算"
+    )
     description = models.TextField(
         blank=True,
         null=True,
@@ -67,6 +78,75 @@ class ScriptTask(ExecutableModel):
         verbose_name="超时时间(秒)",
         help_text="脚本执行超时时间，默认5分钟"
     )
+    use_workspace = models.BooleanField(
+        default=False,
+        verbose_name="独立工作目录",
+        help_text="开启后每次执行创建独立的临时工作目录，脚本需要读写相对路径文件时开启"
+    )
+    memory_limit = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="内存上限(MB)",
+        help_text="脚本进程可用的虚拟地址空间上限，为空表示不限制"
+    )
+    cpu_time_limit = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="CPU时间上限(秒)",
+        help_text="脚本进程可消耗的 CPU 时间上限，为空表示不限制"
+    )
+    open_files_limit = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="打开文件数上限",
+        help_text="脚本进程可同时打开的文件描述符数量上限，为空表示不限制"
+    )
+    output_limit = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="输出上限(KB)",
+        help_text="标准输出与错误输出合计的上限，超过后结束脚本，为空表示不限制"
+    )
+    cache_enabled = models.BooleanField(
+        default=False,
+        verbose_name="缓存结果",
+        help_text="适用于结果只取决于脚本内容和参数的脚本，有效期内相同参数的执行直接返回上次成功的输出"
+    )
+    cache_ttl = models.PositiveIntegerField(
+        default=300,
+        verbose_name="缓存有效期(秒)"
+    )
+    cache_invalidated_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="缓存失效时间",
+        help_text="早于该时间的执行结果不再作为缓存使用"
+    )
+    cache_hits = models.PositiveIntegerField(
+        default=0,
+        verbose_name="缓存命中次数"
+    )
+    cache_misses = models.PositiveIntegerField(
+        default=0,
+        verbose_name="缓存未命中次数"
+    )
+    retention_days = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="执行记录保留天数",
+        help_text="超过天数的执行记录由 pruneexecutions 清理并汇总为每日统计，为空时使用全局配置，0 表示永久保留"
+    )
+    max_concurrency = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="最大并发数",
+        help_text="同时执行的数量上限，超出的执行继续排队，为空表示不限制"
+    )
+    weight = models.PositiveIntegerField(
+        default=1,
+        verbose_name="调度权重",
+        help_text="同一优先级下各脚本按权重分配执行槽位，权重越大分到的越多"
+    )
 
     class Meta:
         db_table = 'script_task'
@@ -81,6 +161,17 @@ class ScriptTask(ExecutableModel):
     def __str__(self):
         return f"{self.name} ({self.get_script_type_display()})"
 
+    def save(self, *args, **kwargs):
+        self.content_hash = compute_content_hash(self.content)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+        super().save(*args, **kwargs)
+
+    def get_content_hash(self):
+        """获取脚本内容哈希，兼容尚未回填哈希的历史数据"""
+        return self.content_hash or compute_content_hash(self.content)
+
     def get_parameter_names(self):
         """获取参数名称列表"""
         if isinstance(self.parameters, dict):
@@ -88,15 +179,353 @@ class ScriptTask(ExecutableModel):
         return []
 
 
+class ScriptBatch(BaseModel):
+    """脚本批量执行记录：同一脚本按项目空间下的车型逐个执行"""
+
+    STATUS_CHOICES = [
+        ('running', '执行中'),
+        ('finished', '已完成'),
+    ]
+
+    script_task = models.ForeignKey(
+        ScriptTask,
+        on_delete=models.CASCADE,
+        related_name='batches',
+        verbose_name="关联脚本"
+    )
+    project_space = models.ForeignKey(
+        'vehicle_management.ProjectSpace',
+        on_delete=models.CASCADE,
+        related_name='script_batches',
+        verbose_name="项目空间"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='running',
+        verbose_name="批次状态"
+    )
+    parameters = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="公共参数",
+        help_text="所有车型共用的参数，车型相关参数会自动追加"
+    )
+    concurrency = models.PositiveIntegerField(
+        default=5,
+        verbose_name="并发上限",
+        help_text="同一批次同时执行的最大数量"
+    )
+    total_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="执行总数"
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="结束时间"
+    )
+
+    class Meta:
+        db_table = 'script_batch'
+        verbose_name = '脚本批量执行'
+        verbose_name_plural = '脚本批量执行'
+        indexes = [
+            models.Index(fields=['script_task', '-created_at']),
+            models.Index(fields=['status']),
+        ]
+
+    def __str__(self):
+        return f"{self.script_task.name} @ {self.project_space.name}"
+
+
+class ScriptSchedule(BaseModel):
+    """脚本定时计划：按 cron 表达式或固定间隔触发脚本执行，由 runscheduler 进程驱动"""
+
+    SCHEDULE_TYPE_CHOICES = [
+        ('cron', 'Cron表达式'),
+        ('interval', '固定间隔'),
+    ]
+
+    MISFIRE_POLICY_CHOICES = [
+        ('run_once', '补执行一次'),
+        ('skip', '跳过'),
+    ]
+
+    script_task = models.ForeignKey(
+        ScriptTask,
+        on_delete=models.CASCADE,
+        related_name='schedules',
+        verbose_name="关联脚本"
+    )
+    name = models.CharField(
+        max_length=100,
+        verbose_name="计划名称"
+    )
+    schedule_type = models.CharField(
+        max_length=10,
+        choices=SCHEDULE_TYPE_CHOICES,
+        default='cron',
+        verbose_name="计划类型"
+    )
+    cron_expression = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        verbose_name="Cron表达式",
+        help_text="5 段格式：分 时 日 月 星期，按系统时区计算"
+    )
+    interval_seconds = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="间隔(秒)"
+    )
+    parameters = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="执行参数"
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name="是否启用"
+    )
+    misfire_policy = models.CharField(
+        max_length=10,
+        choices=MISFIRE_POLICY_CHOICES,
+        default='run_once',
+        verbose_name="错过处理策略",
+        help_text="调度进程停机等原因错过触发时间超过宽限期时：补执行一次或直接跳过，多次错过只补一次"
+    )
+    misfire_grace_seconds = models.PositiveIntegerField(
+        default=60,
+        verbose_name="错过宽限期(秒)",
+        help_text="晚于计划时间不超过该时长仍视为正常触发"
+    )
+    jitter_seconds = models.PositiveIntegerField(
+        default=0,
+        verbose_name="随机延迟(秒)",
+        help_text="在计划时间后随机延迟触发，避免大量计划同时执行"
+    )
+    next_run_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="下次触发时间"
+    )
+    last_run_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="上次触发时间"
+    )
+    last_execution = models.ForeignKey(
+        'ScriptExecution',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="上次执行记录"
+    )
+    run_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="触发次数"
+    )
+    misfire_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="错过次数"
+    )
+
+    class Meta:
+        db_table = 'script_schedule'
+        verbose_name = '脚本定时计划'
+        verbose_name_plural = '脚本定时计划'
+        indexes = [
+            models.Index(fields=['is_active', 'next_run_at']),
+            models.Index(fields=['updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_schedule_type_display()})"
+
+    def get_next_run_after(self, moment):
+        """计算严格晚于 moment 的下一次触发时间"""
+        if self.schedule_type == 'interval':
+            return moment + timedelta(seconds=self.interval_seconds)
+        return CronExpression(self.cron_expression).next_after(moment)
+
+
+class ScriptWorkflow(BaseModel):
+    """脚本工作流：由脚本步骤组成的有向无环图，无依赖关系的步骤并行执行"""
+
+    name = models.CharField(
+        max_length=100,
+        verbose_name="工作流名称"
+    )
+    description = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name="备注说明"
+    )
+    concurrency = models.PositiveIntegerField(
+        default=4,
+        verbose_name="并发上限",
+        help_text="同一次运行中同时执行的最大步骤数"
+    )
+
+    class Meta:
+        db_table = 'script_workflow'
+        verbose_name = '脚本工作流'
+        verbose_name_plural = '脚本工作流'
+        indexes = [
+            models.Index(fields=['name']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def get_definition(self):
+        """步骤定义快照，运行时按快照调度，不受之后修改工作流的影响"""
+        return [
+            {
+                'key': step.key,
+                'script_task': str(step.script_task_id),
+                'parameters': step.parameters,
+                'depends_on': step.depends_on,
+            }
+            for step in self.steps.order_by('order')
+        ]
+
+
+class ScriptWorkflowStep(BaseModel):
+    """工作流步骤"""
+
+    workflow = models.ForeignKey(
+        ScriptWorkflow,
+        on_delete=models.CASCADE,
+        related_name='steps',
+        verbose_name="所属工作流"
+    )
+    key = models.CharField(
+        max_length=50,
+        verbose_name="步骤标识",
+        help_text="工作流内唯一，下游步骤通过 <步骤标识>_output 参数获取本步骤的输出"
+    )
+    script_task = models.ForeignKey(
+        ScriptTask,
+        on_delete=models.CASCADE,
+        related_name='workflow_steps',
+        verbose_name="执行脚本"
+    )
+    parameters = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="步骤参数"
+    )
+    depends_on = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="依赖步骤",
+        help_text="上游步骤标识列表，全部成功后才执行本步骤"
+    )
+    order = models.PositiveIntegerField(
+        default=0,
+        verbose_name="排序"
+    )
+
+    class Meta:
+        db_table = 'script_workflow_step'
+        verbose_name = '脚本工作流步骤'
+        verbose_name_plural = '脚本工作流步骤'
+        unique_together = [('workflow', 'key')]
+
+    def __str__(self):
+        return f"{self.workflow.name}.{self.key}"
+
+
+class ScriptWorkflowRun(BaseModel):
+    """工作流运行记录，每个步骤对应一条执行记录"""
+
+    STATUS_CHOICES = [
+        ('running', '执行中'),
+        ('success', '成功'),
+        ('failed', '失败'),
+    ]
+
+    workflow = models.ForeignKey(
+        ScriptWorkflow,
+        on_delete=models.CASCADE,
+        related_name='runs',
+        verbose_name="所属工作流"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='running',
+        verbose_name="运行状态"
+    )
+    parameters = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="运行参数",
+        help_text="所有步骤共用的参数"
+    )
+    definition = models.JSONField(
+        default=list,
+        verbose_name="步骤定义快照"
+    )
+    concurrency = models.PositiveIntegerField(
+        default=4,
+        verbose_name="并发上限"
+    )
+    critical_path = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name="关键路径",
+        help_text="耗时最长的依赖链上的步骤标识"
+    )
+    critical_path_time = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="关键路径耗时(秒)"
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="结束时间"
+    )
+
+    class Meta:
+        db_table = 'script_workflow_run'
+        verbose_name = '脚本工作流运行记录'
+        verbose_name_plural = '脚本工作流运行记录'
+        indexes = [
+            models.Index(fields=['workflow', '-created_at']),
+            models.Index(fields=['status']),
+        ]
+
+    def __str__(self):
+        return f"{self.workflow.name} @ {self.created_at}"
+
+
 class ScriptExecution(BaseModel):
     """脚本执行记录模型"""
 
+    PRIORITY_LOW = 1
+    PRIORITY_NORMAL = 5
+    PRIORITY_HIGH = 9
+    PRIORITY_CHOICES = [
+        (PRIORITY_LOW, '低（批量）'),
+        (PRIORITY_NORMAL, '普通'),
+        (PRIORITY_HIGH, '高（交互）'),
+    ]
+
     STATUS_CHOICES = [
+        ('pending', '等待调度'),
+        ('queued', '排队中'),
         ('running', '执行中'),
         ('success', '成功'),
         ('failed', '失败'),
         ('timeout', '超时'),
         ('cancelled', '已取消'),
+        ('rejected', '已拒绝'),
     ]
 
     script_task = models.ForeignKey(
@@ -108,7 +537,7 @@ class ScriptExecution(BaseModel):
     status = models.CharField(
         max_length=10,
         choices=STATUS_CHOICES,
-        default='running',
+        default='queued',
         verbose_name="执行状态"
     )
     input_parameters = models.JSONField(
@@ -116,10 +545,128 @@ class ScriptExecution(BaseModel):
         blank=True,
         verbose_name="输入参数"
     )
+    priority = models.PositiveSmallIntegerField(
+        choices=PRIORITY_CHOICES,
+        default=PRIORITY_NORMAL,
+        verbose_name="优先级",
+        help_text="排队的执行按优先级从高到低调度，同一优先级内按脚本权重公平分配"
+    )
+    queued_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="进入队列时间"
+    )
+    queue_wait_time = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="排队时间(秒)",
+        help_text="从进入队列到开始执行的时间"
+    )
+    batch = models.ForeignKey(
+        ScriptBatch,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='executions',
+        verbose_name="所属批次"
+    )
+    vehicle = models.ForeignKey(
+        'vehicle_management.VehicleModel',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='script_executions',
+        verbose_name="关联车型"
+    )
+    workflow_run = models.ForeignKey(
+        ScriptWorkflowRun,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='executions',
+        verbose_name="所属工作流运行"
+    )
+    workflow_step = models.CharField(
+        max_length=50,
+        blank=True,
+        default='',
+        verbose_name="工作流步骤标识"
+    )
+    schedule = models.ForeignKey(
+        ScriptSchedule,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='executions',
+        verbose_name="触发计划"
+    )
+    cache_key = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        verbose_name="缓存键",
+        help_text="按脚本内容哈希和参数计算，用于结果缓存和合并相同的执行"
+    )
+    cache_hit = models.BooleanField(
+        default=False,
+        verbose_name="命中缓存"
+    )
+    coalesced_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="合并请求数",
+        help_text="执行期间到达的相同请求（同一脚本、同样参数）直接合并到本记录的次数"
+    )
+    cached_from = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='cache_reuses',
+        verbose_name="缓存来源",
+        help_text="命中缓存时输出来自的执行记录"
+    )
     output = models.TextField(
         blank=True,
         null=True,
-        verbose_name="执行输出"
+        verbose_name="执行输出",
+        help_text="标准输出，超过内联阈值时仅保留开头部分作为预览"
+    )
+    output_size = models.BigIntegerField(
+        default=0,
+        verbose_name="输出字节数"
+    )
+    output_checksum = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        verbose_name="输出校验和",
+        help_text="完整标准输出的 SHA-256"
+    )
+    output_blob = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name="输出存储信息",
+        help_text="完整输出转存到压缩存储时的路径、压缩算法和分块偏移"
+    )
+    output_ref = models.ForeignKey(
+        'ScriptOutputBlob',
+        on_delete=models.DO_NOTHING,
+        null=True,
+        blank=True,
+        related_name='executions',
+        verbose_name="输出内容",
+        help_text="按内容去重存储的标准输出，此时 output 字段为空；由引用计数管理，不随执行记录删除"
+    )
+    result = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name="结构化结果",
+        help_text="执行成功时按脚本返回类型（json/xml/html）解析标准输出得到的结果，可按其中的字段查询和统计"
+    )
+    result_error = models.TextField(
+        blank=True,
+        default='',
+        verbose_name="结果解析错误"
     )
     error_message = models.TextField(
         blank=True,
@@ -131,6 +678,31 @@ class ScriptExecution(BaseModel):
         blank=True,
         verbose_name="执行耗时(秒)"
     )
+    cpu_user_time = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="用户态CPU时间(秒)"
+    )
+    cpu_system_time = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="内核态CPU时间(秒)"
+    )
+    max_rss = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="峰值内存(KB)"
+    )
+    block_input = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="块设备读次数"
+    )
+    block_output = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="块设备写次数"
+    )
     started_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name="开始时间"
@@ -140,6 +712,27 @@ class ScriptExecution(BaseModel):
         blank=True,
         verbose_name="结束时间"
     )
+    worker_id = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        verbose_name="执行进程",
+        help_text="认领该记录的 runworkers 进程标识，格式为 主机名:进程号"
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name="认领次数"
+    )
+    heartbeat_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="最近心跳时间"
+    )
+    lease_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="租约到期时间"
+    )
 
     class Meta:
         db_table = 'script_execution'
@@ -148,20 +741,44 @@ class ScriptExecution(BaseModel):
         indexes = [
             models.Index(fields=['script_task', '-started_at']),
             models.Index(fields=['status']),
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['status', '-priority', 'created_at']),
+            models.Index(fields=['status', 'lease_expires_at']),
+            models.Index(fields=['batch', 'status']),
+            models.Index(fields=['cache_key', 'status', 'finished_at']),
         ]
 
     def __str__(self):
         return f"{self.script_task.name} - {self.started_at.strftime('%Y-%m-%d %H:%M:%S')}"
     
+    def get_output(self):
+        """标准输出：去重存储的取共享内容，转存的同样只有预览部分"""
+        if self.output_ref_id:
+            return self.output_ref.content
+        return self.output
+
     def get_formatted_output(self):
-        """获取格式化的输出信息"""
-        if not self.output:
+        """获取格式化的输出信息（合并展示标准输出和错误输出）"""
+        sections = []
+        output = self.get_output()
+        if output:
+            sections.append(f"=== 标准输出 ===\n{output}")
+        if self.error_message:
+            sections.append(f"=== 错误输出 ===\n{self.error_message}")
+        if not sections:
             return "无输出"
-        return self.output
+        return '\n'.join(sections)
     
+    def is_output_truncated(self):
+        """输出是否已转存，记录中仅为预览"""
+        if self.output_ref_id:
+            return self.output_ref.storage is not None
+        return self.output_blob is not None
+
     def has_output(self):
         """检查是否有输出内容"""
-        return bool(self.output and self.output.strip())
+        output = self.get_output()
+        return bool(output and output.strip())
     
     def get_execution_summary(self):
         """获取执行摘要信息"""
@@ -173,4 +790,292 @@ class ScriptExecution(BaseModel):
             'started_at': self.started_at.strftime('%Y-%m-%d %H:%M:%S'),
             'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else "未完成"
         }
-        return summary
\ No newline at end of file
+        return summary
+
+
+class ScriptOutputChunk(models.Model):
+    """脚本输出分块，执行过程中按流增量写入"""
+
+    STREAM_CHOICES = [
+        ('stdout', '标准输出'),
+        ('stderr', '错误输出'),
+    ]
+
+    execution = models.ForeignKey(
+        ScriptExecution,
+        on_delete=models.CASCADE,
+        related_name='output_chunks',
+        verbose_name="关联执行记录"
+    )
+    stream = models.CharField(
+        max_length=10,
+        choices=STREAM_CHOICES,
+        verbose_name="输出流"
+    )
+    offset = models.BigIntegerField(
+        verbose_name="起始偏移",
+        help_text="该分块在所属输出流中的起始字节偏移（UTF-8）"
+    )
+    size = models.PositiveIntegerField(
+        verbose_name="分块字节数"
+    )
+    content = models.TextField(
+        verbose_name="分块内容"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="写入时间"
+    )
+
+    class Meta:
+        db_table = 'script_output_chunk'
+        verbose_name = '脚本输出分块'
+        verbose_name_plural = '脚本输出分块'
+        ordering = ['offset']
+        constraints = [
+            models.UniqueConstraint(fields=['execution', 'stream', 'offset'], name='uniq_output_chunk_offset'),
+        ]
+
+    def __str__(self):
+        return f"{self.execution_id} {self.stream}@{self.offset}"
+
+
+class ScriptOutputBlob(models.Model):
+    """
+    按内容去重的标准输出：相同输出（SHA-256 相同）只保存一份，执行记录通过 output_ref 引用
+    ref_count 为引用的执行记录数，降为 0 时连同转存文件一起删除
+    """
+
+    checksum = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name="内容校验和",
+        help_text="完整标准输出的 SHA-256"
+    )
+    size = models.BigIntegerField(
+        verbose_name="内容字节数"
+    )
+    content = models.TextField(
+        blank=True,
+        default='',
+        verbose_name="内容",
+        help_text="完整输出，超过内联阈值时仅保留开头部分作为预览"
+    )
+    storage = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name="存储信息",
+        help_text="完整输出转存到压缩存储时的路径、压缩算法和分块偏移"
+    )
+    ref_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="引用次数"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="创建时间"
+    )
+    last_used_at = models.DateTimeField(
+        verbose_name="最近引用时间"
+    )
+
+    class Meta:
+        db_table = 'script_output_blob'
+        verbose_name = '脚本输出内容'
+        verbose_name_plural = '脚本输出内容'
+        indexes = [
+            models.Index(fields=['ref_count']),
+        ]
+
+    def __str__(self):
+        return f"{self.checksum[:12]} ({self.size} 字节, 引用 {self.ref_count})"
+
+
+class ScriptLatencyStat(models.Model):
+    """脚本执行耗时统计：每个脚本每小时一行，执行结束时增量更新计数和耗时直方图"""
+
+    script_task = models.ForeignKey(
+        ScriptTask,
+        on_delete=models.CASCADE,
+        related_name='latency_stats',
+        verbose_name="关联脚本"
+    )
+    window_start = models.DateTimeField(
+        verbose_name="窗口起始时间",
+        help_text="统计窗口的起始整点"
+    )
+    success_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="成功次数"
+    )
+    failure_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="失败次数"
+    )
+    timeout_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="超时次数"
+    )
+    total_time = models.FloatField(
+        default=0,
+        verbose_name="累计耗时(秒)"
+    )
+    min_time = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="最短耗时(秒)"
+    )
+    max_time = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="最长耗时(秒)"
+    )
+    histogram = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="耗时直方图",
+        help_text="对数分桶的耗时分布 {桶序号: 次数}，用于计算分位数"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="更新时间"
+    )
+
+    class Meta:
+        db_table = 'script_latency_stat'
+        verbose_name = '脚本耗时统计'
+        verbose_name_plural = '脚本耗时统计'
+        ordering = ['window_start']
+        constraints = [
+            models.UniqueConstraint(fields=['script_task', 'window_start'], name='uniq_latency_stat_window'),
+        ]
+        indexes = [
+            models.Index(fields=['window_start']),
+        ]
+
+    def __str__(self):
+        return f"{self.script_task_id} @ {self.window_start}"
+
+
+class ScriptExecutionDailySummary(models.Model):
+    """执行记录每日汇总：清理过期执行记录前按脚本和日期累加，保留长期趋势"""
+
+    script_task = models.ForeignKey(
+        ScriptTask,
+        on_delete=models.CASCADE,
+        related_name='daily_summaries',
+        verbose_name="关联脚本"
+    )
+    date = models.DateField(
+        verbose_name="日期",
+        help_text="执行记录创建时间所在的日期（本地时区）"
+    )
+    total_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="执行总数"
+    )
+    success_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="成功次数"
+    )
+    failure_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="失败次数"
+    )
+    timeout_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="超时次数"
+    )
+    cancelled_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="取消或拒绝次数"
+    )
+    cache_hit_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="缓存命中次数"
+    )
+    total_time = models.FloatField(
+        default=0,
+        verbose_name="累计耗时(秒)"
+    )
+    min_time = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="最短耗时(秒)"
+    )
+    max_time = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name="最长耗时(秒)"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="更新时间"
+    )
+
+    class Meta:
+        db_table = 'script_execution_daily_summary'
+        verbose_name = '执行记录每日汇总'
+        verbose_name_plural = '执行记录每日汇总'
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['script_task', 'date'], name='uniq_execution_summary_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.script_task_id} @ {self.date}"
+
+
+class ScriptRateBucket(models.Model):
+    """
+    执行请求的令牌桶：按客户端、脚本和全局分别限流，各 API 进程共用数据库中的令牌数
+    令牌按 refill_rate 持续补充，最多 capacity 个；每个执行请求消耗一个
+    """
+
+    SCOPE_CHOICES = [
+        ('global', '全局'),
+        ('script', '脚本'),
+        ('client', '客户端'),
+    ]
+
+    key = models.CharField(
+        max_length=200,
+        unique=True,
+        verbose_name="桶标识",
+        help_text="范围加对象标识，如 global、script:<脚本ID>、client:ip:<地址>"
+    )
+    scope = models.CharField(
+        max_length=10,
+        choices=SCOPE_CHOICES,
+        verbose_name="限流范围"
+    )
+    tokens = models.FloatField(
+        verbose_name="剩余令牌",
+        help_text="refilled_at 时刻的令牌数，当前令牌数需加上之后补充的部分"
+    )
+    refilled_at = models.FloatField(
+        verbose_name="令牌结算时间",
+        help_text="Unix 时间戳（秒）"
+    )
+    capacity = models.FloatField(
+        verbose_name="桶容量",
+        help_text="允许的突发请求数"
+    )
+    refill_rate = models.FloatField(
+        verbose_name="补充速率(个/秒)"
+    )
+    rejected_count = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="拒绝次数"
+    )
+
+    class Meta:
+        db_table = 'script_rate_bucket'
+        verbose_name = '执行限流令牌桶'
+        verbose_name_plural = '执行限流令牌桶'
+        indexes = [
+            models.Index(fields=['scope', 'refilled_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.1f}/{self.capacity:.0f}"
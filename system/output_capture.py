@@ -0,0 +1,102 @@
+import time
+
+from django.db.models import F
+
+from .models import ScriptOutputChunk
+
+OUTPUT_STREAMS = ('stdout', 'stderr')
+
+
+class ExecutionOutputRecorder:
+    """按输出流缓冲脚本输出，定期以有序分块批量写入数据库"""
+
+    FLUSH_BYTES = 64 * 1024
+    FLUSH_INTERVAL = 0.5
+
+    def __init__(self, execution_id):
+        self.execution_id = execution_id
+        self._pending = {stream: [] for stream in OUTPUT_STREAMS}
+        self._pending_bytes = {stream: 0 for stream in OUTPUT_STREAMS}
+        self._offsets = {stream: 0 for stream in OUTPUT_STREAMS}
+        self._last_flush = time.monotonic()
+
+    def write(self, stream: str, text: str):
+        """追加一段已解码的输出"""
+        if not text:
+            return
+        self._pending[stream].append(text)
+        self._pending_bytes[stream] += len(text.encode('utf-8'))
+
+    def flush_due(self) -> bool:
+        """缓冲达到字节阈值或距上次写入超过时间阈值"""
+        if not sum(self._pending_bytes.values()):
+            return False
+        return (max(self._pending_bytes.values()) >= self.FLUSH_BYTES
+                or time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL)
+
+    def maybe_flush(self):
+        """缓冲达到阈值时落库"""
+        if self.flush_due():
+            self.flush()
+
+    def flush(self):
+        """将缓冲的输出写成分块"""
+        self.write_chunks(self.take_chunks())
+
+    def take_chunks(self):
+        """取出缓冲的输出并生成分块对象，不访问数据库（供事件循环内调用，再交给线程写入）"""
+        chunks = []
+        for stream in OUTPUT_STREAMS:
+            if not self._pending[stream]:
+                continue
+            size = self._pending_bytes[stream]
+            chunks.append(ScriptOutputChunk(
+                execution_id=self.execution_id,
+                stream=stream,
+                offset=self._offsets[stream],
+                size=size,
+                content=''.join(self._pending[stream])
+            ))
+            self._offsets[stream] += size
+            self._pending[stream] = []
+            self._pending_bytes[stream] = 0
+        self._last_flush = time.monotonic()
+        return chunks
+
+    @staticmethod
+    def write_chunks(chunks):
+        if chunks:
+            ScriptOutputChunk.objects.bulk_create(chunks)
+
+
+def read_output_chunks(execution_id, stream: str, offset: int, limit: int):
+    """
+    读取指定输出流从 offset 开始的新增内容
+    返回: (内容, 下一次读取的偏移)
+    """
+    chunks = ScriptOutputChunk.objects.filter(
+        execution_id=execution_id,
+        stream=stream
+    ).annotate(
+        end=F('offset') + F('size')
+    ).filter(
+        end__gt=offset
+    ).order_by('offset').values_list('offset', 'size', 'content')
+
+    parts = []
+    next_offset = offset
+    total = 0
+    for chunk_offset, size, content in chunks.iterator():
+        if total >= limit:
+            break
+        if chunk_offset < offset:
+            # 起始偏移落在分块中间时按字节截取
+            data = content.encode('utf-8')[offset - chunk_offset:]
+            parts.append(data.decode('utf-8', errors='ignore'))
+            size = len(data)
+        else:
+            parts.append(content)
+        next_offset += size
+        total += size
+
+    return ''.join(parts), next_offset
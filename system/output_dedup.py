@@ -0,0 +1,144 @@
+"""
+执行输出去重的统计与维护
+- 统计：执行记录引用的输出总量（逻辑大小）与去重后实际保存的大小，得出去重比
+- 回收：按实际引用重新计算共享输出的引用数，删除已无引用的共享输出
+- 回填：把去重启用前内联保存或单独转存的输出改为引用共享输出
+"""
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Sum, Q
+from django.utils import timezone
+
+from .models import ScriptExecution, ScriptOutputBlob
+from .output_storage import acquire_output_blob, release_output_refs, purge_output_blobs, iter_output_blob
+from .retention import release_output_blobs
+
+logger = logging.getLogger(__name__)
+
+# 最近被引用过的共享输出不参与回收，其引用可能还未写入执行记录
+GC_GRACE_PERIOD = timedelta(hours=1)
+
+
+def get_dedup_stats(top=10) -> dict:
+    """
+    去重统计
+    返回: 共享输出数、引用的执行数、逻辑字节数、实际保存字节数、去重比和被引用最多的共享输出
+    """
+    referenced = ScriptExecution.objects.filter(output_ref__isnull=False).aggregate(
+        executions=Count('id'),
+        logical_bytes=Sum('output_size')
+    )
+    blobs = ScriptOutputBlob.objects.aggregate(
+        blobs=Count('id'),
+        stored_bytes=Sum('size'),
+        spilled=Count('id', filter=Q(storage__isnull=False)),
+        unreferenced=Count('id', filter=Q(ref_count=0))
+    )
+    inline = ScriptExecution.objects.filter(output_ref__isnull=True).aggregate(
+        executions=Count('id', filter=Q(output_size__gt=0)),
+        bytes=Sum('output_size')
+    )
+    logical_bytes = referenced['logical_bytes'] or 0
+    stored_bytes = blobs['stored_bytes'] or 0
+    return {
+        'blob_count': blobs['blobs'],
+        'spilled_blob_count': blobs['spilled'],
+        'unreferenced_blob_count': blobs['unreferenced'],
+        'deduplicated_executions': referenced['executions'],
+        'logical_bytes': logical_bytes,
+        'stored_bytes': stored_bytes,
+        'saved_bytes': logical_bytes - stored_bytes,
+        'dedup_ratio': round(logical_bytes / stored_bytes, 2) if stored_bytes else None,
+        'inline_executions': inline['executions'],
+        'inline_bytes': inline['bytes'] or 0,
+        'top_blobs': [
+            {**row, 'saved_bytes': row['size'] * max(row['ref_count'] - 1, 0)}
+            for row in ScriptOutputBlob.objects.order_by('-ref_count', '-size').values(
+                'checksum', 'size', 'ref_count', 'last_used_at'
+            )[:top]
+        ],
+    }
+
+
+def collect_garbage(batch_size=500) -> dict:
+    """
+    按实际引用的执行记录数修正共享输出的引用数（执行记录随脚本级联删除时不会减少引用），
+    再删除引用数为 0 的共享输出；最近 GC_GRACE_PERIOD 内被引用的不处理
+    返回: {'corrected': 修正数, 'purged': 删除数}
+    """
+    stats = {'corrected': 0, 'purged': 0}
+    queryset = ScriptOutputBlob.objects.filter(last_used_at__lt=timezone.now() - GC_GRACE_PERIOD)
+    last_id = 0
+    while True:
+        rows = list(
+            queryset.filter(id__gt=last_id).order_by('id').annotate(actual=Count('executions'))
+            .values('id', 'ref_count', 'actual')[:batch_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        for row in rows:
+            if row['ref_count'] != row['actual']:
+                # 只在引用数未被并发修改时更新
+                stats['corrected'] += ScriptOutputBlob.objects.filter(
+                    id=row['id'], ref_count=row['ref_count']
+                ).update(ref_count=row['actual'])
+        stats['purged'] += purge_output_blobs(row['id'] for row in rows if row['actual'] == 0)
+    return stats
+
+
+def backfill(batch_size=500) -> dict:
+    """
+    把不小于去重阈值、仍由执行记录自己保存的已结束执行的输出改为引用共享输出，单独转存的文件随之删除
+    返回: {'converted': 转换数, 'bytes': 转换的输出字节数}
+    """
+    stats = {'converted': 0, 'bytes': 0}
+    min_size = settings.SCRIPT_OUTPUT_DEDUP_MIN_SIZE
+    if not min_size:
+        return stats
+    queryset = ScriptExecution.objects.filter(
+        output_ref__isnull=True,
+        output_size__gte=min_size,
+        finished_at__isnull=False
+    )
+    last_id = None
+    while True:
+        batch = queryset.order_by('id')
+        if last_id is not None:
+            batch = batch.filter(id__gt=last_id)
+        rows = list(batch.values('id', 'output', 'output_size', 'output_blob')[:batch_size])
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        paths = []
+        for row in rows:
+            if row['output_blob']:
+                data = b''.join(iter_output_blob(row['output_blob'], 0, row['output_size']))
+            else:
+                data = (row['output'] or '').encode('utf-8')
+            if len(data) < min_size:
+                continue
+            checksum = hashlib.sha256(data).hexdigest()
+            blob_id = acquire_output_blob(checksum, data, data.decode('utf-8', errors='replace'))
+            # 只转换期间未被修改的记录
+            updated = ScriptExecution.objects.filter(
+                id=row['id'], output_ref__isnull=True, output_size=row['output_size']
+            ).update(
+                output='',
+                output_blob=None,
+                output_checksum=checksum,
+                output_ref_id=blob_id
+            )
+            if not updated:
+                release_output_refs([blob_id])
+                continue
+            if row['output_blob']:
+                paths.append(row['output_blob']['path'])
+            stats['converted'] += 1
+            stats['bytes'] += len(data)
+        release_output_blobs(paths)
+        logger.info(f"已把 {stats['converted']} 条执行记录的输出改为去重存储")
+    return stats
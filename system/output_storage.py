@@ -0,0 +1,248 @@
+import gzip
+import hashlib
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import transaction, IntegrityError
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import ScriptOutputBlob
+
+try:
+    import zstandard
+except ImportError:  # zstd 为可选依赖，未安装时回退到 gzip
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_STORAGE_ALIAS = 'script_outputs'
+
+
+class GzipCodec:
+    name = 'gzip'
+    extension = '.gz'
+
+    @staticmethod
+    def compress(data: bytes) -> bytes:
+        return gzip.compress(data, compresslevel=6)
+
+    @staticmethod
+    def decompress(data: bytes) -> bytes:
+        return gzip.decompress(data)
+
+
+class ZstdCodec:
+    name = 'zstd'
+    extension = '.zst'
+
+    @staticmethod
+    def compress(data: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+
+    @staticmethod
+    def decompress(data: bytes) -> bytes:
+        return zstandard.ZstdDecompressor().decompress(data)
+
+
+CODECS = {
+    GzipCodec.name: GzipCodec,
+    ZstdCodec.name: ZstdCodec,
+}
+
+
+def get_output_storage():
+    """获取输出存储后端，可在 STORAGES 中配置 script_outputs 别名替换为其他存储"""
+    if OUTPUT_STORAGE_ALIAS in settings.STORAGES:
+        return storages[OUTPUT_STORAGE_ALIAS]
+    return FileSystemStorage(location=settings.SCRIPT_OUTPUT_STORAGE_DIR)
+
+
+def get_codec(name=None):
+    name = name or settings.SCRIPT_OUTPUT_COMPRESSION
+    if name == ZstdCodec.name and zstandard is None:
+        logger.warning("未安装 zstandard，输出压缩回退为 gzip")
+        name = GzipCodec.name
+    return CODECS[name]
+
+
+def prepare_output_fields(execution_id, output) -> dict:
+    """
+    计算输出的大小和校验和，不小于去重阈值的输出按内容去重存储，记录只引用共享的输出内容；
+    其余超过内联阈值的输出压缩后写入存储，记录中只保留预览
+    返回: 需要写回执行记录的字段
+    """
+    if output is None:
+        return {'output': None, 'output_size': 0, 'output_checksum': '', 'output_blob': None, 'output_ref_id': None}
+
+    data = output.encode('utf-8')
+    fields = {
+        'output': output,
+        'output_size': len(data),
+        'output_checksum': hashlib.sha256(data).hexdigest(),
+        'output_blob': None,
+        'output_ref_id': None,
+    }
+    min_size = settings.SCRIPT_OUTPUT_DEDUP_MIN_SIZE
+    if min_size and len(data) >= min_size:
+        fields['output_ref_id'] = acquire_output_blob(fields['output_checksum'], data, output)
+        fields['output'] = ''
+    elif len(data) > settings.SCRIPT_OUTPUT_INLINE_LIMIT:
+        fields['output_blob'] = write_output_blob(execution_id, data)
+        fields['output'] = output_preview(data)
+    return fields
+
+
+def output_preview(data: bytes) -> str:
+    return data[:settings.SCRIPT_OUTPUT_PREVIEW_SIZE].decode('utf-8', errors='ignore')
+
+
+def acquire_output_blob(checksum: str, data: bytes, output: str):
+    """
+    取得内容为 output 的共享输出并增加一次引用，不存在时创建（超过内联阈值的内容转存）
+    返回: 输出内容ID
+    """
+    while True:
+        # 先增加引用：引用数大于 0 的内容不会被并发的释放删除
+        if ScriptOutputBlob.objects.filter(checksum=checksum).update(
+            ref_count=F('ref_count') + 1,
+            last_used_at=timezone.now()
+        ):
+            return ScriptOutputBlob.objects.filter(checksum=checksum).values_list('id', flat=True).get()
+
+        storage = None
+        content = output
+        if len(data) > settings.SCRIPT_OUTPUT_INLINE_LIMIT:
+            storage = write_output_blob(checksum, data)
+            content = output_preview(data)
+        try:
+            with transaction.atomic():
+                return ScriptOutputBlob.objects.create(
+                    checksum=checksum,
+                    size=len(data),
+                    content=content,
+                    storage=storage,
+                    ref_count=1,
+                    last_used_at=timezone.now()
+                ).id
+        except IntegrityError:
+            # 其他执行同时创建了相同内容，删除本次写入的文件后改为引用已有的
+            delete_output_blob(storage)
+
+
+def add_output_refs(blob_ids):
+    """为已有的共享输出增加引用（如命中缓存的记录复用来源的输出）"""
+    for blob_id, count in Counter(blob_id for blob_id in blob_ids if blob_id).items():
+        ScriptOutputBlob.objects.filter(id=blob_id).update(
+            ref_count=F('ref_count') + count,
+            last_used_at=timezone.now()
+        )
+
+
+def release_output_refs(blob_ids, delete_files=True):
+    """
+    减少共享输出的引用，引用降为 0 的删除（删除条件与引用数在同一语句中判断，与并发的引用互不干扰）
+    delete_files 为 False 时保留转存文件（如执行记录已归档，归档中引用该文件）
+    返回: 删除的共享输出数
+    """
+    counts = Counter(blob_id for blob_id in blob_ids if blob_id)
+    for blob_id, count in counts.items():
+        ScriptOutputBlob.objects.filter(id=blob_id).update(ref_count=Greatest(F('ref_count') - count, Value(0)))
+    return purge_output_blobs(counts, delete_files)
+
+
+def purge_output_blobs(blob_ids, delete_files=True):
+    """删除其中引用数为 0 的共享输出及其转存文件，返回删除数"""
+    purged = 0
+    for blob_id in blob_ids:
+        storage = ScriptOutputBlob.objects.filter(id=blob_id, ref_count=0).values_list('storage', flat=True).first()
+        deleted, _ = ScriptOutputBlob.objects.filter(id=blob_id, ref_count=0).delete()
+        if not deleted:
+            continue
+        purged += 1
+        if delete_files and storage:
+            try:
+                delete_output_blob(storage)
+            except OSError as e:
+                logger.warning(f"删除输出文件 {storage['path']} 失败: {e}")
+    return purged
+
+
+def write_output_blob(name, data: bytes) -> dict:
+    """
+    按固定大小分块独立压缩后写入存储，记录每块的压缩偏移以支持按范围读取
+    name 为执行ID或内容校验和，存储中已有同名文件时由存储另取文件名
+    返回: 存储元信息
+    """
+    codec = get_codec()
+    block_size = settings.SCRIPT_OUTPUT_BLOCK_SIZE
+    offsets = [0]
+    parts = []
+    for start in range(0, len(data), block_size):
+        compressed = codec.compress(data[start:start + block_size])
+        parts.append(compressed)
+        offsets.append(offsets[-1] + len(compressed))
+
+    storage = get_output_storage()
+    path = storage.save(f"{str(name)[:2]}/{name}{codec.extension}", ContentFile(b''.join(parts)))
+    return {
+        'path': path,
+        'compression': codec.name,
+        'block_size': block_size,
+        'offsets': offsets,
+    }
+
+
+def iter_output_blob(blob: dict, start: int, end: int):
+    """按块读取 [start, end) 字节范围的原始输出"""
+    if start >= end:
+        return
+    codec = get_codec(blob['compression'])
+    block_size = blob['block_size']
+    offsets = blob['offsets']
+    first_block = start // block_size
+    last_block = (end - 1) // block_size
+
+    with get_output_storage().open(blob['path'], 'rb') as f:
+        f.seek(offsets[first_block])
+        for block in range(first_block, last_block + 1):
+            data = codec.decompress(f.read(offsets[block + 1] - offsets[block]))
+            block_start = block * block_size
+            yield data[max(start - block_start, 0):end - block_start]
+
+
+def delete_output_blob(blob: dict):
+    """删除输出存储文件"""
+    if blob:
+        get_output_storage().delete(blob['path'])
+
+
+def parse_byte_range(header: str, size: int):
+    """
+    解析单段 HTTP Range 请求头
+    返回: [start, end) 字节范围；无法识别的格式（如多段范围）返回 None，按完整内容响应
+    无法满足的范围抛出 ValueError
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            end = int(last) + 1 if last else size
+        else:
+            start = size - int(last)
+            end = size
+    except ValueError:
+        return None
+
+    start = max(start, 0)
+    end = min(end, size)
+    if start >= end:
+        raise ValueError("请求范围无法满足")
+    return start, end
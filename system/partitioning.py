@@ -0,0 +1,220 @@
+"""
+PostgreSQL 下 script_execution 表按月范围分区（可选）
+
+转换后表按 created_at 分区，主键变为 (id, created_at)；分区表上的主键不包含 id 单列，
+其他表指向执行记录的外键约束（输出分块、缓存来源、定时计划的最近执行）会被删除，由应用层维护。
+已有数据整体挂载为 script_execution_legacy 分区，之后每月一个分区 script_execution_pYYYYMM，
+另有 script_execution_default 兜底分区。整个分区都已过期时直接删除分区，不逐行删除。
+"""
+import logging
+import re
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum, Min, Max, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ScriptExecution, ScriptOutputChunk, ScriptSchedule
+from .output_storage import release_output_refs
+from .retention import FINISHED_STATUSES, SUMMARY_COUNT_FIELDS, apply_summaries, release_output_blobs
+
+logger = logging.getLogger(__name__)
+
+TABLE = ScriptExecution._meta.db_table
+LEGACY_PARTITION = f'{TABLE}_legacy'
+DEFAULT_PARTITION = f'{TABLE}_default'
+MONTH_PARTITION_PATTERN = re.compile(rf'^{TABLE}_p(\d{{4}})(\d{{2}})$')
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def month_start(moment, offset=0):
+    """moment 所在月份向后 offset 个月的月初（本地时区）"""
+    local = timezone.localtime(moment)
+    index = local.year * 12 + local.month - 1 + offset
+    return timezone.make_aware(datetime(index // 12, index % 12 + 1, 1))
+
+
+def is_partitioned():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def list_partitions():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s) ORDER BY c.relname",
+            [TABLE]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def convert_to_partitioned(months_ahead=3):
+    """
+    把现有的普通表转换为分区表，已有数据作为一个分区挂载，不复制数据
+    转换期间持有表的排他锁，校验旧数据的分区约束需要扫描一次全表
+    """
+    boundary = month_start(timezone.now(), 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE')
+
+        # 指向执行记录的外键：分区表没有 id 单列唯一约束，无法再被引用
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+            "WHERE confrelid = %s::regclass AND contype = 'f'",
+            [TABLE]
+        )
+        for relation, name in cursor.fetchall():
+            cursor.execute(f'ALTER TABLE {relation} DROP CONSTRAINT "{name}"')
+
+        # 本表指向其他表的外键在分区表上重建
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('f', 'p')",
+            [TABLE]
+        )
+        constraints = cursor.fetchall()
+        cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s", [TABLE])
+        indexes = [(name, definition) for name, definition in cursor.fetchall()
+                   if name not in {constraint[0] for constraint in constraints}]
+
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {LEGACY_PARTITION}')
+        for name, _ in constraints:
+            cursor.execute(f'ALTER TABLE {LEGACY_PARTITION} DROP CONSTRAINT "{name}"')
+        for name, _ in indexes:
+            cursor.execute(f'ALTER INDEX "{name}" RENAME TO "{name[:54]}_legacy"')
+
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {LEGACY_PARTITION} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)')
+        for name, definition in constraints:
+            if definition.startswith('FOREIGN KEY'):
+                cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT "{name}" {definition}')
+
+        cursor.execute(
+            f'ALTER TABLE {LEGACY_PARTITION} ADD CONSTRAINT {LEGACY_PARTITION}_bound CHECK (created_at < %s)',
+            [boundary]
+        )
+        cursor.execute(
+            f'ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY_PARTITION} FOR VALUES FROM (MINVALUE) TO (%s)',
+            [boundary]
+        )
+        # 在分区表上重建索引，旧分区上等价的索引会被直接挂载
+        for _, definition in indexes:
+            cursor.execute(definition)
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+    return ensure_partitions(months_ahead)
+
+
+def ensure_partitions(months_ahead=3):
+    """创建当前月份及之后 months_ahead 个月的分区，返回新建的分区名"""
+    existing = set(list_partitions())
+    created = []
+    now = timezone.now()
+    for offset in range(months_ahead + 1):
+        start = month_start(now, offset)
+        name = f'{TABLE}_p{timezone.localtime(start):%Y%m}'
+        if name in existing:
+            continue
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f'CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)',
+                    [start, month_start(now, offset + 1)]
+                )
+        except Exception as e:
+            # 与旧数据分区范围重叠，或兜底分区中已有该月数据
+            logger.info(f"跳过分区 {name}: {e}")
+            continue
+        created.append(name)
+    return created
+
+
+def drop_expired_partitions(cutoffs, batch_size=1000):
+    """
+    删除整个都已过期的月分区：先写入每日汇总、清理输出分块和悬空引用，再卸载并删除分区
+    cutoffs 为 get_retention_cutoffs() 的结果，分区内任一脚本尚未到期或有未结束的执行时保留该分区
+    返回: 删除的分区名
+    """
+    dropped = []
+    for name in list_partitions():
+        match = MONTH_PARTITION_PATTERN.match(name)
+        if not match:
+            continue
+        start = timezone.make_aware(datetime(int(match.group(1)), int(match.group(2)), 1))
+        end = month_start(start, 1)
+        rows = ScriptExecution.objects.filter(created_at__gte=start, created_at__lt=end)
+
+        retained = [script_id for script_id, cutoff in cutoffs.items() if cutoff is None or cutoff < end]
+        if rows.filter(Q(script_task_id__in=retained) | ~Q(status__in=FINISHED_STATUSES)).exists():
+            continue
+
+        drop_partition(name, rows, batch_size)
+        dropped.append(name)
+    return dropped
+
+
+def drop_partition(name, rows, batch_size):
+    summaries = {}
+    aggregates = rows.annotate(date=TruncDate('created_at', tzinfo=timezone.get_current_timezone())).values(
+        'script_task_id', 'date'
+    ).annotate(
+        total_count=Count('id'),
+        success_count=Count('id', filter=Q(status='success')),
+        failure_count=Count('id', filter=Q(status='failed')),
+        timeout_count=Count('id', filter=Q(status='timeout')),
+        cancelled_count=Count('id', filter=Q(status__in=('cancelled', 'rejected'))),
+        cache_hit_count=Count('id', filter=Q(cache_hit=True)),
+        total_time=Sum('execution_time', filter=Q(cache_hit=False)),
+        min_time=Min('execution_time', filter=Q(cache_hit=False)),
+        max_time=Max('execution_time', filter=Q(cache_hit=False)),
+    ).order_by()
+    for row in aggregates:
+        summaries[(row['script_task_id'], row['date'])] = {
+            **{field: row[field] for field in SUMMARY_COUNT_FIELDS},
+            'total_time': row['total_time'] or 0.0,
+            'min_time': row['min_time'],
+            'max_time': row['max_time'],
+        }
+
+    blob_paths = set()
+    blob_refs = []
+    ids = []
+    for execution_id, blob, blob_ref in rows.values_list('id', 'output_blob', 'output_ref_id').iterator(
+        chunk_size=batch_size
+    ):
+        ids.append(execution_id)
+        if blob:
+            blob_paths.add(blob['path'])
+        if blob_ref:
+            blob_refs.append(blob_ref)
+        if len(ids) >= batch_size:
+            clear_references(ids)
+            ids = []
+    clear_references(ids)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        apply_summaries(summaries)
+        cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+        cursor.execute(f'DROP TABLE {name}')
+    logger.info(f"已删除执行记录分区 {name}")
+    release_output_blobs(blob_paths)
+    release_output_refs(blob_refs)
+
+
+def clear_references(ids):
+    """分区表没有外键级联，删除分区前手动清理指向这些执行记录的数据"""
+    if not ids:
+        return
+    with transaction.atomic():
+        ScriptOutputChunk.objects.filter(execution_id__in=ids).delete()
+        ScriptExecution.objects.filter(cached_from_id__in=ids).update(cached_from=None)
+        ScriptSchedule.objects.filter(last_execution_id__in=ids).update(last_execution=None)
@@ -0,0 +1,143 @@
+import json
+import os
+import select
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+
+from django.conf import settings
+
+from .forkserver_main import HEADER
+
+FORKSERVER_MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'forkserver_main.py')
+
+
+class ForkedProcess:
+    """由 forkserver 派生的脚本子进程，提供与 subprocess.Popen 一致的常用接口"""
+
+    def __init__(self, pid, conn, stdout, stderr):
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self.rusage = None
+        self._conn = conn
+        self._reader = conn.makefile('rb')
+
+    def poll(self):
+        """不阻塞地检查子进程是否已退出"""
+        if self.returncode is None and select.select([self._conn], [], [], 0)[0]:
+            self.wait()
+        return self.returncode
+
+    def wait(self):
+        """等待 forkserver 回报子进程退出状态"""
+        if self.returncode is None:
+            line = self._reader.readline()
+            if line:
+                message = json.loads(line)
+                self.returncode = message['exit']
+                self.rusage = message['rusage']
+            else:
+                # forkserver 异常退出，子进程状态未知
+                self.returncode = -signal.SIGKILL
+            self._reader.close()
+            self._conn.close()
+        return self.returncode
+
+    def send_signal(self, sig):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+class PythonForkServer:
+    """预热的 Python 解释器：预先导入常用模块，每次执行从该进程 fork 子进程"""
+
+    def __init__(self, preload_modules=(), python='python3'):
+        self.preload_modules = list(preload_modules)
+        self.python = python
+        self._socket_dir = tempfile.mkdtemp(prefix='script-forkserver-')
+        self.socket_path = os.path.join(self._socket_dir, 'forkserver.sock')
+        self._process = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        """启动或在异常退出后重启 forkserver"""
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self._process = subprocess.Popen(
+                [self.python, FORKSERVER_MAIN, self.socket_path, *self.preload_modules],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE
+            )
+            if self._process.stdout.readline().strip() != b'ready':
+                self._process.kill()
+                self._process.wait()
+                raise RuntimeError("Python 预热解释器启动失败")
+            self._process.stdout.close()
+
+    def spawn(self, code: str, params: dict, cwd: str, content_hash: str = '', limits: dict = None) -> ForkedProcess:
+        """fork 一个子进程执行脚本，参数经 socket 传入子进程；相同内容哈希的脚本只编译一次"""
+        self.ensure_started()
+        payload = json.dumps(
+            {'code': code, 'hash': content_hash, 'params': params, 'cwd': cwd, 'limits': limits or {}},
+            ensure_ascii=False
+        ).encode('utf-8')
+
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(self.socket_path)
+            socket.send_fds(conn, [HEADER.pack(len(payload))], [stdout_w, stderr_w])
+            conn.sendall(payload)
+        except OSError:
+            conn.close()
+            for fd in (stdout_r, stderr_r):
+                os.close(fd)
+            raise
+        finally:
+            os.close(stdout_w)
+            os.close(stderr_w)
+
+        process = ForkedProcess(None, conn, os.fdopen(stdout_r, 'rb'), os.fdopen(stderr_r, 'rb'))
+        line = process._reader.readline()
+        if not line:
+            process.stdout.close()
+            process.stderr.close()
+            conn.close()
+            raise RuntimeError("Python 预热解释器未返回子进程号")
+        process.pid = json.loads(line)['pid']
+        return process
+
+    def stop(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.terminate()
+                self._process.wait()
+            self._process = None
+
+
+_forkserver = None
+_forkserver_lock = threading.Lock()
+
+
+def get_python_forkserver() -> PythonForkServer:
+    """获取进程内共享的 Python 预热解释器"""
+    global _forkserver
+    if _forkserver is None:
+        with _forkserver_lock:
+            if _forkserver is None:
+                _forkserver = PythonForkServer(preload_modules=settings.SCRIPT_PYTHON_PRELOAD_MODULES)
+    return _forkserver
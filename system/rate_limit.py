@@ -0,0 +1,196 @@
+"""
+执行请求的准入控制：按客户端、脚本和全局三级令牌桶限流
+- 令牌数保存在数据库（script_rate_bucket），多个 API 进程和主机共用
+- 取令牌是一条带条件的 UPDATE（补充后的令牌数不少于 1 才扣减），不加锁、不读后写
+- 依次检查客户端、脚本、全局桶，某一级不足时退回已取的令牌，被拒绝的客户端不消耗共享的桶
+"""
+import math
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import F, Value, FloatField
+from django.db.models.functions import Least, Greatest
+from django.db.models.lookups import GreaterThanOrEqual
+from rest_framework.throttling import BaseThrottle
+
+from .models import ScriptRateBucket
+
+# 限流频率的时间单位，与 DRF 的 throttle rates 写法一致，如 60/min
+RATE_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    解析 "数量/时间单位" 格式的频率，数量同时作为桶容量（允许的突发请求数）
+    返回: (容量, 每秒补充数)；为空表示不限流，返回 None
+    """
+    if not rate:
+        return None
+    count, _, period = rate.partition('/')
+    count = int(count)
+    seconds = RATE_PERIODS.get(period.strip()[:1].lower())
+    if count <= 0 or seconds is None:
+        raise ValueError(f"限流频率格式无效: {rate}")
+    return float(count), count / seconds
+
+
+def get_rate_limits() -> dict:
+    """各级限流配置，{范围: (容量, 每秒补充数)}，未配置的范围不限流"""
+    return {
+        scope: parse_rate(rate) for scope, rate in (
+            ('client', settings.SCRIPT_RATE_LIMIT_CLIENT),
+            ('script', settings.SCRIPT_RATE_LIMIT_SCRIPT),
+            ('global', settings.SCRIPT_RATE_LIMIT_GLOBAL),
+        ) if rate
+    }
+
+
+def _level(capacity, refill_rate, now):
+    """当前令牌数：结算后补充的令牌，不超过容量（时钟回拨时不补充）"""
+    elapsed = Greatest(Value(now) - F('refilled_at'), Value(0.0))
+    return Least(Value(capacity), F('tokens') + elapsed * Value(refill_rate), output_field=FloatField())
+
+
+def take_token(scope, key, capacity, refill_rate):
+    """
+    从桶中取一个令牌
+    返回: (是否取得, 建议的重试等待秒数)
+    """
+    now = time.time()
+    level = _level(capacity, refill_rate, now)
+    buckets = ScriptRateBucket.objects.filter(key=key)
+    while True:
+        # tokens 需排在 refilled_at 之前：MySQL 按顺序赋值，之后的表达式读到的是新值
+        if buckets.filter(GreaterThanOrEqual(level, 1)).update(
+            tokens=level - 1,
+            refilled_at=now,
+            capacity=capacity,
+            refill_rate=refill_rate
+        ):
+            return True, 0
+
+        bucket = buckets.values('tokens', 'refilled_at').first()
+        if bucket is not None:
+            buckets.update(rejected_count=F('rejected_count') + 1)
+            tokens = min(capacity, bucket['tokens'] + max(now - bucket['refilled_at'], 0) * refill_rate)
+            return False, max(1 - tokens, 0) / refill_rate
+
+        try:
+            with transaction.atomic():
+                ScriptRateBucket.objects.create(
+                    key=key,
+                    scope=scope,
+                    tokens=capacity - 1,
+                    refilled_at=now,
+                    capacity=capacity,
+                    refill_rate=refill_rate
+                )
+            return True, 0
+        except IntegrityError:
+            # 其他请求同时创建了该桶，重新按条件扣减
+            continue
+
+
+def return_token(key, capacity):
+    """退回已取的令牌（后续的桶不足、请求未被接收时）"""
+    ScriptRateBucket.objects.filter(key=key).update(
+        tokens=Least(Value(capacity), F('tokens') + 1, output_field=FloatField())
+    )
+
+
+def acquire(client_ident, script_id=None):
+    """
+    依次从客户端、脚本、全局桶中各取一个令牌，任一不足时退回已取的令牌
+    返回: (是否放行, 建议的重试等待秒数)
+    """
+    limits = get_rate_limits()
+    keys = {
+        'client': f'client:{client_ident}',
+        'script': f'script:{script_id}' if script_id else None,
+        'global': 'global',
+    }
+    taken = []
+    for scope, (capacity, refill_rate) in limits.items():
+        key = keys[scope]
+        if key is None:
+            continue
+        allowed, wait = take_token(scope, key, capacity, refill_rate)
+        if not allowed:
+            for taken_key, taken_capacity in taken:
+                return_token(taken_key, taken_capacity)
+            return False, wait
+        taken.append((key, capacity))
+    return True, 0
+
+
+def get_bucket_levels(scope=None, limit=100) -> dict:
+    """
+    各令牌桶的当前令牌数，供监控使用；按当前令牌占容量的比例从低到高排列
+    返回: {'limits': 各级限流配置, 'buckets': [...]}
+    """
+    now = time.time()
+    queryset = ScriptRateBucket.objects.all()
+    if scope:
+        queryset = queryset.filter(scope=scope)
+    buckets = []
+    for bucket in queryset.values(
+        'key', 'scope', 'tokens', 'refilled_at', 'capacity', 'refill_rate', 'rejected_count'
+    ):
+        tokens = min(
+            bucket['capacity'],
+            bucket['tokens'] + max(now - bucket['refilled_at'], 0) * bucket['refill_rate']
+        )
+        buckets.append({
+            'key': bucket['key'],
+            'scope': bucket['scope'],
+            'tokens': round(tokens, 2),
+            'capacity': bucket['capacity'],
+            'refill_rate': bucket['refill_rate'],
+            'fill_ratio': round(tokens / bucket['capacity'], 3) if bucket['capacity'] else None,
+            'rejected_count': bucket['rejected_count'],
+            'last_taken_at': datetime.fromtimestamp(bucket['refilled_at'], tz=dt_timezone.utc),
+        })
+    buckets.sort(key=lambda item: (item['fill_ratio'] is None, item['fill_ratio']))
+    return {
+        'limits': {
+            scope: {'capacity': capacity, 'refill_rate': refill_rate}
+            for scope, (capacity, refill_rate) in get_rate_limits().items()
+        },
+        'buckets': buckets[:limit],
+    }
+
+
+def prune_idle_buckets() -> int:
+    """删除已补满的令牌桶（空闲时间超过 容量/补充速率），与新建的桶等价；返回删除数"""
+    deleted, _ = ScriptRateBucket.objects.filter(
+        refilled_at__lt=Value(time.time()) - F('capacity') / F('refill_rate')
+    ).delete()
+    return deleted
+
+
+class ExecutionRateThrottle(BaseThrottle):
+    """
+    执行接口的限流：按客户端、脚本（URL 中的 script_id）和全局令牌桶准入
+    客户端按登录用户区分，未登录时按来源地址（遵循 REST_FRAMEWORK 的 NUM_PROXIES 设置）
+    """
+
+    def __init__(self):
+        self.retry_after = None
+
+    def get_client_ident(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return f'user:{user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        allowed, wait = acquire(self.get_client_ident(request), view.kwargs.get('script_id'))
+        self.retry_after = None if allowed else wait
+        return allowed
+
+    def wait(self):
+        if self.retry_after is None:
+            return None
+        return max(math.ceil(self.retry_after), 1)
@@ -0,0 +1,137 @@
+import json
+import re
+import xml.etree.ElementTree as ElementTree
+from html.parser import HTMLParser
+
+# 结果字段路径：点号分隔的键名或数组下标，如 summary.failed、items.0.name
+RESULT_PATH_PATTERN = re.compile(r'^[A-Za-z0-9_\-]+(\.[A-Za-z0-9_\-]+)*$')
+
+# 结果查询支持的比较方式
+RESULT_LOOKUPS = ('exact', 'gt', 'gte', 'lt', 'lte', 'contains', 'icontains', 'isnull')
+
+
+def parse_json(text: str):
+    """整个输出为 JSON；否则取最后一个非空行（脚本先打印日志、最后输出结果的常见写法）"""
+    text = text.strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        lines = [line for line in text.splitlines() if line.strip()]
+        if len(lines) > 1:
+            return json.loads(lines[-1])
+        raise
+
+
+def element_to_dict(element):
+    """XML 元素转为字典：属性加 @ 前缀，文本为 #text，同名子元素合并为列表"""
+    node = {f'@{key}': value for key, value in element.attrib.items()}
+    for child in element:
+        value = element_to_dict(child)[child.tag]
+        if child.tag in node:
+            if not isinstance(node[child.tag], list):
+                node[child.tag] = [node[child.tag]]
+            node[child.tag].append(value)
+        else:
+            node[child.tag] = value
+    text = (element.text or '').strip()
+    if text:
+        if not node:
+            return {element.tag: text}
+        node['#text'] = text
+    return {element.tag: node or None}
+
+
+def parse_xml(text: str):
+    return element_to_dict(ElementTree.fromstring(text.strip()))
+
+
+class TableExtractor(HTMLParser):
+    """提取 HTML 的标题和表格，表格按行保存单元格文本"""
+
+    def __init__(self):
+        super().__init__()
+        self.title = None
+        self.tables = []
+        self._in_title = False
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'title':
+            self._in_title = True
+        elif tag == 'table':
+            self.tables.append([])
+        elif tag == 'tr' and self.tables:
+            self._row = []
+        elif tag in ('td', 'th') and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self._in_title = False
+        elif tag in ('td', 'th') and self._cell is not None:
+            self._row.append(' '.join(''.join(self._cell).split()))
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self.tables[-1].append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title = (self.title or '') + data.strip()
+        elif self._cell is not None:
+            self._cell.append(data)
+
+
+def parse_html(text: str):
+    parser = TableExtractor()
+    parser.feed(text)
+    parser.close()
+    return {'title': parser.title, 'tables': parser.tables}
+
+
+PARSERS = {
+    'json': parse_json,
+    'xml': parse_xml,
+    'html': parse_html,
+}
+
+
+def parse_result(return_type: str, output: str, max_size: int):
+    """
+    按脚本的返回类型解析标准输出
+    返回: (结构化结果, 错误信息)；纯文本类型或输出为空时都为 None
+    """
+    parser = PARSERS.get(return_type)
+    if parser is None or not output or not output.strip():
+        return None, None
+    if len(output) > max_size:
+        return None, f"输出超过 {max_size} 字节，未解析结果"
+    try:
+        return parser(output), None
+    except (ValueError, ElementTree.ParseError) as e:
+        return None, f"按 {return_type} 解析输出失败: {e}"
+
+
+def build_result_lookups(params):
+    """
+    把 result.<路径>[__比较方式]=值 形式的查询参数转换为 ORM 查询条件
+    值按 JSON 解析（数字、布尔、null），解析失败时按字符串比较
+    返回: (查询条件字典, 错误信息)
+    """
+    lookups = {}
+    for key, raw in params.items():
+        if not key.startswith('result.'):
+            continue
+        path, _, lookup = key[len('result.'):].partition('__')
+        lookup = lookup or 'exact'
+        if not RESULT_PATH_PATTERN.match(path) or lookup not in RESULT_LOOKUPS:
+            return None, f"结果查询参数无效: {key}"
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        if lookup == 'isnull':
+            value = bool(value)
+        lookups[f"result__{path.replace('.', '__')}__{lookup}"] = value
+    return lookups, None
@@ -0,0 +1,249 @@
+import gzip
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import ScriptTask, ScriptExecution, ScriptOutputChunk, ScriptExecutionDailySummary, ScriptOutputBlob
+from .output_storage import get_output_storage, delete_output_blob, release_output_refs
+
+logger = logging.getLogger(__name__)
+
+# 只清理已结束的执行记录
+FINISHED_STATUSES = ('success', 'failed', 'timeout', 'cancelled', 'rejected')
+
+SUMMARY_COUNTERS = {
+    'success': 'success_count',
+    'failed': 'failure_count',
+    'timeout': 'timeout_count',
+    'cancelled': 'cancelled_count',
+    'rejected': 'cancelled_count',
+}
+SUMMARY_COUNT_FIELDS = (
+    'total_count', 'success_count', 'failure_count', 'timeout_count', 'cancelled_count', 'cache_hit_count'
+)
+
+ARCHIVE_PREFIX = 'archive'
+
+
+def get_retention_days(script) -> int:
+    """脚本的执行记录保留天数，0 表示永久保留"""
+    if script.retention_days is None:
+        return settings.SCRIPT_EXECUTION_RETENTION_DAYS
+    return script.retention_days
+
+
+def get_retention_cutoffs(now=None) -> dict:
+    """
+    各脚本的清理截止时间，早于该时间创建的执行记录可以清理
+    返回: {脚本ID: 截止时间}，永久保留的脚本为 None
+    """
+    now = now or timezone.now()
+    cutoffs = {}
+    for script in ScriptTask.objects.only('id', 'retention_days'):
+        days = get_retention_days(script)
+        cutoffs[script.id] = now - timedelta(days=days) if days else None
+    return cutoffs
+
+
+def _merge_extreme(current, value, func):
+    if value is None:
+        return current
+    return value if current is None else func(current, value)
+
+
+def new_summary():
+    return {**{field: 0 for field in SUMMARY_COUNT_FIELDS}, 'total_time': 0.0, 'min_time': None, 'max_time': None}
+
+
+def summarize_rows(rows) -> dict:
+    """把执行记录按 (脚本, 本地日期) 汇总为每日统计的增量"""
+    summaries = {}
+    for row in rows:
+        key = (row['script_task_id'], timezone.localdate(row['created_at']))
+        summary = summaries.setdefault(key, new_summary())
+        summary['total_count'] += 1
+        summary[SUMMARY_COUNTERS[row['status']]] += 1
+        if row['cache_hit']:
+            # 命中缓存的记录没有真正执行，不计入耗时
+            summary['cache_hit_count'] += 1
+        elif row['execution_time'] is not None:
+            summary['total_time'] += row['execution_time']
+            summary['min_time'] = _merge_extreme(summary['min_time'], row['execution_time'], min)
+            summary['max_time'] = _merge_extreme(summary['max_time'], row['execution_time'], max)
+    return summaries
+
+
+def apply_summaries(summaries: dict):
+    """把汇总增量累加到每日统计行，需在事务中调用"""
+    for (script_id, date), delta in summaries.items():
+        summary, _ = ScriptExecutionDailySummary.objects.get_or_create(script_task_id=script_id, date=date)
+        # 先写后读：累加计数时取得行锁，再合并最短/最长耗时
+        ScriptExecutionDailySummary.objects.filter(id=summary.id).update(
+            total_time=F('total_time') + delta['total_time'],
+            **{field: F(field) + delta[field] for field in SUMMARY_COUNT_FIELDS}
+        )
+        summary.refresh_from_db(fields=['min_time', 'max_time'])
+        summary.min_time = _merge_extreme(summary.min_time, delta['min_time'], min)
+        summary.max_time = _merge_extreme(summary.max_time, delta['max_time'], max)
+        summary.save(update_fields=['min_time', 'max_time', 'updated_at'])
+
+
+def release_output_blobs(paths):
+    """删除已没有执行记录引用的输出文件（命中缓存的记录与缓存来源共用同一个文件）"""
+    paths = {path for path in paths if path}
+    if not paths:
+        return 0
+    referenced = set(
+        ScriptExecution.objects.filter(output_blob__path__in=list(paths)).values_list('output_blob__path', flat=True)
+    )
+    released = paths - referenced
+    for path in released:
+        try:
+            delete_output_blob({'path': path})
+        except OSError as e:
+            logger.warning(f"删除输出文件 {path} 失败: {e}")
+    return len(released)
+
+
+class ExecutionRetention:
+    """
+    执行记录保留策略：按脚本的保留天数分批清理过期的执行记录
+    - 每批在独立的短事务中先累加每日汇总再删除，不长时间持有锁
+    - 可选先归档为 gzip 压缩的 JSON Lines 文件（写入输出存储的 archive/ 目录），归档时保留转存的输出文件
+    - 同时把已结束执行的零散输出分块合并为每个输出流一块
+    """
+
+    def __init__(self, batch_size=500, pause=0.0, archive=False, dry_run=False):
+        self.batch_size = batch_size
+        self.pause = pause
+        self.archive = archive
+        self.dry_run = dry_run
+        self.stats = {'deleted': 0, 'archived': 0, 'blobs_released': 0, 'chunks_compacted': 0}
+
+    def run(self, compact_before=None):
+        """清理所有脚本的过期执行记录，compact_before 之前结束的执行会合并输出分块"""
+        for script_id, cutoff in get_retention_cutoffs().items():
+            if cutoff is not None:
+                self.purge_script(script_id, cutoff)
+        if compact_before is not None:
+            self.compact_chunks(compact_before)
+        return self.stats
+
+    def purge_script(self, script_id, cutoff):
+        """分批清理单个脚本在 cutoff 之前创建的执行记录"""
+        queryset = ScriptExecution.objects.filter(
+            script_task_id=script_id,
+            created_at__lt=cutoff,
+            status__in=FINISHED_STATUSES
+        )
+        if self.dry_run:
+            self.stats['deleted'] += queryset.count()
+            return
+
+        while True:
+            rows = list(queryset.order_by('created_at').values()[:self.batch_size])
+            if not rows:
+                return
+            self.purge_rows(rows)
+            logger.info(f"脚本 {script_id} 清理执行记录 {len(rows)} 条")
+            if len(rows) < self.batch_size:
+                return
+            if self.pause:
+                time.sleep(self.pause)
+
+    def purge_rows(self, rows):
+        """汇总、归档并删除一批执行记录"""
+        ids = [row['id'] for row in rows]
+        if self.archive:
+            self.archive_rows(rows)
+
+        with transaction.atomic():
+            apply_summaries(summarize_rows(rows))
+            ScriptOutputChunk.objects.filter(execution_id__in=ids).delete()
+            ScriptExecution.objects.filter(id__in=ids, status__in=FINISHED_STATUSES).delete()
+        self.stats['deleted'] += len(ids)
+
+        # 归档中保留转存文件的路径，归档时只删除共享输出的记录
+        self.stats['blobs_released'] += release_output_refs(
+            [row['output_ref_id'] for row in rows],
+            delete_files=not self.archive
+        )
+        if not self.archive:
+            self.stats['blobs_released'] += release_output_blobs(
+                row['output_blob']['path'] for row in rows if row['output_blob']
+            )
+
+    def archive_rows(self, rows):
+        """把执行记录连同错误输出写成一个归档文件"""
+        stderr = {}
+        for execution_id, content in ScriptOutputChunk.objects.filter(
+            execution_id__in=[row['id'] for row in rows],
+            stream='stderr'
+        ).order_by('execution_id', 'offset').values_list('execution_id', 'content'):
+            stderr.setdefault(execution_id, []).append(content)
+        # 去重存储的输出写入归档行本身，归档不依赖共享输出记录
+        shared = {
+            blob['id']: blob for blob in ScriptOutputBlob.objects.filter(
+                id__in={row['output_ref_id'] for row in rows if row['output_ref_id']}
+            ).values('id', 'content', 'storage')
+        }
+
+        lines = []
+        for row in rows:
+            row = {**row, 'stderr': ''.join(stderr.get(row['id'], []))}
+            blob = shared.get(row['output_ref_id'])
+            if blob:
+                row.update(output=blob['content'], output_blob=blob['storage'])
+            lines.append(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+        first = rows[0]
+        name = (f"{ARCHIVE_PREFIX}/{first['script_task_id']}/"
+                f"{timezone.localtime(first['created_at']):%Y%m%d}-{first['id']}.jsonl.gz")
+        get_output_storage().save(name, ContentFile(gzip.compress('\n'.join(lines).encode('utf-8'))))
+        self.stats['archived'] += len(rows)
+
+    def compact_chunks(self, before):
+        """把 before 之前结束的执行按输出流合并为单个分块，减少分块表的行数"""
+        groups = ScriptOutputChunk.objects.filter(
+            execution__finished_at__lt=before,
+            execution__status__in=FINISHED_STATUSES
+        ).values('execution_id', 'stream').annotate(chunk_count=Count('id')).filter(chunk_count__gt=1).order_by()
+
+        while True:
+            batch = list(groups[:self.batch_size])
+            if not batch:
+                return
+            if self.dry_run:
+                self.stats['chunks_compacted'] += sum(group['chunk_count'] - 1 for group in batch)
+                return
+            for group in batch:
+                self.stats['chunks_compacted'] += self.compact_stream(group['execution_id'], group['stream'])
+            if self.pause:
+                time.sleep(self.pause)
+
+    @staticmethod
+    def compact_stream(execution_id, stream):
+        """合并一个输出流的全部分块，返回减少的分块数"""
+        with transaction.atomic():
+            chunks = list(ScriptOutputChunk.objects.select_for_update().filter(
+                execution_id=execution_id,
+                stream=stream
+            ).order_by('offset'))
+            if len(chunks) < 2:
+                return 0
+            ScriptOutputChunk.objects.filter(id__in=[chunk.id for chunk in chunks]).delete()
+            ScriptOutputChunk.objects.create(
+                execution_id=execution_id,
+                stream=stream,
+                offset=chunks[0].offset,
+                size=sum(chunk.size for chunk in chunks),
+                content=''.join(chunk.content for chunk in chunks)
+            )
+        return len(chunks) - 1
@@ -0,0 +1,172 @@
+import heapq
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ScriptSchedule
+from .services import ScriptTaskService
+
+logger = logging.getLogger(__name__)
+
+
+class ScriptScheduler:
+    """
+    定时计划调度进程
+    - 所有启用计划的触发时间保存在内存最小堆中，休眠到最早的触发时间，不按秒轮询数据库
+    - 每隔 refresh_interval 按 updated_at 增量同步新增、修改和停用的计划
+    - 触发前以 next_run_at 做比较交换（CAS），多台主机同时运行时每个触发时间只由一个进程执行
+    """
+
+    def __init__(self, refresh_interval=30):
+        self.refresh_interval = refresh_interval
+        self.scheduler_id = f"{socket.gethostname()}-{os.getpid()}"
+        # 堆元素: (触发时间戳, 计划ID, 计划时间)；计划变更后旧元素留在堆中，弹出时按 _slots 判断是否过期
+        self._heap = []
+        self._slots = {}
+        self._synced_at = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        """主循环：休眠到最早的触发时间或下一次同步时间，收到 SIGTERM/SIGINT 后退出"""
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        logger.info(f"调度进程 {self.scheduler_id} 启动")
+
+        next_refresh = timezone.now()
+        while not self._stop_event.is_set():
+            close_old_connections()
+            now = timezone.now()
+            if now >= next_refresh:
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.exception("同步定时计划失败")
+                next_refresh = now + timedelta(seconds=self.refresh_interval)
+
+            self.fire_due()
+
+            wake_at = next_refresh.timestamp()
+            if self._heap:
+                wake_at = min(wake_at, self._heap[0][0])
+            self._stop_event.wait(max(wake_at - time.time(), 0))
+
+        logger.info(f"调度进程 {self.scheduler_id} 已停止")
+
+    def refresh(self):
+        """从数据库同步计划：首次全量加载，之后只读取上次同步后变更过的计划"""
+        started = timezone.now()
+        queryset = ScriptSchedule.objects.all()
+        if self._synced_at is None:
+            queryset = queryset.filter(is_active=True, is_deleted=False)
+        else:
+            # 留出一个同步间隔的重叠，容忍主机间的时钟偏差
+            queryset = queryset.filter(updated_at__gte=self._synced_at - timedelta(seconds=self.refresh_interval))
+
+        count = 0
+        for schedule in queryset.only('id', 'is_active', 'is_deleted', 'next_run_at', 'jitter_seconds'):
+            if schedule.is_active and not schedule.is_deleted and schedule.next_run_at:
+                if self._slots.get(schedule.id) != schedule.next_run_at:
+                    self._push(schedule.id, schedule.next_run_at, schedule.jitter_seconds)
+            else:
+                self._slots.pop(schedule.id, None)
+            count += 1
+        self._synced_at = started
+        if count:
+            logger.info(f"同步定时计划 {count} 个，当前排期 {len(self._slots)} 个")
+
+    def fire_due(self):
+        """触发所有已到时间的计划"""
+        now_ts = timezone.now().timestamp()
+        while self._heap and self._heap[0][0] <= now_ts:
+            _, schedule_id, slot = heapq.heappop(self._heap)
+            if self._slots.get(schedule_id) != slot:
+                continue
+            del self._slots[schedule_id]
+            try:
+                self.fire(schedule_id, slot)
+            except Exception:
+                logger.exception(f"触发定时计划 {schedule_id} 失败")
+
+    def fire(self, schedule_id, slot):
+        """触发计划的一个时间点，仅当本进程抢到该时间点时执行"""
+        schedule = ScriptSchedule.objects.filter(id=schedule_id, is_active=True, is_deleted=False).first()
+        if not schedule or not schedule.next_run_at:
+            return
+        if schedule.next_run_at != slot:
+            # 已被其他调度进程触发或计划已修改，按数据库中的时间重新排期
+            self._push(schedule.id, schedule.next_run_at, schedule.jitter_seconds)
+            return
+
+        now = timezone.now()
+        misfired = (now - slot).total_seconds() > schedule.misfire_grace_seconds
+        try:
+            next_slot = schedule.get_next_run_after(slot)
+            if next_slot <= now:
+                # 错过了多个触发时间只处理一次，之后从当前时间继续
+                next_slot = schedule.get_next_run_after(now)
+        except ValueError as e:
+            logger.error(f"定时计划 {schedule.name} 无法计算下次触发时间: {e}")
+            next_slot = None
+
+        skip = misfired and schedule.misfire_policy == 'skip'
+        claimed = ScriptSchedule.objects.filter(id=schedule.id, next_run_at=slot).update(
+            next_run_at=next_slot,
+            last_run_at=now,
+            run_count=F('run_count') + (0 if skip else 1),
+            misfire_count=F('misfire_count') + (1 if misfired else 0)
+        )
+        if not claimed:
+            schedule.refresh_from_db(fields=['next_run_at'])
+            if schedule.next_run_at:
+                self._push(schedule.id, schedule.next_run_at, schedule.jitter_seconds)
+            return
+        if next_slot:
+            self._push(schedule.id, next_slot, schedule.jitter_seconds)
+
+        if skip:
+            logger.warning(f"定时计划 {schedule.name} 错过触发时间 {slot}，按策略跳过")
+            return
+        if misfired:
+            logger.warning(f"定时计划 {schedule.name} 错过触发时间 {slot}，补执行一次")
+
+        execution, errors = ScriptTaskService.execute_script(
+            schedule.script_task_id,
+            schedule.parameters,
+            schedule=schedule
+        )
+        if not execution:
+            logger.error(f"定时计划 {schedule.name} 触发执行失败: {errors}")
+            return
+        ScriptSchedule.objects.filter(id=schedule.id).update(last_execution=execution)
+        logger.info(f"定时计划 {schedule.name} 已触发执行 {execution.id}")
+
+    def stats(self):
+        return {
+            'scheduler_id': self.scheduler_id,
+            'scheduled': len(self._slots),
+            'heap_size': len(self._heap),
+        }
+
+    def _push(self, schedule_id, slot, jitter_seconds):
+        fire_at = slot.timestamp() + (random.uniform(0, jitter_seconds) if jitter_seconds else 0)
+        heapq.heappush(self._heap, (fire_at, schedule_id, slot))
+        self._slots[schedule_id] = slot
+        if len(self._heap) > 2 * len(self._slots) + 1024:
+            self._compact()
+
+    def _compact(self):
+        """清理堆中已过期的元素"""
+        self._heap = [entry for entry in self._heap if self._slots.get(entry[1]) == entry[2]]
+        heapq.heapify(self._heap)
+
+    def _handle_stop(self, signum, frame):
+        self._stop_event.set()
@@ -0,0 +1,158 @@
+import fcntl
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+INTERPRETERS = {
+    'bash': 'bash',
+    'python': 'python3',
+}
+
+# 参数经环境变量 SCRIPT_PARAMS 以 JSON 传入，脚本内容本身与参数无关，可按内容哈希复用
+PARAM_ENV_PREFIX = 'PARAM_'
+
+# bash 参数另以 PARAM_<名称> 传入，解释器启动后再导出为同名变量
+BASH_PRELUDE = """for __param in ${!PARAM_@}; do
+    export "${__param#PARAM_}=${!__param}"
+    unset "$__param"
+done
+unset __param
+
+"""
+
+PYTHON_PRELUDE = """# -*- coding: utf-8 -*-
+import json
+import sys
+import os
+
+# 自动注入的参数字典
+PARAMS = json.loads(os.environ.get('SCRIPT_PARAMS') or '{}')
+
+# 用户脚本内容
+"""
+
+
+def compute_content_hash(content: str) -> str:
+    """计算脚本内容的 SHA-256"""
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
+def compute_cache_key(content_hash: str, parameters: dict) -> str:
+    """结果缓存键：脚本内容哈希 + 规范化后的参数（键排序、紧凑格式）"""
+    canonical = json.dumps(parameters or {}, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(f'{content_hash}:{canonical}'.encode('utf-8')).hexdigest()
+
+
+def check_script_syntax(script_type: str, content: str):
+    """
+    只做语法检查不执行脚本（bash -n / Python 编译）
+    返回: 错误信息，语法正确时返回 None
+    """
+    if script_type == 'python':
+        try:
+            compile(content, 'script.py', 'exec')
+        except (SyntaxError, ValueError) as e:
+            return f"Python 语法错误: {e}"
+        return None
+
+    if script_type == 'bash':
+        try:
+            result = subprocess.run(
+                ['bash', '-n'],
+                input=content,
+                capture_output=True,
+                text=True,
+                timeout=10
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            # 本机无法做语法检查时不阻止保存
+            return None
+        if result.returncode != 0:
+            return f"Bash 语法错误: {result.stderr.strip()}"
+    return None
+
+
+class PreparedScript:
+    """渲染完成的脚本，内容保存在只读的匿名内存文件中，执行时无需落盘"""
+
+    def __init__(self, script_type: str, source: str):
+        self.script_type = script_type
+        self.source = source
+        self.fd = None
+        self._users = 0
+        self._evicted = False
+        if hasattr(os, 'memfd_create'):
+            self.fd = os.memfd_create(f'script-{script_type}', os.MFD_CLOEXEC | os.MFD_ALLOW_SEALING)
+            os.write(self.fd, source.encode('utf-8'))
+            # 封印后内容不可再修改，多个子进程可安全共享
+            fcntl.fcntl(self.fd, fcntl.F_ADD_SEALS,
+                        fcntl.F_SEAL_SEAL | fcntl.F_SEAL_SHRINK | fcntl.F_SEAL_GROW | fcntl.F_SEAL_WRITE)
+
+    def command(self):
+        """
+        返回: (命令行, 需要传给子进程的文件描述符)
+        """
+        interpreter = INTERPRETERS[self.script_type]
+        if self.fd is not None:
+            return [interpreter, f'/dev/fd/{self.fd}'], (self.fd,)
+        return [interpreter, '-c', self.source], ()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def render_script(script_type: str, content: str) -> str:
+    """生成实际交给解释器的脚本内容"""
+    if script_type == 'python':
+        return PYTHON_PRELUDE + content + '\n'
+    return BASH_PRELUDE + content + '\n'
+
+
+class PreparedScriptCache:
+    """按 (脚本类型, 内容哈希) 缓存渲染后的脚本，LRU 淘汰"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @contextmanager
+    def acquire(self, script_task):
+        """获取脚本的预编译结果，使用期间不会被淘汰关闭"""
+        key = (script_task.script_type, script_task.get_content_hash())
+        with self._lock:
+            prepared = self._entries.get(key)
+            if prepared is None:
+                self.misses += 1
+                prepared = PreparedScript(script_task.script_type, render_script(script_task.script_type, script_task.content))
+                self._entries[key] = prepared
+                self._evict()
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            prepared._users += 1
+        try:
+            yield prepared
+        finally:
+            with self._lock:
+                prepared._users -= 1
+                if prepared._evicted and not prepared._users:
+                    prepared.close()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            _, prepared = self._entries.popitem(last=False)
+            prepared._evicted = True
+            if not prepared._users:
+                prepared.close()
+
+
+prepared_script_cache = PreparedScriptCache()
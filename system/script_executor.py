@@ -1,19 +1,69 @@
+import codecs
+import functools
+import queue
+import re
+import shutil
 import subprocess
 import tempfile
+import threading
 import os
 import json
+import logging
+import signal
 import time
-from datetime import datetime
 from django.conf import settings
 from typing import Tuple, Dict, Any
+from .forkserver_main import apply_resource_limits, rusage_to_dict
+from .python_forkserver import get_python_forkserver
+from .script_cache import prepared_script_cache, PARAM_ENV_PREFIX
+from .watchdog import get_execution_watchdog
+
+logger = logging.getLogger(__name__)
+
+ENV_NAME_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+# 不允许作为参数名导出的变量：会改变解释器、动态链接器或 shell 行为的环境变量
+RESERVED_PARAM_PATTERN = re.compile(
+    r'^(PATH|IFS|ENV|HOME|SHELL|TMPDIR|CDPATH|GLOBIGNORE|SHELLOPTS|BASHOPTS|PROMPT_COMMAND|PS[0-9]|'
+    r'BASH\w*|LD_\w*|PYTHON\w*|PERL5\w*|RUBY\w*|NODE_\w*|LC_\w*|LANG|LANGUAGE|GCONV_PATH|LOCPATH|NLSPATH|'
+    r'HOSTALIASES|RESOLV_\w*|MALLOC_\w*|UID|EUID|PPID|SHLVL|OPTIND|OPTARG|SCRIPT_PARAMS)$'
+)
+
+
+def kill_process_group(process, sig=signal.SIGKILL):
+    """向脚本所在的进程组发送信号，连同脚本派生的子进程一起结束"""
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
 
 
 class ScriptExecutor:
     """脚本执行器"""
 
-    def __init__(self, script_task):
+    STREAMS = ('stdout', 'stderr')
+    READ_SIZE = 64 * 1024
+    POLL_INTERVAL = 0.2
+    KILL_GRACE = 5
+    OUTCOME_MESSAGES = {
+        'timeout': "脚本执行超时",
+        'cancelled': "脚本执行已取消",
+        'output_limit': "脚本输出超过上限",
+    }
+
+    def __init__(self, script_task, output_recorder=None, execution_id=None):
+        """
+        output_recorder: 可选的输出记录器，需提供 write(stream, text)、maybe_flush()、flush()
+        execution_id: 对应的执行记录，提供时由看门狗监管超时与取消
+        """
         self.script_task = script_task
-        self.temp_dir = tempfile.mkdtemp()
+        self.output_recorder = output_recorder
+        self.execution_id = execution_id
+        self.temp_dir = None
+        self.process = None
+        # 被终止的原因：timeout、cancelled 或 output_limit，正常结束时为 None
+        self.outcome = None
+        # 子进程退出后的资源使用（wait4 的 rusage）
+        self.rusage = None
 
     def execute(self, parameters: Dict[str, Any] = None) -> Tuple[bool, str, str, float]:
         """
@@ -36,123 +86,239 @@ class ScriptExecutor:
             self._cleanup()
 
     def _execute_bash(self, parameters: Dict[str, Any], start_time: float) -> Tuple[bool, str, str, float]:
-        """执行Bash脚本"""
-        # 创建临时脚本文件
-        script_file = os.path.join(self.temp_dir, 'script.sh')
+        """执行Bash脚本，参数以环境变量传入"""
+        return self._run_process(parameters, start_time)
 
-        # 准备脚本内容，添加参数处理
-        script_content = self._prepare_bash_script(parameters)
+    def _execute_python(self, parameters: Dict[str, Any], start_time: float) -> Tuple[bool, str, str, float]:
+        """执行Python脚本，参数经 SCRIPT_PARAMS 环境变量注入 PARAMS"""
+        if settings.SCRIPT_PYTHON_FORKSERVER_ENABLED:
+            # 从预热解释器 fork 子进程，省去解释器启动和常用模块导入
+            try:
+                process = get_python_forkserver().spawn(
+                    self.script_task.content,
+                    parameters,
+                    cwd=self._get_cwd(),
+                    content_hash=self.script_task.get_content_hash(),
+                    limits=self._build_limits()
+                )
+            except (OSError, RuntimeError) as e:
+                logger.warning(f"Python 预热解释器不可用，改为独立进程执行: {e}")
+            else:
+                return self._supervise(process, start_time)
 
-        with open(script_file, 'w', encoding='utf-8') as f:
-            f.write(script_content)
+        return self._run_process(parameters, start_time)
 
-        # 设置执行权限
-        os.chmod(script_file, 0o755)
+    def _run_process(self, parameters: Dict[str, Any], start_time: float) -> Tuple[bool, str, str, float]:
+        """启动子进程并增量读取输出，标准输出和错误输出分开返回"""
+        return self._supervise(self._popen(parameters), start_time)
 
-        # 执行脚本
-        try:
-            result = subprocess.run(
-                ['bash', script_file],
-                capture_output=True,
-                text=True,
-                timeout=self.script_task.timeout,
-                cwd=self.temp_dir
+    def _popen(self, parameters: Dict[str, Any]) -> subprocess.Popen:
+        """在独立会话中启动脚本子进程，标准输出和错误输出为管道"""
+        # 脚本按内容哈希缓存在内存文件中，每次执行不再写临时文件
+        limits = self._build_limits()
+        with prepared_script_cache.acquire(self.script_task) as prepared:
+            command, pass_fds = prepared.command()
+            return subprocess.Popen(
+                command,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=self._get_cwd(),
+                env=self._build_env(parameters),
+                pass_fds=pass_fds,
+                # 独立会话，超时或取消时可结束整个进程组
+                start_new_session=True,
+                preexec_fn=functools.partial(apply_resource_limits, limits) if limits else None
             )
 
-            execution_time = time.time() - start_time
-
-            # 合并标准输出和标准错误输出，提供完整的脚本执行信息
-            combined_output = ""
-            if result.stdout:
-                combined_output += f"=== 标准输出 ===\n{result.stdout}\n"
-            if result.stderr:
-                combined_output += f"=== 错误输出 ===\n{result.stderr}\n"
-            
-            if result.returncode == 0:
-                return True, combined_output.strip(), result.stderr, execution_time
-            else:
-                return False, combined_output.strip(), result.stderr, execution_time
-
-        except subprocess.TimeoutExpired:
-            return False, "", "脚本执行超时", time.time() - start_time
+    def kill(self, reason: str):
+        """终止脚本进程组，reason 为 timeout 或 cancelled，可由其他线程调用"""
+        if self.outcome is None:
+            self.outcome = reason
+        if self.process is not None:
+            kill_process_group(self.process)
 
-    def _execute_python(self, parameters: Dict[str, Any], start_time: float) -> Tuple[bool, str, str, float]:
-        """执行Python脚本"""
-        # 创建临时脚本文件
-        script_file = os.path.join(self.temp_dir, 'script.py')
+    def _supervise(self, process, start_time: float) -> Tuple[bool, str, str, float]:
+        """等待子进程结束并整理执行结果"""
+        self.process = process
+        watchdog = get_execution_watchdog() if self.execution_id else None
+        if watchdog:
+            watchdog.register(self.execution_id, self, self.script_task.timeout + 2 * self.KILL_GRACE)
+        try:
+            stdout, stderr = self._communicate(process)
+        finally:
+            if watchdog:
+                watchdog.unregister(self.execution_id)
+        return self._build_result(process, stdout, stderr, time.time() - start_time)
 
-        # 准备脚本内容，添加参数处理
-        script_content = self._prepare_python_script(parameters)
+    def _build_result(self, process, stdout: str, stderr: str, execution_time: float) -> Tuple[bool, str, str, float]:
+        """按终止原因和退出码整理执行结果"""
+        if self.outcome:
+            message = self.OUTCOME_MESSAGES[self.outcome]
+            error = f"{stderr}\n{message}" if stderr else message
+            return False, stdout, error, execution_time
+        if process.returncode < 0:
+            # 被信号结束，如超过 CPU 时间上限时的 SIGXCPU
+            try:
+                name = signal.Signals(-process.returncode).name
+            except ValueError:
+                name = str(-process.returncode)
+            message = f"脚本被信号 {name} 终止"
+            stderr = f"{stderr}\n{message}" if stderr else message
+        return process.returncode == 0, stdout, stderr, execution_time
 
-        with open(script_file, 'w', encoding='utf-8') as f:
-            f.write(script_content)
+    def _communicate(self, process) -> Tuple[str, str]:
+        """
+        边执行边读取子进程输出
+        返回: (标准输出, 错误输出)
+        """
+        chunks = queue.Queue()
+        for stream, pipe in (('stdout', process.stdout), ('stderr', process.stderr)):
+            threading.Thread(
+                target=self._read_pipe,
+                args=(stream, pipe, chunks),
+                daemon=True
+            ).start()
 
-        # 执行脚本
-        try:
-            result = subprocess.run(
-                ['python3', script_file],
-                capture_output=True,
-                text=True,
-                timeout=self.script_task.timeout,
-                cwd=self.temp_dir
-            )
+        decoders = {stream: codecs.getincrementaldecoder('utf-8')(errors='replace') for stream in self.STREAMS}
+        collected = {stream: [] for stream in self.STREAMS}
+        open_streams = len(self.STREAMS)
+        deadline = time.monotonic() + self.script_task.timeout
+        drain_deadline = None
+        output_limit = self.script_task.output_limit * 1024 if self.script_task.output_limit else None
+        output_size = 0
 
-            execution_time = time.time() - start_time
-
-            # 合并标准输出和标准错误输出，提供完整的脚本执行信息
-            combined_output = ""
-            if result.stdout:
-                combined_output += f"=== 标准输出 ===\n{result.stdout}\n"
-            if result.stderr:
-                combined_output += f"=== 错误输出 ===\n{result.stderr}\n"
-            
-            if result.returncode == 0:
-                return True, combined_output.strip(), result.stderr, execution_time
+        while open_streams:
+            try:
+                stream, data = chunks.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                pass
             else:
-                return False, combined_output.strip(), result.stderr, execution_time
+                if not data:
+                    open_streams -= 1
+                if output_limit is not None:
+                    if output_size + len(data) > output_limit:
+                        # 只保留上限以内的输出，之后的数据丢弃
+                        data = data[:max(output_limit - output_size, 0)]
+                        self.kill('output_limit')
+                    output_size += len(data)
+                self._emit(stream, decoders[stream].decode(data, final=not data), collected)
 
-        except subprocess.TimeoutExpired:
-            return False, "", "脚本执行超时", time.time() - start_time
+            if self.output_recorder:
+                self.output_recorder.maybe_flush()
 
-    def _prepare_bash_script(self, parameters: Dict[str, Any]) -> str:
-        """准备Bash脚本内容"""
-        param_exports = []
-        for key, value in parameters.items():
-            # 安全处理参数值
-            safe_value = str(value).replace('"', '\\"')
-            param_exports.append(f'export {key}="{safe_value}"')
+            now = time.monotonic()
+            if drain_deadline is None:
+                if now > deadline:
+                    self.kill('timeout')
+                if self.outcome or self._exited(process):
+                    # 脚本已退出或被终止，剩余输出最多再等待 KILL_GRACE
+                    drain_deadline = now + self.KILL_GRACE
+            elif now > drain_deadline:
+                # 脚本派生的后台进程仍持有管道，结束整个进程组后不再等待
+                kill_process_group(process)
+                break
 
-        param_section = '\n'.join(param_exports) if param_exports else ''
+        self._wait(process)
+        if self.output_recorder:
+            self.output_recorder.flush()
+        return ''.join(collected['stdout']), ''.join(collected['stderr'])
 
-        return f"""#!/bin/bash
-# 自动生成的参数导出
-{param_section}
+    @staticmethod
+    def _exited(process) -> bool:
+        """检查子进程是否已退出，不回收进程，留给 _wait 取得资源使用"""
+        if isinstance(process, subprocess.Popen):
+            try:
+                return os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None
+            except ChildProcessError:
+                return True
+        return process.poll() is not None
 
-# 用户脚本内容
-{self.script_task.content}
-"""
+    def _wait(self, process):
+        """回收子进程并记录其资源使用"""
+        if not isinstance(process, subprocess.Popen):
+            process.wait()
+            self.rusage = process.rusage
+            return
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            process.wait()
+            return
+        process.returncode = os.waitstatus_to_exitcode(status)
+        self.rusage = rusage_to_dict(rusage)
 
-    def _prepare_python_script(self, parameters: Dict[str, Any]) -> str:
-        """准备Python脚本内容"""
-        param_dict = json.dumps(parameters, ensure_ascii=False, indent=2)
+    def get_resource_usage(self) -> Dict[str, Any]:
+        """子进程资源使用，字段与执行记录一致"""
+        if not self.rusage:
+            return {}
+        return {
+            'cpu_user_time': self.rusage['ru_utime'],
+            'cpu_system_time': self.rusage['ru_stime'],
+            'max_rss': self.rusage['ru_maxrss'],
+            'block_input': self.rusage['ru_inblock'],
+            'block_output': self.rusage['ru_oublock'],
+        }
 
-        return f"""#!/usr/bin/env python3
-# -*- coding: utf-8 -*-
-import json
-import sys
-import os
+    def _emit(self, stream: str, text: str, collected: Dict[str, list]):
+        """记录一段解码后的输出"""
+        if not text:
+            return
+        collected[stream].append(text)
+        if self.output_recorder:
+            self.output_recorder.write(stream, text)
 
-# 自动生成的参数字典
-PARAMS = {param_dict}
+    @staticmethod
+    def _read_pipe(stream: str, pipe, chunks: queue.Queue):
+        """读取管道直到EOF，空字节串表示流结束"""
+        try:
+            while True:
+                data = pipe.read1(ScriptExecutor.READ_SIZE)
+                chunks.put((stream, data))
+                if not data:
+                    break
+        finally:
+            pipe.close()
+
+    def _get_cwd(self) -> str:
+        """获取工作目录，仅对需要独立工作目录的脚本创建临时目录"""
+        if not self.script_task.use_workspace:
+            return settings.SCRIPT_DEFAULT_CWD
+        if self.temp_dir is None:
+            self.temp_dir = tempfile.mkdtemp(prefix='script-workspace-')
+        return self.temp_dir
 
-# 用户脚本内容
-{self.script_task.content}
-"""
+    def _build_limits(self) -> Dict[str, int]:
+        """按脚本配置生成子进程的资源上限"""
+        limits = {}
+        if self.script_task.memory_limit:
+            limits['RLIMIT_AS'] = self.script_task.memory_limit * 1024 * 1024
+        if self.script_task.cpu_time_limit:
+            limits['RLIMIT_CPU'] = self.script_task.cpu_time_limit
+        if self.script_task.open_files_limit:
+            limits['RLIMIT_NOFILE'] = self.script_task.open_files_limit
+        return limits
+
+    @staticmethod
+    def _build_env(parameters: Dict[str, Any]) -> Dict[str, str]:
+        """
+        构造子进程环境变量：完整参数以 JSON 放入 SCRIPT_PARAMS；
+        合法变量名且非保留名的参数同时以 PARAM_<名称> 导出，由 bash 脚本开头恢复为同名变量
+        """
+        env = {key: value for key, value in os.environ.items() if not key.startswith(PARAM_ENV_PREFIX)}
+        env['SCRIPT_PARAMS'] = json.dumps(parameters, ensure_ascii=False)
+        for key, value in parameters.items():
+            key = str(key)
+            if not ENV_NAME_PATTERN.match(key):
+                continue
+            if RESERVED_PARAM_PATTERN.match(key):
+                logger.warning(f"参数 {key} 与保留的环境变量同名，仅可通过 SCRIPT_PARAMS 读取")
+                continue
+            env[PARAM_ENV_PREFIX + key] = str(value)
+        return env
 
     def _cleanup(self):
-        """清理临时文件"""
-        try:
-            import shutil
+        """清理临时工作目录"""
+        if self.temp_dir:
             shutil.rmtree(self.temp_dir, ignore_errors=True)
-        except Exception:
-            pass
+            self.temp_dir = None
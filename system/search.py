@@ -0,0 +1,320 @@
+"""
+执行记录输出（output）和错误信息（error_message）的全文检索
+
+按数据库分别建立索引（由 post_migrate 信号自动创建，已存在时跳过）：
+- SQLite：FTS5 表 script_execution_fts，trigram 分词，由触发器与执行记录同步；
+  执行记录主键为 UUID，隐式 rowid 在 VACUUM 后可能变化，因此索引不引用 rowid，
+  而是由映射表 script_execution_fts_ids 记录索引行号与执行ID，检索时按执行ID关联
+- PostgreSQL：pg_trgm 的 GIN 三元组索引，按 icontains 查询即可使用索引
+- MySQL：带 ngram 分词器的 FULLTEXT 索引，按布尔模式 MATCH ... AGAINST 查询
+其他数据库，或索引创建失败时，退化为不走索引的 icontains 查询。
+按内容去重存储的输出在共享输出表（script_output_blob）的 content 上同样建立索引。
+输出已转存到块存储的执行，只有预览部分参与检索。
+"""
+import html
+import logging
+import re
+
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.db.models import Q, BooleanField, Value, CharField
+from django.db.models.expressions import RawSQL
+
+from .models import ScriptExecution, ScriptOutputBlob
+
+logger = logging.getLogger(__name__)
+
+TABLE = ScriptExecution._meta.db_table
+FTS_TABLE = f'{TABLE}_fts'
+FTS_IDS_TABLE = f'{FTS_TABLE}_ids'
+SEARCH_FIELDS = ('output', 'error_message')
+PG_INDEX_PREFIX = f'{TABLE}_trgm_'
+MYSQL_INDEX = f'{TABLE}_fulltext'
+
+# 共享输出表的索引
+BLOB_TABLE = ScriptOutputBlob._meta.db_table
+BLOB_FTS_TABLE = f'{BLOB_TABLE}_fts'
+BLOB_SEARCH_FIELDS = ('content',)
+BLOB_PG_INDEX_PREFIX = f'{BLOB_TABLE}_trgm_'
+BLOB_MYSQL_INDEX = f'{BLOB_TABLE}_fulltext'
+
+# 查询词：双引号括起的短语或以空白分隔的词
+TERM_PATTERN = re.compile(r'"([^"]+)"|(\S+)')
+MAX_TERMS = 10
+
+# 各索引能使用的最短查询词，更短的词退化为 icontains
+MIN_TERM_LENGTH = {
+    'sqlite': 3,
+    'postgresql': 3,
+    'mysql': 2,
+}
+
+_indexed = {}
+
+
+def parse_terms(query):
+    """把 q 参数拆分为查询词，所有词都需出现（AND）"""
+    terms = []
+    for phrase, word in TERM_PATTERN.findall(query or ''):
+        term = (phrase or word).strip()
+        if term and term not in terms:
+            terms.append(term)
+    return terms[:MAX_TERMS]
+
+
+def has_search_index(using=DEFAULT_DB_ALIAS):
+    """当前数据库是否已建立全文索引，存在后缓存结果"""
+    if _indexed.get(using):
+        return True
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (%s, %s)",
+                [FTS_TABLE, BLOB_FTS_TABLE]
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT COUNT(DISTINCT tablename) FROM pg_indexes "
+                "WHERE (tablename = %s AND indexname LIKE %s) OR (tablename = %s AND indexname LIKE %s)",
+                [TABLE, f'{PG_INDEX_PREFIX}%', BLOB_TABLE, f'{BLOB_PG_INDEX_PREFIX}%']
+            )
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT COUNT(DISTINCT table_name) FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND ((table_name = %s AND index_name = %s) "
+                "OR (table_name = %s AND index_name = %s))",
+                [TABLE, MYSQL_INDEX, BLOB_TABLE, BLOB_MYSQL_INDEX]
+            )
+        else:
+            return False
+        _indexed[using] = cursor.fetchone()[0] == 2
+    return _indexed[using]
+
+
+def _contains(term):
+    return (
+        Q(output__icontains=term) | Q(error_message__icontains=term) | Q(output_ref__content__icontains=term)
+    )
+
+
+def _fts_phrase(term):
+    """FTS5 短语：双引号括起，内部的双引号重复转义"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def filter_by_search(queryset, query):
+    """
+    按查询词筛选执行记录，所有词都需出现在输出或错误信息中
+    同时注解 search_query，供序列化时生成高亮片段
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return queryset
+    queryset = queryset.annotate(search_query=Value(query, output_field=CharField()))
+
+    connection = connections[queryset.db]
+    vendor = connection.vendor
+    min_length = MIN_TERM_LENGTH.get(vendor)
+    if min_length is None or not has_search_index(queryset.db):
+        for term in terms:
+            queryset = queryset.filter(_contains(term))
+        return queryset
+
+    indexed = [term for term in terms if len(term) >= min_length]
+    for term in terms:
+        if term not in indexed:
+            queryset = queryset.filter(_contains(term))
+    if not indexed:
+        return queryset
+
+    # 每个词可能出现在执行记录本身，也可能出现在引用的共享输出中，逐词分别匹配
+    if vendor == 'sqlite':
+        # trigram 分词下短语查询即子串匹配，大小写不敏感
+        for term in indexed:
+            queryset = queryset.filter(RawSQL(
+                f'"{TABLE}"."id" IN (SELECT execution_id FROM {FTS_IDS_TABLE} WHERE rowid IN '
+                f'(SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)) '
+                f'OR "{TABLE}"."output_ref_id" IN (SELECT rowid FROM {BLOB_FTS_TABLE} WHERE {BLOB_FTS_TABLE} MATCH %s)',
+                [_fts_phrase(term)] * 2,
+                output_field=BooleanField()
+            ))
+        return queryset
+    if vendor == 'mysql':
+        # 布尔模式下每个词作为必须出现的短语，ngram 分词支持中文
+        for term in indexed:
+            against = '+"' + term.replace('"', ' ') + '"'
+            queryset = queryset.filter(RawSQL(
+                f'MATCH (`{TABLE}`.`output`, `{TABLE}`.`error_message`) AGAINST (%s IN BOOLEAN MODE) '
+                f'OR `{TABLE}`.`output_ref_id` IN '
+                f'(SELECT `id` FROM `{BLOB_TABLE}` WHERE MATCH (`content`) AGAINST (%s IN BOOLEAN MODE))',
+                [against] * 2,
+                output_field=BooleanField()
+            ))
+        return queryset
+    # PostgreSQL：icontains 生成 UPPER(...) LIKE，由 UPPER 表达式上的三元组索引加速
+    for term in indexed:
+        queryset = queryset.filter(_contains(term))
+    return queryset
+
+
+def build_highlights(execution, query, context=60, max_snippets=3):
+    """
+    在输出和错误信息中截取查询词附近的片段，HTML 转义后用 <mark> 标记命中位置
+    返回: {'output': [片段], 'error_message': [片段]}，没有命中的字段不返回
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return {}
+    pattern = re.compile('|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    highlights = {}
+    for field in SEARCH_FIELDS:
+        text = (execution.get_output() if field == 'output' else getattr(execution, field)) or ''
+        snippets = []
+        end = 0
+        for match in pattern.finditer(text):
+            if match.start() < end:
+                continue
+            start = max(match.start() - context, 0)
+            end = min(match.end() + context, len(text))
+            fragment = text[start:end]
+            marked = pattern.sub(lambda m: f'\x00{m.group(0)}\x01', fragment)
+            snippet = html.escape(marked).replace('\x00', '<mark>').replace('\x01', '</mark>')
+            snippets.append(('…' if start else '') + snippet + ('…' if end < len(text) else ''))
+            if len(snippets) >= max_snippets:
+                break
+        if snippets:
+            highlights[field] = snippets
+    return highlights
+
+
+def ensure_search_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    创建全文索引（post_migrate 信号处理函数），已存在时跳过
+    创建失败（缺少扩展或权限等）只记录日志，检索退化为 icontains
+    """
+    connection = connections[using]
+    if TABLE not in connection.introspection.table_names():
+        return
+    try:
+        for table, fields, fts_table, pg_prefix, mysql_index in (
+            (TABLE, SEARCH_FIELDS, FTS_TABLE, PG_INDEX_PREFIX, MYSQL_INDEX),
+            (BLOB_TABLE, BLOB_SEARCH_FIELDS, BLOB_FTS_TABLE, BLOB_PG_INDEX_PREFIX, BLOB_MYSQL_INDEX),
+        ):
+            if connection.vendor == 'sqlite':
+                if table == TABLE:
+                    _ensure_sqlite_keyed_index(connection, table, fields, fts_table, FTS_IDS_TABLE)
+                else:
+                    _ensure_sqlite_index(connection, table, fields, fts_table)
+            elif connection.vendor == 'postgresql':
+                _ensure_postgresql_index(connection, table, fields, pg_prefix)
+            elif connection.vendor == 'mysql':
+                _ensure_mysql_index(connection, table, fields, mysql_index)
+    except Exception as e:
+        logger.warning(f"创建执行输出全文索引失败，检索将不使用索引: {e}")
+    _indexed.pop(using, None)
+
+
+def _ensure_sqlite_index(connection, table, fields, fts_table):
+    """外部内容表索引，仅用于整数主键（即 rowid）的表，rowid 在 VACUUM 后保持不变"""
+    columns = ', '.join(fields)
+    old_values = ', '.join(f'old.{field}' for field in fields)
+    new_values = ', '.join(f'new.{field}' for field in fields)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts_table])
+        if cursor.fetchone():
+            return
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {fts_table} USING fts5({columns}, content='{table}', "
+            f"content_rowid='rowid', tokenize='trigram')"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.rowid, {new_values}); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values}); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values}); "
+            f"INSERT INTO {fts_table}(rowid, {columns}) VALUES (new.rowid, {new_values}); END"
+        )
+        # 为已有的记录建立索引
+        cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+    logger.info(f"已创建全文索引 {fts_table}")
+
+
+def _ensure_sqlite_keyed_index(connection, table, fields, fts_table, ids_table):
+    """
+    非整数主键的表：无内容的 FTS5 表只保存索引，索引行号与主键的对应关系保存在映射表中，
+    与表本身的 rowid 无关；删除和更新时由触发器按主键查出行号，以旧值从索引中删除
+    早期按 rowid 建立的外部内容索引会被删除重建
+    """
+    columns = ', '.join(fields)
+    old_values = ', '.join(f'old.{field}' for field in fields)
+    new_values = ', '.join(f'new.{field}' for field in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name IN (%s, %s)", [fts_table, ids_table]
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if ids_table in existing:
+            return
+        if fts_table in existing:
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {fts_table}_{suffix}")
+            cursor.execute(f"DROP TABLE {fts_table}")
+            logger.info(f"删除按 rowid 关联的全文索引 {fts_table}，改为按主键关联重建")
+
+        cursor.execute(
+            f"CREATE TABLE {ids_table} (rowid INTEGER PRIMARY KEY, execution_id TEXT NOT NULL UNIQUE)"
+        )
+        cursor.execute(f"CREATE VIRTUAL TABLE {fts_table} USING fts5({columns}, content='', tokenize='trigram')")
+        insert = (
+            f"INSERT INTO {ids_table}(execution_id) VALUES (new.id); "
+            f"INSERT INTO {fts_table}(rowid, {columns}) "
+            f"SELECT rowid, {new_values} FROM {ids_table} WHERE execution_id = new.id; "
+        )
+        delete = (
+            f"INSERT INTO {fts_table}({fts_table}, rowid, {columns}) "
+            f"SELECT 'delete', rowid, {old_values} FROM {ids_table} WHERE execution_id = old.id; "
+            f"DELETE FROM {ids_table} WHERE execution_id = old.id; "
+        )
+        cursor.execute(f"CREATE TRIGGER {fts_table}_ai AFTER INSERT ON {table} BEGIN {insert}END")
+        cursor.execute(f"CREATE TRIGGER {fts_table}_ad AFTER DELETE ON {table} BEGIN {delete}END")
+        cursor.execute(
+            f"CREATE TRIGGER {fts_table}_au AFTER UPDATE OF {columns} ON {table} BEGIN {delete}{insert}END"
+        )
+        # 为已有的记录建立索引
+        cursor.execute(f"INSERT INTO {ids_table}(execution_id) SELECT id FROM {table}")
+        cursor.execute(
+            f"INSERT INTO {fts_table}(rowid, {columns}) SELECT ids.rowid, "
+            f"{', '.join(f't.{field}' for field in fields)} FROM {ids_table} ids "
+            f"JOIN {table} t ON t.id = ids.execution_id"
+        )
+    logger.info(f"已创建全文索引 {fts_table}")
+
+
+def _ensure_postgresql_index(connection, table, fields, index_prefix):
+    with connection.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for field in fields:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {index_prefix}{field} ON {table} '
+                f'USING gin (UPPER("{field}"::text) gin_trgm_ops)'
+            )
+
+
+def _ensure_mysql_index(connection, table, fields, index_name):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+            [table, index_name]
+        )
+        if cursor.fetchone():
+            return
+        columns = ', '.join(f'`{field}`' for field in fields)
+        cursor.execute(f'ALTER TABLE `{table}` ADD FULLTEXT INDEX `{index_name}` ({columns}) WITH PARSER ngram')
+    logger.info(f"已创建全文索引 {index_name}")
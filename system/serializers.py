@@ -1,6 +1,16 @@
 from rest_framework import serializers
-from .models import ScriptTask, ScriptExecution
+from django.utils import timezone
+from .models import (
+    ScriptTask, ScriptExecution, ScriptBatch, ScriptSchedule,
+    ScriptWorkflow, ScriptWorkflowStep, ScriptWorkflowRun
+)
+from .script_cache import check_script_syntax
+from .cron import CronExpression
+from .search import build_highlights
 import json
+import re
+
+STEP_KEY_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
 
 
 class ScriptTaskSerializer(serializers.ModelSerializer):
@@ -15,10 +25,15 @@ class ScriptTaskSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'script_type', 'script_type_display',
             'return_type', 'return_type_display', 'parameters', 'parameter_names',
-            'content', 'description', 'status', 'status_display', 'timeout',
-            'last_executed_at', 'execution_count', 'created_at', 'updated_at'
+            'content', 'content_hash', 'description', 'status', 'status_display', 'timeout',
+            'use_workspace', 'memory_limit', 'cpu_time_limit', 'open_files_limit', 'output_limit',
+            'cache_enabled', 'cache_ttl', 'cache_hits', 'cache_misses', 'retention_days',
+            'max_concurrency', 'weight', 'last_executed_at', 'execution_count', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'content_hash', 'cache_hits', 'cache_misses', 'last_executed_at', 'execution_count',
+            'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'last_executed_at', 'execution_count', 'created_at', 'updated_at']
 
 
 class ScriptTaskCreateSerializer(serializers.ModelSerializer):
@@ -28,8 +43,14 @@ class ScriptTaskCreateSerializer(serializers.ModelSerializer):
         model = ScriptTask
         fields = [
             'name', 'script_type', 'return_type', 'parameters',
-            'content', 'description', 'status', 'timeout'
+            'content', 'description', 'status', 'timeout', 'use_workspace',
+            'memory_limit', 'cpu_time_limit', 'open_files_limit', 'output_limit',
+            'cache_enabled', 'cache_ttl', 'retention_days', 'max_concurrency', 'weight'
         ]
+        extra_kwargs = {
+            'max_concurrency': {'min_value': 1},
+            'weight': {'min_value': 1},
+        }
 
     def validate_name(self, value):
         if ScriptTask.objects.filter(name=value, is_deleted=False).exists():
@@ -46,6 +67,13 @@ class ScriptTaskCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("脚本内容不能为空")
         return value
 
+    def validate(self, attrs):
+        # 保存时做一次语法检查，执行时不再重复校验
+        error = check_script_syntax(attrs.get('script_type', 'bash'), attrs['content'])
+        if error:
+            raise serializers.ValidationError({'content': error})
+        return attrs
+
 
 class ScriptTaskUpdateSerializer(serializers.ModelSerializer):
     """脚本任务更新序列化器"""
@@ -54,8 +82,14 @@ class ScriptTaskUpdateSerializer(serializers.ModelSerializer):
         model = ScriptTask
         fields = [
             'name', 'script_type', 'return_type', 'parameters',
-            'content', 'description', 'status', 'timeout'
+            'content', 'description', 'status', 'timeout', 'use_workspace',
+            'memory_limit', 'cpu_time_limit', 'open_files_limit', 'output_limit',
+            'cache_enabled', 'cache_ttl', 'retention_days', 'max_concurrency', 'weight'
         ]
+        extra_kwargs = {
+            'max_concurrency': {'min_value': 1},
+            'weight': {'min_value': 1},
+        }
 
     def validate_name(self, value):
         # 更新时需要排除当前记录本身
@@ -77,30 +111,62 @@ class ScriptTaskUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("脚本内容不能为空")
         return value
 
+    def validate(self, attrs):
+        if 'content' in attrs or 'script_type' in attrs:
+            script_type = attrs.get('script_type', self.instance.script_type)
+            content = attrs.get('content', self.instance.content)
+            error = check_script_syntax(script_type, content)
+            if error:
+                raise serializers.ValidationError({'content': error})
+        return attrs
+
 
 class ScriptExecutionSerializer(serializers.ModelSerializer):
     """脚本执行记录序列化器"""
     script_name = serializers.CharField(source='script_task.name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
+    priority_display = serializers.CharField(source='get_priority_display', read_only=True)
+    output = serializers.CharField(source='get_output', read_only=True, allow_null=True)
     formatted_output = serializers.CharField(source='get_formatted_output', read_only=True)
     has_output = serializers.SerializerMethodField(read_only=True)
+    output_truncated = serializers.BooleanField(source='is_output_truncated', read_only=True)
     execution_summary = serializers.DictField(source='get_execution_summary', read_only=True)
+    highlights = serializers.SerializerMethodField(read_only=True)
 
     def get_has_output(self, obj):
         """获取是否有输出内容"""
         return obj.has_output()
 
+    def get_highlights(self, obj):
+        """全文检索时命中位置附近的片段，未检索时为 None"""
+        query = getattr(obj, 'search_query', None)
+        if not query:
+            return None
+        return build_highlights(obj, query)
+
     class Meta:
         model = ScriptExecution
         fields = [
             'id', 'script_task', 'script_name', 'status', 'status_display',
+            'batch', 'vehicle', 'schedule', 'workflow_run', 'workflow_step', 'cache_hit', 'cached_from',
+            'coalesced_count', 'priority', 'priority_display', 'queued_at', 'queue_wait_time',
             'input_parameters', 'output', 'formatted_output', 'has_output',
-            'error_message', 'execution_time', 'execution_summary',
+            'output_size', 'output_checksum', 'output_truncated', 'result', 'result_error',
+            'error_message', 'highlights', 'execution_time', 'execution_summary',
+            'cpu_user_time', 'cpu_system_time', 'max_rss', 'block_input', 'block_output',
             'started_at', 'finished_at', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
 
 
+class ScriptExecutionListSerializer(ScriptExecutionSerializer):
+    """执行记录列表序列化器：不重复返回与 output 内容相同的 formatted_output，完整格式见详情接口"""
+    formatted_output = None
+
+    class Meta(ScriptExecutionSerializer.Meta):
+        fields = [field for field in ScriptExecutionSerializer.Meta.fields if field != 'formatted_output']
+
+
 class ScriptExecuteSerializer(serializers.Serializer):
     """脚本执行请求序列化器"""
     parameters = serializers.JSONField(
@@ -108,8 +174,294 @@ class ScriptExecuteSerializer(serializers.Serializer):
         default=dict,
         help_text="执行参数，JSON格式"
     )
+    priority = serializers.ChoiceField(
+        choices=ScriptExecution.PRIORITY_CHOICES,
+        required=False,
+        default=ScriptExecution.PRIORITY_NORMAL,
+        help_text="优先级：9 高（交互）、5 普通、1 低（批量）"
+    )
+
+    def validate_parameters(self, value):
+        if value and not isinstance(value, dict):
+            raise serializers.ValidationError("参数必须是有效的JSON对象")
+        return value
+
+
+class ScriptBatchExecuteSerializer(serializers.Serializer):
+    """按项目空间批量执行请求序列化器"""
+    project_id = serializers.UUIDField(help_text="项目空间ID")
+    parameters = serializers.JSONField(
+        required=False,
+        default=dict,
+        help_text="所有车型共用的执行参数，JSON格式"
+    )
+    concurrency = serializers.IntegerField(
+        required=False,
+        default=5,
+        min_value=1,
+        max_value=100,
+        help_text="同时执行的最大数量"
+    )
+    priority = serializers.ChoiceField(
+        choices=ScriptExecution.PRIORITY_CHOICES,
+        required=False,
+        default=ScriptExecution.PRIORITY_LOW,
+        help_text="优先级，批量执行默认为低优先级，只使用交互执行剩余的槽位"
+    )
+
+    def validate_parameters(self, value):
+        if value and not isinstance(value, dict):
+            raise serializers.ValidationError("参数必须是有效的JSON对象")
+        return value
+
+
+class ScriptBatchSerializer(serializers.ModelSerializer):
+    """脚本批量执行记录序列化器（统计字段由查询集注解提供）"""
+    script_name = serializers.CharField(source='script_task.name', read_only=True)
+    project_name = serializers.CharField(source='project_space.name', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    pending_count = serializers.IntegerField(read_only=True)
+    running_count = serializers.IntegerField(read_only=True)
+    success_count = serializers.IntegerField(read_only=True)
+    failed_count = serializers.IntegerField(read_only=True)
+    progress = serializers.SerializerMethodField(read_only=True)
+
+    def get_progress(self, obj):
+        """获取完成进度百分比"""
+        if not obj.total_count:
+            return 100.0
+        finished = obj.total_count - obj.pending_count - obj.running_count
+        return round(finished * 100 / obj.total_count, 1)
+
+    class Meta:
+        model = ScriptBatch
+        fields = [
+            'id', 'script_task', 'script_name', 'project_space', 'project_name',
+            'status', 'status_display', 'parameters', 'concurrency', 'total_count',
+            'pending_count', 'running_count', 'success_count', 'failed_count', 'progress',
+            'finished_at', 'created_at'
+        ]
+        read_only_fields = ['id', 'created_at']
+
+
+class ScriptScheduleSerializer(serializers.ModelSerializer):
+    """脚本定时计划序列化器"""
+    script_name = serializers.CharField(source='script_task.name', read_only=True)
+    schedule_type_display = serializers.CharField(source='get_schedule_type_display', read_only=True)
+    misfire_policy_display = serializers.CharField(source='get_misfire_policy_display', read_only=True)
+    upcoming_runs = serializers.SerializerMethodField(read_only=True)
+
+    def get_upcoming_runs(self, obj):
+        """获取接下来的触发时间"""
+        if not obj.is_active or not obj.next_run_at:
+            return []
+        runs = [obj.next_run_at]
+        try:
+            while len(runs) < 5:
+                runs.append(obj.get_next_run_after(runs[-1]))
+        except ValueError:
+            pass
+        return [timezone.localtime(run).isoformat() for run in runs]
+
+    class Meta:
+        model = ScriptSchedule
+        fields = [
+            'id', 'script_task', 'script_name', 'name', 'schedule_type', 'schedule_type_display',
+            'cron_expression', 'interval_seconds', 'parameters', 'is_active',
+            'misfire_policy', 'misfire_policy_display', 'misfire_grace_seconds', 'jitter_seconds',
+            'next_run_at', 'last_run_at', 'last_execution', 'run_count', 'misfire_count', 'upcoming_runs',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'id', 'next_run_at', 'last_run_at', 'last_execution', 'run_count', 'misfire_count',
+            'created_at', 'updated_at'
+        ]
+
+
+class ScriptScheduleWriteSerializer(serializers.ModelSerializer):
+    """脚本定时计划创建/更新序列化器"""
+
+    class Meta:
+        model = ScriptSchedule
+        fields = [
+            'script_task', 'name', 'schedule_type', 'cron_expression', 'interval_seconds', 'parameters',
+            'is_active', 'misfire_policy', 'misfire_grace_seconds', 'jitter_seconds'
+        ]
+
+    def validate_script_task(self, value):
+        if value.is_deleted:
+            raise serializers.ValidationError("脚本不存在")
+        return value
+
+    def validate_parameters(self, value):
+        if value and not isinstance(value, dict):
+            raise serializers.ValidationError("参数必须是有效的JSON对象")
+        return value
+
+    def validate(self, attrs):
+        instance = self.instance
+        schedule_type = attrs.get('schedule_type', instance.schedule_type if instance else 'cron')
+        if schedule_type == 'cron':
+            expression = attrs.get('cron_expression', instance.cron_expression if instance else '')
+            try:
+                CronExpression(expression).next_after(timezone.now())
+            except ValueError as e:
+                raise serializers.ValidationError({'cron_expression': str(e)})
+        else:
+            interval = attrs.get('interval_seconds', instance.interval_seconds if instance else None)
+            if not interval:
+                raise serializers.ValidationError({'interval_seconds': "固定间隔计划必须设置间隔秒数"})
+        return attrs
+
+
+class ScriptWorkflowStepSerializer(serializers.ModelSerializer):
+    """工作流步骤序列化器"""
+    script_name = serializers.CharField(source='script_task.name', read_only=True)
+
+    class Meta:
+        model = ScriptWorkflowStep
+        fields = ['key', 'script_task', 'script_name', 'parameters', 'depends_on']
+
+
+class ScriptWorkflowSerializer(serializers.ModelSerializer):
+    """脚本工作流序列化器"""
+    steps = serializers.SerializerMethodField(read_only=True)
+
+    def get_steps(self, obj):
+        """获取按顺序排列的步骤"""
+        return ScriptWorkflowStepSerializer(obj.steps.select_related('script_task').order_by('order'), many=True).data
+
+    class Meta:
+        model = ScriptWorkflow
+        fields = ['id', 'name', 'description', 'concurrency', 'steps', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+class ScriptWorkflowWriteSerializer(serializers.ModelSerializer):
+    """脚本工作流创建/更新序列化器，步骤整体替换"""
+    steps = ScriptWorkflowStepSerializer(many=True, required=False)
+
+    class Meta:
+        model = ScriptWorkflow
+        fields = ['name', 'description', 'concurrency', 'steps']
+
+    def validate_concurrency(self, value):
+        if value < 1:
+            raise serializers.ValidationError("并发上限至少为1")
+        return value
+
+    def validate_steps(self, value):
+        if not value:
+            raise serializers.ValidationError("工作流至少需要一个步骤")
+
+        keys = [step['key'] for step in value]
+        if len(set(keys)) != len(keys):
+            raise serializers.ValidationError("步骤标识不能重复")
+        for step in value:
+            if not STEP_KEY_PATTERN.match(step['key']):
+                raise serializers.ValidationError(f"步骤标识只能包含字母、数字和下划线且不能以数字开头: {step['key']}")
+            if step['script_task'].is_deleted:
+                raise serializers.ValidationError(f"步骤 {step['key']} 的脚本不存在")
+            if step.get('parameters') and not isinstance(step['parameters'], dict):
+                raise serializers.ValidationError(f"步骤 {step['key']} 的参数必须是有效的JSON对象")
+            depends_on = step.get('depends_on') or []
+            if not isinstance(depends_on, list) or any(key not in keys or key == step['key'] for key in depends_on):
+                raise serializers.ValidationError(f"步骤 {step['key']} 的依赖步骤无效")
+
+        # 按拓扑排序检查是否存在环
+        remaining = {step['key']: set(step.get('depends_on') or []) for step in value}
+        while remaining:
+            ready = [key for key, deps in remaining.items() if not deps]
+            if not ready:
+                raise serializers.ValidationError(f"步骤之间存在循环依赖: {', '.join(sorted(remaining))}")
+            for key in ready:
+                del remaining[key]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return value
+
+    def validate(self, attrs):
+        if self.instance is None and 'steps' not in attrs:
+            raise serializers.ValidationError({'steps': "工作流至少需要一个步骤"})
+        return attrs
+
+    def create(self, validated_data):
+        steps = validated_data.pop('steps')
+        workflow = ScriptWorkflow.objects.create(**validated_data)
+        self._save_steps(workflow, steps)
+        return workflow
+
+    def update(self, instance, validated_data):
+        steps = validated_data.pop('steps', None)
+        instance = super().update(instance, validated_data)
+        if steps is not None:
+            instance.steps.all().delete()
+            self._save_steps(instance, steps)
+        return instance
+
+    @staticmethod
+    def _save_steps(workflow, steps):
+        ScriptWorkflowStep.objects.bulk_create([
+            ScriptWorkflowStep(
+                workflow=workflow,
+                key=step['key'],
+                script_task=step['script_task'],
+                parameters=step.get('parameters') or {},
+                depends_on=step.get('depends_on') or [],
+                order=index
+            )
+            for index, step in enumerate(steps)
+        ])
+
+
+class ScriptWorkflowRunSerializer(serializers.ModelSerializer):
+    """工作流运行记录序列化器"""
+    workflow_name = serializers.CharField(source='workflow.name', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    steps = serializers.SerializerMethodField(read_only=True)
+    duration = serializers.SerializerMethodField(read_only=True)
+
+    def get_steps(self, obj):
+        """获取各步骤及其执行记录"""
+        executions = {execution.workflow_step: execution for execution in obj.executions.all()}
+        steps = []
+        for step in obj.definition:
+            execution = executions.get(step['key'])
+            steps.append({
+                'key': step['key'],
+                'script_task': step['script_task'],
+                'depends_on': step['depends_on'],
+                'execution': execution.id if execution else None,
+                'status': execution.status if execution else None,
+                'execution_time': execution.execution_time if execution else None,
+                'on_critical_path': step['key'] in obj.critical_path,
+            })
+        return steps
+
+    def get_duration(self, obj):
+        """获取运行总耗时（秒）"""
+        if not obj.finished_at:
+            return None
+        return (obj.finished_at - obj.created_at).total_seconds()
+
+    class Meta:
+        model = ScriptWorkflowRun
+        fields = [
+            'id', 'workflow', 'workflow_name', 'status', 'status_display', 'parameters', 'concurrency',
+            'steps', 'critical_path', 'critical_path_time', 'duration', 'finished_at', 'created_at'
+        ]
+        read_only_fields = ['id', 'created_at']
+
+
+class ScriptWorkflowRunCreateSerializer(serializers.Serializer):
+    """工作流运行请求序列化器"""
+    parameters = serializers.JSONField(
+        required=False,
+        default=dict,
+        help_text="所有步骤共用的参数，JSON格式"
+    )
 
     def validate_parameters(self, value):
         if value and not isinstance(value, dict):
             raise serializers.ValidationError("参数必须是有效的JSON对象")
-        return value
\ No newline at end of file
+        return value
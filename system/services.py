@@ -1,14 +1,41 @@
-from django.db import transaction
+from django.db import transaction, connections
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils import timezone
-from .models import ScriptTask, ScriptExecution
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Count, Q, F, Value, Case, When, Sum, Avg, Min, Max, FloatField
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, TruncDate, Coalesce, Greatest
+from django.utils.dateparse import parse_datetime
+from vehicle_management.services import ProjectSpaceService
+from .models import (
+    ScriptTask, ScriptExecution, ScriptOutputChunk, ScriptBatch, ScriptSchedule,
+    ScriptWorkflow, ScriptWorkflowRun, ScriptLatencyStat
+)
 from .serializers import (
     ScriptTaskSerializer, ScriptTaskCreateSerializer, ScriptTaskUpdateSerializer,
-    ScriptExecutionSerializer, ScriptExecuteSerializer
+    ScriptExecutionSerializer, ScriptExecuteSerializer, ScriptBatchExecuteSerializer,
+    ScriptScheduleWriteSerializer, ScriptWorkflowWriteSerializer, ScriptWorkflowRunCreateSerializer
 )
 from .script_executor import ScriptExecutor
-import threading
+from .async_executor import AsyncScriptExecutor, get_async_engine, run_blocking
+from .execution_pool import get_execution_pool
+from .dispatcher import get_execution_dispatcher
+from .write_behind import ExecutionCompletion, get_completion_writer
+from .script_cache import compute_cache_key
+from .watchdog import get_execution_watchdog
+from .output_capture import ExecutionOutputRecorder, read_output_chunks, OUTPUT_STREAMS
+from .output_storage import (
+    prepare_output_fields, iter_output_blob, add_output_refs
+)
+from .result_parser import parse_result, build_result_lookups, RESULT_PATH_PATTERN
+from .search import filter_by_search
+from .rate_limit import get_bucket_levels
+from .latency import window_start, add_sample, merge_histograms, compute_percentiles, resolve_range
+from datetime import timedelta
 import logging
+import threading
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +43,11 @@ logger = logging.getLogger(__name__)
 class ScriptTaskService:
     """脚本任务业务逻辑"""
 
+    # 执行队列已满时，批次和工作流重新调度的等待时间(秒)
+    DISPATCH_RETRY_DELAY = 1.0
+    # 合并相同执行时，只合并到创建后未超过 脚本超时 + 该秒数 或租约仍有效的执行，更早的视为卡住不再合并
+    COALESCE_GRACE = 2 * ScriptExecutor.KILL_GRACE + 20
+
     @staticmethod
     def get_all_scripts(status=None, script_type=None, name=None):
         """获取所有脚本任务"""
@@ -56,7 +88,8 @@ class ScriptTaskService:
 
         serializer = ScriptTaskUpdateSerializer(script, data=data, partial=True)
         if serializer.is_valid():
-            updated_script = serializer.save()
+            # 脚本变更后之前缓存的执行结果不再可信
+            updated_script = serializer.save(cache_invalidated_at=timezone.now())
             return updated_script, None
         return None, serializer.errors
 
@@ -69,7 +102,7 @@ class ScriptTaskService:
             return False, "脚本不存在"
 
         # 检查是否有正在执行的任务
-        running_executions = script.executions.filter(status='running')
+        running_executions = script.executions.filter(status__in=['pending', 'queued', 'running'])
         if running_executions.exists():
             return False, "脚本正在执行中，无法删除"
 
@@ -78,8 +111,8 @@ class ScriptTaskService:
         return True, "删除成功"
 
     @staticmethod
-    def execute_script(script_id, parameters=None):
-        """执行脚本任务"""
+    def execute_script(script_id, parameters=None, schedule=None, priority=ScriptExecution.PRIORITY_NORMAL):
+        """执行脚本任务，schedule 为触发本次执行的定时计划，priority 为排队优先级"""
         script = ScriptTaskService.get_script_by_id(script_id)
         if not script:
             return None, "脚本不存在"
@@ -88,89 +121,1151 @@ class ScriptTaskService:
             return None, "脚本未启用，无法执行"
 
         # 验证参数
-        serializer = ScriptExecuteSerializer(data={'parameters': parameters or {}})
+        serializer = ScriptExecuteSerializer(data={'parameters': parameters or {}, 'priority': priority})
         if not serializer.is_valid():
             return None, serializer.errors
 
-        # 创建执行记录
+        cache_key = compute_cache_key(script.get_content_hash(), parameters or {})
+        if script.cache_enabled:
+            execution = ScriptTaskService._execute_from_cache(script, parameters or {}, cache_key)
+            if execution:
+                return execution, None
+
+        with transaction.atomic():
+            # 锁住脚本行，多个进程同时提交相同执行时串行判断
+            ScriptTask.objects.select_for_update().filter(id=script.id).first()
+            now = timezone.now()
+            inflight = ScriptExecution.objects.filter(
+                Q(started_at__gte=now - timedelta(seconds=script.timeout + ScriptTaskService.COALESCE_GRACE))
+                | Q(lease_expires_at__gt=now),
+                script_task=script,
+                cache_key=cache_key,
+                status__in=['queued', 'running']
+            ).order_by('created_at').first()
+            if inflight:
+                # 相同的执行尚未结束，合并到该执行而不再启动新进程
+                ScriptExecution.objects.filter(id=inflight.id).update(coalesced_count=F('coalesced_count') + 1)
+                inflight.refresh_from_db()
+                return inflight, None
+
+            # 创建执行记录
+            execution = ScriptExecution.objects.create(
+                script_task=script,
+                status='queued',
+                priority=serializer.validated_data['priority'],
+                queued_at=timezone.now(),
+                input_parameters=parameters or {},
+                cache_key=cache_key,
+                schedule=schedule
+            )
+
+        # 交给执行后端，队列已满时直接拒绝
+        if not ScriptTaskService._dispatch_execution(execution.id):
+            execution.status = 'rejected'
+            execution.error_message = "执行队列已满，请求被拒绝"
+            execution.finished_at = timezone.now()
+            execution.save(update_fields=['status', 'error_message', 'finished_at'])
+            return None, "执行队列已满，请稍后重试"
+
+        return execution, None
+
+    @staticmethod
+    def _execute_from_cache(script, parameters, cache_key):
+        """有效期内存在相同缓存键的成功执行时直接复用其输出，不启动进程；返回新建的命中记录"""
+        now = timezone.now()
+        valid_after = now - timedelta(seconds=script.cache_ttl)
+        if script.cache_invalidated_at and script.cache_invalidated_at > valid_after:
+            valid_after = script.cache_invalidated_at
+
+        source = ScriptExecution.objects.filter(
+            script_task=script,
+            cache_key=cache_key,
+            status='success',
+            cache_hit=False,
+            finished_at__gt=valid_after
+        ).order_by('-finished_at').first()
+        if not source:
+            ScriptTask.objects.filter(id=script.id).update(cache_misses=F('cache_misses') + 1)
+            return None
+
         execution = ScriptExecution.objects.create(
             script_task=script,
-            status='running',
-            input_parameters=parameters or {}
+            status='success',
+            input_parameters=parameters,
+            cache_key=cache_key,
+            cache_hit=True,
+            cached_from=source,
+            output=source.output,
+            output_size=source.output_size,
+            output_checksum=source.output_checksum,
+            output_blob=source.output_blob,
+            output_ref_id=source.output_ref_id,
+            result=source.result,
+            result_error=source.result_error,
+            error_message=source.error_message,
+            execution_time=0,
+            finished_at=now
         )
+        add_output_refs([source.output_ref_id])
+        ScriptTask.objects.filter(id=script.id).update(cache_hits=F('cache_hits') + 1)
+        return execution
+
+    @staticmethod
+    def invalidate_cache(script_id):
+        """使脚本已有的缓存结果全部失效"""
+        script = ScriptTaskService.get_script_by_id(script_id)
+        if not script:
+            return None, "脚本不存在"
+        script.cache_invalidated_at = timezone.now()
+        script.save(update_fields=['cache_invalidated_at', 'updated_at'])
+        return script, None
 
-        # 异步执行脚本
-        thread = threading.Thread(
-            target=ScriptTaskService._execute_script_async,
-            args=(script, execution)
+    @staticmethod
+    def get_cache_stats(script):
+        """脚本结果缓存的命中统计和当前有效的缓存条目数"""
+        valid_after = timezone.now() - timedelta(seconds=script.cache_ttl)
+        if script.cache_invalidated_at and script.cache_invalidated_at > valid_after:
+            valid_after = script.cache_invalidated_at
+        lookups = script.cache_hits + script.cache_misses
+        return {
+            'cache_enabled': script.cache_enabled,
+            'cache_ttl': script.cache_ttl,
+            'hits': script.cache_hits,
+            'misses': script.cache_misses,
+            'hit_rate': round(script.cache_hits / lookups * 100, 1) if lookups else 0,
+            'entries': script.executions.filter(
+                status='success',
+                cache_hit=False,
+                finished_at__gt=valid_after
+            ).exclude(cache_key='').values('cache_key').distinct().count(),
+            'invalidated_at': script.cache_invalidated_at,
+        }
+
+    @staticmethod
+    def _dispatch_execution(execution_id):
+        """将排队中的执行记录交给执行后端，返回是否成功入队"""
+        if settings.SCRIPT_EXECUTION_BACKEND == 'database':
+            # 数据库队列模式下由 runworkers 进程认领执行
+            return True
+        return ScriptTaskService.get_dispatcher().submit(execution_id)
+
+    @staticmethod
+    def get_dispatcher():
+        """进程内执行调度器，按 SCRIPT_EXECUTOR_ENGINE 绑定线程池或 asyncio 执行引擎"""
+        if settings.SCRIPT_EXECUTOR_ENGINE == 'asyncio':
+            engine = get_async_engine()
+            return get_execution_dispatcher(
+                engine, engine.max_concurrency, ScriptTaskService._execute_script_coroutine, is_async=True
+            )
+        pool = get_execution_pool()
+        return get_execution_dispatcher(pool, pool.max_workers, ScriptTaskService._execute_script_async)
+
+    @staticmethod
+    def _execute_script_async(execution_id):
+        """异步执行脚本（在执行线程池中运行）"""
+        if ScriptTaskService._start_execution(execution_id):
+            ScriptTaskService.run_execution(execution_id)
+
+    @staticmethod
+    async def _execute_script_coroutine(execution_id):
+        """异步执行脚本（在 asyncio 执行引擎中运行）"""
+        if await run_blocking(ScriptTaskService._start_execution, execution_id):
+            await ScriptTaskService.run_execution_async(execution_id)
+
+    @staticmethod
+    def _start_execution(execution_id):
+        """queued 转为 running，同时记录排队时间"""
+        now = timezone.now()
+        updated = ScriptExecution.objects.filter(id=execution_id, status='queued').update(status='running')
+        if updated:
+            ScriptTaskService.record_queue_wait([execution_id], now)
+        return updated
+
+    @staticmethod
+    def record_queue_wait(execution_ids, started_at):
+        """
+        写入从进入队列到开始执行的时间，没有进入队列时间的历史记录按创建时间计算；
+        各记录的等待时间合并为一条 CASE 更新
+        """
+        waits = [
+            When(id=execution_id, then=Value(max((started_at - (queued_at or created_at)).total_seconds(), 0)))
+            for execution_id, queued_at, created_at in ScriptExecution.objects.filter(
+                id__in=execution_ids
+            ).values_list('id', 'queued_at', 'created_at')
+        ]
+        if waits:
+            ScriptExecution.objects.filter(id__in=execution_ids).update(
+                queue_wait_time=Case(*waits, default=F('queue_wait_time'), output_field=FloatField())
+            )
+
+    @staticmethod
+    def get_executor_class():
+        """按 SCRIPT_EXECUTOR_ENGINE 选择执行器"""
+        if settings.SCRIPT_EXECUTOR_ENGINE == 'asyncio':
+            return AsyncScriptExecutor
+        return ScriptExecutor
+
+    @staticmethod
+    def run_execution(execution_id):
+        """执行已进入 running 状态的记录并登记结果，返回待写回的结果"""
+        execution, executor = ScriptTaskService._prepare_execution(
+            execution_id, ScriptTaskService.get_executor_class()
         )
-        thread.daemon = True
-        thread.start()
+        try:
+            result = executor.execute(execution.input_parameters)
+        except Exception as e:
+            result = e
+        return ScriptTaskService._complete_execution(execution, executor, result)
 
-        return execution, None
+    @staticmethod
+    async def run_execution_async(execution_id):
+        """run_execution 的协程版本：脚本由事件循环监管，数据库读写在线程池中完成"""
+        execution, executor = await run_blocking(
+            ScriptTaskService._prepare_execution, execution_id, ScriptTaskService.get_executor_class()
+        )
+        try:
+            result = await executor.execute_async(execution.input_parameters)
+        except Exception as e:
+            result = e
+        return await run_blocking(ScriptTaskService._complete_execution, execution, executor, result)
+
+    @staticmethod
+    def _prepare_execution(execution_id, executor_class):
+        execution = ScriptExecution.objects.select_related('script_task').get(id=execution_id)
+        if execution.attempts > 1:
+            # 重新认领的记录需清掉上一次残留的输出分块
+            ScriptOutputChunk.objects.filter(execution_id=execution.id).delete()
+        executor = executor_class(
+            execution.script_task,
+            output_recorder=ExecutionOutputRecorder(execution.id),
+            execution_id=execution.id
+        )
+        return execution, executor
+
+    @staticmethod
+    def _complete_execution(execution, executor, returned):
+        """
+        登记执行结果，returned 为执行器返回值或执行时抛出的异常；结果由写回器批量写入
+        返回: 待写回的结果（ExecutionCompletion）
+        """
+        script = execution.script_task
+        if isinstance(returned, Exception):
+            logger.error(f"脚本执行异常: {returned}")
+            return ScriptTaskService._finish_execution(
+                execution,
+                record_latency=True,
+                followups=True,
+                status='failed',
+                error_message=str(returned)
+            )
+        success, output, error, exec_time = returned
+
+        if executor.outcome == 'cancelled':
+            # 状态已由取消请求写入，这里只补充已产生的输出
+            return ScriptTaskService._finish_execution(
+                execution,
+                expected_status='cancelled',
+                output=output,
+                execution_time=exec_time,
+                **executor.get_resource_usage()
+            )
+
+        # 更新执行记录
+        if executor.outcome == 'timeout':
+            status = 'timeout'
+        else:
+            status = 'success' if success else 'failed'
+        result, result_error = None, ''
+        if status == 'success':
+            # 结果只在执行结束时解析一次，之后按字段查询无需再解析输出
+            result, result_error = parse_result(script.return_type, output, settings.SCRIPT_RESULT_MAX_SIZE)
+        return ScriptTaskService._finish_execution(
+            execution,
+            count_execution=True,
+            record_latency=True,
+            followups=True,
+            status=status,
+            output=output,
+            error_message=error,
+            execution_time=exec_time,
+            result=result,
+            result_error=result_error or '',
+            **executor.get_resource_usage()
+        )
+
+    @staticmethod
+    def get_completion_writer():
+        """进程内执行结果写回器"""
+        return get_completion_writer(ScriptTaskService._after_completions)
+
+    @staticmethod
+    def _after_completions(completions):
+        """
+        一批执行结果写回后：按脚本合并执行次数和最近执行时间为一条原子更新，
+        合并耗时统计，每个批次和工作流运行只调度一次后续执行
+        """
+        now = timezone.now()
+        counts = {}
+        for completion in completions:
+            if completion.count_execution:
+                script_id = completion.execution.script_task_id
+                counts[script_id] = counts.get(script_id, 0) + 1
+        for script_id, count in counts.items():
+            ScriptTask.objects.filter(id=script_id).update(
+                execution_count=F('execution_count') + count,
+                last_executed_at=Greatest(Coalesce('last_executed_at', Value(now)), Value(now)),
+                updated_at=now
+            )
+
+        ScriptLatencyService.record_many([
+            (
+                completion.execution.script_task_id,
+                completion.fields['status'],
+                completion.fields.get('execution_time'),
+                completion.fields.get('finished_at')
+            )
+            for completion in completions if completion.record_latency
+        ])
+
+        batch_ids, run_ids = set(), set()
+        for completion in completions:
+            if completion.followups:
+                batch_ids.add(completion.execution.batch_id)
+                run_ids.add(completion.execution.workflow_run_id)
+        for batch_id in batch_ids - {None}:
+            ScriptTaskService.dispatch_followups(batch_id=batch_id)
+        for run_id in run_ids - {None}:
+            ScriptTaskService.dispatch_followups(workflow_run_id=run_id)
+
+    @staticmethod
+    def dispatch_followups(batch_id=None, workflow_run_id=None):
+        """执行结束后调度同一批次或同一工作流运行中的后续执行"""
+        if batch_id:
+            ScriptBatchService.dispatch_batch(batch_id)
+        if workflow_run_id:
+            ScriptWorkflowService.advance_run(workflow_run_id)
+
+    @staticmethod
+    def _dispatch_pending(execution_ids, retry, *args):
+        """把已提升为 queued 的执行交给执行后端；队列已满的退回 pending，稍后调用 retry(*args) 重试"""
+        rejected = [
+            execution_id for execution_id in execution_ids
+            if not ScriptTaskService._dispatch_execution(execution_id)
+        ]
+        if rejected:
+            ScriptExecution.objects.filter(id__in=rejected, status='queued').update(status='pending')
+            timer = threading.Timer(
+                ScriptTaskService.DISPATCH_RETRY_DELAY,
+                ScriptTaskService._retry_dispatch,
+                args=(retry, args)
+            )
+            timer.daemon = True
+            timer.start()
 
     @staticmethod
-    def _execute_script_async(script, execution):
-        """异步执行脚本"""
+    def _retry_dispatch(retry, args):
         try:
-            executor = ScriptExecutor(script)
-            success, output, error, exec_time = executor.execute(execution.input_parameters)
-
-            # 更新执行记录
-            execution.status = 'success' if success else 'failed'
-            execution.output = output
-            execution.error_message = error
-            execution.execution_time = exec_time
-            execution.finished_at = timezone.now()
-            execution.save()
+            retry(*args)
+        finally:
+            connections.close_all()
 
-            # 更新脚本任务统计
-            script.last_executed_at = timezone.now()
-            script.execution_count += 1
-            script.save()
+    @staticmethod
+    def _finish_execution(execution, expected_status='running', count_execution=False, record_latency=False,
+                          followups=False, **fields):
+        """登记执行结果，写回时仅当记录仍由当前执行者持有时生效；返回待写回的结果"""
+        expected_statuses = (expected_status,)
+        if expected_status == 'running':
+            fields['finished_at'] = timezone.now()
+            # 看门狗可能已先把记录标记为超时，执行器的实际结果（输出、资源用量）仍需写回
+            expected_statuses = ('running', 'timeout')
+        if 'output' in fields:
+            fields.update(prepare_output_fields(execution.id, fields['output']))
+        return ScriptTaskService.get_completion_writer().submit(ExecutionCompletion(
+            execution,
+            expected_statuses,
+            fields,
+            count_execution=count_execution,
+            record_latency=record_latency,
+            followups=followups
+        ))
 
-        except Exception as e:
-            logger.error(f"脚本执行异常: {e}")
-            execution.status = 'failed'
-            execution.error_message = str(e)
-            execution.finished_at = timezone.now()
-            execution.save()
+
+class ScriptBatchService:
+    """脚本批量执行业务逻辑"""
+
+    @staticmethod
+    def get_batch_queryset():
+        """批次查询集，附带按状态汇总的执行数量"""
+        return ScriptBatch.objects.filter(is_deleted=False).select_related(
+            'script_task', 'project_space'
+        ).annotate(
+            pending_count=Count('executions', filter=Q(executions__status__in=['pending', 'queued'])),
+            running_count=Count('executions', filter=Q(executions__status='running')),
+            success_count=Count('executions', filter=Q(executions__status='success')),
+            failed_count=Count(
+                'executions',
+                filter=Q(executions__status__in=['failed', 'timeout', 'cancelled', 'rejected'])
+            ),
+        )
+
+    @staticmethod
+    def get_all_batches(script_id=None, status=None):
+        """获取批次列表"""
+        queryset = ScriptBatchService.get_batch_queryset()
+        if script_id:
+            queryset = queryset.filter(script_task_id=script_id)
+        if status:
+            queryset = queryset.filter(status=status)
+        return queryset.order_by('-created_at')
+
+    @staticmethod
+    def get_batch_by_id(batch_id):
+        """根据ID获取批次"""
+        return ScriptBatchService.get_batch_queryset().filter(id=batch_id).first()
+
+    @staticmethod
+    def build_vehicle_parameters(vehicle):
+        """车型相关的执行参数"""
+        return {
+            'vehicle_id': str(vehicle.id),
+            'vehicle_code': vehicle.code,
+            'vehicle_name': vehicle.name,
+            'pipelines': vehicle.pipelines,
+        }
+
+    @staticmethod
+    def execute_batch(script_id, data):
+        """按项目空间下的车型批量执行脚本"""
+        serializer = ScriptBatchExecuteSerializer(data=data)
+        if not serializer.is_valid():
+            return None, serializer.errors
+
+        script = ScriptTaskService.get_script_by_id(script_id)
+        if not script:
+            return None, "脚本不存在"
+        if script.status != 'active':
+            return None, "脚本未启用，无法执行"
+
+        project = ProjectSpaceService.get_project_by_id(serializer.validated_data['project_id'])
+        if not project:
+            return None, "项目空间不存在"
+        if not project.is_active:
+            return None, "项目空间未启用，无法执行"
+
+        vehicles = list(project.vehicles.filter(is_deleted=False).order_by('code'))
+        if not vehicles:
+            return None, "项目空间下没有车型"
+
+        parameters = serializer.validated_data['parameters']
+        with transaction.atomic():
+            batch = ScriptBatch.objects.create(
+                script_task=script,
+                project_space=project,
+                parameters=parameters,
+                concurrency=serializer.validated_data['concurrency'],
+                total_count=len(vehicles)
+            )
+            # 一次批量插入全部执行记录，按并发上限逐步调度
+            ScriptExecution.objects.bulk_create([
+                ScriptExecution(
+                    script_task=script,
+                    batch=batch,
+                    vehicle=vehicle,
+                    status='pending',
+                    priority=serializer.validated_data['priority'],
+                    input_parameters={**parameters, **ScriptBatchService.build_vehicle_parameters(vehicle)}
+                )
+                for vehicle in vehicles
+            ], batch_size=500)
+
+        ScriptBatchService.dispatch_batch(batch.id)
+        return ScriptBatchService.get_batch_by_id(batch.id), None
+
+    @staticmethod
+    def dispatch_batch(batch_id):
+        """在并发上限内把等待调度的执行记录交给执行后端，全部结束时关闭批次"""
+        with transaction.atomic():
+            # 先写后读锁住批次行，多个执行同时结束时串行调度
+            if not ScriptBatch.objects.filter(id=batch_id, status='running').update(updated_at=timezone.now()):
+                return
+            batch = ScriptBatch.objects.get(id=batch_id)
+            active = batch.executions.filter(status__in=['queued', 'running']).count()
+            execution_ids = list(
+                batch.executions.filter(status='pending').order_by('created_at').values_list('id', flat=True)[
+                    :max(batch.concurrency - active, 0)
+                ]
+            )
+            if execution_ids:
+                ScriptExecution.objects.filter(id__in=execution_ids, status='pending').update(
+                    status='queued',
+                    queued_at=timezone.now()
+                )
+            elif not active and not batch.executions.filter(status='pending').exists():
+                batch.status = 'finished'
+                batch.finished_at = timezone.now()
+                batch.save(update_fields=['status', 'finished_at', 'updated_at'])
+                return
+
+        ScriptTaskService._dispatch_pending(execution_ids, ScriptBatchService.dispatch_batch, batch_id)
+
+
+class ScriptWorkflowService:
+    """脚本工作流业务逻辑"""
+
+    # 上游处于这些状态时，下游步骤不再执行
+    UNSUCCESSFUL_STATUSES = ('failed', 'timeout', 'cancelled', 'rejected')
+
+    @staticmethod
+    def get_all_workflows(name=None):
+        """获取工作流列表"""
+        queryset = ScriptWorkflow.objects.filter(is_deleted=False)
+        if name:
+            queryset = queryset.filter(name__icontains=name)
+        return queryset.order_by('-created_at')
+
+    @staticmethod
+    def get_workflow_by_id(workflow_id):
+        """根据ID获取工作流"""
+        try:
+            return ScriptWorkflow.objects.get(id=workflow_id, is_deleted=False)
+        except ObjectDoesNotExist:
+            return None
+
+    @staticmethod
+    @transaction.atomic
+    def create_workflow(data):
+        """创建工作流及其步骤"""
+        serializer = ScriptWorkflowWriteSerializer(data=data)
+        if serializer.is_valid():
+            return serializer.save(), None
+        return None, serializer.errors
+
+    @staticmethod
+    @transaction.atomic
+    def update_workflow(workflow_id, data):
+        """更新工作流，提供 steps 时整体替换步骤，不影响已开始的运行"""
+        workflow = ScriptWorkflowService.get_workflow_by_id(workflow_id)
+        if not workflow:
+            return None, "工作流不存在"
+        serializer = ScriptWorkflowWriteSerializer(workflow, data=data, partial=True)
+        if serializer.is_valid():
+            return serializer.save(), None
+        return None, serializer.errors
+
+    @staticmethod
+    @transaction.atomic
+    def delete_workflow(workflow_id):
+        """删除工作流（软删除）"""
+        workflow = ScriptWorkflowService.get_workflow_by_id(workflow_id)
+        if not workflow:
+            return False, "工作流不存在"
+        if workflow.runs.filter(status='running').exists():
+            return False, "工作流正在运行中，无法删除"
+        workflow.is_deleted = True
+        workflow.save()
+        return True, "删除成功"
+
+    @staticmethod
+    def get_all_runs(workflow_id=None, status=None):
+        """获取工作流运行记录列表"""
+        queryset = ScriptWorkflowRun.objects.filter(is_deleted=False).select_related(
+            'workflow'
+        ).prefetch_related('executions')
+        if workflow_id:
+            queryset = queryset.filter(workflow_id=workflow_id)
+        if status:
+            queryset = queryset.filter(status=status)
+        return queryset.order_by('-created_at')
+
+    @staticmethod
+    def get_run_by_id(run_id):
+        """根据ID获取工作流运行记录"""
+        return ScriptWorkflowService.get_all_runs().filter(id=run_id).first()
+
+    @staticmethod
+    def run_workflow(workflow_id, data):
+        """启动一次工作流运行：每个步骤先建一条等待调度的执行记录，依赖满足后依次交给执行后端"""
+        serializer = ScriptWorkflowRunCreateSerializer(data=data)
+        if not serializer.is_valid():
+            return None, serializer.errors
+
+        workflow = ScriptWorkflowService.get_workflow_by_id(workflow_id)
+        if not workflow:
+            return None, "工作流不存在"
+        definition = workflow.get_definition()
+        scripts = ScriptTask.objects.in_bulk([step['script_task'] for step in definition])
+        for step in definition:
+            script = scripts.get(uuid.UUID(step['script_task']))
+            if not script or script.is_deleted:
+                return None, f"步骤 {step['key']} 的脚本不存在"
+            if script.status != 'active':
+                return None, f"步骤 {step['key']} 的脚本未启用，无法执行"
+
+        with transaction.atomic():
+            run = ScriptWorkflowRun.objects.create(
+                workflow=workflow,
+                parameters=serializer.validated_data['parameters'],
+                definition=definition,
+                concurrency=workflow.concurrency
+            )
+            ScriptExecution.objects.bulk_create([
+                ScriptExecution(
+                    script_task=scripts[uuid.UUID(step['script_task'])],
+                    workflow_run=run,
+                    workflow_step=step['key'],
+                    status='pending'
+                )
+                for step in definition
+            ])
+
+        ScriptWorkflowService.advance_run(run.id)
+        return ScriptWorkflowService.get_run_by_id(run.id), None
+
+    @staticmethod
+    def advance_run(run_id):
+        """
+        推进工作流运行：依赖全部成功的步骤在并发上限内交给执行后端，
+        上游未成功的步骤级联跳过，全部结束时汇总状态和关键路径
+        """
+        with transaction.atomic():
+            # 先写后读锁住运行记录，多个步骤同时结束时串行推进
+            now = timezone.now()
+            if not ScriptWorkflowRun.objects.filter(id=run_id, status='running').update(updated_at=now):
+                return
+            run = ScriptWorkflowRun.objects.get(id=run_id)
+            executions = {
+                execution.workflow_step: execution for execution in run.executions.select_related('output_ref')
+            }
+            steps = run.definition
+
+            blocked = {
+                key for key, execution in executions.items()
+                if execution.status in ScriptWorkflowService.UNSUCCESSFUL_STATUSES
+            }
+            skipped = []
+            changed = True
+            while changed:
+                changed = False
+                for step in steps:
+                    execution = executions[step['key']]
+                    if execution.status == 'pending' and blocked.intersection(step['depends_on']):
+                        execution.status = 'cancelled'
+                        blocked.add(step['key'])
+                        skipped.append(execution.id)
+                        changed = True
+            if skipped:
+                ScriptExecution.objects.filter(id__in=skipped, status='pending').update(
+                    status='cancelled',
+                    error_message="上游步骤未成功，已跳过",
+                    finished_at=now
+                )
+
+            active = sum(1 for execution in executions.values() if execution.status in ('queued', 'running'))
+            ready = [
+                step for step in steps
+                if executions[step['key']].status == 'pending'
+                and all(executions[key].status == 'success' for key in step['depends_on'])
+            ][:max(run.concurrency - active, 0)]
+            for step in ready:
+                ScriptExecution.objects.filter(id=executions[step['key']].id, status='pending').update(
+                    status='queued',
+                    queued_at=now,
+                    input_parameters=ScriptWorkflowService._step_parameters(run, step, executions)
+                )
+
+            if not ready and not active and not any(e.status == 'pending' for e in executions.values()):
+                ScriptWorkflowService._finish_run(run, executions)
+                return
+
+        ScriptTaskService._dispatch_pending(
+            [executions[step['key']].id for step in ready],
+            ScriptWorkflowService.advance_run,
+            run_id
+        )
+
+    @staticmethod
+    def _step_parameters(run, step, executions):
+        """步骤参数：运行参数 < 步骤参数 < 直接上游的输出（<步骤标识>_output）"""
+        parameters = {**run.parameters, **step['parameters']}
+        for key in step['depends_on']:
+            parameters[f'{key}_output'] = (executions[key].get_output() or '').strip()
+        return parameters
+
+    @staticmethod
+    def _finish_run(run, executions):
+        """汇总运行结果，计算关键路径（按依赖链累加步骤耗时的最长路径）"""
+        durations = {key: execution.execution_time or 0 for key, execution in executions.items()}
+        depends_on = {step['key']: step['depends_on'] for step in run.definition}
+        finish = {}
+
+        def longest(key):
+            if key not in finish:
+                upstream = max(depends_on[key], key=longest, default=None)
+                finish[key] = (durations[key] + (finish[upstream][0] if upstream else 0), upstream)
+            return finish[key][0]
+
+        path = []
+        key = max(depends_on, key=longest, default=None)
+        critical_path_time = finish[key][0] if key else 0
+        while key:
+            path.append(key)
+            key = finish[key][1]
+
+        run.status = 'success' if all(e.status == 'success' for e in executions.values()) else 'failed'
+        run.critical_path = path[::-1]
+        run.critical_path_time = critical_path_time
+        run.finished_at = timezone.now()
+        run.save(update_fields=['status', 'critical_path', 'critical_path_time', 'finished_at', 'updated_at'])
+
+
+class ScriptScheduleService:
+    """脚本定时计划业务逻辑"""
+
+    @staticmethod
+    def get_all_schedules(script_id=None, is_active=None):
+        """获取定时计划列表"""
+        queryset = ScriptSchedule.objects.filter(is_deleted=False).select_related('script_task')
+        if script_id:
+            queryset = queryset.filter(script_task_id=script_id)
+        if is_active is not None:
+            queryset = queryset.filter(is_active=is_active)
+        return queryset.order_by('-created_at')
+
+    @staticmethod
+    def get_schedule_by_id(schedule_id):
+        """根据ID获取定时计划"""
+        try:
+            return ScriptSchedule.objects.select_related('script_task').get(id=schedule_id, is_deleted=False)
+        except ObjectDoesNotExist:
+            return None
+
+    @staticmethod
+    @transaction.atomic
+    def create_schedule(data):
+        """创建定时计划"""
+        serializer = ScriptScheduleWriteSerializer(data=data)
+        if not serializer.is_valid():
+            return None, serializer.errors
+        schedule = serializer.save()
+        ScriptScheduleService._reset_next_run(schedule)
+        return schedule, None
+
+    @staticmethod
+    @transaction.atomic
+    def update_schedule(schedule_id, data):
+        """更新定时计划，触发时间从当前时间重新计算"""
+        schedule = ScriptScheduleService.get_schedule_by_id(schedule_id)
+        if not schedule:
+            return None, "定时计划不存在"
+
+        serializer = ScriptScheduleWriteSerializer(schedule, data=data, partial=True)
+        if not serializer.is_valid():
+            return None, serializer.errors
+        schedule = serializer.save()
+        ScriptScheduleService._reset_next_run(schedule)
+        return schedule, None
+
+    @staticmethod
+    @transaction.atomic
+    def delete_schedule(schedule_id):
+        """删除定时计划（软删除）"""
+        schedule = ScriptScheduleService.get_schedule_by_id(schedule_id)
+        if not schedule:
+            return False, "定时计划不存在"
+        schedule.is_deleted = True
+        schedule.is_active = False
+        schedule.next_run_at = None
+        schedule.save()
+        return True, "删除成功"
+
+    @staticmethod
+    def _reset_next_run(schedule):
+        # 保存会更新 updated_at，调度进程增量同步时据此重新排期
+        schedule.next_run_at = schedule.get_next_run_after(timezone.now()) if schedule.is_active else None
+        schedule.save(update_fields=['next_run_at', 'updated_at'])
+
+
+class ScriptLatencyService:
+    """脚本执行耗时统计业务逻辑"""
+
+    STATUS_COUNTERS = {
+        'success': 'success_count',
+        'failed': 'failure_count',
+        'timeout': 'timeout_count',
+    }
+
+    @staticmethod
+    def record(script_id, status, execution_time, finished_at):
+        """执行结束后更新所在小时窗口的计数和耗时直方图，统计失败不影响执行结果"""
+        ScriptLatencyService.record_many([(script_id, status, execution_time, finished_at)])
+
+    @staticmethod
+    def record_many(samples):
+        """
+        批量记录执行耗时，samples 为 (脚本ID, 状态, 耗时, 结束时间) 列表；
+        同一脚本同一窗口的样本合并为一次计数更新和一次直方图合并
+        """
+        groups = {}
+        for script_id, status, execution_time, finished_at in samples:
+            counter = ScriptLatencyService.STATUS_COUNTERS.get(status)
+            if counter is None:
+                continue
+            group = groups.setdefault(
+                (script_id, window_start(finished_at or timezone.now())), {'counts': {}, 'times': []}
+            )
+            group['counts'][counter] = group['counts'].get(counter, 0) + 1
+            if execution_time is not None:
+                group['times'].append(execution_time)
+
+        for (script_id, window), group in groups.items():
+            try:
+                stat, _ = ScriptLatencyStat.objects.get_or_create(script_task_id=script_id, window_start=window)
+                with transaction.atomic():
+                    # 先写后读：更新计数时取得行锁，同一窗口并发写入的样本依次合并直方图
+                    ScriptLatencyStat.objects.filter(id=stat.id).update(
+                        updated_at=timezone.now(),
+                        **{counter: F(counter) + count for counter, count in group['counts'].items()}
+                    )
+                    times = group['times']
+                    if not times:
+                        continue
+                    stat = ScriptLatencyStat.objects.get(id=stat.id)
+                    for execution_time in times:
+                        add_sample(stat.histogram, execution_time)
+                    stat.total_time += sum(times)
+                    stat.min_time = min(times) if stat.min_time is None else min(stat.min_time, *times)
+                    stat.max_time = max(times) if stat.max_time is None else max(stat.max_time, *times)
+                    stat.save(update_fields=['histogram', 'total_time', 'min_time', 'max_time', 'updated_at'])
+            except Exception:
+                logger.exception(f"更新脚本 {script_id} 耗时统计失败")
+
+    @staticmethod
+    def summarize(stats):
+        """合并多个窗口的统计，分位数由合并后的直方图计算"""
+        success = sum(stat['success_count'] for stat in stats)
+        failure = sum(stat['failure_count'] for stat in stats)
+        timeout = sum(stat['timeout_count'] for stat in stats)
+        total = success + failure + timeout
+        histogram = merge_histograms(stat['histogram'] for stat in stats)
+        timed = sum(histogram.values())
+        min_times = [stat['min_time'] for stat in stats if stat['min_time'] is not None]
+        max_times = [stat['max_time'] for stat in stats if stat['max_time'] is not None]
+        return {
+            'total_count': total,
+            'success_count': success,
+            'failure_count': failure,
+            'timeout_count': timeout,
+            'success_rate': round(success / total * 100, 1) if total else 0,
+            'avg_time': round(sum(stat['total_time'] for stat in stats) / timed, 4) if timed else None,
+            'min_time': round(min(min_times), 4) if min_times else None,
+            'max_time': round(max(max_times), 4) if max_times else None,
+            **compute_percentiles(histogram),
+        }
+
+    @staticmethod
+    def get_stats(range_name, script_id=None):
+        """
+        读取当前周期和上一周期的窗口统计，行数只与时间范围有关
+        返回: (起始窗口, 统计行列表)，时间范围无效时返回 (None, 错误信息)
+        """
+        bounds = resolve_range(range_name)
+        if bounds is None:
+            return None, "时间范围无效"
+        start, previous_start, _ = bounds
+        queryset = ScriptLatencyStat.objects.filter(window_start__gte=previous_start)
+        if script_id:
+            queryset = queryset.filter(script_task_id=script_id)
+        else:
+            queryset = queryset.filter(script_task__is_deleted=False)
+        stats = list(queryset.values(
+            'script_task_id', 'window_start', 'success_count', 'failure_count', 'timeout_count',
+            'total_time', 'min_time', 'max_time', 'histogram'
+        ))
+        return start, stats
+
+    @staticmethod
+    def get_script_latency(script, range_name='24h', series=False):
+        """获取脚本在时间范围内的耗时分位数，并与上一周期对比"""
+        start, stats = ScriptLatencyService.get_stats(range_name, script.id)
+        if start is None:
+            return None, stats
+        current = [stat for stat in stats if stat['window_start'] >= start]
+        previous = [stat for stat in stats if stat['window_start'] < start]
+        data = {
+            'script_id': script.id,
+            'range': range_name,
+            'since': start,
+            'current': ScriptLatencyService.summarize(current),
+            'previous': ScriptLatencyService.summarize(previous),
+            'queue_wait': ScriptLatencyService.get_queue_wait(script.id, start),
+        }
+        if series:
+            data['windows'] = [
+                {'window_start': stat['window_start'], **ScriptLatencyService.summarize([stat])}
+                for stat in current
+            ]
+        return data, None
+
+    @staticmethod
+    def get_queue_wait(script_id, since):
+        """按优先级统计脚本执行的排队时间"""
+        rows = ScriptExecution.objects.filter(
+            script_task_id=script_id,
+            started_at__gte=since,
+            queue_wait_time__isnull=False
+        ).values('priority').annotate(
+            count=Count('id'),
+            avg_wait=Avg('queue_wait_time'),
+            max_wait=Max('queue_wait_time')
+        ).order_by('-priority')
+        return [
+            {
+                'priority': row['priority'],
+                'count': row['count'],
+                'avg_wait': round(row['avg_wait'], 4),
+                'max_wait': round(row['max_wait'], 4),
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def get_latency_ranking(range_name='7d', limit=20):
+        """按 p95 耗时相对上一周期的变化从大到小列出脚本，用于发现变慢的脚本"""
+        start, stats = ScriptLatencyService.get_stats(range_name)
+        if start is None:
+            return None, stats
+        grouped = {}
+        for stat in stats:
+            periods = grouped.setdefault(stat['script_task_id'], ([], []))
+            periods[0 if stat['window_start'] >= start else 1].append(stat)
+
+        names = dict(ScriptTask.objects.filter(id__in=grouped).values_list('id', 'name'))
+        ranking = []
+        for script_id, (current, previous) in grouped.items():
+            if not current:
+                continue
+            current_summary = ScriptLatencyService.summarize(current)
+            previous_p95 = ScriptLatencyService.summarize(previous)['p95'] if previous else None
+            p95 = current_summary['p95']
+            ranking.append({
+                'script_id': script_id,
+                'script_name': names.get(script_id),
+                **current_summary,
+                'previous_p95': previous_p95,
+                'p95_change': round((p95 - previous_p95) / previous_p95 * 100, 1) if p95 and previous_p95 else None,
+            })
+        ranking.sort(key=lambda item: (item['p95_change'] is not None, item['p95_change'] or 0, item['p95'] or 0),
+                     reverse=True)
+        return {'range': range_name, 'since': start, 'scripts': ranking[:limit]}, None
 
 
 class ScriptExecutionService:
     """脚本执行记录业务逻辑"""
 
+    @staticmethod
+    def get_pool_stats():
+        """获取执行后端状态"""
+        if settings.SCRIPT_EXECUTION_BACKEND == 'database':
+            running = ScriptExecution.objects.filter(status='running', lease_expires_at__isnull=False)
+            return {
+                'backend': 'database',
+                'queue_depth': ScriptExecution.objects.filter(status='queued').count(),
+                'queue_depth_by_priority': {
+                    str(row['priority']): row['queued_count']
+                    for row in ScriptExecution.objects.filter(status='queued').values('priority').annotate(
+                        queued_count=Count('id')
+                    ).order_by()
+                },
+                'running_count': running.count(),
+                'workers': list(
+                    running.values('worker_id').annotate(running_count=Count('id')).order_by('worker_id')
+                ),
+            }
+        if settings.SCRIPT_EXECUTOR_ENGINE == 'asyncio':
+            stats = get_async_engine().stats()
+        else:
+            stats = get_execution_pool().stats()
+        return {
+            'backend': 'thread',
+            'engine': settings.SCRIPT_EXECUTOR_ENGINE,
+            'thread_count': threading.active_count(),
+            **stats,
+            **ScriptTaskService.get_dispatcher().stats(),
+            **ScriptTaskService.get_completion_writer().stats()
+        }
 
+    @staticmethod
+    def get_rate_limit_stats(scope=None, limit=100):
+        """获取执行限流配置和各令牌桶的当前令牌数"""
+        return get_bucket_levels(scope=scope, limit=limit)
 
     @staticmethod
-    def get_all_executions(status=None):
-        """获取所有执行记录"""
+    def get_all_executions(status=None, batch_id=None, result_filters=None, search=None):
+        """
+        获取所有执行记录，result_filters 为 build_result_lookups 生成的结果字段查询条件，
+        search 为输出和错误信息的全文检索词
+        """
         queryset = ScriptExecution.objects.filter(
             script_task__is_deleted=False
-        ).select_related('script_task')
+        ).select_related('script_task', 'output_ref')
         
         if status:
             queryset = queryset.filter(status=status)
+        if batch_id:
+            queryset = queryset.filter(batch_id=batch_id)
+        if result_filters:
+            queryset = queryset.filter(**result_filters)
+        if search:
+            queryset = filter_by_search(queryset, search)
             
         return queryset.order_by('-started_at')
     
     @staticmethod
-    def get_executions_by_script(script_id, status=None):
+    def get_executions_by_script(script_id, status=None, result_filters=None, search=None):
         """获取脚本的执行记录"""
         queryset = ScriptExecution.objects.filter(
             script_task_id=script_id,
             script_task__is_deleted=False
-        )
+        ).select_related('output_ref')
         
         if status:
             queryset = queryset.filter(status=status)
+        if result_filters:
+            queryset = queryset.filter(**result_filters)
+        if search:
+            queryset = filter_by_search(queryset, search)
             
         return queryset.order_by('-started_at')
 
+    AGGREGATE_FUNCTIONS = {
+        'count': Count,
+        'sum': Sum,
+        'avg': Avg,
+        'min': Min,
+        'max': Max,
+    }
+
+    @staticmethod
+    def aggregate_results(script_id, params):
+        """
+        在数据库中按结果字段统计脚本的成功执行，不读取输出
+        params: field（结果字段路径）、func（count/sum/avg/min/max）、group_by（date 或结果字段路径）、
+                since/until（创建时间范围）以及 result.<路径> 查询条件
+        返回: (统计结果, 错误信息)
+        """
+        field = params.get('field', '')
+        func = params.get('func', 'sum')
+        group_by = params.get('group_by')
+        if not RESULT_PATH_PATTERN.match(field):
+            return None, "field 参数无效"
+        if func not in ScriptExecutionService.AGGREGATE_FUNCTIONS:
+            return None, "func 参数无效"
+        if group_by and group_by != 'date' and not RESULT_PATH_PATTERN.match(group_by):
+            return None, "group_by 参数无效"
+        result_filters, error = build_result_lookups(params)
+        if error:
+            return None, error
+
+        queryset = ScriptExecution.objects.filter(
+            script_task_id=script_id,
+            status='success',
+            **result_filters
+        )
+        for param, lookup in (('since', 'created_at__gte'), ('until', 'created_at__lt')):
+            if params.get(param):
+                moment = parse_datetime(params[param])
+                if moment is None:
+                    return None, f"{param} 参数无效"
+                queryset = queryset.filter(**{lookup: moment})
+
+        path = f"result__{field.replace('.', '__')}"
+        if func == 'count':
+            value = Count(KT(path))
+        else:
+            value = ScriptExecutionService.AGGREGATE_FUNCTIONS[func](Cast(KT(path), FloatField()))
+
+        if group_by == 'date':
+            queryset = queryset.annotate(group=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+        elif group_by:
+            queryset = queryset.annotate(group=KT(f"result__{group_by.replace('.', '__')}"))
+
+        try:
+            if group_by:
+                rows = list(
+                    queryset.values('group').annotate(value=value, executions=Count('id')).order_by('group')
+                )
+                data = {'groups': rows}
+            else:
+                data = queryset.aggregate(value=value, executions=Count('id'))
+        except DatabaseError as e:
+            logger.warning(f"统计执行结果失败: {e}")
+            return None, "统计失败，请确认统计字段为数值"
+        return {'field': field, 'func': func, 'group_by': group_by, **data}, None
+
     @staticmethod
     def get_execution_by_id(execution_id):
         """根据ID获取执行记录"""
         try:
-            return ScriptExecution.objects.get(id=execution_id)
+            return ScriptExecution.objects.select_related('output_ref').get(id=execution_id)
         except ObjectDoesNotExist:
-            return None
\ No newline at end of file
+            return None
+
+    @staticmethod
+    def cancel_execution(execution_id):
+        """取消尚未结束的执行：未开始的直接取消，执行中的结束其进程组"""
+        execution = ScriptExecutionService.get_execution_by_id(execution_id)
+        if not execution:
+            return None, "执行记录不存在"
+
+        cancelled = ScriptExecution.objects.filter(
+            id=execution.id,
+            status__in=['pending', 'queued', 'running']
+        ).update(
+            status='cancelled',
+            error_message="执行已取消",
+            finished_at=timezone.now()
+        )
+        if not cancelled:
+            return None, "执行已结束，无法取消"
+
+        # 由本进程执行的立即结束，其他进程中的由其看门狗发现后结束
+        get_execution_watchdog().cancel(execution.id)
+        ScriptTaskService.dispatch_followups(execution.batch_id, execution.workflow_run_id)
+        execution.refresh_from_db()
+        return execution, None
+
+    @staticmethod
+    def get_execution_output(execution, stream='stdout', offset=0, limit=1024 * 1024):
+        """增量读取执行输出，返回自 offset 之后的新内容"""
+        if stream not in OUTPUT_STREAMS:
+            return None, "输出流只能是 stdout 或 stderr"
+        if offset < 0 or limit <= 0:
+            return None, "offset 和 limit 参数无效"
+
+        # 命中缓存的记录没有自己的输出分块，读取缓存来源的
+        content, next_offset = read_output_chunks(execution.cached_from_id or execution.id, stream, offset, limit)
+        return {
+            'execution_id': execution.id,
+            'status': execution.status,
+            'finished': execution.status not in ('pending', 'queued', 'running'),
+            'stream': stream,
+            'offset': offset,
+            'next_offset': next_offset,
+            'content': content,
+        }, None
+
+    @staticmethod
+    def get_output_size(execution):
+        """获取完整标准输出的字节数"""
+        if execution.output_ref_id or execution.output_blob or execution.output_size:
+            return execution.output_size
+        return len((execution.output or '').encode('utf-8'))
+
+    @staticmethod
+    def iter_output(execution, start, end):
+        """按 [start, end) 字节范围读取完整标准输出，转存的输出只解压涉及的分块"""
+        blob = execution.output_ref.storage if execution.output_ref_id else execution.output_blob
+        if blob:
+            yield from iter_output_blob(blob, start, end)
+        elif start < end:
+            yield (execution.get_output() or '').encode('utf-8')[start:end]
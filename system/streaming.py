@@ -0,0 +1,239 @@
+import asyncio
+import json
+import weakref
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ScriptExecution, ScriptOutputChunk
+
+ACTIVE_STATUSES = ('pending', 'queued', 'running')
+
+
+class ExecutionOutputFeed:
+    """单个执行记录的输出轮询源，同一事件循环内的所有订阅者共享一次数据库轮询"""
+
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, hub, execution_id):
+        self.hub = hub
+        self.execution_id = execution_id
+        self.subscribers = set()
+        self._task = None
+
+    def subscribe(self, after_id: int) -> asyncio.Queue:
+        """订阅后续事件，新建轮询时从 after_id 之后开始读取分块"""
+        queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll(after_id))
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers:
+            if self._task and not self._task.done():
+                self._task.cancel()
+            self.hub.remove(self)
+
+    def _publish(self, event):
+        for queue in self.subscribers:
+            queue.put_nowait(event)
+
+    async def fetch_chunks(self, after_id):
+        queryset = ScriptOutputChunk.objects.filter(
+            execution_id=self.execution_id,
+            id__gt=after_id
+        ).order_by('id').values('id', 'stream', 'content')
+        return [chunk async for chunk in queryset]
+
+    async def _poll(self, last_id: int):
+        while True:
+            state = await get_execution_state(self.execution_id)
+            # 先读状态再读分块：状态已结束时，结束前写入的分块一定能在本轮读到
+            for chunk in await self.fetch_chunks(last_id):
+                last_id = chunk['id']
+                self._publish(('output', chunk))
+
+            if state is None or state['status'] not in ACTIVE_STATUSES:
+                self._publish(('status', state))
+                return
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+
+class ExecutionOutputHub:
+    """按事件循环维护各执行记录的输出轮询源"""
+
+    def __init__(self):
+        self._feeds = weakref.WeakKeyDictionary()
+
+    def get_feed(self, execution_id) -> ExecutionOutputFeed:
+        feeds = self._feeds.setdefault(asyncio.get_running_loop(), {})
+        feed = feeds.get(execution_id)
+        if feed is None:
+            feed = feeds[execution_id] = ExecutionOutputFeed(self, execution_id)
+        return feed
+
+    def remove(self, feed: ExecutionOutputFeed):
+        feeds = self._feeds.get(asyncio.get_running_loop(), {})
+        if feeds.get(feed.execution_id) is feed:
+            del feeds[feed.execution_id]
+
+
+output_hub = ExecutionOutputHub()
+
+# 批量查询状态时返回的精简字段，不含输出
+STATUS_FIELDS = (
+    'id', 'status', 'script_task_id', 'batch_id', 'workflow_run_id', 'cache_hit',
+    'execution_time', 'queued_at', 'started_at', 'finished_at'
+)
+STATUS_QUERY_CHUNK = 500
+
+
+async def get_execution_statuses(execution_ids):
+    """一次查询（按 STATUS_QUERY_CHUNK 分段）读取多个执行记录的精简状态，返回 {执行ID字符串: 状态字典}"""
+    execution_ids = list(execution_ids)
+    statuses = {}
+    for start in range(0, len(execution_ids), STATUS_QUERY_CHUNK):
+        queryset = ScriptExecution.objects.filter(
+            id__in=execution_ids[start:start + STATUS_QUERY_CHUNK]
+        ).values(*STATUS_FIELDS)
+        async for row in queryset:
+            statuses[str(row['id'])] = row
+    return statuses
+
+
+class ExecutionStatusWatcher:
+    """
+    等待一组执行记录中任意一个的状态发生变化（长轮询）
+    同一事件循环内的所有等待者共享一次数据库轮询：每 POLL_INTERVAL 秒按所有等待者关注的执行ID查询一次状态
+    """
+
+    POLL_INTERVAL = 0.5
+
+    def __init__(self):
+        self._waiters = {}
+        self._task = None
+
+    async def wait(self, baseline: dict, timeout: float) -> bool:
+        """
+        baseline 为 {执行ID字符串: 已知状态}（不存在的记录为 None）
+        返回: 是否在超时前有状态变化
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[future] = baseline
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        try:
+            await asyncio.wait_for(future, timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.pop(future, None)
+
+    async def _poll(self):
+        while self._waiters:
+            await asyncio.sleep(self.POLL_INTERVAL)
+            waiters = list(self._waiters.items())
+            if not waiters:
+                return
+            watched = set().union(*(baseline.keys() for _, baseline in waiters))
+            statuses = await get_execution_statuses(watched)
+            for future, baseline in waiters:
+                if future.done():
+                    continue
+                if any((statuses.get(key) or {}).get('status') != status for key, status in baseline.items()):
+                    future.set_result(True)
+
+
+_status_watchers = weakref.WeakKeyDictionary()
+
+
+def get_status_watcher() -> ExecutionStatusWatcher:
+    """获取当前事件循环的状态等待器"""
+    loop = asyncio.get_running_loop()
+    watcher = _status_watchers.get(loop)
+    if watcher is None:
+        watcher = _status_watchers[loop] = ExecutionStatusWatcher()
+    return watcher
+
+
+async def wait_execution_statuses(execution_ids, known=None, wait=0):
+    """
+    批量读取执行状态；wait 大于 0 时等待直到任意一个的状态与已知状态不同，或超时
+    known 为客户端上次得到的 {执行ID: 状态}，未提供的按本次请求开始时的状态比较；
+    已知状态与当前不同时立即返回，两次请求之间发生的变化不会漏掉
+    返回: (当前状态字典, 状态有变化的执行ID列表, 是否超时)
+    """
+    known = {str(key): value for key, value in (known or {}).items()}
+    statuses = await get_execution_statuses(execution_ids)
+    baseline = {
+        key: known.get(key, (statuses.get(key) or {}).get('status'))
+        for key in map(str, execution_ids)
+    }
+    changed = _changed_ids(baseline, statuses)
+    timed_out = False
+    if wait > 0 and not changed:
+        timed_out = not await get_status_watcher().wait(baseline, wait)
+        statuses = await get_execution_statuses(execution_ids)
+        changed = _changed_ids(baseline, statuses)
+    return statuses, changed, timed_out
+
+
+def _changed_ids(baseline, statuses):
+    return [key for key, status in baseline.items() if (statuses.get(key) or {}).get('status') != status]
+
+
+async def get_execution_state(execution_id):
+    """读取执行记录的状态字段"""
+    return await ScriptExecution.objects.filter(id=execution_id).values(
+        'status', 'execution_time', 'finished_at'
+    ).afirst()
+
+
+def format_sse(event: str, data, event_id=None) -> str:
+    """格式化为 Server-Sent Events 消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    payload = json.dumps(data, ensure_ascii=False, cls=DjangoJSONEncoder)
+    lines.append(f"data: {payload}")
+    return '\n'.join(lines) + '\n\n'
+
+
+async def stream_execution_events(execution_id, last_event_id=0, keepalive=15):
+    """
+    推送一次执行的全部输出和最终状态
+    last_event_id 为客户端断线重连时携带的最后一个分块ID
+    """
+    feed = output_hub.get_feed(execution_id)
+    sent_id = last_event_id
+    for chunk in await feed.fetch_chunks(sent_id):
+        sent_id = chunk['id']
+        yield format_sse('output', {'stream': chunk['stream'], 'content': chunk['content']}, chunk['id'])
+
+    queue = feed.subscribe(sent_id)
+    try:
+        # 订阅后再补读一次，覆盖订阅前已被共享轮询发布的分块，之后按分块ID去重
+        for chunk in await feed.fetch_chunks(sent_id):
+            sent_id = chunk['id']
+            yield format_sse('output', {'stream': chunk['stream'], 'content': chunk['content']}, chunk['id'])
+
+        while True:
+            try:
+                event, data = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            if event == 'output':
+                if data['id'] <= sent_id:
+                    continue
+                sent_id = data['id']
+                yield format_sse('output', {'stream': data['stream'], 'content': data['content']}, data['id'])
+            else:
+                yield format_sse('status', data)
+                return
+    finally:
+        feed.unsubscribe(queue)
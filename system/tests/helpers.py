@@ -0,0 +1,46 @@
+from unittest import mock
+
+from vehicle_management.models import ProjectSpace, VehicleModel
+
+from system.models import ScriptTask
+from system.services import ScriptTaskService
+
+
+def create_script(name='script', content='echo hello', script_type='bash', **kwargs):
+    """创建启用状态的脚本任务"""
+    return ScriptTask.objects.create(name=name, script_type=script_type, content=content, status='active', **kwargs)
+
+
+def create_project(vehicle_count=3, name='project'):
+    """创建带若干车型的项目空间"""
+    project = ProjectSpace.objects.create(name=name, is_active=True)
+    for index in range(vehicle_count):
+        VehicleModel.objects.create(project_space=project, name=f'vehicle{index}', code=f'V{index:03d}')
+    return project
+
+
+class InlineExecutionMixin:
+    """
+    测试中不启用执行后端：交给执行后端的记录直接在当前线程执行，结果同步写回，
+    使执行在测试事务内完成；超时由执行器自身的截止时间处理，不启动后台看门狗线程
+    """
+
+    def setUp(self):
+        super().setUp()
+        dispatch = mock.patch.object(
+            ScriptTaskService, '_dispatch_execution', side_effect=self.run_inline
+        )
+        dispatch.start()
+        self.addCleanup(dispatch.stop)
+        writer = mock.patch.object(ScriptTaskService.get_completion_writer(), 'flush_interval', 0)
+        writer.start()
+        self.addCleanup(writer.stop)
+        for module in ('system.script_executor', 'system.async_executor'):
+            watchdog = mock.patch(f'{module}.get_execution_watchdog')
+            watchdog.start()
+            self.addCleanup(watchdog.stop)
+
+    @staticmethod
+    def run_inline(execution_id):
+        ScriptTaskService._execute_script_async(execution_id)
+        return True
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from system.async_executor import AsyncExecutionEngine, AsyncScriptExecutor
+from system.models import ScriptTask
+
+
+def executor(content, timeout=30, **kwargs):
+    return AsyncScriptExecutor(ScriptTask(name='script', script_type='bash', content=content, timeout=timeout, **kwargs))
+
+
+class AsyncScriptExecutorTests(SimpleTestCase):
+    """asyncio 子进程监管"""
+
+    def test_output_and_usage(self):
+        script = executor('echo out; echo err >&2; exit 3')
+        success, output, error, _ = asyncio.run(script.execute_async())
+        self.assertEqual((success, output, error), (False, 'out\n', 'err\n'))
+        self.assertEqual(script.process.returncode, 3)
+        self.assertIn('max_rss', script.get_resource_usage())
+
+    def test_many_scripts_share_one_loop(self):
+        async def run_all():
+            return await asyncio.gather(*(executor(f'sleep 0.3; echo {i}').execute_async() for i in range(20)))
+
+        started = time.monotonic()
+        results = asyncio.run(run_all())
+        self.assertLess(time.monotonic() - started, 3)
+        self.assertEqual([output for _, output, _, _ in results], [f'{i}\n' for i in range(20)])
+
+    def test_timeout_kills_process_group(self):
+        script = executor('echo started; sleep 30 & wait', timeout=1)
+        started = time.monotonic()
+        success, output, error, _ = asyncio.run(script.execute_async())
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual((success, output, script.outcome), (False, 'started\n', 'timeout'))
+
+    def test_kill_from_another_thread(self):
+        script = executor('sleep 30')
+
+        async def run():
+            task = asyncio.ensure_future(script.execute_async())
+            while script.process is None:
+                await asyncio.sleep(0.01)
+            threading.Thread(target=script.kill, args=('cancelled',)).start()
+            return await asyncio.wait_for(task, 5)
+
+        _, _, error, _ = asyncio.run(run())
+        self.assertIn("脚本执行已取消", error)
+
+    def test_output_limit(self):
+        script = executor('yes x', output_limit=1)
+        success, output, _, _ = asyncio.run(script.execute_async())
+        self.assertEqual((success, len(output), script.outcome), (False, 1024, 'output_limit'))
+
+
+class AsyncExecutionEngineTests(SimpleTestCase):
+    """asyncio 执行引擎"""
+
+    def test_rejects_beyond_capacity(self):
+        engine = AsyncExecutionEngine(max_concurrency=2, queue_size=1, db_threads=1)
+        release = asyncio.Event()
+
+        async def block():
+            await release.wait()
+
+        self.assertEqual([engine.submit(block) for _ in range(4)], [True, True, True, False])
+        stats = engine.stats()
+        self.assertEqual((stats['submitted_count'], stats['rejected_count']), (3, 1))
+
+        engine._loop.call_soon_threadsafe(release.set)
+        engine.join()
+        self.assertEqual(engine.stats()['completed_count'], 3)
+
+    def test_failing_task_is_logged(self):
+        engine = AsyncExecutionEngine(max_concurrency=1, queue_size=1, db_threads=1)
+
+        async def fail():
+            raise RuntimeError
+
+        with self.assertLogs('system.async_executor', 'ERROR'):
+            engine.submit(fail)
+            engine.join()
+
+    def test_sync_execute_runs_on_engine(self):
+        engine = AsyncExecutionEngine(max_concurrency=2, queue_size=1, db_threads=1)
+        with mock.patch('system.async_executor.get_async_engine', return_value=engine):
+            success, output, _, _ = executor('echo sync').execute()
+        self.assertEqual((success, output), (True, 'sync\n'))
@@ -0,0 +1,81 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from system.models import ScriptBatch, ScriptExecution
+from system.services import ScriptBatchService, ScriptTaskService
+
+from .helpers import InlineExecutionMixin, create_project, create_script
+
+
+class ScriptBatchExecuteTests(InlineExecutionMixin, TestCase):
+    """按项目空间的车型批量执行"""
+
+    def setUp(self):
+        super().setUp()
+        self.project = create_project(vehicle_count=3)
+
+    def test_runs_once_per_vehicle_and_finishes(self):
+        script = create_script(content='echo "$vehicle_code $region"')
+        batch, error = ScriptBatchService.execute_batch(
+            script.id, {'project_id': self.project.id, 'parameters': {'region': 'cn'}, 'concurrency': 2}
+        )
+        self.assertIsNone(error)
+        self.assertEqual(batch.total_count, 3)
+
+        batch = ScriptBatchService.get_batch_by_id(batch.id)
+        self.assertEqual((batch.status, batch.success_count, batch.failed_count), ('finished', 3, 0))
+        self.assertIsNotNone(batch.finished_at)
+        outputs = sorted(execution.output.strip() for execution in batch.executions.all())
+        self.assertEqual(outputs, ['V000 cn', 'V001 cn', 'V002 cn'])
+
+    def test_failed_executions_do_not_stop_batch(self):
+        script = create_script(content='[ "$vehicle_code" != V001 ]')
+        batch, _ = ScriptBatchService.execute_batch(script.id, {'project_id': self.project.id, 'concurrency': 1})
+        batch = ScriptBatchService.get_batch_by_id(batch.id)
+        self.assertEqual((batch.status, batch.success_count, batch.failed_count), ('finished', 2, 1))
+
+    def test_validation(self):
+        script = create_script()
+        empty = create_project(vehicle_count=0, name='empty')
+        self.assertEqual(
+            ScriptBatchService.execute_batch(script.id, {'project_id': empty.id})[1], "项目空间下没有车型"
+        )
+        script.status = 'inactive'
+        script.save()
+        self.assertEqual(
+            ScriptBatchService.execute_batch(script.id, {'project_id': self.project.id})[1], "脚本未启用，无法执行"
+        )
+        self.assertFalse(ScriptBatch.objects.exists())
+
+
+class ScriptBatchConcurrencyTests(TestCase):
+    """批次内的执行按并发上限逐步调度"""
+
+    def test_dispatches_within_concurrency(self):
+        project = create_project(vehicle_count=3)
+        script = create_script()
+        with mock.patch.object(ScriptTaskService, '_dispatch_execution', return_value=True) as dispatch:
+            batch, _ = ScriptBatchService.execute_batch(script.id, {'project_id': project.id, 'concurrency': 2})
+            self.assertEqual(dispatch.call_count, 2)
+            self.assertEqual(batch.executions.filter(status='pending').count(), 1)
+
+            # 一条结束后补充调度剩余的一条
+            first = batch.executions.filter(status='queued').first()
+            ScriptExecution.objects.filter(id=first.id).update(status='success')
+            ScriptBatchService.dispatch_batch(batch.id)
+            self.assertEqual(dispatch.call_count, 3)
+            self.assertFalse(batch.executions.filter(status='pending').exists())
+
+            batch.executions.update(status='success')
+            ScriptBatchService.dispatch_batch(batch.id)
+        self.assertEqual(ScriptBatch.objects.get(id=batch.id).status, 'finished')
+
+    def test_rejected_dispatch_returns_to_pending(self):
+        project = create_project(vehicle_count=2)
+        script = create_script()
+        with mock.patch.object(ScriptTaskService, '_dispatch_execution', return_value=False), \
+                mock.patch('system.services.threading.Timer') as timer:
+            batch, _ = ScriptBatchService.execute_batch(script.id, {'project_id': project.id, 'concurrency': 2})
+        self.assertEqual(batch.executions.filter(status='pending').count(), 2)
+        timer.return_value.start.assert_called_once()
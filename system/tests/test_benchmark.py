@@ -0,0 +1,89 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+
+from system import dispatcher
+from system.benchmark import BENCH_PREFIX, ExecutionBenchmark, compare_results, summarize
+from system.management.commands.benchexecutions import parse_size
+from system.models import ScriptExecution, ScriptTask
+
+from .helpers import InlineExecutionMixin
+
+
+class BenchmarkHelperTests(SimpleTestCase):
+    """基准测试的统计和对比"""
+
+    def test_summarize(self):
+        self.assertIsNone(summarize([None]))
+        stats = summarize([3, 1, None, 2])
+        self.assertEqual((stats['count'], stats['p50'], stats['max'], stats['mean']), (3, 2, 3, 2))
+
+    def test_compare_results(self):
+        baseline = {'service': [{
+            'script_type': 'bash', 'output': 'tiny', 'executor': 'noop', 'concurrency': 10,
+            'throughput': 100.0, 'end_to_end': {'p95': 0.2},
+        }]}
+        current = {'service': [{
+            'script_type': 'bash', 'output': 'tiny', 'executor': 'noop', 'concurrency': 10,
+            'throughput': 80.0, 'end_to_end': {'p95': 0.1},
+        }, {
+            'script_type': 'python', 'output': 'tiny', 'executor': 'noop', 'concurrency': 10, 'throughput': 1.0,
+        }]}
+        rows = {row['metric']: row for row in compare_results(baseline, current)}
+        self.assertEqual(set(rows), {'throughput', 'end_to_end.p95'})
+        # 吞吐下降和耗时上升才算变差
+        self.assertEqual((rows['throughput']['change'], rows['throughput']['regression']), (-20.0, True))
+        self.assertEqual((rows['end_to_end.p95']['change'], rows['end_to_end.p95']['regression']), (-50.0, False))
+
+    def test_parse_size(self):
+        self.assertEqual([parse_size(value) for value in ('16', '4k', '1M')], [16, 4096, 1024 * 1024])
+
+    def test_command_rejects_invalid_options(self):
+        for options in ({'concurrency': '0'}, {'script_types': 'ruby'}, {'outputs': 'tiny=x'}):
+            with self.assertRaises(CommandError):
+                call_command('benchexecutions', **options)
+
+
+class ExecutionBenchmarkTests(InlineExecutionMixin, TestCase):
+    """不启动进程的执行器经服务层完成执行，结束后清理临时脚本"""
+
+    def test_noop_run(self):
+        saved_dispatcher = dispatcher._dispatcher
+        results = ExecutionBenchmark(
+            script_types=('bash',), output_sizes={'small': 5000}, concurrency_levels=(2,),
+            executors=('noop',), spawn_runs=1, rounds=2, timeout=10
+        ).run()
+
+        self.assertIs(dispatcher._dispatcher, saved_dispatcher)
+        [spawn] = results['spawn']
+        self.assertEqual((spawn['runs'], spawn['failures']), (1, 0))
+        [service] = results['service']
+        self.assertEqual(
+            (service['runs'], service['submitted'], service['success'], service['timed_out']), (4, 4, 4, False)
+        )
+        self.assertEqual(service['end_to_end']['count'], 4)
+        self.assertFalse(ScriptTask.objects.filter(name__startswith=BENCH_PREFIX).exists())
+        self.assertFalse(ScriptExecution.objects.exists())
+
+    def test_command_json(self):
+        out = StringIO()
+        call_command(
+            'benchexecutions', script_types='python', outputs='tiny=16', concurrency='1', executors='noop',
+            spawn_runs=1, rounds=1, json=True, stdout=out
+        )
+        results = json.loads(out.getvalue())
+        self.assertEqual(results['service'][0]['success'], 1)
+        self.assertEqual(results['environment']['database'], 'sqlite')
+
+
+class ForkServerBenchmarkTests(SimpleTestCase):
+
+    def test_command_json(self):
+        out = StringIO()
+        call_command('benchforkserver', runs=2, json=True, stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual((result['spawn']['failures'], result['forkserver']['failures']), (0, 0))
+        self.assertGreater(result['speedup_p50'], 0)
@@ -0,0 +1,111 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from system.models import ScriptBatch, ScriptExecution, ScriptTask
+from system.script_executor import ScriptExecutor
+from system.services import ScriptExecutionService, ScriptTaskService
+from system.watchdog import ExecutionWatchdog
+
+from .helpers import InlineExecutionMixin, create_project, create_script
+
+
+class ScriptExecutorKillTests(SimpleTestCase):
+    """超时和取消时结束整个进程组"""
+
+    def executor(self, content, timeout=30):
+        return ScriptExecutor(ScriptTask(name='script', script_type='bash', content=content, timeout=timeout))
+
+    def test_timeout_kills_background_children(self):
+        executor = self.executor('echo started; sleep 30 & wait', timeout=1)
+        started = time.monotonic()
+        success, output, error, _ = executor.execute()
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual((success, output, executor.outcome), (False, 'started\n', 'timeout'))
+        self.assertIn("脚本执行超时", error)
+
+    def test_kill_from_another_thread(self):
+        executor = self.executor('echo started; sleep 30')
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(value=executor.execute()))
+        thread.start()
+        deadline = time.monotonic() + 5
+        while executor.process is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        executor.kill('cancelled')
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(executor.outcome, 'cancelled')
+        self.assertIn("脚本执行已取消", result['value'][2])
+
+
+class CancelExecutionTests(TestCase):
+    """取消执行"""
+
+    def test_cancel_pending_and_finished(self):
+        script = create_script()
+        pending = ScriptExecution.objects.create(script_task=script, status='queued')
+        execution, error = ScriptExecutionService.cancel_execution(pending.id)
+        self.assertIsNone(error)
+        self.assertEqual(execution.status, 'cancelled')
+        self.assertIsNotNone(execution.finished_at)
+
+        self.assertEqual(ScriptExecutionService.cancel_execution(pending.id), (None, "执行已结束，无法取消"))
+
+    def test_cancel_kills_process_owned_here(self):
+        execution = ScriptExecution.objects.create(script_task=create_script(), status='running')
+        with mock.patch('system.services.get_execution_watchdog') as watchdog:
+            ScriptExecutionService.cancel_execution(execution.id)
+        watchdog.return_value.cancel.assert_called_once_with(execution.id)
+
+
+class ExecutionTimeoutTests(InlineExecutionMixin, TestCase):
+
+    def test_timed_out_execution_is_recorded(self):
+        script = create_script(content='echo partial; sleep 30', timeout=1)
+        execution, _ = ScriptTaskService.execute_script(script.id, {})
+        execution.refresh_from_db()
+        self.assertEqual((execution.status, execution.output), ('timeout', 'partial\n'))
+        self.assertIn("脚本执行超时", execution.error_message)
+
+
+class ExecutionWatchdogTests(InlineExecutionMixin, TestCase):
+    """看门狗兜底超时"""
+
+    def setUp(self):
+        super().setUp()
+        self.script = create_script()
+        self.batch = ScriptBatch.objects.create(
+            script_task=self.script, project_space=create_project(vehicle_count=0), total_count=1
+        )
+        self.execution = ScriptExecution.objects.create(script_task=self.script, batch=self.batch, status='running')
+        self.watchdog = ExecutionWatchdog()
+        self.executor = mock.Mock()
+
+    def test_expired_execution_marked_timeout_and_followups_dispatched(self):
+        self.watchdog._entries[self.execution.id] = (self.executor, time.monotonic() - 1)
+        with self.assertLogs('system.watchdog', 'WARNING'):
+            self.watchdog.check()
+
+        self.executor.kill.assert_called_once_with('timeout')
+        self.execution.refresh_from_db()
+        self.assertEqual(self.execution.status, 'timeout')
+        # 批次中已没有未结束的执行，后续调度关闭批次
+        self.assertEqual(ScriptBatch.objects.get(id=self.batch.id).status, 'finished')
+
+    def test_late_result_is_written_after_watchdog_timeout(self):
+        ScriptExecution.objects.filter(id=self.execution.id).update(status='timeout')
+        ScriptTaskService._finish_execution(
+            self.execution, count_execution=True, status='timeout', output='late output', max_rss=1024
+        )
+        self.execution.refresh_from_db()
+        self.assertEqual((self.execution.output, self.execution.max_rss), ('late output', 1024))
+        self.assertEqual(ScriptTask.objects.get(id=self.script.id).execution_count, 1)
+
+    def test_cancelled_in_database_is_killed(self):
+        self.watchdog._entries[self.execution.id] = (self.executor, time.monotonic() + 60)
+        ScriptExecution.objects.filter(id=self.execution.id).update(status='cancelled')
+        self.watchdog.check()
+        self.executor.kill.assert_called_once_with('cancelled')
@@ -0,0 +1,61 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from system.models import ScriptExecution
+from system.script_cache import compute_cache_key
+from system.services import ScriptTaskService
+
+from .helpers import create_script
+
+
+@mock.patch.object(ScriptTaskService, '_dispatch_execution', return_value=True)
+class CoalesceExecutionTests(TestCase):
+    """相同的进行中执行合并为一次"""
+
+    def setUp(self):
+        self.script = create_script(timeout=60)
+
+    def test_identical_requests_share_one_execution(self, dispatch):
+        first, _ = ScriptTaskService.execute_script(self.script.id, {'a': 1, 'b': 2})
+        second, _ = ScriptTaskService.execute_script(self.script.id, {'b': 2, 'a': 1})
+        self.assertEqual(second.id, first.id)
+        self.assertEqual(second.coalesced_count, 1)
+        self.assertEqual(dispatch.call_count, 1)
+
+        other, _ = ScriptTaskService.execute_script(self.script.id, {'a': 2})
+        self.assertNotEqual(other.id, first.id)
+
+    def test_finished_execution_is_not_joined(self, dispatch):
+        first, _ = ScriptTaskService.execute_script(self.script.id, {})
+        ScriptExecution.objects.filter(id=first.id).update(status='success')
+        second, _ = ScriptTaskService.execute_script(self.script.id, {})
+        self.assertNotEqual(second.id, first.id)
+
+    def stale(self, **kwargs):
+        execution = ScriptExecution.objects.create(
+            script_task=self.script, status='running', cache_key=compute_cache_key(self.script.get_content_hash(), {}),
+            **kwargs
+        )
+        started_at = timezone.now() - timedelta(seconds=self.script.timeout + ScriptTaskService.COALESCE_GRACE + 1)
+        ScriptExecution.objects.filter(id=execution.id).update(started_at=started_at)
+        return execution
+
+    def test_stale_execution_is_ignored(self, dispatch):
+        # 执行进程失联后仍停留在 running 的记录不再合并新的请求
+        stale = self.stale()
+        execution, _ = ScriptTaskService.execute_script(self.script.id, {})
+        self.assertNotEqual(execution.id, stale.id)
+        self.assertEqual(ScriptExecution.objects.get(id=stale.id).coalesced_count, 0)
+
+    def test_old_execution_with_valid_lease_is_joined(self, dispatch):
+        leased = self.stale(lease_expires_at=timezone.now() + timedelta(seconds=30))
+        execution, _ = ScriptTaskService.execute_script(self.script.id, {})
+        self.assertEqual(execution.id, leased.id)
+
+    def test_expired_lease_is_ignored(self, dispatch):
+        expired = self.stale(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        execution, _ = ScriptTaskService.execute_script(self.script.id, {})
+        self.assertNotEqual(execution.id, expired.id)
@@ -0,0 +1,158 @@
+import uuid
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from system.dispatcher import ExecutionDispatcher, FairShareSelector, count_running
+from system.models import ScriptExecution
+from system.services import ScriptTaskService
+from system.worker import ExecutionWorker
+
+from .helpers import create_script
+
+BASE_TIME = datetime(2024, 1, 1)
+
+
+class CandidateFactory:
+
+    def __init__(self):
+        self.sequence = 0
+
+    def __call__(self, script_id, priority=1, weight=1, max_concurrency=None):
+        self.sequence += 1
+        return {
+            'id': f'{script_id}-{self.sequence}',
+            'script_task_id': script_id,
+            'priority': priority,
+            'created_at': BASE_TIME + timedelta(seconds=self.sequence),
+            'script_task__weight': weight,
+            'script_task__max_concurrency': max_concurrency,
+        }
+
+
+def scripts_of(selected):
+    return [execution_id.split('-')[0] for execution_id in selected]
+
+
+class FairShareSelectorTests(SimpleTestCase):
+    """按优先级和脚本权重选择排队执行"""
+
+    def setUp(self):
+        self.candidate = CandidateFactory()
+
+    def test_higher_priority_first(self):
+        candidates = [self.candidate('low', priority=0) for _ in range(3)] + [self.candidate('high', priority=2)]
+        self.assertEqual(scripts_of(FairShareSelector().select(candidates, {}, 2)), ['high', 'low'])
+
+    def test_busy_script_does_not_starve_others(self):
+        # 先排队的大量执行不会让后到的脚本一直等待
+        candidates = [self.candidate('busy') for _ in range(10)] + [self.candidate('quiet')]
+        self.assertEqual(scripts_of(FairShareSelector().select(candidates, {}, 2)), ['busy', 'quiet'])
+
+    def test_weighted_share(self):
+        candidates = [self.candidate('heavy', weight=3) for _ in range(20)] + [self.candidate('light') for _ in range(20)]
+        selected = scripts_of(FairShareSelector().select(candidates, {}, 8))
+        self.assertEqual((selected.count('heavy'), selected.count('light')), (6, 2))
+
+    def test_share_carries_across_rounds(self):
+        selector = FairShareSelector()
+        candidates = [self.candidate('a') for _ in range(4)] + [self.candidate('b') for _ in range(4)]
+        first = selector.select(candidates, {}, 1)
+        remaining = [candidate for candidate in candidates if candidate['id'] not in first]
+        second = selector.select(remaining, {}, 1)
+        self.assertEqual(scripts_of(first + second), ['a', 'b'])
+
+    def test_max_concurrency_counts_running(self):
+        candidates = [self.candidate('capped', max_concurrency=2) for _ in range(5)] + [self.candidate('other')]
+        selected = scripts_of(FairShareSelector().select(candidates, {'capped': 1}, 5))
+        self.assertEqual(sorted(selected), ['capped', 'other'])
+
+    def test_blocked_high_priority_leaves_slots_to_lower(self):
+        candidates = [self.candidate('high', priority=2, max_concurrency=1) for _ in range(3)]
+        candidates.append(self.candidate('low', priority=0))
+        self.assertEqual(scripts_of(FairShareSelector().select(candidates, {'high': 1}, 2)), ['low'])
+
+
+class ExecutionDispatcherTests(TestCase):
+    """进程内调度器只把能立即开始的执行交给执行后端"""
+
+    def setUp(self):
+        self.backend = mock.Mock()
+        self.backend.submit.return_value = True
+        self.dispatcher = ExecutionDispatcher(self.backend, capacity=2, queue_size=3, target=mock.Mock())
+        # 测试中直接调用 _dispatch，不启动调度线程
+        patcher = mock.patch.object(ExecutionDispatcher, '_ensure_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.script = create_script(max_concurrency=1)
+
+    def queued(self, count):
+        return [ScriptExecution.objects.create(script_task=self.script, status='queued').id for _ in range(count)]
+
+    def test_dispatch_within_capacity_and_cap(self):
+        other = create_script(name='other')
+        capped = self.queued(2)
+        free = ScriptExecution.objects.create(script_task=other, status='queued').id
+        for execution_id in capped + [free]:
+            self.assertTrue(self.dispatcher.submit(execution_id))
+        self.assertFalse(self.dispatcher.submit(ScriptExecution.objects.create(script_task=other, status='queued').id))
+
+        self.dispatcher._dispatch()
+        submitted = [call.args[1] for call in self.backend.submit.call_args_list]
+        self.assertEqual(sorted(map(str, submitted)), sorted(map(str, [capped[0], free])))
+        stats = self.dispatcher.stats()
+        self.assertEqual((stats['dispatch_waiting'], stats['dispatch_inflight']), (1, 2))
+
+        self.dispatcher._run(capped[0])
+        self.dispatcher._dispatch()
+        self.assertEqual(self.backend.submit.call_args.args[1], capped[1])
+
+    def test_running_elsewhere_counts_toward_cap(self):
+        ScriptExecution.objects.create(script_task=self.script, status='running')
+        self.assertEqual(count_running({self.script.id}), {self.script.id: 1})
+        self.dispatcher.submit(self.queued(1)[0])
+        self.dispatcher._dispatch()
+        self.backend.submit.assert_not_called()
+
+    def test_backend_full_returns_to_waiting(self):
+        self.backend.submit.return_value = False
+        execution_id = self.queued(1)[0]
+        self.dispatcher.submit(execution_id)
+        self.dispatcher._dispatch()
+        self.assertEqual((self.dispatcher.stats()['dispatch_waiting'], self.dispatcher.stats()['dispatched_count']), (1, 0))
+
+
+class QueueWaitTests(TestCase):
+    """排队时间"""
+
+    def test_record_queue_wait_in_one_update(self):
+        script = create_script()
+        now = timezone.now()
+        executions = [
+            ScriptExecution.objects.create(script_task=script, status='running', queued_at=now - timedelta(seconds=s))
+            for s in (1, 5, 30)
+        ]
+        # 一次读取加一条 CASE 更新，与记录数无关
+        with self.assertNumQueries(2):
+            ScriptTaskService.record_queue_wait([execution.id for execution in executions], now)
+        waits = [ScriptExecution.objects.get(id=execution.id).queue_wait_time for execution in executions]
+        self.assertEqual([round(wait) for wait in waits], [1, 5, 30])
+
+    def test_worker_claims_by_priority(self):
+        script = create_script()
+        low = ScriptExecution.objects.create(
+            script_task=script, status='queued', priority=ScriptExecution.PRIORITY_LOW, queued_at=timezone.now()
+        )
+        high = ScriptExecution.objects.create(
+            script_task=script, status='queued', priority=ScriptExecution.PRIORITY_HIGH, queued_at=timezone.now()
+        )
+        worker = ExecutionWorker(concurrency=1)
+        self.assertEqual(worker.claim(1), [high.id])
+        self.assertEqual(worker.claim(1), [low.id])
+        self.assertEqual(worker.claim(1), [])
+
+    def test_unknown_execution_is_not_submitted(self):
+        dispatcher = ExecutionDispatcher(mock.Mock(), capacity=1, queue_size=1, target=mock.Mock())
+        self.assertFalse(dispatcher.submit(uuid.uuid4()))
@@ -0,0 +1,72 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from system.execution_pool import ScriptExecutionPool
+from system.models import ScriptExecution
+from system.services import ScriptTaskService
+
+from .helpers import create_script
+
+
+class ScriptExecutionPoolTests(SimpleTestCase):
+    """有界执行线程池"""
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+
+    def tearDown(self):
+        self.release.set()
+
+    def block(self):
+        self.started.release()
+        self.release.wait(5)
+
+    def test_rejects_when_workers_and_queue_are_full(self):
+        pool = ScriptExecutionPool(max_workers=2, queue_size=1)
+        for _ in range(2):
+            self.assertTrue(pool.submit(self.block))
+            self.assertTrue(self.started.acquire(timeout=5))
+
+        self.assertTrue(pool.submit(self.block))
+        self.assertFalse(pool.submit(self.block))
+
+        stats = pool.stats()
+        self.assertEqual(stats['active_workers'], 2)
+        self.assertEqual(stats['queue_depth'], 1)
+        self.assertEqual(stats['submitted_count'], 3)
+        self.assertEqual(stats['rejected_count'], 1)
+
+        self.release.set()
+        pool.join()
+        self.assertEqual(pool.stats()['completed_count'], 3)
+
+    def test_thread_count_is_bounded(self):
+        pool = ScriptExecutionPool(max_workers=3, queue_size=50)
+        for _ in range(20):
+            pool.submit(lambda: None)
+        pool.join()
+        self.assertEqual(len([thread for thread in pool._threads if thread.is_alive()]), 3)
+
+    def test_failing_task_does_not_stop_worker(self):
+        pool = ScriptExecutionPool(max_workers=1, queue_size=5)
+        done = threading.Event()
+        with self.assertLogs('system.execution_pool', 'ERROR'):
+            pool.submit(lambda: 1 / 0)
+            pool.submit(done.set)
+            pool.join()
+        self.assertTrue(done.is_set())
+
+
+class ExecuteScriptQueueFullTests(TestCase):
+    """执行队列已满时拒绝请求"""
+
+    def test_rejected_execution_is_recorded(self):
+        script = create_script()
+        with mock.patch.object(ScriptTaskService, '_dispatch_execution', return_value=False):
+            execution, error = ScriptTaskService.execute_script(script.id, {})
+        self.assertIsNone(execution)
+        self.assertEqual(error, "执行队列已满，请稍后重试")
+        self.assertEqual(ScriptExecution.objects.get(script_task=script).status, 'rejected')
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import time
+import uuid
+from unittest import mock
+
+from django.test import TestCase
+
+from system.models import ScriptExecution
+from system.streaming import ExecutionStatusWatcher, get_execution_statuses, wait_execution_statuses
+
+from .helpers import create_script
+
+STATUS_URL = '/api/v1/system/executions/status/'
+
+
+def create_executions(*statuses):
+    script = create_script()
+    return [str(ScriptExecution.objects.create(script_task=script, status=status).id) for status in statuses]
+
+
+@mock.patch.object(ExecutionStatusWatcher, 'POLL_INTERVAL', 0.01)
+class WaitExecutionStatusesTests(TestCase):
+    """批量读取状态，长轮询等待任意一个变化"""
+
+    def setUp(self):
+        self.running, self.queued = create_executions('running', 'queued')
+
+    async def set_status(self, execution_id, status, delay=0):
+        await asyncio.sleep(delay)
+        await ScriptExecution.objects.filter(id=execution_id).aupdate(status=status)
+
+    async def test_statuses_in_one_query(self):
+        missing = str(uuid.uuid4())
+        statuses = await get_execution_statuses([self.running, self.queued, missing])
+        self.assertEqual({key: row['status'] for key, row in statuses.items()}, {
+            self.running: 'running', self.queued: 'queued'
+        })
+        self.assertNotIn('output', statuses[self.running])
+
+    async def test_known_status_differs_returns_immediately(self):
+        statuses, changed, timed_out = await wait_execution_statuses(
+            [self.running, self.queued], known={self.running: 'queued', self.queued: 'queued'}, wait=30
+        )
+        self.assertEqual((changed, timed_out), ([self.running], False))
+        self.assertEqual(statuses[self.running]['status'], 'running')
+
+    async def test_wait_until_change(self):
+        updater = asyncio.ensure_future(self.set_status(self.queued, 'running', delay=0.05))
+        started = time.monotonic()
+        statuses, changed, timed_out = await wait_execution_statuses([self.running, self.queued], wait=5)
+        await updater
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual((changed, timed_out), ([self.queued], False))
+        self.assertEqual(statuses[self.queued]['status'], 'running')
+
+    async def test_timeout(self):
+        statuses, changed, timed_out = await wait_execution_statuses([self.running], wait=0.05)
+        self.assertEqual((changed, timed_out), ([], True))
+
+    async def test_waiters_share_polling(self):
+        watcher = ExecutionStatusWatcher()
+        with mock.patch('system.streaming.get_status_watcher', return_value=watcher), \
+                mock.patch('system.streaming.get_execution_statuses', wraps=get_execution_statuses) as query:
+            waits = asyncio.gather(*(
+                wait_execution_statuses([self.running, self.queued], wait=5) for _ in range(5)
+            ))
+            updater = asyncio.ensure_future(self.set_status(self.running, 'success', delay=0.05))
+            results = await waits
+            await updater
+        self.assertEqual([changed for _, changed, _ in results], [[self.running]] * 5)
+        # 每个请求开始和结束各查询一次，等待期间的轮询由所有等待者共用
+        self.assertLess(query.call_count, 5 * 2 + 10)
+
+
+@mock.patch.object(ExecutionStatusWatcher, 'POLL_INTERVAL', 0.01)
+class ScriptExecutionStatusViewTests(TestCase):
+    """批量状态接口"""
+
+    def setUp(self):
+        self.running, self.success = create_executions('running', 'success')
+
+    async def test_get(self):
+        missing = str(uuid.uuid4())
+        response = await self.async_client.get(STATUS_URL, {'ids': f'{self.running},{self.success},{missing}'})
+        data = json.loads(response.content)['data']
+        self.assertEqual([item['status'] for item in data['items']], ['running', 'success'])
+        self.assertEqual((data['missing'], data['changed'], data['timed_out']), ([missing], [], False))
+
+    async def test_post_with_known_and_wait(self):
+        response = await self.async_client.post(STATUS_URL, {
+            'ids': [self.running, self.success], 'known': {self.running: 'queued'}, 'wait': 10
+        }, content_type='application/json')
+        data = json.loads(response.content)['data']
+        self.assertEqual((data['changed'], data['timed_out']), ([self.running], False))
+
+        response = await self.async_client.post(STATUS_URL, {
+            'ids': [self.running], 'wait': 0.05
+        }, content_type='application/json')
+        self.assertTrue(json.loads(response.content)['data']['timed_out'])
+
+    async def test_invalid_requests(self):
+        for params in ({}, {'ids': 'not-a-uuid'}, {'ids': self.running, 'wait': 'x'}):
+            response = await self.async_client.get(STATUS_URL, params)
+            self.assertEqual(response.status_code, 400)
+        response = await self.async_client.post(STATUS_URL, {
+            'ids': [self.running], 'known': ['running']
+        }, content_type='application/json')
+        self.assertEqual(json.loads(response.content)['message'], "known 必须是 执行ID 到状态的对象")
+        response = await self.async_client.post(STATUS_URL, {
+            'ids': [str(uuid.uuid4()) for _ in range(501)]
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    async def test_long_poll_sees_completion(self):
+        async def finish():
+            await asyncio.sleep(0.05)
+            await ScriptExecution.objects.filter(id=self.running).aupdate(status='success')
+
+        updater = asyncio.ensure_future(finish())
+        response = await self.async_client.get(STATUS_URL, {'ids': self.running, 'wait': 5})
+        await updater
+        data = json.loads(response.content)['data']
+        self.assertEqual((data['changed'], data['items'][0]['status']), ([self.running], 'success'))
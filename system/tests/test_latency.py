@@ -0,0 +1,97 @@
+import random
+from datetime import timedelta
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from system.latency import add_sample, bucket_index, bucket_value, compute_percentiles, merge_histograms
+from system.models import ScriptLatencyStat
+from system.services import ScriptLatencyService
+
+from .helpers import create_script
+
+
+class LatencyHistogramTests(SimpleTestCase):
+    """对数分桶直方图和分位数"""
+
+    def test_bucket_relative_error(self):
+        for seconds in (0.0015, 0.02, 0.5, 3, 120, 3600):
+            self.assertAlmostEqual(bucket_value(bucket_index(seconds)) / seconds, 1, delta=0.011)
+        self.assertEqual(bucket_index(0), 0)
+        self.assertEqual(bucket_index(0.0005), 0)
+
+    def test_percentiles_match_exact_values(self):
+        generator = random.Random(1)
+        samples = sorted(generator.lognormvariate(0, 1) for _ in range(10000))
+        histogram = {}
+        for seconds in samples:
+            add_sample(histogram, seconds)
+
+        percentiles = compute_percentiles(histogram)
+        for p in (50, 95, 99):
+            exact = samples[int(len(samples) * p / 100) - 1]
+            self.assertAlmostEqual(percentiles[f'p{p}'] / exact, 1, delta=0.02)
+
+    def test_empty_and_merge(self):
+        self.assertEqual(compute_percentiles({}), {'p50': None, 'p95': None, 'p99': None})
+        self.assertEqual(merge_histograms([{'1': 2}, None, {'1': 1, '5': 1}]), {'1': 3, '5': 1})
+
+    def test_single_sample(self):
+        histogram = {}
+        add_sample(histogram, 2.0)
+        percentiles = compute_percentiles(histogram)
+        self.assertEqual(percentiles['p50'], percentiles['p99'])
+        self.assertAlmostEqual(percentiles['p50'], 2.0, delta=0.02)
+
+
+class ScriptLatencyServiceTests(TestCase):
+    """按小时窗口增量维护的耗时统计"""
+
+    def setUp(self):
+        self.script = create_script()
+
+    def test_record_many_merges_samples_per_window(self):
+        now = timezone.now()
+        ScriptLatencyService.record_many([
+            (self.script.id, 'success', 1.0, now),
+            (self.script.id, 'success', 3.0, now),
+            (self.script.id, 'failed', 2.0, now),
+            (self.script.id, 'timeout', None, now),
+            (self.script.id, 'cancelled', 9.0, now),
+        ])
+        ScriptLatencyService.record(self.script.id, 'success', 0.5, now)
+
+        stat = ScriptLatencyStat.objects.get(script_task=self.script)
+        self.assertEqual((stat.success_count, stat.failure_count, stat.timeout_count), (3, 1, 1))
+        self.assertEqual(sum(stat.histogram.values()), 4)
+        self.assertEqual((stat.min_time, stat.max_time, stat.total_time), (0.5, 3.0, 6.5))
+
+    def test_current_and_previous_periods(self):
+        now = timezone.now()
+        ScriptLatencyService.record_many([(self.script.id, 'success', 1.0, now)] * 10)
+        ScriptLatencyService.record_many([(self.script.id, 'success', 4.0, now - timedelta(hours=30))] * 10)
+
+        data, error = ScriptLatencyService.get_script_latency(self.script, '24h', series=True)
+        self.assertIsNone(error)
+        self.assertEqual(data['current']['total_count'], 10)
+        self.assertAlmostEqual(data['current']['p95'], 1.0, delta=0.02)
+        self.assertAlmostEqual(data['previous']['p95'], 4.0, delta=0.05)
+        self.assertEqual(len(data['windows']), 1)
+
+        self.assertEqual(ScriptLatencyService.get_script_latency(self.script, '2h'), (None, "时间范围无效"))
+
+    def test_ranking_orders_by_p95_regression(self):
+        slower = create_script(name='slower')
+        now = timezone.now()
+        for script, before, after in ((self.script, 1.0, 1.1), (slower, 1.0, 3.0)):
+            ScriptLatencyService.record_many([(script.id, 'success', before, now - timedelta(days=8))])
+            ScriptLatencyService.record_many([(script.id, 'success', after, now)])
+
+        data, _ = ScriptLatencyService.get_latency_ranking('7d')
+        self.assertEqual([item['script_id'] for item in data['scripts']], [slower.id, self.script.id])
+        self.assertAlmostEqual(data['scripts'][0]['p95_change'], 200, delta=5)
+
+    def test_latency_endpoint(self):
+        ScriptLatencyService.record(self.script.id, 'success', 0.2, timezone.now())
+        response = self.client.get(f'/api/v1/system/scripts/{self.script.id}/latency/', {'range': '1h'})
+        self.assertEqual(response.json()['data']['current']['success_count'], 1)
@@ -0,0 +1,76 @@
+from django.test import TestCase
+
+from system.models import ScriptExecution, ScriptOutputChunk
+from system.output_capture import ExecutionOutputRecorder, read_output_chunks
+from system.services import ScriptTaskService
+
+from .helpers import InlineExecutionMixin, create_script
+
+
+class ExecutionOutputRecorderTests(TestCase):
+    """分块输出的写入和增量读取"""
+
+    def setUp(self):
+        self.execution = ScriptExecution.objects.create(script_task=create_script(), status='running')
+        self.recorder = ExecutionOutputRecorder(self.execution.id)
+
+    def test_chunks_have_contiguous_byte_offsets_per_stream(self):
+        self.recorder.write('stdout', 'hello ')
+        self.recorder.write('stderr', 'oops')
+        self.recorder.flush()
+        self.recorder.write('stdout', '世界')
+        self.recorder.flush()
+
+        chunks = list(ScriptOutputChunk.objects.filter(
+            execution=self.execution, stream='stdout'
+        ).order_by('offset').values_list('offset', 'size'))
+        self.assertEqual(chunks, [(0, 6), (6, 6)])
+        self.assertEqual(read_output_chunks(self.execution.id, 'stdout', 0, 1024), ('hello 世界', 12))
+        self.assertEqual(read_output_chunks(self.execution.id, 'stderr', 0, 1024), ('oops', 4))
+
+    def test_flush_due_by_size(self):
+        self.assertFalse(self.recorder.flush_due())
+        self.recorder.write('stdout', 'x' * ExecutionOutputRecorder.FLUSH_BYTES)
+        self.assertTrue(self.recorder.flush_due())
+        self.recorder.maybe_flush()
+        self.assertFalse(self.recorder.flush_due())
+        self.assertEqual(ScriptOutputChunk.objects.filter(execution=self.execution).count(), 1)
+
+    def test_read_from_offset_inside_chunk(self):
+        self.recorder.write('stdout', 'abcdef')
+        self.recorder.flush()
+        self.recorder.write('stdout', 'ghi')
+        self.recorder.flush()
+
+        self.assertEqual(read_output_chunks(self.execution.id, 'stdout', 4, 1024), ('efghi', 9))
+        self.assertEqual(read_output_chunks(self.execution.id, 'stdout', 9, 1024), ('', 9))
+
+    def test_limit_stops_at_chunk_boundary(self):
+        for text in ('aaa', 'bbb', 'ccc'):
+            self.recorder.write('stdout', text)
+            self.recorder.flush()
+        self.assertEqual(read_output_chunks(self.execution.id, 'stdout', 0, 4), ('aaabbb', 6))
+
+
+class ExecutionOutputViewTests(InlineExecutionMixin, TestCase):
+    """执行输出增量读取接口"""
+
+    def test_tail_output_of_finished_execution(self):
+        script = create_script(content='echo out; echo err >&2')
+        execution, error = ScriptTaskService.execute_script(script.id, {})
+        self.assertIsNone(error)
+
+        url = f'/api/v1/system/executions/{execution.id}/output/'
+        data = self.client.get(url).json()['data']
+        self.assertEqual((data['content'], data['next_offset'], data['finished']), ('out\n', 4, True))
+
+        data = self.client.get(url, {'stream': 'stderr'}).json()['data']
+        self.assertEqual(data['content'], 'err\n')
+
+        data = self.client.get(url, {'offset': 4}).json()['data']
+        self.assertEqual((data['content'], data['next_offset']), ('', 4))
+
+    def test_invalid_stream_is_rejected(self):
+        execution = ScriptExecution.objects.create(script_task=create_script(), status='running')
+        response = self.client.get(f'/api/v1/system/executions/{execution.id}/output/', {'stream': 'stdin'})
+        self.assertEqual(response.status_code, 400)
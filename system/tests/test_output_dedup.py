@@ -0,0 +1,128 @@
+import hashlib
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from system.models import ScriptExecution, ScriptOutputBlob
+from system.output_dedup import backfill, collect_garbage, get_dedup_stats
+from system.output_storage import (
+    acquire_output_blob, get_output_storage, iter_output_blob, prepare_output_fields, release_output_refs
+)
+
+from .helpers import create_script
+
+
+def acquire(output):
+    data = output.encode('utf-8')
+    return acquire_output_blob(hashlib.sha256(data).hexdigest(), data, output)
+
+
+def stored_output(execution):
+    """共享输出的完整内容，转存的从存储读取"""
+    blob = ScriptOutputBlob.objects.get(id=execution.output_ref_id)
+    if blob.storage:
+        return b''.join(iter_output_blob(blob.storage, 0, blob.size)).decode('utf-8')
+    return blob.content
+
+
+class OutputDedupTests(TestCase):
+    """相同输出只保存一份，按引用数回收"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            SCRIPT_OUTPUT_STORAGE_DIR=directory.name, SCRIPT_OUTPUT_DEDUP_MIN_SIZE=10, SCRIPT_OUTPUT_INLINE_LIMIT=100,
+            SCRIPT_OUTPUT_PREVIEW_SIZE=50
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.script = create_script()
+
+    def execution(self, output, **kwargs):
+        fields = prepare_output_fields(None, output)
+        return ScriptExecution.objects.create(
+            script_task=self.script, status='success', finished_at=timezone.now(), **fields, **kwargs
+        )
+
+    def test_identical_outputs_share_blob(self):
+        first = self.execution('same output\n')
+        second = self.execution('same output\n')
+        short = self.execution('short')
+        self.assertEqual(first.output_ref_id, second.output_ref_id)
+        self.assertEqual((first.output, short.output_ref_id), ('', None))
+        self.assertEqual(ScriptOutputBlob.objects.get().ref_count, 2)
+        self.assertEqual(ScriptExecution.objects.get(id=second.id).get_output(), 'same output\n')
+
+    def test_large_blob_spilled_once(self):
+        output = 'x' * 500
+        executions = [self.execution(output) for _ in range(3)]
+        blob = ScriptOutputBlob.objects.get()
+        self.assertEqual((blob.ref_count, blob.content), (3, 'x' * 50))
+        self.assertTrue(get_output_storage().exists(blob.storage['path']))
+        self.assertEqual(stored_output(executions[2]), output)
+
+    def test_release_deletes_at_zero(self):
+        blob_id = acquire('x' * 500)
+        path = ScriptOutputBlob.objects.get(id=blob_id).storage['path']
+        self.assertEqual(acquire('x' * 500), blob_id)
+        self.assertEqual(release_output_refs([blob_id, None]), 0)
+        self.assertEqual(ScriptOutputBlob.objects.get(id=blob_id).ref_count, 1)
+        self.assertEqual(release_output_refs([blob_id]), 1)
+        self.assertFalse(ScriptOutputBlob.objects.exists())
+        self.assertFalse(get_output_storage().exists(path))
+
+    def test_stats(self):
+        for _ in range(4):
+            self.execution('shared output')
+        self.execution('short')
+        stats = get_dedup_stats()
+        self.assertEqual(
+            (stats['blob_count'], stats['deduplicated_executions'], stats['logical_bytes'], stats['stored_bytes']),
+            (1, 4, 52, 13)
+        )
+        self.assertEqual((stats['dedup_ratio'], stats['inline_executions']), (4.0, 1))
+        self.assertEqual(stats['top_blobs'][0]['saved_bytes'], 39)
+
+    def test_collect_garbage_fixes_counts(self):
+        kept = self.execution('kept output')
+        orphan = acquire('orphaned output')
+        # 引用数与实际不符：多记了一次引用
+        ScriptOutputBlob.objects.filter(id=kept.output_ref_id).update(ref_count=5)
+        self.assertEqual(collect_garbage(), {'corrected': 0, 'purged': 0})
+
+        ScriptOutputBlob.objects.update(last_used_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(collect_garbage(batch_size=1), {'corrected': 2, 'purged': 1})
+        self.assertEqual(list(ScriptOutputBlob.objects.values_list('id', 'ref_count')), [(kept.output_ref_id, 1)])
+        self.assertFalse(ScriptOutputBlob.objects.filter(id=orphan).exists())
+
+    def test_backfill(self):
+        with override_settings(SCRIPT_OUTPUT_DEDUP_MIN_SIZE=0):
+            inline = self.execution('backfilled output')
+            spilled = self.execution('y' * 500)
+        spilled_path = spilled.output_blob['path']
+        running = ScriptExecution.objects.create(script_task=self.script, status='running', output='still running')
+        self.execution('backfilled output')
+
+        self.assertEqual(backfill(batch_size=1), {'converted': 2, 'bytes': 517})
+        for execution, output in ((inline, 'backfilled output'), (spilled, 'y' * 500)):
+            execution.refresh_from_db()
+            self.assertIsNotNone(execution.output_ref_id)
+            self.assertEqual((execution.output, execution.output_blob, stored_output(execution)), ('', None, output))
+        self.assertEqual(ScriptOutputBlob.objects.get(id=inline.output_ref_id).ref_count, 2)
+        self.assertFalse(get_output_storage().exists(spilled_path))
+        running.refresh_from_db()
+        self.assertIsNone(running.output_ref_id)
+
+    def test_command(self):
+        self.execution('command output')
+        out = StringIO()
+        with mock.patch('logging.basicConfig'):
+            call_command('outputstats', '--gc', '--json', stdout=out, stderr=StringIO())
+        self.assertEqual(json.loads(out.getvalue())['deduplicated_executions'], 1)
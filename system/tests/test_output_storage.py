@@ -0,0 +1,120 @@
+import tempfile
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from system.models import ScriptExecution
+from system.output_storage import iter_output_blob, parse_byte_range, prepare_output_fields, write_output_blob
+from system.services import ScriptExecutionService
+
+from .helpers import create_script
+
+
+class ParseByteRangeTests(SimpleTestCase):
+    """HTTP Range 请求头解析"""
+
+    def test_ranges(self):
+        self.assertEqual(parse_byte_range('bytes=0-9', 100), (0, 10))
+        self.assertEqual(parse_byte_range('bytes=90-', 100), (90, 100))
+        self.assertEqual(parse_byte_range('bytes=-10', 100), (90, 100))
+        self.assertEqual(parse_byte_range('bytes=50-500', 100), (50, 100))
+        self.assertEqual(parse_byte_range('bytes=-500', 100), (0, 100))
+
+    def test_unsupported_ranges_serve_full_content(self):
+        self.assertIsNone(parse_byte_range('items=0-9', 100))
+        self.assertIsNone(parse_byte_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(parse_byte_range('bytes=a-b', 100))
+
+    def test_unsatisfiable_range(self):
+        with self.assertRaises(ValueError):
+            parse_byte_range('bytes=100-', 100)
+        with self.assertRaises(ValueError):
+            parse_byte_range('bytes=0-9', 0)
+
+
+class OutputStorageTestMixin:
+    """输出存储写入临时目录，按小阈值转存，不去重"""
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        storage_settings = override_settings(
+            SCRIPT_OUTPUT_STORAGE_DIR=directory.name,
+            SCRIPT_OUTPUT_INLINE_LIMIT=64,
+            SCRIPT_OUTPUT_PREVIEW_SIZE=8,
+            SCRIPT_OUTPUT_BLOCK_SIZE=16,
+            SCRIPT_OUTPUT_DEDUP_MIN_SIZE=0,
+        )
+        storage_settings.enable()
+        self.addCleanup(storage_settings.disable)
+
+
+class OutputBlobTests(OutputStorageTestMixin, SimpleTestCase):
+    """分块压缩存储和按范围读取"""
+
+    def test_range_reads_across_blocks(self):
+        data = bytes(range(256)) * 2
+        blob = write_output_blob('abc', data)
+        self.assertEqual(len(blob['offsets']), 512 // 16 + 1)
+        for start, end in ((0, 512), (5, 6), (10, 40), (16, 32), (500, 512), (7, 7)):
+            self.assertEqual(b''.join(iter_output_blob(blob, start, end)), data[start:end])
+
+    def test_small_output_stays_inline(self):
+        fields = prepare_output_fields('abc', 'short')
+        self.assertEqual((fields['output'], fields['output_size'], fields['output_blob']), ('short', 5, None))
+
+    def test_large_output_spills_with_preview(self):
+        output = '行' * 100
+        fields = prepare_output_fields('abc', output)
+        self.assertEqual(fields['output_size'], 300)
+        self.assertLessEqual(len(fields['output'].encode('utf-8')), 8)
+        self.assertEqual(b''.join(iter_output_blob(fields['output_blob'], 0, 300)).decode('utf-8'), output)
+
+
+class OutputDownloadViewTests(OutputStorageTestMixin, TestCase):
+    """完整输出下载和 Range 响应"""
+
+    def setUp(self):
+        super().setUp()
+        self.output = ''.join(str(index % 10) for index in range(200))
+        self.execution = ScriptExecution.objects.create(
+            script_task=create_script(), status='success', **prepare_output_fields('abc', self.output)
+        )
+        self.url = f'/api/v1/system/executions/{self.execution.id}/output/download/'
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], '200')
+        self.assertEqual(self.content(response), self.output)
+
+    def test_partial_download(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=10-49'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-49/200')
+        self.assertEqual(self.content(response), self.output[10:50])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=500-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */200')
+
+    def test_output_size_of_inline_output(self):
+        execution = ScriptExecution.objects.create(script_task=create_script(), status='success', output='数据')
+        self.assertEqual(ScriptExecutionService.get_output_size(execution), 6)
+
+
+class ExecutionListOutputTests(TestCase):
+    """执行记录列表只返回 output，格式化输出仅在详情中返回"""
+
+    def test_list_omits_formatted_output(self):
+        execution = ScriptExecution.objects.create(script_task=create_script(), status='success', output='done')
+        item = self.client.get('/api/v1/system/executions/').json()['data']['items'][0]
+        self.assertEqual(item['output'], 'done')
+        self.assertNotIn('formatted_output', item)
+
+        detail = self.client.get(f'/api/v1/system/executions/{execution.id}/').json()['data']
+        self.assertIn('done', detail['formatted_output'])
@@ -0,0 +1,77 @@
+import sys
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from system.models import ScriptTask
+from system.python_forkserver import PythonForkServer
+from system.script_executor import ScriptExecutor
+
+
+class PythonForkServerTests(SimpleTestCase):
+    """Python 预热解释器"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.forkserver = PythonForkServer(preload_modules=['json'], python=sys.executable)
+        cls.addClassCleanup(cls.forkserver.stop)
+
+    def run_code(self, code, params=None, content_hash=''):
+        process = self.forkserver.spawn(code, params or {}, cwd='/tmp', content_hash=content_hash)
+        stdout, stderr = process.stdout.read(), process.stderr.read()
+        process.stdout.close()
+        process.stderr.close()
+        return process.wait(), stdout.decode(), stderr.decode(), process
+
+    def test_params_and_output(self):
+        returncode, stdout, stderr, process = self.run_code('print(PARAMS["name"])', {'name': '车辆'})
+        self.assertEqual((returncode, stdout, stderr), (0, '车辆\n', ''))
+        self.assertGreater(process.pid, 0)
+        self.assertIn('ru_maxrss', process.rusage)
+
+    def test_exit_codes(self):
+        self.assertEqual(self.run_code('sys.exit(3)')[0], 3)
+        self.assertEqual(self.run_code('sys.exit("bad")')[:3], (1, '', 'bad\n'))
+
+        returncode, _, stderr, _ = self.run_code('raise ValueError("boom")')
+        self.assertEqual(returncode, 1)
+        self.assertIn('ValueError: boom', stderr)
+        self.assertNotIn('forkserver_main', stderr)
+
+    def test_syntax_error_is_reported_by_child(self):
+        returncode, _, stderr, _ = self.run_code('def (:', content_hash='broken')
+        self.assertEqual(returncode, 1)
+        self.assertIn('SyntaxError', stderr)
+
+    def test_same_hash_runs_cached_code(self):
+        # 相同内容哈希复用首次编译的代码对象
+        self.assertEqual(self.run_code('print(1)', content_hash='same')[1], '1\n')
+        self.assertEqual(self.run_code('print(2)', content_hash='same')[1], '1\n')
+
+    def test_restarts_after_exit(self):
+        self.forkserver.stop()
+        self.assertEqual(self.run_code('print("again")')[:2], (0, 'again\n'))
+
+
+@override_settings(SCRIPT_PYTHON_FORKSERVER_ENABLED=True)
+class ForkServerExecutorTests(SimpleTestCase):
+    """执行器经预热解释器执行 Python 脚本"""
+
+    def setUp(self):
+        self.script = ScriptTask(name='script', script_type='python', content='print(PARAMS["n"] * 2)', timeout=10)
+
+    def test_execute_through_forkserver(self):
+        forkserver = PythonForkServer(python=sys.executable)
+        self.addCleanup(forkserver.stop)
+        with mock.patch('system.script_executor.get_python_forkserver', return_value=forkserver):
+            success, output, error, _ = ScriptExecutor(self.script).execute({'n': 21})
+        self.assertEqual((success, output.strip(), error), (True, '42', ''))
+
+    def test_falls_back_to_process_when_unavailable(self):
+        forkserver = mock.Mock(spawn=mock.Mock(side_effect=RuntimeError("Python 预热解释器启动失败")))
+        with mock.patch('system.script_executor.get_python_forkserver', return_value=forkserver):
+            with self.assertLogs('system.script_executor', 'WARNING'):
+                success, output, _, _ = ScriptExecutor(self.script).execute({'n': 21})
+        self.assertTrue(success)
+        self.assertEqual(output.strip(), '42')
@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from system.models import ScriptRateBucket
+from system.rate_limit import acquire, get_bucket_levels, parse_rate, prune_idle_buckets, return_token, take_token
+
+from .helpers import InlineExecutionMixin, create_script
+
+
+class Clock:
+    """可手动推进的 time.time"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class ParseRateTests(SimpleTestCase):
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('60/min'), (60.0, 1.0))
+        self.assertEqual(parse_rate('10/s'), (10.0, 10.0))
+        self.assertEqual(parse_rate('7200/hour'), (7200.0, 2.0))
+        self.assertIsNone(parse_rate(''))
+        for rate in ('0/min', '10/week', 'x/min'):
+            with self.assertRaises(ValueError):
+                parse_rate(rate)
+
+
+class TokenBucketTests(TestCase):
+    """数据库令牌桶的扣减与按时间补充"""
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch('system.rate_limit.time.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def take(self, key='client:a', capacity=3, refill_rate=1.0):
+        return take_token('client', key, capacity, refill_rate)
+
+    def test_burst_then_refill(self):
+        self.assertEqual([self.take()[0] for _ in range(4)], [True, True, True, False])
+        self.assertEqual(self.take(), (False, 1.0))
+        self.assertEqual(ScriptRateBucket.objects.get().rejected_count, 2)
+
+        self.clock.now += 0.5
+        allowed, wait = self.take()
+        self.assertEqual((allowed, wait), (False, 0.5))
+        self.clock.now += 0.5
+        self.assertEqual(self.take(), (True, 0))
+
+        # 补充不超过容量
+        self.clock.now += 100
+        self.assertEqual([self.take()[0] for _ in range(4)], [True, True, True, False])
+
+    def test_clock_going_back_does_not_refill(self):
+        self.take(capacity=1)
+        self.clock.now -= 50
+        self.assertFalse(self.take(capacity=1)[0])
+
+    def test_return_token(self):
+        self.take(capacity=1)
+        return_token('client:a', 1)
+        return_token('client:a', 1)
+        self.assertEqual(ScriptRateBucket.objects.get().tokens, 1)
+
+    def test_prune_idle_buckets(self):
+        self.take(key='client:idle', capacity=2, refill_rate=1.0)
+        self.clock.now += 10
+        self.take(key='client:busy', capacity=2, refill_rate=1.0)
+        self.clock.now += 1
+        self.assertEqual(prune_idle_buckets(), 1)
+        self.assertEqual(list(ScriptRateBucket.objects.values_list('key', flat=True)), ['client:busy'])
+
+    @override_settings(SCRIPT_RATE_LIMIT_CLIENT='2/min', SCRIPT_RATE_LIMIT_SCRIPT='3/min', SCRIPT_RATE_LIMIT_GLOBAL='')
+    def test_acquire_returns_tokens_of_earlier_levels(self):
+        self.assertEqual([acquire('a', 's1')[0] for _ in range(2)], [True, True])
+        self.assertTrue(acquire('b', 's1')[0])
+        # 脚本桶已空：客户端 b 取得的令牌被退回
+        allowed, wait = acquire('b', 's1')
+        self.assertEqual((allowed, round(wait)), (False, 20))
+        levels = {bucket['key']: bucket['tokens'] for bucket in get_bucket_levels()['buckets']}
+        self.assertEqual(levels, {'client:a': 0, 'client:b': 1, 'script:s1': 0})
+        self.assertFalse(acquire('a', 's2')[0])
+        self.assertFalse(ScriptRateBucket.objects.filter(key='script:s2').exists())
+
+
+@override_settings(SCRIPT_RATE_LIMIT_CLIENT='2/min', SCRIPT_RATE_LIMIT_SCRIPT='', SCRIPT_RATE_LIMIT_GLOBAL='')
+class ExecuteThrottleTests(InlineExecutionMixin, TestCase):
+    """执行接口超限返回 429 和 Retry-After"""
+
+    def test_execute_throttled(self):
+        script = create_script()
+        url = f'/api/v1/system/scripts/{script.id}/execute/'
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, {}, content_type='application/json').status_code, 200)
+
+        response = self.client.post(url, {}, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(response.json()['data'], {'retry_after': 30})
+
+        stats = self.client.get('/api/v1/system/executions/rate-limits/', {'scope': 'client'}).json()['data']
+        self.assertEqual(stats['limits'], {'client': {'capacity': 2.0, 'refill_rate': 2 / 60}})
+        self.assertEqual(stats['buckets'][0]['rejected_count'], 1)
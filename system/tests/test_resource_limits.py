@@ -0,0 +1,59 @@
+from django.test import SimpleTestCase, TestCase
+
+from system.models import ScriptTask
+from system.script_executor import ScriptExecutor
+from system.services import ScriptTaskService
+
+from .helpers import InlineExecutionMixin, create_script
+
+
+class ResourceLimitTests(SimpleTestCase):
+    """子进程资源上限"""
+
+    def execute(self, content, script_type='bash', **limits):
+        script = ScriptTask(name='script', script_type=script_type, content=content, timeout=30, **limits)
+        executor = ScriptExecutor(script)
+        return executor, executor.execute()
+
+    def test_build_limits(self):
+        script = ScriptTask(memory_limit=64, cpu_time_limit=2, open_files_limit=32)
+        self.assertEqual(ScriptExecutor(script)._build_limits(), {
+            'RLIMIT_AS': 64 * 1024 * 1024, 'RLIMIT_CPU': 2, 'RLIMIT_NOFILE': 32
+        })
+        self.assertEqual(ScriptExecutor(ScriptTask())._build_limits(), {})
+
+    def test_output_limit_truncates_and_stops(self):
+        executor, (success, output, error, _) = self.execute('yes x', output_limit=1)
+        self.assertFalse(success)
+        self.assertEqual(executor.outcome, 'output_limit')
+        self.assertEqual(len(output), 1024)
+        self.assertIn("脚本输出超过上限", error)
+
+    def test_cpu_time_limit(self):
+        _, (success, _, error, _) = self.execute('while :; do :; done', cpu_time_limit=1)
+        self.assertFalse(success)
+        self.assertRegex(error, '脚本被信号 SIG(XCPU|KILL) 终止')
+
+    def test_memory_limit(self):
+        _, (success, _, error, _) = self.execute(
+            'data = bytearray(512 * 1024 * 1024)', script_type='python', memory_limit=128
+        )
+        self.assertFalse(success)
+        self.assertIn('MemoryError', error)
+
+    def test_open_files_limit(self):
+        _, (success, output, _, _) = self.execute('ulimit -n', open_files_limit=16)
+        self.assertEqual((success, output.strip()), (True, '16'))
+
+
+class ResourceUsageTests(InlineExecutionMixin, TestCase):
+    """执行记录中的资源使用"""
+
+    def test_usage_recorded(self):
+        script = create_script(content='python3 -c "bytearray(32 * 1024 * 1024)"')
+        execution, _ = ScriptTaskService.execute_script(script.id, {})
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'success')
+        self.assertGreater(execution.max_rss, 32 * 1024)
+        self.assertIsNotNone(execution.cpu_user_time)
+        self.assertIsNotNone(execution.cpu_system_time)
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from system.models import ScriptExecution, ScriptTask
+from system.services import ScriptExecutionService, ScriptTaskService
+
+from .helpers import InlineExecutionMixin, create_script
+
+
+class ResultCacheTests(InlineExecutionMixin, TestCase):
+    """确定性脚本的结果缓存"""
+
+    def setUp(self):
+        super().setUp()
+        self.script = create_script(content='echo "$n"; date +%s%N', cache_enabled=True, cache_ttl=3600)
+
+    def execute(self, parameters):
+        execution, error = ScriptTaskService.execute_script(self.script.id, parameters)
+        self.assertIsNone(error)
+        execution.refresh_from_db()
+        return execution
+
+    def test_same_parameters_reuse_result(self):
+        first = self.execute({'n': 1, 'm': 2})
+        second = self.execute({'m': 2, 'n': 1})
+        self.assertFalse(first.cache_hit)
+        self.assertTrue(second.cache_hit)
+        self.assertEqual(second.cached_from_id, first.id)
+        self.assertEqual((second.status, second.output), ('success', first.output))
+
+        other = self.execute({'n': 2})
+        self.assertFalse(other.cache_hit)
+
+        stats = ScriptTaskService.get_cache_stats(ScriptTask.objects.get(id=self.script.id))
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries'], stats['hit_rate']), (1, 2, 2, 33.3))
+
+    def test_cache_hit_serves_source_output_chunks(self):
+        first = self.execute({'n': 7})
+        second = self.execute({'n': 7})
+        data, _ = ScriptExecutionService.get_execution_output(second)
+        self.assertEqual(data['content'], first.output)
+
+    def test_failed_and_expired_results_are_not_reused(self):
+        failed = create_script(name='failed', content='exit 1', cache_enabled=True)
+        first, _ = ScriptTaskService.execute_script(failed.id, {})
+        second, _ = ScriptTaskService.execute_script(failed.id, {})
+        self.assertNotEqual(first.id, second.id)
+        self.assertFalse(ScriptExecution.objects.get(id=second.id).cache_hit)
+
+        first = self.execute({})
+        ScriptExecution.objects.filter(id=first.id).update(finished_at=timezone.now() - timedelta(hours=2))
+        self.assertFalse(self.execute({}).cache_hit)
+
+    def test_invalidation(self):
+        self.execute({})
+        ScriptTaskService.invalidate_cache(self.script.id)
+        self.assertFalse(self.execute({}).cache_hit)
+
+        response = self.client.delete(f'/api/v1/system/scripts/{self.script.id}/cache/')
+        self.assertEqual(response.json()['data']['entries'], 0)
+
+    def test_content_change_invalidates(self):
+        self.execute({})
+        ScriptTaskService.update_script(self.script.id, {'content': 'echo changed'})
+        self.assertEqual(self.execute({}).output, 'changed\n')
+
+    def test_disabled_cache_always_runs(self):
+        ScriptTask.objects.filter(id=self.script.id).update(cache_enabled=False)
+        self.execute({})
+        self.assertFalse(self.execute({}).cache_hit)
@@ -0,0 +1,97 @@
+from django.test import SimpleTestCase, TestCase
+
+from system.models import ScriptExecution
+from system.result_parser import build_result_lookups, parse_result
+from system.services import ScriptExecutionService, ScriptTaskService
+
+from .helpers import InlineExecutionMixin, create_script
+
+
+class ParseResultTests(SimpleTestCase):
+    """按返回类型解析输出"""
+
+    def test_json(self):
+        self.assertEqual(parse_result('json', '{"ok": true}\n', 1024), ({'ok': True}, None))
+        # 先打印日志、最后一行输出结果
+        self.assertEqual(parse_result('json', 'loading...\ndone\n[1, 2]\n', 1024), ([1, 2], None))
+        result, error = parse_result('json', 'not json', 1024)
+        self.assertIsNone(result)
+        self.assertIn("按 json 解析输出失败", error)
+
+    def test_xml(self):
+        result, error = parse_result(
+            'xml', '<report id="7"><item>a</item><item>b</item><total>2</total></report>', 1024
+        )
+        self.assertIsNone(error)
+        self.assertEqual(result, {'report': {'@id': '7', 'item': ['a', 'b'], 'total': '2'}})
+        self.assertIn("按 xml 解析输出失败", parse_result('xml', '<a>', 1024)[1])
+
+    def test_html(self):
+        output = ('<html><head><title>报告</title></head><body><table>'
+                  '<tr><th>名称</th><th>数量</th></tr><tr><td> a </td><td>1</td></tr></table></body></html>')
+        self.assertEqual(parse_result('html', output, 1024), (
+            {'title': '报告', 'tables': [[['名称', '数量'], ['a', '1']]]}, None
+        ))
+
+    def test_text_empty_and_oversized(self):
+        self.assertEqual(parse_result('text', '{"a": 1}', 1024), (None, None))
+        self.assertEqual(parse_result('json', '  \n', 1024), (None, None))
+        self.assertEqual(parse_result('json', '[' + '1,' * 100 + '1]', 10), (None, "输出超过 10 字节，未解析结果"))
+
+    def test_build_result_lookups(self):
+        lookups, error = build_result_lookups({
+            'result.summary.failed__gt': '0', 'result.name': 'abc', 'result.flag__isnull': 'true', 'page': '1'
+        })
+        self.assertIsNone(error)
+        self.assertEqual(lookups, {
+            'result__summary__failed__gt': 0, 'result__name__exact': 'abc', 'result__flag__isnull': True
+        })
+        self.assertEqual(build_result_lookups({'result.a__regex': 'x'}), (None, "结果查询参数无效: result.a__regex"))
+        self.assertEqual(build_result_lookups({'result.a b': 'x'})[1], "结果查询参数无效: result.a b")
+
+
+class StructuredResultTests(InlineExecutionMixin, TestCase):
+    """执行结束时解析结果并支持按结果字段查询和统计"""
+
+    def setUp(self):
+        super().setUp()
+        self.script = create_script(
+            content='echo "{\\"host\\": \\"$host\\", \\"summary\\": {\\"failed\\": $failed}}"', return_type='json'
+        )
+        for host, failed in (('a', 0), ('a', 2), ('b', 5)):
+            ScriptTaskService.execute_script(self.script.id, {'host': host, 'failed': failed})
+
+    def test_result_stored_once(self):
+        execution = ScriptExecution.objects.filter(script_task=self.script).order_by('created_at').last()
+        self.assertEqual(execution.result, {'host': 'b', 'summary': {'failed': 5}})
+        self.assertEqual(execution.result_error, '')
+
+    def test_parse_failure_keeps_success(self):
+        script = create_script(name='broken', content='echo oops', return_type='json')
+        execution, _ = ScriptTaskService.execute_script(script.id, {})
+        execution.refresh_from_db()
+        self.assertEqual((execution.status, execution.result), ('success', None))
+        self.assertIn("按 json 解析输出失败", execution.result_error)
+
+    def test_filter_by_result(self):
+        response = self.client.get('/api/v1/system/executions/', {
+            'script_id': self.script.id, 'result.summary.failed__gte': '2'
+        })
+        items = response.json()['data']['items']
+        self.assertEqual(sorted(item['result']['summary']['failed'] for item in items), [2, 5])
+
+    def test_aggregate(self):
+        data, error = ScriptExecutionService.aggregate_results(self.script.id, {'field': 'summary.failed'})
+        self.assertIsNone(error)
+        self.assertEqual((data['value'], data['executions']), (7, 3))
+
+        data, _ = ScriptExecutionService.aggregate_results(
+            self.script.id, {'field': 'summary.failed', 'func': 'max', 'group_by': 'host'}
+        )
+        self.assertEqual(
+            [(row['group'], row['value'], row['executions']) for row in data['groups']], [('a', 2, 2), ('b', 5, 1)]
+        )
+        self.assertEqual(
+            ScriptExecutionService.aggregate_results(self.script.id, {'field': 'x', 'func': 'median'}),
+            (None, "func 参数无效")
+        )
@@ -0,0 +1,115 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from system.models import ScriptExecution, ScriptExecutionDailySummary, ScriptOutputChunk
+from system.partitioning import month_start
+from system.retention import ExecutionRetention, get_retention_cutoffs
+
+from .helpers import create_script
+
+
+class MonthStartTests(SimpleTestCase):
+
+    def test_month_offsets(self):
+        moment = timezone.make_aware(datetime(2024, 11, 15, 8))
+        self.assertEqual(month_start(moment), timezone.make_aware(datetime(2024, 11, 1)))
+        self.assertEqual(month_start(moment, 2), timezone.make_aware(datetime(2025, 1, 1)))
+        self.assertEqual(month_start(moment, -11), timezone.make_aware(datetime(2023, 12, 1)))
+
+
+@override_settings(SCRIPT_EXECUTION_RETENTION_DAYS=30)
+class ExecutionRetentionTests(TestCase):
+    """按保留天数清理执行记录"""
+
+    def setUp(self):
+        self.script = create_script()
+        self.now = timezone.now()
+
+    def execution(self, days_ago, status='success', execution_time=1.0, **kwargs):
+        execution = ScriptExecution.objects.create(
+            script_task=self.script, status=status, execution_time=execution_time, **kwargs
+        )
+        ScriptExecution.objects.filter(id=execution.id).update(created_at=self.now - timedelta(days=days_ago))
+        return execution
+
+    def test_cutoffs(self):
+        forever = create_script(name='forever', retention_days=0)
+        short = create_script(name='short', retention_days=7)
+        cutoffs = get_retention_cutoffs(self.now)
+        self.assertEqual(cutoffs[self.script.id], self.now - timedelta(days=30))
+        self.assertEqual(cutoffs[short.id], self.now - timedelta(days=7))
+        self.assertIsNone(cutoffs[forever.id])
+
+    def test_purge_in_batches_with_daily_summary(self):
+        old = [self.execution(40, execution_time=time) for time in (1.0, 2.0, 3.0)]
+        self.execution(40, status='failed', execution_time=None)
+        self.execution(40, cache_hit=True, execution_time=0)
+        running = self.execution(40, status='running')
+        recent = self.execution(1)
+        ScriptOutputChunk.objects.create(execution=old[0], stream='stdout', offset=0, size=1, content='x')
+
+        stats = ExecutionRetention(batch_size=2).run()
+        self.assertEqual(stats['deleted'], 5)
+        self.assertEqual(
+            set(ScriptExecution.objects.values_list('id', flat=True)), {running.id, recent.id}
+        )
+        self.assertFalse(ScriptOutputChunk.objects.exists())
+
+        summary = ScriptExecutionDailySummary.objects.get(script_task=self.script)
+        self.assertEqual(summary.date, timezone.localdate(self.now - timedelta(days=40)))
+        self.assertEqual(
+            (summary.total_count, summary.success_count, summary.failure_count, summary.cache_hit_count),
+            (5, 4, 1, 1)
+        )
+        self.assertEqual((summary.total_time, summary.min_time, summary.max_time), (6.0, 1.0, 3.0))
+
+    def test_dry_run_changes_nothing(self):
+        self.execution(40)
+        stats = ExecutionRetention(dry_run=True).run()
+        self.assertEqual(stats['deleted'], 1)
+        self.assertEqual(ScriptExecution.objects.count(), 1)
+        self.assertFalse(ScriptExecutionDailySummary.objects.exists())
+
+    def test_archive_before_delete(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        execution = self.execution(40, output='out')
+        ScriptOutputChunk.objects.create(execution=execution, stream='stderr', offset=0, size=4, content='warn')
+
+        with override_settings(SCRIPT_OUTPUT_STORAGE_DIR=directory.name):
+            stats = ExecutionRetention(archive=True).run()
+        self.assertEqual(stats['archived'], 1)
+
+        archive_dir = os.path.join(directory.name, 'archive', str(self.script.id))
+        [name] = os.listdir(archive_dir)
+        with gzip.open(os.path.join(archive_dir, name), 'rt', encoding='utf-8') as f:
+            row = json.loads(f.read())
+        self.assertEqual((row['id'], row['output'], row['stderr']), (str(execution.id), 'out', 'warn'))
+
+    def test_compact_chunks(self):
+        execution = self.execution(1, finished_at=self.now - timedelta(days=2))
+        for offset, content in ((0, 'ab'), (2, 'cd'), (4, 'e')):
+            ScriptOutputChunk.objects.create(
+                execution=execution, stream='stdout', offset=offset, size=len(content), content=content
+            )
+        stats = ExecutionRetention().run(compact_before=self.now - timedelta(days=1))
+        self.assertEqual(stats['chunks_compacted'], 2)
+        chunk = ScriptOutputChunk.objects.get(execution=execution)
+        self.assertEqual((chunk.offset, chunk.size, chunk.content), (0, 5, 'abcde'))
+
+    def test_command(self):
+        self.execution(40)
+        out = StringIO()
+        # 命令会配置根日志，测试中不改动全局日志设置
+        with mock.patch('logging.basicConfig'):
+            call_command('pruneexecutions', stdout=out)
+        self.assertIn("已清理执行记录 1 条", out.getvalue())
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from system.cron import CronExpression
+from system.models import ScriptExecution, ScriptSchedule
+from system.scheduler import ScriptScheduler
+from system.services import ScriptScheduleService, ScriptTaskService
+
+from .helpers import create_script
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class CronExpressionTests(SimpleTestCase):
+    """cron 表达式的下一次触发时间（按当前时区）"""
+
+    def assertNext(self, expression, moment, expected):
+        self.assertEqual(CronExpression(expression).next_after(moment), expected)
+
+    def test_next_fire_time(self):
+        self.assertNext('*/15 * * * *', local(2024, 1, 1, 10, 7, 30), local(2024, 1, 1, 10, 15))
+        # 严格晚于给定时间
+        self.assertNext('0 * * * *', local(2024, 1, 1, 10, 0), local(2024, 1, 1, 11, 0))
+        self.assertNext('30 9 * * mon-fri', local(2024, 1, 5, 10, 0), local(2024, 1, 8, 9, 30))
+        self.assertNext('0 0 1 jan *', local(2024, 3, 1), local(2025, 1, 1))
+        self.assertNext('@daily', local(2024, 12, 31, 23, 59), local(2025, 1, 1))
+        self.assertNext('0 12 29 2 *', local(2023, 3, 1), local(2024, 2, 29, 12, 0))
+        self.assertNext('0 0 * * 7', local(2024, 1, 1), local(2024, 1, 7))
+
+    def test_day_or_weekday(self):
+        # 日和星期同时限定时满足其一即触发
+        expression = CronExpression('0 0 13 * fri')
+        self.assertEqual(expression.upcoming(local(2024, 9, 1), 3), [
+            local(2024, 9, 6), local(2024, 9, 13), local(2024, 9, 20)
+        ])
+
+    def test_invalid_expressions(self):
+        for expression in ('* * * *', '60 * * * *', '* * * * 8', '*/0 * * * *', '5-1 * * * *', 'x * * * *'):
+            with self.assertRaises(ValueError, msg=expression):
+                CronExpression(expression)
+        with self.assertRaises(ValueError):
+            CronExpression('0 0 30 2 *').next_after(local(2024, 1, 1))
+
+
+@mock.patch.object(ScriptTaskService, '_dispatch_execution', return_value=True)
+class ScriptSchedulerTests(TestCase):
+    """定时计划调度进程"""
+
+    def setUp(self):
+        self.script = create_script()
+
+    def create_schedule(self, **kwargs):
+        data = {'script_task': self.script.id, 'name': 'every minute', 'cron_expression': '* * * * *', **kwargs}
+        schedule, errors = ScriptScheduleService.create_schedule(data)
+        self.assertIsNone(errors)
+        return schedule
+
+    def make_due(self, schedule, seconds_ago=1):
+        slot = timezone.now().replace(microsecond=0) - timedelta(seconds=seconds_ago)
+        ScriptSchedule.objects.filter(id=schedule.id).update(next_run_at=slot)
+        return slot
+
+    def test_create_computes_next_run(self, dispatch):
+        schedule = self.create_schedule()
+        self.assertGreater(schedule.next_run_at, timezone.now())
+        self.assertEqual(schedule.next_run_at.second, 0)
+
+        _, errors = ScriptScheduleService.create_schedule({
+            'script_task': self.script.id, 'name': 'bad', 'cron_expression': '0 0 30 2 *'
+        })
+        self.assertIn('cron_expression', errors)
+
+    def test_due_schedule_fires_once_across_schedulers(self, dispatch):
+        schedule = self.create_schedule(parameters={'a': 1})
+        slot = self.make_due(schedule)
+        first, second = ScriptScheduler(), ScriptScheduler()
+        first.refresh()
+        second.refresh()
+
+        first.fire_due()
+        second.fire_due()
+
+        execution = ScriptExecution.objects.get(schedule=schedule)
+        self.assertEqual(execution.input_parameters, {'a': 1})
+        schedule.refresh_from_db()
+        self.assertEqual((schedule.run_count, schedule.last_execution_id), (1, execution.id))
+        self.assertGreater(schedule.next_run_at, slot)
+        # 落后的调度进程按数据库中的新时间重新排期
+        self.assertEqual(second.stats()['scheduled'], 1)
+        self.assertEqual(second._slots[schedule.id], schedule.next_run_at)
+
+    def test_misfire_skip(self, dispatch):
+        schedule = self.create_schedule(misfire_policy='skip', misfire_grace_seconds=10)
+        self.make_due(schedule, seconds_ago=300)
+        scheduler = ScriptScheduler()
+        scheduler.refresh()
+        with self.assertLogs('system.scheduler', 'WARNING'):
+            scheduler.fire_due()
+
+        schedule.refresh_from_db()
+        self.assertFalse(ScriptExecution.objects.filter(schedule=schedule).exists())
+        self.assertEqual((schedule.run_count, schedule.misfire_count), (0, 1))
+        # 错过多个触发时间后从当前时间继续
+        self.assertGreater(schedule.next_run_at, timezone.now())
+
+    def test_refresh_drops_deactivated_schedules(self, dispatch):
+        schedule = self.create_schedule()
+        scheduler = ScriptScheduler()
+        scheduler.refresh()
+        self.assertEqual(scheduler.stats()['scheduled'], 1)
+
+        ScriptScheduleService.update_schedule(schedule.id, {'is_active': False})
+        scheduler.refresh()
+        self.assertEqual(scheduler.stats()['scheduled'], 0)
+        self.make_due(schedule)
+        scheduler.fire_due()
+        self.assertFalse(ScriptExecution.objects.exists())
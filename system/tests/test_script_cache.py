@@ -0,0 +1,116 @@
+import fcntl
+import os
+
+from django.test import SimpleTestCase, TestCase
+
+from system.models import ScriptTask
+from system.script_cache import (
+    PreparedScriptCache, check_script_syntax, compute_cache_key, compute_content_hash
+)
+from system.script_executor import ScriptExecutor
+
+from .helpers import create_script
+
+
+class ScriptHashTests(SimpleTestCase):
+
+    def test_cache_key_ignores_parameter_order(self):
+        content_hash = compute_content_hash('echo hi')
+        self.assertEqual(
+            compute_cache_key(content_hash, {'a': 1, 'b': 2}),
+            compute_cache_key(content_hash, {'b': 2, 'a': 1})
+        )
+        self.assertNotEqual(
+            compute_cache_key(content_hash, {'a': 1}),
+            compute_cache_key(compute_content_hash('echo bye'), {'a': 1})
+        )
+
+    def test_syntax_check(self):
+        self.assertIsNone(check_script_syntax('python', 'print(1)'))
+        self.assertIn('Python 语法错误', check_script_syntax('python', 'def (:'))
+        self.assertIsNone(check_script_syntax('bash', 'echo ok'))
+        self.assertIn('Bash 语法错误', check_script_syntax('bash', 'if true; then'))
+
+
+class ContentHashTests(TestCase):
+
+    def test_hash_follows_content(self):
+        script = create_script(content='echo a')
+        self.assertEqual(script.content_hash, compute_content_hash('echo a'))
+        script.content = 'echo b'
+        script.save(update_fields=['content'])
+        script.refresh_from_db()
+        self.assertEqual(script.content_hash, compute_content_hash('echo b'))
+
+
+class PreparedScriptCacheTests(SimpleTestCase):
+    """按内容哈希缓存渲染后的脚本"""
+
+    def script(self, content):
+        return ScriptTask(script_type='bash', content=content)
+
+    def test_hits_by_content(self):
+        cache = PreparedScriptCache()
+        with cache.acquire(self.script('echo 1')) as first:
+            pass
+        with cache.acquire(self.script('echo 1')) as second:
+            self.assertIs(first, second)
+        with cache.acquire(self.script('echo 2')):
+            pass
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_sealed_memory_file(self):
+        if not hasattr(os, 'memfd_create'):
+            self.skipTest("memfd_create 不可用")
+        cache = PreparedScriptCache()
+        with cache.acquire(self.script('echo sealed')) as prepared:
+            command, fds = prepared.command()
+            self.assertEqual(command, ['bash', f'/dev/fd/{prepared.fd}'])
+            self.assertEqual(fds, (prepared.fd,))
+            self.assertTrue(fcntl.fcntl(prepared.fd, fcntl.F_GET_SEALS) & fcntl.F_SEAL_WRITE)
+            with self.assertRaises(OSError):
+                os.write(prepared.fd, b'x')
+
+    def test_evicted_entry_closed_after_last_user(self):
+        if not hasattr(os, 'memfd_create'):
+            self.skipTest("memfd_create 不可用")
+        cache = PreparedScriptCache(max_entries=1)
+        with cache.acquire(self.script('echo old')) as old:
+            with cache.acquire(self.script('echo new')):
+                pass
+            # 使用中的脚本被淘汰后不立即关闭
+            self.assertIsNotNone(old.fd)
+        self.assertIsNone(old.fd)
+
+
+class ScriptParameterDeliveryTests(SimpleTestCase):
+    """参数经环境变量传入脚本"""
+
+    def execute(self, script_type, content, parameters):
+        script = ScriptTask(name='script', script_type=script_type, content=content, timeout=10)
+        return ScriptExecutor(script).execute(parameters)
+
+    def test_bash_parameters_become_variables(self):
+        success, output, _, _ = self.execute('bash', 'echo "$name $count"; env | grep -c "^PARAM_" || true', {
+            'name': 'a b', 'count': 3
+        })
+        self.assertTrue(success)
+        self.assertEqual(output.split('\n')[:2], ['a b 3', '0'])
+
+    def test_python_parameters(self):
+        success, output, _, _ = self.execute('python', 'print(PARAMS["items"][1])', {'items': [1, '二']})
+        self.assertTrue(success)
+        self.assertEqual(output.strip(), '二')
+
+    def test_reserved_names_are_not_exported(self):
+        with self.assertLogs('system.script_executor', 'WARNING'):
+            env = ScriptExecutor._build_env({'PATH': '/tmp', 'LD_PRELOAD': 'x.so', 'bad-name': 1, 'ok': 1})
+        self.assertNotIn('PARAM_PATH', env)
+        self.assertNotIn('PARAM_LD_PRELOAD', env)
+        self.assertNotIn('PARAM_bad-name', env)
+        self.assertEqual(env['PARAM_ok'], '1')
+        self.assertIn('"PATH": "/tmp"', env['SCRIPT_PARAMS'])
+
+        with self.assertLogs('system.script_executor', 'WARNING'):
+            success, output, _, _ = self.execute('bash', 'command -v ls >/dev/null && echo found', {'PATH': '/nowhere'})
+        self.assertEqual((success, output.strip()), (True, 'found'))
@@ -0,0 +1,92 @@
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+
+from system.models import ScriptExecution, ScriptOutputBlob
+from system.search import FTS_IDS_TABLE, build_highlights, filter_by_search, has_search_index, parse_terms
+
+from .helpers import create_script
+
+
+def search(query):
+    return set(filter_by_search(ScriptExecution.objects.all(), query).values_list('output', flat=True))
+
+
+class SearchTermTests(SimpleTestCase):
+    """查询词拆分和高亮片段"""
+
+    def test_parse_terms(self):
+        self.assertEqual(parse_terms('disk "no space left" disk  '), ['disk', 'no space left'])
+        self.assertEqual(parse_terms(''), [])
+        self.assertEqual(len(parse_terms(' '.join(f'w{i}' for i in range(20)))), 10)
+
+    def test_build_highlights(self):
+        execution = ScriptExecution(output='x' * 100 + 'Disk <full>' + 'y' * 100, error_message='disk error')
+        highlights = build_highlights(execution, 'disk', context=5)
+        self.assertEqual(highlights['output'], ['…xxxxx<mark>Disk</mark> &lt;ful…'])
+        self.assertEqual(highlights['error_message'], ['<mark>disk</mark> erro…'])
+        self.assertEqual(build_highlights(execution, 'missing'), {})
+
+
+class ExecutionSearchTests(TestCase):
+    """按输出和错误信息检索执行记录"""
+
+    def setUp(self):
+        self.script = create_script()
+        for output, error in (('Disk full on /var', ''), ('all ok', 'connection refused'), ('磁盘空间不足', '')):
+            ScriptExecution.objects.create(script_task=self.script, status='success', output=output, error_message=error)
+
+    def test_index_created(self):
+        self.assertTrue(has_search_index())
+
+    def test_terms_are_anded(self):
+        self.assertEqual(search('disk'), {'Disk full on /var'})
+        self.assertEqual(search('refused'), {'all ok'})
+        self.assertEqual(search('disk var'), {'Disk full on /var'})
+        self.assertEqual(search('disk refused'), set())
+        self.assertEqual(search('"full on"'), {'Disk full on /var'})
+        # 短于 trigram 长度的词退化为 icontains
+        self.assertEqual(search('ok'), {'all ok'})
+        self.assertEqual(search('磁盘空间'), {'磁盘空间不足'})
+
+    def test_index_follows_updates_and_deletes(self):
+        execution = ScriptExecution.objects.get(output='all ok')
+        execution.output = 'timeout reached'
+        execution.save()
+        self.assertEqual(search('timeout'), {'timeout reached'})
+        self.assertEqual(search('all ok'), set())
+        execution.delete()
+        self.assertEqual(search('timeout'), set())
+
+    def test_shared_output(self):
+        blob = ScriptOutputBlob.objects.create(
+            checksum='a' * 64, size=14, content='kernel panic!!', last_used_at=timezone.now()
+        )
+        ScriptExecution.objects.create(script_task=self.script, status='success', output='', output_ref=blob)
+        self.assertEqual(filter_by_search(ScriptExecution.objects.all(), 'panic').count(), 1)
+
+    def test_endpoint_highlights(self):
+        response = self.client.get('/api/v1/system/executions/', {'q': 'refused'})
+        [item] = response.json()['data']['items']
+        self.assertEqual(item['highlights'], {'error_message': ['connection <mark>refused</mark>']})
+
+
+class SearchIndexVacuumTests(TransactionTestCase):
+    """索引按执行ID关联，VACUUM 重排 rowid 后仍能命中正确的记录"""
+
+    def test_vacuum_keeps_matches(self):
+        script = create_script()
+        executions = [
+            ScriptExecution.objects.create(script_task=script, status='success', output=f'output-{name}')
+            for name in ('alpha', 'beta', 'gamma', 'delta')
+        ]
+        executions[0].delete()
+        executions[2].delete()
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+            cursor.execute(f'SELECT COUNT(*) FROM {FTS_IDS_TABLE}')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+        self.assertEqual(search('output-beta'), {'output-beta'})
+        self.assertEqual(search('output-delta'), {'output-delta'})
+        self.assertEqual(search('gamma'), set())
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import uuid
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import SimpleTestCase, TestCase
+
+from system.models import ScriptExecution, ScriptOutputChunk
+from system.streaming import ExecutionOutputFeed, format_sse, stream_execution_events
+
+from .helpers import create_script
+
+
+def parse_events(messages):
+    """把 SSE 消息解析为 (事件ID, 事件名, 数据)，忽略心跳"""
+    events = []
+    for message in messages:
+        if message.startswith(':'):
+            continue
+        fields = dict(line.split(': ', 1) for line in message.strip().split('\n'))
+        events.append((fields.get('id'), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class FormatSseTests(SimpleTestCase):
+
+    def test_format_with_id(self):
+        self.assertEqual(
+            format_sse('output', {'content': '中文'}, 3),
+            'id: 3\nevent: output\ndata: {"content": "中文"}\n\n'
+        )
+
+
+@mock.patch.object(ExecutionOutputFeed, 'POLL_INTERVAL', 0.01)
+class StreamExecutionEventsTests(TestCase):
+    """执行输出实时推送"""
+
+    def setUp(self):
+        self.execution = ScriptExecution.objects.create(script_task=create_script(), status='running')
+
+    def add_chunk(self, content, offset=0, stream='stdout'):
+        return ScriptOutputChunk.objects.create(
+            execution=self.execution, stream=stream, offset=offset, size=len(content), content=content
+        )
+
+    async def collect(self, last_event_id=0):
+        return parse_events([
+            message async for message in stream_execution_events(self.execution.id, last_event_id, keepalive=5)
+        ])
+
+    async def test_finished_execution_replays_output_then_status(self):
+        first = await sync_to_async(self.add_chunk)('a\n')
+        second = await sync_to_async(self.add_chunk)('b\n', 2)
+        await ScriptExecution.objects.filter(id=self.execution.id).aupdate(status='success')
+
+        events = await self.collect()
+        self.assertEqual(events[:2], [
+            (str(first.id), 'output', {'stream': 'stdout', 'content': 'a\n'}),
+            (str(second.id), 'output', {'stream': 'stdout', 'content': 'b\n'}),
+        ])
+        self.assertEqual(events[2][1:], ('status', {'status': 'success', 'execution_time': None, 'finished_at': None}))
+        self.assertEqual(len(events), 3)
+
+    async def test_reconnect_skips_delivered_chunks(self):
+        first = await sync_to_async(self.add_chunk)('a\n')
+        await sync_to_async(self.add_chunk)('b\n', 2)
+        await ScriptExecution.objects.filter(id=self.execution.id).aupdate(status='failed')
+
+        events = await self.collect(last_event_id=first.id)
+        self.assertEqual([event[2].get('content') for event in events], ['b\n', None])
+
+    async def test_running_execution_streams_new_output_until_finished(self):
+        task = asyncio.ensure_future(self.collect())
+        await asyncio.sleep(0.05)
+        await sync_to_async(self.add_chunk)('late\n')
+        await ScriptExecution.objects.filter(id=self.execution.id).aupdate(status='success')
+
+        events = await asyncio.wait_for(task, 5)
+        self.assertEqual([(event[1], event[2].get('content')) for event in events], [
+            ('output', 'late\n'), ('status', None)
+        ])
+
+
+class ScriptExecutionStreamViewTests(TestCase):
+
+    async def test_unknown_execution(self):
+        response = await self.async_client.get(f'/api/v1/system/executions/{uuid.uuid4()}/stream/')
+        self.assertEqual(json.loads(response.content)['code'], 404)
+
+    async def test_invalid_last_event_id(self):
+        execution = await sync_to_async(
+            lambda: ScriptExecution.objects.create(script_task=create_script(), status='success')
+        )()
+        response = await self.async_client.get(
+            f'/api/v1/system/executions/{execution.id}/stream/', headers={'Last-Event-ID': 'abc'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_stream_response(self):
+        execution = await sync_to_async(
+            lambda: ScriptExecution.objects.create(script_task=create_script(), status='success')
+        )()
+        response = await self.async_client.get(f'/api/v1/system/executions/{execution.id}/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual([event[1] for event in parse_events(body.split('\n\n')[:-1])], ['status'])
@@ -0,0 +1,112 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db.models.query import QuerySet
+from django.test import TestCase
+from django.utils import timezone
+
+from system.models import ScriptExecution
+from system.worker import ExecutionWorker
+from system.write_behind import ExecutionCompletion
+
+from .helpers import create_script
+
+
+class ExecutionWorkerTests(TestCase):
+    """数据库队列执行进程：认领、租约回收和续租"""
+
+    def setUp(self):
+        self.script = create_script()
+        self.worker = ExecutionWorker(concurrency=4, lease_seconds=30, max_attempts=2)
+
+    def queue(self, count=1, **kwargs):
+        return [
+            ScriptExecution.objects.create(script_task=self.script, status='queued', queued_at=timezone.now(), **kwargs)
+            for _ in range(count)
+        ]
+
+    def test_claim_marks_rows_running_with_lease(self):
+        executions = self.queue(3)
+        claimed = self.worker.claim(2)
+        self.assertEqual(len(claimed), 2)
+        for execution in ScriptExecution.objects.filter(id__in=claimed):
+            self.assertEqual(execution.status, 'running')
+            self.assertEqual(execution.worker_id, self.worker.worker_id)
+            self.assertEqual(execution.attempts, 1)
+            self.assertGreater(execution.lease_expires_at, timezone.now())
+            self.assertIsNotNone(execution.queue_wait_time)
+        self.assertEqual(ScriptExecution.objects.filter(id__in=[e.id for e in executions], status='queued').count(), 1)
+
+    def test_claim_returns_only_rows_won_by_this_worker(self):
+        # 模拟不支持 skip_locked 时另一进程在选中之后、更新之前认领了其中一条
+        stolen, kept = self.queue(2)
+        original_update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            if kwargs.get('status') == 'running' and not racing_update.raced:
+                racing_update.raced = True
+                original_update(ScriptExecution.objects.filter(id=stolen.id), status='running', worker_id='other:1')
+            return original_update(queryset, **kwargs)
+        racing_update.raced = False
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            claimed = self.worker.claim(2)
+        self.assertEqual(claimed, [kept.id])
+        self.assertEqual(ScriptExecution.objects.get(id=stolen.id).worker_id, 'other:1')
+
+    def test_reclaim_requeues_or_fails_expired_leases(self):
+        retry, exhausted, alive = self.queue(3)
+        expired_at = timezone.now() - timedelta(seconds=1)
+        ScriptExecution.objects.filter(id=retry.id).update(
+            status='running', worker_id='gone:1', attempts=1, lease_expires_at=expired_at
+        )
+        ScriptExecution.objects.filter(id=exhausted.id).update(
+            status='running', worker_id='gone:1', attempts=2, lease_expires_at=expired_at
+        )
+        ScriptExecution.objects.filter(id=alive.id).update(
+            status='running', worker_id='alive:1', attempts=1, lease_expires_at=timezone.now() + timedelta(minutes=1)
+        )
+
+        with self.assertLogs('system.worker', 'WARNING'):
+            self.worker.reclaim_expired()
+
+        retry.refresh_from_db()
+        exhausted.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((retry.status, retry.worker_id, retry.lease_expires_at), ('queued', '', None))
+        self.assertEqual(exhausted.status, 'failed')
+        self.assertIsNotNone(exhausted.finished_at)
+        self.assertEqual(alive.status, 'running')
+
+    def test_heartbeat_extends_only_own_inflight_leases(self):
+        mine, other = self.queue(2)
+        soon = timezone.now() + timedelta(seconds=1)
+        ScriptExecution.objects.filter(id=mine.id).update(
+            status='running', worker_id=self.worker.worker_id, lease_expires_at=soon
+        )
+        ScriptExecution.objects.filter(id=other.id).update(status='running', worker_id='other:1', lease_expires_at=soon)
+        self.worker._inflight = {mine.id, other.id}
+
+        self.worker._heartbeat()
+        self.assertGreater(ScriptExecution.objects.get(id=mine.id).lease_expires_at, soon + timedelta(seconds=20))
+        self.assertEqual(ScriptExecution.objects.get(id=other.id).lease_expires_at, soon)
+
+    def test_inflight_kept_until_buffered_result_is_written(self):
+        # 结果仍在写回缓冲中时继续续租，写回后才移出在途集合
+        execution = self.queue()[0]
+        completion = ExecutionCompletion(execution, ('running',), {})
+        self.worker._inflight.add(execution.id)
+        with mock.patch('system.worker.ScriptTaskService.run_execution', return_value=completion):
+            self.worker._run(execution.id)
+        self.assertEqual(self.worker._inflight_count(), 1)
+
+        completion.set_done()
+        self.assertEqual(self.worker._inflight_count(), 0)
+
+    def test_inflight_released_when_execution_fails_before_completion(self):
+        execution = self.queue()[0]
+        self.worker._inflight.add(execution.id)
+        with mock.patch('system.worker.ScriptTaskService.run_execution', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.worker._run(execution.id)
+        self.assertEqual(self.worker._inflight_count(), 0)
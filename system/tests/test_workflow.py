@@ -0,0 +1,135 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from system.models import ScriptExecution, ScriptWorkflowRun
+from system.services import ScriptTaskService, ScriptWorkflowService
+
+from .helpers import InlineExecutionMixin, create_script
+
+
+class WorkflowTestMixin:
+
+    def create_workflow(self, steps, concurrency=4):
+        workflow, errors = ScriptWorkflowService.create_workflow({
+            'name': 'workflow',
+            'concurrency': concurrency,
+            'steps': [
+                {'key': key, 'script_task': script.id, 'depends_on': depends_on}
+                for key, script, depends_on in steps
+            ]
+        })
+        self.assertIsNone(errors)
+        return workflow
+
+    def step_executions(self, run):
+        return {execution.workflow_step: execution for execution in ScriptExecution.objects.filter(workflow_run=run)}
+
+
+class WorkflowValidationTests(WorkflowTestMixin, TestCase):
+    """工作流定义校验"""
+
+    def test_cycle_detection(self):
+        script = create_script()
+        _, errors = ScriptWorkflowService.create_workflow({'name': 'cycle', 'steps': [
+            {'key': 'a', 'script_task': script.id, 'depends_on': ['c']},
+            {'key': 'b', 'script_task': script.id, 'depends_on': ['a']},
+            {'key': 'c', 'script_task': script.id, 'depends_on': ['b']},
+            {'key': 'd', 'script_task': script.id, 'depends_on': []},
+        ]})
+        self.assertIn("步骤之间存在循环依赖: a, b, c", str(errors['steps']))
+
+    def test_invalid_steps(self):
+        script = create_script()
+        for steps in (
+            [],
+            [{'key': 'a', 'script_task': script.id}, {'key': 'a', 'script_task': script.id}],
+            [{'key': 'a', 'script_task': script.id, 'depends_on': ['a']}],
+            [{'key': 'a', 'script_task': script.id, 'depends_on': ['missing']}],
+            [{'key': '1a', 'script_task': script.id}],
+        ):
+            _, errors = ScriptWorkflowService.create_workflow({'name': 'invalid', 'steps': steps})
+            self.assertIn('steps', errors, steps)
+
+
+class WorkflowRunTests(InlineExecutionMixin, WorkflowTestMixin, TestCase):
+    """工作流运行"""
+
+    def test_diamond_passes_upstream_output(self):
+        workflow = self.create_workflow([
+            ('fetch', create_script(content='echo data'), []),
+            ('left', create_script(content='echo "L-$fetch_output"'), ['fetch']),
+            ('right', create_script(content='echo "R-$fetch_output-$region"'), ['fetch']),
+            ('merge', create_script(content='echo "$left_output+$right_output"'), ['left', 'right']),
+        ])
+        run, errors = ScriptWorkflowService.run_workflow(workflow.id, {'parameters': {'region': 'cn'}})
+        self.assertIsNone(errors)
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, 'success')
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual(self.step_executions(run)['merge'].output, 'L-data+R-data-cn\n')
+        self.assertEqual(run.critical_path[0], 'fetch')
+        self.assertEqual(run.critical_path[-1], 'merge')
+
+    def test_failed_step_skips_downstream(self):
+        workflow = self.create_workflow([
+            ('a', create_script(content='exit 1'), []),
+            ('b', create_script(), ['a']),
+            ('c', create_script(), ['b']),
+            ('d', create_script(), []),
+        ])
+        run, _ = ScriptWorkflowService.run_workflow(workflow.id, {})
+        run.refresh_from_db()
+        statuses = {key: execution.status for key, execution in self.step_executions(run).items()}
+        self.assertEqual(statuses, {'a': 'failed', 'b': 'cancelled', 'c': 'cancelled', 'd': 'success'})
+        self.assertEqual(run.status, 'failed')
+
+
+class WorkflowSchedulingTests(WorkflowTestMixin, TestCase):
+    """工作流步骤的并行调度和关键路径"""
+
+    def setUp(self):
+        self.script = create_script()
+        dispatch = mock.patch.object(ScriptTaskService, '_dispatch_execution', return_value=True)
+        self.dispatch = dispatch.start()
+        self.addCleanup(dispatch.stop)
+
+    def finish(self, run, **durations):
+        executions = self.step_executions(run)
+        for key, duration in durations.items():
+            ScriptExecution.objects.filter(id=executions[key].id).update(status='success', execution_time=duration)
+        ScriptWorkflowService.advance_run(run.id)
+
+    def test_independent_steps_run_in_parallel_within_concurrency(self):
+        workflow = self.create_workflow([
+            ('a', self.script, []), ('b', self.script, []), ('c', self.script, []), ('d', self.script, ['a']),
+        ], concurrency=2)
+        run, _ = ScriptWorkflowService.run_workflow(workflow.id, {})
+        queued = {key for key, e in self.step_executions(run).items() if e.status == 'queued'}
+        self.assertEqual(queued, {'a', 'b'})
+
+        self.finish(run, a=1)
+        queued = {key for key, e in self.step_executions(run).items() if e.status == 'queued'}
+        self.assertEqual(queued, {'b', 'c'})
+
+    def test_critical_path(self):
+        workflow = self.create_workflow([
+            ('a', self.script, []),
+            ('b', self.script, ['a']),
+            ('c', self.script, ['a']),
+            ('d', self.script, ['b', 'c']),
+            ('e', self.script, []),
+        ])
+        run, _ = ScriptWorkflowService.run_workflow(workflow.id, {})
+        self.finish(run, a=1, e=4)
+        self.finish(run, b=2, c=5)
+        self.finish(run, d=1)
+
+        run = ScriptWorkflowRun.objects.get(id=run.id)
+        self.assertEqual(run.status, 'success')
+        self.assertEqual(run.critical_path, ['a', 'c', 'd'])
+        self.assertEqual(run.critical_path_time, 7)
+
+        steps = self.client.get(f'/api/v1/system/workflow-runs/{run.id}/').json()['data']['steps']
+        self.assertEqual([step['key'] for step in steps if step['on_critical_path']], ['a', 'c', 'd'])
@@ -0,0 +1,163 @@
+import unittest
+from unittest import mock
+
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from system.models import ScriptExecution, ScriptLatencyStat, ScriptTask
+from system.services import ScriptTaskService
+from system.write_behind import WRITE_RETRIES, CompletionWriter, ExecutionCompletion
+
+from .helpers import create_script
+
+
+class CompletionWriterTests(TestCase):
+    """执行结果的批量写回"""
+
+    def setUp(self):
+        self.on_flushed = mock.Mock()
+        self.writer = CompletionWriter(self.on_flushed, batch_size=2, flush_interval=60)
+        # 测试中由 flush 直接写回，不启动后台线程
+        patcher = mock.patch.object(CompletionWriter, '_ensure_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        sleep = mock.patch('system.write_behind.time.sleep')
+        sleep.start()
+        self.addCleanup(sleep.stop)
+        self.script = create_script()
+
+    def completion(self, status='success', worker_id='w1', **fields):
+        execution = ScriptExecution.objects.create(script_task=self.script, status='running', worker_id='w1')
+        execution.worker_id = worker_id
+        return ExecutionCompletion(
+            execution, ('running',), {'status': status, 'finished_at': timezone.now(), **fields}
+        )
+
+    def test_buffer_until_flush_in_batches(self):
+        completions = [self.completion(output=f'out{i}') for i in range(3)]
+        completions.append(self.completion(status='failed'))
+        for completion in completions:
+            self.writer.submit(completion)
+        self.assertEqual(ScriptExecution.objects.filter(status='running').count(), 4)
+        self.assertEqual(self.writer.stats()['completion_buffered'], 4)
+
+        self.writer.flush()
+        self.assertEqual(
+            sorted(ScriptExecution.objects.values_list('status', 'output')),
+            [('failed', None), ('success', 'out0'), ('success', 'out1'), ('success', 'out2')]
+        )
+        self.assertEqual(self.on_flushed.call_count, 2)
+        self.assertEqual(self.writer.stats(), {
+            'completion_buffered': 0,
+            'completion_flushed_count': 4,
+            'completion_discarded_count': 0,
+            'completion_batch_count': 2,
+        })
+        self.assertEqual(completions[0].execution.status, 'success')
+
+    def test_batch_queries_do_not_grow_with_size(self):
+        def count_queries(size):
+            writer = CompletionWriter(mock.Mock(), batch_size=size, flush_interval=0)
+            batch = [self.completion() for _ in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                writer._flush(batch)
+            return len(queries)
+
+        self.assertEqual(count_queries(2), count_queries(20))
+
+    def test_stale_worker_discarded(self):
+        done = mock.Mock()
+        stale = self.completion(worker_id='w2', output_blob={'path': 'x'})
+        stale.add_done_callback(done)
+        current = self.completion()
+        with mock.patch('system.write_behind.delete_output_blob') as delete_output_blob, \
+                self.assertLogs('system.write_behind', 'WARNING'):
+            self.writer.submit(stale)
+            self.writer.submit(current)
+            self.writer.flush()
+
+        done.assert_called_once_with()
+        delete_output_blob.assert_called_once_with({'path': 'x'})
+        self.on_flushed.assert_called_once_with([current])
+        self.assertEqual(ScriptExecution.objects.get(id=stale.execution.id).status, 'running')
+        self.assertEqual(self.writer.stats()['completion_discarded_count'], 1)
+
+    def test_retry_on_operational_error(self):
+        completion = self.completion()
+        write = CompletionWriter._write
+        errors = [OperationalError('database is locked')]
+
+        def locked_once(writer, batch):
+            if errors:
+                raise errors.pop()
+            return write(writer, batch)
+
+        with mock.patch.object(CompletionWriter, '_write', autospec=True, side_effect=locked_once), \
+                self.assertLogs('system.write_behind', 'WARNING'):
+            self.writer._flush([completion])
+        self.assertEqual(ScriptExecution.objects.get(id=completion.execution.id).status, 'success')
+        self.on_flushed.assert_called_once_with([completion])
+
+    def test_failed_write_marks_failed(self):
+        done = mock.Mock()
+        completion = self.completion(output='lost')
+        completion.add_done_callback(done)
+        with mock.patch.object(
+            CompletionWriter, '_write', side_effect=OperationalError('disk I/O error')
+        ) as write, self.assertLogs('system.write_behind'):
+            self.writer._flush([completion])
+
+        self.assertEqual(write.call_count, WRITE_RETRIES + 1)
+        execution = ScriptExecution.objects.get(id=completion.execution.id)
+        self.assertEqual((execution.status, execution.output), ('failed', None))
+        self.assertEqual(execution.error_message, "执行结果写回失败: disk I/O error")
+        self.on_flushed.assert_called_once_with([completion])
+        done.assert_called_once_with()
+
+    def test_failed_batch_retried_one_by_one(self):
+        good = self.completion()
+        bad = self.completion()
+        write = CompletionWriter._write
+
+        def fail_with_bad(writer, batch):
+            if bad in batch:
+                raise ValueError
+            return write(writer, batch)
+
+        with mock.patch.object(CompletionWriter, '_write', autospec=True, side_effect=fail_with_bad), \
+                self.assertLogs('system.write_behind'):
+            self.writer._flush([good, bad])
+        self.assertEqual(ScriptExecution.objects.get(id=good.execution.id).status, 'success')
+        self.assertEqual(ScriptExecution.objects.get(id=bad.execution.id).status, 'failed')
+
+
+class AfterCompletionsTests(TestCase):
+    """写回后的汇总按批合并"""
+
+    def test_counts_and_latency_merged(self):
+        script = create_script()
+        completions = []
+        for execution_time in (1.0, 2.0, 3.0):
+            execution = ScriptExecution.objects.create(script_task=script, status='success')
+            completions.append(ExecutionCompletion(
+                execution, ('running',),
+                {'status': 'success', 'execution_time': execution_time, 'finished_at': timezone.now()},
+                count_execution=True, record_latency=True
+            ))
+        completions[2].count_execution = False
+
+        ScriptTaskService._after_completions(completions)
+        script = ScriptTask.objects.get(id=script.id)
+        self.assertEqual(script.execution_count, 2)
+        self.assertIsNotNone(script.last_executed_at)
+        stat = ScriptLatencyStat.objects.get(script_task=script)
+        self.assertEqual((stat.success_count, stat.total_time), (3, 6.0))
+
+
+class SqliteTransactionModeTests(SimpleTestCase):
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', "仅 SQLite")
+    def test_immediate_transactions(self):
+        self.assertEqual(connection.settings_dict['OPTIONS']['transaction_mode'], 'IMMEDIATE')
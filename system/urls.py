@@ -1,7 +1,13 @@
 from django.urls import path
 from .views import (
-    ScriptTaskView, ScriptTaskDetailView, ScriptExecuteView,
-    ScriptExecutionView, ScriptExecutionDetailView
+    ScriptTaskView, ScriptTaskDetailView, ScriptTaskCacheView, ScriptExecuteView,
+    ScriptExecutionView, ScriptExecutionDetailView, ScriptExecutionPoolView,
+    ScriptExecutionOutputView, ScriptExecutionOutputDownloadView, ScriptExecutionStreamView,
+    ScriptExecutionCancelView, ScriptBatchExecuteView, ScriptBatchView, ScriptBatchDetailView,
+    ScriptScheduleView, ScriptScheduleDetailView, ScriptWorkflowView, ScriptWorkflowDetailView,
+    ScriptWorkflowRunCreateView, ScriptWorkflowRunView, ScriptWorkflowRunDetailView, ScriptTaskLatencyView,
+    ScriptLatencyRankingView, ScriptResultAggregateView, ScriptRateLimitView,
+    ScriptExecutionStatusView
 )
 
 app_name = 'system'
@@ -10,9 +16,38 @@ urlpatterns = [
     # 脚本任务相关
     path('scripts/', ScriptTaskView.as_view(), name='script-list'),
     path('scripts/<uuid:script_id>/', ScriptTaskDetailView.as_view(), name='script-detail'),
+    path('scripts/<uuid:script_id>/cache/', ScriptTaskCacheView.as_view(), name='script-cache'),
+    path('scripts/<uuid:script_id>/latency/', ScriptTaskLatencyView.as_view(), name='script-latency'),
+    path('scripts/<uuid:script_id>/results/aggregate/', ScriptResultAggregateView.as_view(),
+         name='script-result-aggregate'),
+    path('scripts/latency/', ScriptLatencyRankingView.as_view(), name='script-latency-ranking'),
     path('scripts/<uuid:script_id>/execute/', ScriptExecuteView.as_view(), name='script-execute'),
+    path('scripts/<uuid:script_id>/batch-execute/', ScriptBatchExecuteView.as_view(), name='script-batch-execute'),
+
+    # 批量执行批次相关
+    path('batches/', ScriptBatchView.as_view(), name='batch-list'),
+    path('batches/<uuid:batch_id>/', ScriptBatchDetailView.as_view(), name='batch-detail'),
+
+    # 定时计划相关
+    path('schedules/', ScriptScheduleView.as_view(), name='schedule-list'),
+    path('schedules/<uuid:schedule_id>/', ScriptScheduleDetailView.as_view(), name='schedule-detail'),
+
+    # 工作流相关
+    path('workflows/', ScriptWorkflowView.as_view(), name='workflow-list'),
+    path('workflows/<uuid:workflow_id>/', ScriptWorkflowDetailView.as_view(), name='workflow-detail'),
+    path('workflows/<uuid:workflow_id>/run/', ScriptWorkflowRunCreateView.as_view(), name='workflow-run'),
+    path('workflow-runs/', ScriptWorkflowRunView.as_view(), name='workflow-run-list'),
+    path('workflow-runs/<uuid:run_id>/', ScriptWorkflowRunDetailView.as_view(), name='workflow-run-detail'),
 
     # 脚本执行记录相关
     path('executions/', ScriptExecutionView.as_view(), name='execution-list'),
+    path('executions/pool/', ScriptExecutionPoolView.as_view(), name='execution-pool'),
+    path('executions/status/', ScriptExecutionStatusView.as_view(), name='execution-status'),
+    path('executions/rate-limits/', ScriptRateLimitView.as_view(), name='execution-rate-limits'),
     path('executions/<uuid:execution_id>/', ScriptExecutionDetailView.as_view(), name='execution-detail'),
+    path('executions/<uuid:execution_id>/cancel/', ScriptExecutionCancelView.as_view(), name='execution-cancel'),
+    path('executions/<uuid:execution_id>/output/', ScriptExecutionOutputView.as_view(), name='execution-output'),
+    path('executions/<uuid:execution_id>/output/download/', ScriptExecutionOutputDownloadView.as_view(),
+         name='execution-output-download'),
+    path('executions/<uuid:execution_id>/stream/', ScriptExecutionStreamView.as_view(), name='execution-stream'),
 ]
\ No newline at end of file
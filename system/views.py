@@ -1,11 +1,29 @@
+import json
+import uuid
+
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import Throttled
 from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from common.responses import ApiResponse
-from .services import ScriptTaskService, ScriptExecutionService
+from .services import (
+    ScriptTaskService, ScriptExecutionService, ScriptBatchService, ScriptScheduleService, ScriptWorkflowService,
+    ScriptLatencyService
+)
+from .streaming import stream_execution_events, get_execution_state, wait_execution_statuses
+from .output_storage import parse_byte_range
+from .result_parser import build_result_lookups
+from .rate_limit import ExecutionRateThrottle
+from .models import ScriptExecution
 from .serializers import (
-    ScriptTaskSerializer, ScriptTaskUpdateSerializer, ScriptExecutionSerializer,
-    ScriptExecuteSerializer
+    ScriptTaskSerializer, ScriptTaskUpdateSerializer, ScriptExecutionSerializer, ScriptExecutionListSerializer,
+    ScriptExecuteSerializer, ScriptBatchExecuteSerializer, ScriptBatchSerializer,
+    ScriptScheduleSerializer, ScriptScheduleWriteSerializer, ScriptWorkflowSerializer,
+    ScriptWorkflowWriteSerializer, ScriptWorkflowRunSerializer, ScriptWorkflowRunCreateSerializer
 )
 
 
@@ -129,59 +147,500 @@ class ScriptTaskDetailView(APIView):
         return ApiResponse.error(message=message)
 
 
-class ScriptExecuteView(APIView):
+class ScriptTaskCacheView(APIView):
+    """脚本结果缓存视图"""
+
+    @swagger_auto_schema(
+        operation_summary="获取脚本结果缓存统计",
+        operation_description="获取缓存命中/未命中次数、命中率和当前有效的缓存条目数",
+        responses={200: openapi.Schema(type=openapi.TYPE_OBJECT)}
+    )
+    def get(self, request, script_id):
+        """获取脚本结果缓存统计"""
+        script = ScriptTaskService.get_script_by_id(script_id)
+        if not script:
+            return ApiResponse.error(message="脚本不存在", code=404)
+        return ApiResponse.success(data=ScriptTaskService.get_cache_stats(script))
+
+    @swagger_auto_schema(
+        operation_summary="清除脚本结果缓存",
+        operation_description="使脚本已有的缓存结果全部失效，之后的执行重新运行脚本"
+    )
+    def delete(self, request, script_id):
+        """清除脚本结果缓存"""
+        script, error = ScriptTaskService.invalidate_cache(script_id)
+        if not script:
+            return ApiResponse.error(message=error, code=404)
+        return ApiResponse.success(data=ScriptTaskService.get_cache_stats(script), message="缓存已清除")
+
+
+class ScriptTaskLatencyView(APIView):
+    """脚本耗时统计视图"""
+
+    @swagger_auto_schema(
+        operation_summary="获取脚本耗时分位数",
+        operation_description="获取脚本在时间范围内的执行次数、成功率和 p50/p95/p99 耗时，并与上一周期对比；"
+                              "由按小时累计的直方图计算，不扫描执行记录",
+        manual_parameters=[
+            openapi.Parameter('range', openapi.IN_QUERY, description="时间范围", type=openapi.TYPE_STRING,
+                            enum=['1h', '24h', '7d', '30d'], default='24h'),
+            openapi.Parameter('series', openapi.IN_QUERY, description="是否返回每小时的明细", type=openapi.TYPE_BOOLEAN),
+        ],
+        responses={200: openapi.Schema(type=openapi.TYPE_OBJECT)}
+    )
+    def get(self, request, script_id):
+        """获取脚本耗时分位数"""
+        script = ScriptTaskService.get_script_by_id(script_id)
+        if not script:
+            return ApiResponse.error(message="脚本不存在", code=404)
+        data, error = ScriptLatencyService.get_script_latency(
+            script,
+            request.query_params.get('range', '24h'),
+            series=request.query_params.get('series') == 'true'
+        )
+        if error:
+            return ApiResponse.error(message=error)
+        return ApiResponse.success(data=data)
+
+
+class ScriptLatencyRankingView(APIView):
+    """脚本耗时变化排行视图"""
+
+    @swagger_auto_schema(
+        operation_summary="获取脚本耗时变化排行",
+        operation_description="按 p95 耗时相对上一周期的涨幅从大到小列出脚本",
+        manual_parameters=[
+            openapi.Parameter('range', openapi.IN_QUERY, description="时间范围", type=openapi.TYPE_STRING,
+                            enum=['1h', '24h', '7d', '30d'], default='7d'),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="返回数量", type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: openapi.Schema(type=openapi.TYPE_OBJECT)}
+    )
+    def get(self, request):
+        """获取脚本耗时变化排行"""
+        data, error = ScriptLatencyService.get_latency_ranking(
+            request.query_params.get('range', '7d'),
+            limit=int(request.query_params.get('limit', 20))
+        )
+        if error:
+            return ApiResponse.error(message=error)
+        return ApiResponse.success(data=data)
+
+
+class ScriptResultAggregateView(APIView):
+    """脚本结构化结果统计视图"""
+
+    @swagger_auto_schema(
+        operation_summary="统计脚本执行结果",
+        operation_description="按结构化结果中的字段在数据库中统计脚本的成功执行，可按日期或结果字段分组，"
+                              "同样支持 result.<字段路径>[__比较方式]=值 形式的筛选条件",
+        manual_parameters=[
+            openapi.Parameter('field', openapi.IN_QUERY, description="统计的结果字段路径，如 summary.failed",
+                            type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('func', openapi.IN_QUERY, description="统计方式", type=openapi.TYPE_STRING,
+                            enum=['count', 'sum', 'avg', 'min', 'max'], default='sum'),
+            openapi.Parameter('group_by', openapi.IN_QUERY, description="分组：date 或结果字段路径",
+                            type=openapi.TYPE_STRING),
+            openapi.Parameter('since', openapi.IN_QUERY, description="起始创建时间", type=openapi.TYPE_STRING),
+            openapi.Parameter('until', openapi.IN_QUERY, description="截止创建时间", type=openapi.TYPE_STRING),
+        ],
+        responses={200: openapi.Schema(type=openapi.TYPE_OBJECT)}
+    )
+    def get(self, request, script_id):
+        """统计脚本执行结果"""
+        script = ScriptTaskService.get_script_by_id(script_id)
+        if not script:
+            return ApiResponse.error(message="脚本不存在", code=404)
+        data, error = ScriptExecutionService.aggregate_results(script.id, request.query_params)
+        if error:
+            return ApiResponse.error(message=error)
+        return ApiResponse.success(data=data)
+
+
+class RateLimitedAPIView(APIView):
+    """按客户端、脚本和全局令牌桶限流的接口，超限时直接返回 429 和 Retry-After"""
+    throttle_classes = [ExecutionRateThrottle]
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Throttled):
+            return ApiResponse.too_many_requests(
+                message=f"请求过于频繁，请 {exc.wait} 秒后重试",
+                retry_after=exc.wait,
+                data={'retry_after': exc.wait}
+            )
+        return super().handle_exception(exc)
+
+
+class ScriptExecuteView(RateLimitedAPIView):
     """脚本执行视图"""
 
     @swagger_auto_schema(
         operation_summary="执行脚本任务",
-        operation_description="执行指定的脚本任务",
+        operation_description="执行指定的脚本任务，排队时按优先级调度，同一优先级内各脚本按权重公平分配执行槽位；"
+                              "按客户端、脚本和全局限流，超限返回 429 及 Retry-After",
         request_body=ScriptExecuteSerializer,
-        responses={200: ScriptExecutionSerializer()}
+        responses={200: ScriptExecutionSerializer(), 429: "请求过于频繁"}
     )
     def post(self, request, script_id):
         """执行脚本任务"""
         execution, errors = ScriptTaskService.execute_script(
             script_id,
-            request.data.get('parameters', {})
+            request.data.get('parameters', {}),
+            priority=request.data.get('priority', ScriptExecution.PRIORITY_NORMAL)
         )
         if execution:
             serializer = ScriptExecutionSerializer(execution)
-            return ApiResponse.success(data=serializer.data, message="脚本开始执行")
+            return ApiResponse.success(data=serializer.data, message="脚本已加入执行队列")
         return ApiResponse.error(message=errors if isinstance(errors, str) else "执行失败", data=errors)
 
 
+class ScriptBatchExecuteView(RateLimitedAPIView):
+    """脚本批量执行视图"""
+
+    @swagger_auto_schema(
+        operation_summary="按项目空间批量执行脚本",
+        operation_description="对项目空间下的每个车型各执行一次脚本，车型信息合并到执行参数中，按并发上限逐步调度；"
+                              "每次请求与单次执行共用限流令牌桶",
+        request_body=ScriptBatchExecuteSerializer,
+        responses={200: ScriptBatchSerializer(), 429: "请求过于频繁"}
+    )
+    def post(self, request, script_id):
+        """批量执行脚本任务"""
+        batch, errors = ScriptBatchService.execute_batch(script_id, request.data)
+        if batch:
+            serializer = ScriptBatchSerializer(batch)
+            return ApiResponse.success(data=serializer.data, message="批量执行已创建")
+        return ApiResponse.error(message=errors if isinstance(errors, str) else "批量执行失败", data=errors)
+
+
+class ScriptBatchView(APIView):
+    """脚本批量执行批次视图"""
+
+    @swagger_auto_schema(
+        operation_summary="获取批次列表",
+        operation_description="获取批量执行批次及其进度，可按脚本和状态筛选",
+        manual_parameters=[
+            openapi.Parameter('script_id', openapi.IN_QUERY, description="脚本ID", type=openapi.TYPE_STRING),
+            openapi.Parameter('status', openapi.IN_QUERY, description="批次状态", type=openapi.TYPE_STRING,
+                            enum=['running', 'finished']),
+            openapi.Parameter('page', openapi.IN_QUERY, description="页码", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="每页数量", type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: ScriptBatchSerializer(many=True)}
+    )
+    def get(self, request):
+        """获取批次列表"""
+        page = int(request.query_params.get('page', 1))
+        page_size = int(request.query_params.get('page_size', 10))
+        queryset = ScriptBatchService.get_all_batches(
+            script_id=request.query_params.get('script_id'),
+            status=request.query_params.get('status')
+        )
+        return ApiResponse.paginated_response(
+            queryset=queryset,
+            page=page,
+            page_size=page_size,
+            serializer_class=ScriptBatchSerializer,
+            request=request
+        )
+
+
+class ScriptBatchDetailView(APIView):
+    """脚本批量执行批次详情视图"""
+
+    @swagger_auto_schema(
+        operation_summary="获取批次详情",
+        operation_description="根据ID获取批次及其进度",
+        responses={200: ScriptBatchSerializer()}
+    )
+    def get(self, request, batch_id):
+        """获取批次详情"""
+        batch = ScriptBatchService.get_batch_by_id(batch_id)
+        if not batch:
+            return ApiResponse.error(message="批次不存在", code=404)
+        return ApiResponse.success(data=ScriptBatchSerializer(batch).data)
+
+
+class ScriptScheduleView(APIView):
+    """脚本定时计划视图"""
+
+    @swagger_auto_schema(
+        operation_summary="获取定时计划列表",
+        operation_description="获取脚本定时计划，可按脚本和启用状态筛选",
+        manual_parameters=[
+            openapi.Parameter('script_id', openapi.IN_QUERY, description="脚本ID", type=openapi.TYPE_STRING),
+            openapi.Parameter('is_active', openapi.IN_QUERY, description="是否启用", type=openapi.TYPE_BOOLEAN),
+            openapi.Parameter('page', openapi.IN_QUERY, description="页码", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="每页数量", type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: ScriptScheduleSerializer(many=True)}
+    )
+    def get(self, request):
+        """获取定时计划列表"""
+        is_active = request.query_params.get('is_active')
+        page = int(request.query_params.get('page', 1))
+        page_size = int(request.query_params.get('page_size', 10))
+        queryset = ScriptScheduleService.get_all_schedules(
+            script_id=request.query_params.get('script_id'),
+            is_active=is_active.lower() == 'true' if is_active else None
+        )
+        return ApiResponse.paginated_response(
+            queryset=queryset,
+            page=page,
+            page_size=page_size,
+            serializer_class=ScriptScheduleSerializer,
+            request=request
+        )
+
+    @swagger_auto_schema(
+        operation_summary="创建定时计划",
+        operation_description="为脚本创建 cron 或固定间隔的定时计划，由 runscheduler 进程触发执行",
+        request_body=ScriptScheduleWriteSerializer,
+        responses={200: ScriptScheduleSerializer()}
+    )
+    def post(self, request):
+        """创建定时计划"""
+        schedule, errors = ScriptScheduleService.create_schedule(request.data)
+        if schedule:
+            return ApiResponse.success(data=ScriptScheduleSerializer(schedule).data, message="定时计划创建成功")
+        return ApiResponse.error(message="创建失败", data=errors)
+
+
+class ScriptScheduleDetailView(APIView):
+    """脚本定时计划详情视图"""
+
+    @swagger_auto_schema(
+        operation_summary="获取定时计划详情",
+        operation_description="根据ID获取定时计划及接下来的触发时间",
+        responses={200: ScriptScheduleSerializer()}
+    )
+    def get(self, request, schedule_id):
+        """获取定时计划详情"""
+        schedule = ScriptScheduleService.get_schedule_by_id(schedule_id)
+        if not schedule:
+            return ApiResponse.error(message="定时计划不存在", code=404)
+        return ApiResponse.success(data=ScriptScheduleSerializer(schedule).data)
+
+    @swagger_auto_schema(
+        operation_summary="更新定时计划",
+        operation_description="根据ID更新定时计划，下次触发时间从当前时间重新计算",
+        request_body=ScriptScheduleWriteSerializer,
+        responses={200: ScriptScheduleSerializer()}
+    )
+    def put(self, request, schedule_id):
+        """更新定时计划"""
+        schedule, errors = ScriptScheduleService.update_schedule(schedule_id, request.data)
+        if schedule:
+            return ApiResponse.success(data=ScriptScheduleSerializer(schedule).data, message="更新成功")
+        return ApiResponse.error(message=errors if isinstance(errors, str) else "更新失败", data=errors)
+
+    @swagger_auto_schema(
+        operation_summary="删除定时计划",
+        operation_description="根据ID删除定时计划（软删除）",
+        responses={200: openapi.Schema(type=openapi.TYPE_OBJECT)}
+    )
+    def delete(self, request, schedule_id):
+        """删除定时计划"""
+        success, message = ScriptScheduleService.delete_schedule(schedule_id)
+        if success:
+            return ApiResponse.success(message=message)
+        return ApiResponse.error(message=message)
+
+
+class ScriptWorkflowView(APIView):
+    """脚本工作流视图"""
+
+    @swagger_auto_schema(
+        operation_summary="获取工作流列表",
+        operation_description="获取脚本工作流，支持按名称模糊搜索",
+        manual_parameters=[
+            openapi.Parameter('name', openapi.IN_QUERY, description="工作流名称模糊搜索", type=openapi.TYPE_STRING),
+            openapi.Parameter('page', openapi.IN_QUERY, description="页码", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="每页数量", type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: ScriptWorkflowSerializer(many=True)}
+    )
+    def get(self, request):
+        """获取工作流列表"""
+        page = int(request.query_params.get('page', 1))
+        page_size = int(request.query_params.get('page_size', 10))
+        queryset = ScriptWorkflowService.get_all_workflows(name=request.query_params.get('name'))
+        return ApiResponse.paginated_response(
+            queryset=queryset,
+            page=page,
+            page_size=page_size,
+            serializer_class=ScriptWorkflowSerializer,
+            request=request
+        )
+
+    @swagger_auto_schema(
+        operation_summary="创建工作流",
+        operation_description="创建由脚本步骤组成的工作流，depends_on 声明上游步骤，步骤之间不能有循环依赖",
+        request_body=ScriptWorkflowWriteSerializer,
+        responses={200: ScriptWorkflowSerializer()}
+    )
+    def post(self, request):
+        """创建工作流"""
+        workflow, errors = ScriptWorkflowService.create_workflow(request.data)
+        if workflow:
+            return ApiResponse.success(data=ScriptWorkflowSerializer(workflow).data, message="工作流创建成功")
+        return ApiResponse.error(message="创建失败", data=errors)
+
+
+class ScriptWorkflowDetailView(APIView):
+    """脚本工作流详情视图"""
+
+    @swagger_auto_schema(
+        operation_summary="获取工作流详情",
+        operation_description="根据ID获取工作流及其步骤",
+        responses={200: ScriptWorkflowSerializer()}
+    )
+    def get(self, request, workflow_id):
+        """获取工作流详情"""
+        workflow = ScriptWorkflowService.get_workflow_by_id(workflow_id)
+        if not workflow:
+            return ApiResponse.error(message="工作流不存在", code=404)
+        return ApiResponse.success(data=ScriptWorkflowSerializer(workflow).data)
+
+    @swagger_auto_schema(
+        operation_summary="更新工作流",
+        operation_description="根据ID更新工作流，提供 steps 时整体替换步骤",
+        request_body=ScriptWorkflowWriteSerializer,
+        responses={200: ScriptWorkflowSerializer()}
+    )
+    def put(self, request, workflow_id):
+        """更新工作流"""
+        workflow, errors = ScriptWorkflowService.update_workflow(workflow_id, request.data)
+        if workflow:
+            return ApiResponse.success(data=ScriptWorkflowSerializer(workflow).data, message="更新成功")
+        return ApiResponse.error(message=errors if isinstance(errors, str) else "更新失败", data=errors)
+
+    @swagger_auto_schema(
+        operation_summary="删除工作流",
+        operation_description="根据ID删除工作流（软删除）",
+        responses={200: openapi.Schema(type=openapi.TYPE_OBJECT)}
+    )
+    def delete(self, request, workflow_id):
+        """删除工作流"""
+        success, message = ScriptWorkflowService.delete_workflow(workflow_id)
+        if success:
+            return ApiResponse.success(message=message)
+        return ApiResponse.error(message=message)
+
+
+class ScriptWorkflowRunCreateView(APIView):
+    """工作流运行视图"""
+
+    @swagger_auto_schema(
+        operation_summary="运行工作流",
+        operation_description="按依赖关系执行工作流的各个步骤，无依赖关系的步骤在并发上限内并行执行",
+        request_body=ScriptWorkflowRunCreateSerializer,
+        responses={200: ScriptWorkflowRunSerializer()}
+    )
+    def post(self, request, workflow_id):
+        """运行工作流"""
+        run, errors = ScriptWorkflowService.run_workflow(workflow_id, request.data)
+        if run:
+            return ApiResponse.success(data=ScriptWorkflowRunSerializer(run).data, message="工作流已开始运行")
+        return ApiResponse.error(message=errors if isinstance(errors, str) else "运行失败", data=errors)
+
+
+class ScriptWorkflowRunView(APIView):
+    """工作流运行记录视图"""
+
+    @swagger_auto_schema(
+        operation_summary="获取工作流运行记录列表",
+        operation_description="获取工作流运行记录，可按工作流和状态筛选",
+        manual_parameters=[
+            openapi.Parameter('workflow_id', openapi.IN_QUERY, description="工作流ID", type=openapi.TYPE_STRING),
+            openapi.Parameter('status', openapi.IN_QUERY, description="运行状态", type=openapi.TYPE_STRING,
+                            enum=['running', 'success', 'failed']),
+            openapi.Parameter('page', openapi.IN_QUERY, description="页码", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('page_size', openapi.IN_QUERY, description="每页数量", type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: ScriptWorkflowRunSerializer(many=True)}
+    )
+    def get(self, request):
+        """获取工作流运行记录列表"""
+        page = int(request.query_params.get('page', 1))
+        page_size = int(request.query_params.get('page_size', 10))
+        queryset = ScriptWorkflowService.get_all_runs(
+            workflow_id=request.query_params.get('workflow_id'),
+            status=request.query_params.get('status')
+        )
+        return ApiResponse.paginated_response(
+            queryset=queryset,
+            page=page,
+            page_size=page_size,
+            serializer_class=ScriptWorkflowRunSerializer,
+            request=request
+        )
+
+
+class ScriptWorkflowRunDetailView(APIView):
+    """工作流运行记录详情视图"""
+
+    @swagger_auto_schema(
+        operation_summary="获取工作流运行记录详情",
+        operation_description="根据ID获取运行记录、各步骤的执行记录和关键路径",
+        responses={200: ScriptWorkflowRunSerializer()}
+    )
+    def get(self, request, run_id):
+        """获取工作流运行记录详情"""
+        run = ScriptWorkflowService.get_run_by_id(run_id)
+        if not run:
+            return ApiResponse.error(message="运行记录不存在", code=404)
+        return ApiResponse.success(data=ScriptWorkflowRunSerializer(run).data)
+
+
 class ScriptExecutionView(APIView):
     """脚本执行记录视图"""
 
     @swagger_auto_schema(
         operation_summary="获取执行记录列表",
-        operation_description="获取脚本执行记录，可按脚本和状态筛选",
+        operation_description="获取脚本执行记录，可按脚本和状态筛选；"
+                              "支持按结构化结果筛选，参数形如 result.<字段路径>[__gt|gte|lt|lte|contains|isnull]=值，"
+                              "如 result.summary.failed__gt=0；"
+                              "q 按输出和错误信息全文检索，返回的 highlights 为标记了命中位置的片段",
         manual_parameters=[
             openapi.Parameter('script_id', openapi.IN_QUERY, description="脚本ID", type=openapi.TYPE_STRING),
+            openapi.Parameter('batch_id', openapi.IN_QUERY, description="批次ID", type=openapi.TYPE_STRING),
+            openapi.Parameter('q', openapi.IN_QUERY, description="检索词，空格分隔的词都需出现，双引号括起为短语",
+                            type=openapi.TYPE_STRING),
             openapi.Parameter('status', openapi.IN_QUERY, description="执行状态", type=openapi.TYPE_STRING,
-                            enum=['running', 'success', 'failed', 'timeout', 'cancelled']),
+                            enum=['pending', 'queued', 'running', 'success', 'failed', 'timeout', 'cancelled',
+                                  'rejected']),
             openapi.Parameter('page', openapi.IN_QUERY, description="页码", type=openapi.TYPE_INTEGER),
             openapi.Parameter('page_size', openapi.IN_QUERY, description="每页数量", type=openapi.TYPE_INTEGER),
         ],
-        responses={200: ScriptExecutionSerializer(many=True)}
+        responses={200: ScriptExecutionListSerializer(many=True)}
     )
     def get(self, request):
         """获取执行记录列表"""
         script_id = request.query_params.get('script_id')
+        batch_id = request.query_params.get('batch_id')
         status = request.query_params.get('status')
+        search = request.query_params.get('q')
         page = int(request.query_params.get('page', 1))
         page_size = int(request.query_params.get('page_size', 10))
+        result_filters, error = build_result_lookups(request.query_params)
+        if error:
+            return ApiResponse.error(message=error)
 
         if script_id:
-            queryset = ScriptExecutionService.get_executions_by_script(script_id, status=status)
+            queryset = ScriptExecutionService.get_executions_by_script(
+                script_id, status=status, result_filters=result_filters, search=search
+            )
         else:
-            queryset = ScriptExecutionService.get_all_executions(status=status)
+            queryset = ScriptExecutionService.get_all_executions(
+                status=status, batch_id=batch_id, result_filters=result_filters, search=search
+            )
 
         return ApiResponse.paginated_response(
             queryset=queryset,
             page=page,
             page_size=page_size,
-            serializer_class=ScriptExecutionSerializer,
+            serializer_class=ScriptExecutionListSerializer,
             request=request
         )
 
@@ -201,4 +660,223 @@ class ScriptExecutionDetailView(APIView):
             return ApiResponse.error(message="执行记录不存在", code=404)
 
         serializer = ScriptExecutionSerializer(execution)
-        return ApiResponse.success(data=serializer.data)
\ No newline at end of file
+        return ApiResponse.success(data=serializer.data)
+
+
+class ScriptExecutionCancelView(APIView):
+    """脚本执行取消视图"""
+
+    @swagger_auto_schema(
+        operation_summary="取消执行",
+        operation_description="取消等待中或执行中的记录，执行中的脚本连同其派生的子进程一起结束",
+        responses={200: ScriptExecutionSerializer()}
+    )
+    def post(self, request, execution_id):
+        """取消执行"""
+        if not ScriptExecutionService.get_execution_by_id(execution_id):
+            return ApiResponse.error(message="执行记录不存在", code=404)
+
+        execution, error = ScriptExecutionService.cancel_execution(execution_id)
+        if not execution:
+            return ApiResponse.error(message=error)
+        return ApiResponse.success(data=ScriptExecutionSerializer(execution).data, message="执行已取消")
+
+
+class ScriptExecutionOutputView(APIView):
+    """脚本执行输出增量读取视图"""
+
+    @swagger_auto_schema(
+        operation_summary="增量读取执行输出",
+        operation_description="返回指定输出流自 offset 之后新增的内容，下一次请求使用返回的 next_offset",
+        manual_parameters=[
+            openapi.Parameter('stream', openapi.IN_QUERY, description="输出流", type=openapi.TYPE_STRING,
+                              enum=['stdout', 'stderr']),
+            openapi.Parameter('offset', openapi.IN_QUERY, description="起始字节偏移", type=openapi.TYPE_INTEGER),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="单次最多返回的字节数", type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: openapi.Schema(type=openapi.TYPE_OBJECT)}
+    )
+    def get(self, request, execution_id):
+        """增量读取执行输出"""
+        execution = ScriptExecutionService.get_execution_by_id(execution_id)
+        if not execution:
+            return ApiResponse.error(message="执行记录不存在", code=404)
+
+        stream = request.query_params.get('stream', 'stdout')
+        offset = int(request.query_params.get('offset', 0))
+        limit = int(request.query_params.get('limit', 1024 * 1024))
+
+        data, errors = ScriptExecutionService.get_execution_output(execution, stream, offset, limit)
+        if data is None:
+            return ApiResponse.error(message=errors)
+        return ApiResponse.success(data=data)
+
+
+class ScriptExecutionOutputDownloadView(APIView):
+    """脚本执行完整输出下载视图，支持 HTTP Range 请求"""
+
+    @swagger_auto_schema(
+        operation_summary="下载执行完整输出",
+        operation_description="下载完整标准输出，支持通过 Range 请求头按字节范围读取",
+        manual_parameters=[
+            openapi.Parameter('Range', openapi.IN_HEADER, description="字节范围，如 bytes=0-1023",
+                              type=openapi.TYPE_STRING),
+        ],
+        responses={200: 'text/plain', 206: 'text/plain'}
+    )
+    def get(self, request, execution_id):
+        """下载执行完整输出"""
+        execution = ScriptExecutionService.get_execution_by_id(execution_id)
+        if not execution:
+            return ApiResponse.error(message="执行记录不存在", code=404)
+
+        size = ScriptExecutionService.get_output_size(execution)
+        start, end, status = 0, size, 200
+        range_header = request.headers.get('Range')
+        if range_header:
+            try:
+                byte_range = parse_byte_range(range_header, size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f"bytes */{size}"
+                return response
+            if byte_range:
+                start, end = byte_range
+                status = 206
+
+        response = StreamingHttpResponse(
+            ScriptExecutionService.iter_output(execution, start, end),
+            status=status,
+            content_type='text/plain; charset=utf-8'
+        )
+        response['Accept-Ranges'] = 'bytes'
+        response['Content-Length'] = str(end - start)
+        response['Content-Disposition'] = f'attachment; filename="{execution.id}.stdout.txt"'
+        if status == 206:
+            response['Content-Range'] = f"bytes {start}-{end - 1}/{size}"
+        return response
+
+
+class ScriptExecutionStreamView(View):
+    """脚本执行输出实时推送视图（Server-Sent Events，需以 ASGI 方式部署）"""
+
+    async def get(self, request, execution_id):
+        """推送执行输出和最终状态"""
+        if await get_execution_state(execution_id) is None:
+            return JsonResponse({
+                'code': 404,
+                'message': "执行记录不存在",
+                'data': None,
+                'success': False
+            }, status=400)
+
+        try:
+            last_event_id = int(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id') or 0)
+        except ValueError:
+            return JsonResponse({
+                'code': 400,
+                'message': "last_event_id 参数无效",
+                'data': None,
+                'success': False
+            }, status=400)
+        response = StreamingHttpResponse(
+            stream_execution_events(execution_id, last_event_id=last_event_id),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ScriptExecutionStatusView(View):
+    """
+    批量查询执行状态（长轮询），替代逐个轮询执行详情
+    GET ?ids=<ID>,<ID>&wait=<秒>，或 POST {"ids": [...], "wait": 秒, "known": {"<ID>": "<状态>"}}
+    wait 大于 0 时等待直到任意一个执行的状态变化或超时；以 ASGI 方式部署时，同一进程内的等待共享一次数据库轮询
+    """
+
+    MAX_IDS = 500
+    MAX_WAIT = 60
+
+    async def get(self, request):
+        """按查询参数批量查询执行状态"""
+        ids = [value for value in request.GET.get('ids', '').split(',') if value.strip()]
+        return await self.respond(ids, request.GET.get('wait'), None)
+
+    async def post(self, request):
+        """按请求体批量查询执行状态，ID较多或需要携带已知状态时使用"""
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return self.error("请求体不是有效的 JSON")
+        if not isinstance(data, dict):
+            return self.error("请求体必须是 JSON 对象")
+        known = data.get('known')
+        if known is not None and not isinstance(known, dict):
+            return self.error("known 必须是 执行ID 到状态的对象")
+        return await self.respond(data.get('ids') or [], data.get('wait'), known)
+
+    async def respond(self, ids, wait, known):
+        if not isinstance(ids, list) or not ids:
+            return self.error("ids 不能为空")
+        if len(ids) > self.MAX_IDS:
+            return self.error(f"ids 最多 {self.MAX_IDS} 个")
+        try:
+            ids = list(dict.fromkeys(uuid.UUID(str(value).strip()) for value in ids))
+            wait = min(max(float(wait or 0), 0), self.MAX_WAIT)
+        except (TypeError, ValueError):
+            return self.error("ids 或 wait 参数无效")
+
+        statuses, changed, timed_out = await wait_execution_statuses(ids, known=known, wait=wait)
+        return JsonResponse({
+            'code': 200,
+            'message': "获取成功",
+            'data': {
+                'items': [statuses[str(key)] for key in ids if str(key) in statuses],
+                'missing': [str(key) for key in ids if str(key) not in statuses],
+                'changed': changed,
+                'timed_out': timed_out,
+            },
+            'success': True
+        })
+
+    @staticmethod
+    def error(message):
+        return JsonResponse({'code': 400, 'message': message, 'data': None, 'success': False}, status=400)
+
+
+class ScriptExecutionPoolView(APIView):
+    """脚本执行线程池状态视图"""
+
+    @swagger_auto_schema(
+        operation_summary="获取执行线程池状态",
+        operation_description="获取当前进程内执行线程池的工作线程数、活跃线程数和队列深度",
+        responses={200: openapi.Schema(type=openapi.TYPE_OBJECT)}
+    )
+    def get(self, request):
+        """获取执行线程池状态"""
+        return ApiResponse.success(data=ScriptExecutionService.get_pool_stats())
+
+
+class ScriptRateLimitView(APIView):
+    """执行限流令牌桶视图"""
+
+    @swagger_auto_schema(
+        operation_summary="获取执行限流状态",
+        operation_description="获取各级限流配置和令牌桶的当前令牌数、拒绝次数，按剩余比例从低到高排列",
+        manual_parameters=[
+            openapi.Parameter('scope', openapi.IN_QUERY, description="限流范围", type=openapi.TYPE_STRING,
+                              enum=['global', 'script', 'client']),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="返回的令牌桶数量，默认100",
+                              type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: openapi.Schema(type=openapi.TYPE_OBJECT)}
+    )
+    def get(self, request):
+        """获取执行限流状态"""
+        data = ScriptExecutionService.get_rate_limit_stats(
+            scope=request.query_params.get('scope'),
+            limit=int(request.query_params.get('limit', 100))
+        )
+        return ApiResponse.success(data=data)
\ No newline at end of file
@@ -0,0 +1,107 @@
+import logging
+import threading
+import time
+
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ScriptExecution
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionWatchdog:
+    """
+    执行看门狗：后台线程定期检查本进程内正在执行的脚本
+    - 超过硬截止时间仍未结束的，结束进程组并将记录标记为超时（监管线程失效时兜底），并调度后续执行；
+      监管线程之后送达的实际结果仍会写回（见 ScriptTaskService._finish_execution）
+    - 记录已在数据库中被取消的，结束进程组（取消请求可能来自其他进程）
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, execution_id, executor, hard_timeout):
+        """登记执行中的脚本，executor 需提供 kill(reason)"""
+        with self._lock:
+            self._entries[execution_id] = (executor, time.monotonic() + hard_timeout)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='script-watchdog', daemon=True)
+                self._thread.start()
+
+    def unregister(self, execution_id):
+        with self._lock:
+            self._entries.pop(execution_id, None)
+
+    def cancel(self, execution_id):
+        """立即结束本进程内的执行，返回该执行是否由本进程持有"""
+        with self._lock:
+            entry = self._entries.get(execution_id)
+        if entry is None:
+            return False
+        entry[0].kill('cancelled')
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {'watched': len(self._entries)}
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                close_old_connections()
+                self.check()
+            except Exception:
+                logger.exception("执行看门狗检查失败")
+
+    def check(self):
+        with self._lock:
+            entries = dict(self._entries)
+        if not entries:
+            return
+
+        now = time.monotonic()
+        expired = [execution_id for execution_id, (_, deadline) in entries.items() if now > deadline]
+        for execution_id in expired:
+            entries[execution_id][0].kill('timeout')
+        if expired:
+            running = ScriptExecution.objects.filter(id__in=expired, status='running')
+            followups = set(running.filter(
+                Q(batch__isnull=False) | Q(workflow_run__isnull=False)
+            ).values_list('batch_id', 'workflow_run_id'))
+            marked = running.update(
+                status='timeout',
+                error_message="脚本执行超时，已由看门狗强制结束",
+                finished_at=timezone.now()
+            )
+            logger.warning(f"看门狗强制结束超时执行 {len(expired)} 个，更新记录 {marked} 条")
+            # 监管线程可能已失效，不等待其写回结果，直接调度所在批次和工作流运行的后续执行
+            from .services import ScriptTaskService
+            for batch_id, workflow_run_id in followups:
+                ScriptTaskService.dispatch_followups(batch_id, workflow_run_id)
+
+        cancelled = ScriptExecution.objects.filter(
+            id__in=[execution_id for execution_id in entries if execution_id not in expired],
+            status='cancelled'
+        ).values_list('id', flat=True)
+        for execution_id in cancelled:
+            entries[execution_id][0].kill('cancelled')
+
+
+_watchdog = None
+_watchdog_lock = threading.Lock()
+
+
+def get_execution_watchdog() -> ExecutionWatchdog:
+    """获取进程内共享的执行看门狗"""
+    global _watchdog
+    if _watchdog is None:
+        with _watchdog_lock:
+            if _watchdog is None:
+                _watchdog = ExecutionWatchdog()
+    return _watchdog
@@ -0,0 +1,200 @@
+import logging
+import os
+import signal
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction, close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .async_executor import AsyncExecutionEngine
+from .dispatcher import CANDIDATE_FIELDS, FairShareSelector, count_running
+from .execution_pool import ScriptExecutionPool
+from .models import ScriptExecution
+from .services import ScriptTaskService
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutionWorker:
+    """数据库队列执行进程：认领排队记录、维持租约心跳并回收失联记录"""
+
+    # 每次认领时参与调度的候选记录数为可认领数的倍数
+    CANDIDATE_FACTOR = 20
+
+    def __init__(self, concurrency=4, poll_interval=None, lease_seconds=None, max_attempts=None):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval or settings.SCRIPT_WORKER_POLL_INTERVAL
+        self.lease_seconds = lease_seconds or settings.SCRIPT_WORKER_LEASE_SECONDS
+        self.max_attempts = max_attempts or settings.SCRIPT_WORKER_MAX_ATTEMPTS
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        if settings.SCRIPT_EXECUTOR_ENGINE == 'asyncio':
+            self.pool = AsyncExecutionEngine(
+                max_concurrency=concurrency,
+                queue_size=concurrency,
+                db_threads=settings.SCRIPT_ASYNC_DB_THREADS
+            )
+            self._run = self._run_async
+        else:
+            self.pool = ScriptExecutionPool(max_workers=concurrency, queue_size=concurrency)
+        self.selector = FairShareSelector()
+        self._inflight = set()
+        self._inflight_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._drained_event = threading.Event()
+
+    def run(self):
+        """主循环，收到 SIGTERM/SIGINT 后停止认领并等待在途任务结束"""
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name='script-worker-heartbeat', daemon=True)
+        heartbeat.start()
+        logger.info(f"执行进程 {self.worker_id} 已启动，并发数 {self.concurrency}")
+
+        while not self._stop_event.is_set():
+            try:
+                close_old_connections()
+                self.reclaim_expired()
+                claimed = self.claim(self.concurrency - self._inflight_count())
+            except Exception:
+                logger.exception("认领执行记录失败")
+                claimed = []
+
+            for execution_id in claimed:
+                with self._inflight_lock:
+                    self._inflight.add(execution_id)
+                self.pool.submit(self._run, execution_id)
+
+            if not claimed:
+                self._stop_event.wait(self.poll_interval)
+
+        logger.info(f"执行进程 {self.worker_id} 停止认领，等待 {self._inflight_count()} 个在途任务结束")
+        self.pool.join()
+        ScriptTaskService.get_completion_writer().flush()
+        self._drained_event.set()
+
+    def claim(self, limit):
+        """
+        认领最多 limit 条排队记录，并发进程之间通过行锁互斥
+        先从优先级最高、排队最久的若干条中按优先级和脚本权重选出本次认领的记录（见 FairShareSelector），
+        脚本的执行中数量取自数据库，包含其他执行进程中的执行
+        """
+        if limit <= 0:
+            return []
+        candidates = list(
+            ScriptExecution.objects.filter(status='queued').order_by('-priority', 'created_at')
+            .values(*CANDIDATE_FIELDS)[:limit * self.CANDIDATE_FACTOR]
+        )
+        if not candidates:
+            return []
+        running = count_running({candidate['script_task_id'] for candidate in candidates})
+        selected = self.selector.select(candidates, running, limit)
+        if not selected:
+            return []
+
+        now = timezone.now()
+        with transaction.atomic():
+            queryset = ScriptExecution.objects.filter(id__in=selected, status='queued')
+            if getattr(connection.features, 'has_select_for_update_skip_locked', False):
+                queryset = queryset.select_for_update(skip_locked=True)
+            execution_ids = list(queryset.values_list('id', flat=True))
+            if execution_ids:
+                ScriptExecution.objects.filter(id__in=execution_ids, status='queued').update(
+                    status='running',
+                    worker_id=self.worker_id,
+                    attempts=F('attempts') + 1,
+                    heartbeat_at=now,
+                    lease_expires_at=now + timedelta(seconds=self.lease_seconds)
+                )
+                # 不支持 skip_locked 时其他进程可能选中同样的记录，只返回本进程实际认领到的
+                execution_ids = list(ScriptExecution.objects.filter(
+                    id__in=execution_ids, status='running', worker_id=self.worker_id
+                ).values_list('id', flat=True))
+        ScriptTaskService.record_queue_wait(execution_ids, now)
+        return execution_ids
+
+    def reclaim_expired(self):
+        """回收租约过期的 running 记录：未超过最大次数的重新排队，否则标记失败"""
+        now = timezone.now()
+        expired = ScriptExecution.objects.filter(status='running', lease_expires_at__lt=now)
+        requeued = expired.filter(attempts__lt=self.max_attempts).update(
+            status='queued',
+            queued_at=now,
+            worker_id='',
+            heartbeat_at=None,
+            lease_expires_at=None
+        )
+        exhausted = expired.filter(attempts__gte=self.max_attempts)
+        followups = set(exhausted.filter(
+            Q(batch__isnull=False) | Q(workflow_run__isnull=False)
+        ).values_list('batch_id', 'workflow_run_id'))
+        failed = exhausted.update(
+            status='failed',
+            error_message="执行进程失联，已超过最大认领次数",
+            lease_expires_at=None,
+            finished_at=now
+        )
+        if requeued or failed:
+            logger.warning(f"回收失联执行记录：重新排队 {requeued} 条，标记失败 {failed} 条")
+        for batch_id, workflow_run_id in followups:
+            ScriptTaskService.dispatch_followups(batch_id, workflow_run_id)
+
+    def _run(self, execution_id):
+        completion = None
+        try:
+            completion = ScriptTaskService.run_execution(execution_id)
+        finally:
+            self._release_when_written(execution_id, completion)
+
+    async def _run_async(self, execution_id):
+        completion = None
+        try:
+            completion = await ScriptTaskService.run_execution_async(execution_id)
+        finally:
+            self._release_when_written(execution_id, completion)
+
+    def _release_when_written(self, execution_id, completion):
+        """结果写回（或被丢弃）后才移出在途集合，写回前继续续租，避免租约过期后被其他进程重复执行"""
+        if completion is None:
+            self._release(execution_id)
+        else:
+            completion.add_done_callback(lambda: self._release(execution_id))
+
+    def _release(self, execution_id):
+        with self._inflight_lock:
+            self._inflight.discard(execution_id)
+
+    def _inflight_count(self):
+        with self._inflight_lock:
+            return len(self._inflight)
+
+    def _heartbeat_loop(self):
+        interval = max(self.lease_seconds / 3, 1)
+        # 停止认领后仍需续约，直到在途任务全部结束
+        while not self._drained_event.wait(interval):
+            try:
+                self._heartbeat()
+            except Exception:
+                logger.exception("续约心跳失败")
+            finally:
+                close_old_connections()
+
+    def _heartbeat(self):
+        """为在途记录续约"""
+        with self._inflight_lock:
+            execution_ids = list(self._inflight)
+        if not execution_ids:
+            return
+        now = timezone.now()
+        ScriptExecution.objects.filter(
+            id__in=execution_ids,
+            status='running',
+            worker_id=self.worker_id
+        ).update(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=self.lease_seconds))
+
+    def _handle_stop(self, signum, frame):
+        self._stop_event.set()
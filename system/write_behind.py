@@ -0,0 +1,278 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction, OperationalError
+from django.utils import timezone
+
+from .models import ScriptExecution
+from .output_storage import delete_output_blob, release_output_refs
+
+logger = logging.getLogger(__name__)
+
+# 数据库暂时不可用（锁等待超时、连接中断等）时的重试次数和首次重试等待秒数，之后每次加倍
+WRITE_RETRIES = 3
+WRITE_RETRY_DELAY = 0.2
+
+
+class ExecutionCompletion:
+    """
+    一条待写回的执行结果
+    fields 为写回执行记录的字段；仅当记录的状态在 expected_statuses 中且由同一执行者持有时生效
+    count_execution / record_latency / followups 表示写回后是否计入脚本执行次数、耗时统计和调度后续执行
+    """
+
+    def __init__(self, execution, expected_statuses, fields, count_execution=False, record_latency=False,
+                 followups=False):
+        self.execution = execution
+        self.expected_statuses = tuple(expected_statuses)
+        self.fields = fields
+        self.count_execution = count_execution
+        self.record_latency = record_latency
+        self.followups = followups
+        self._done = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def add_done_callback(self, callback):
+        """结果写回或被丢弃后调用 callback()，已处理完时立即调用"""
+        with self._lock:
+            if not self._done:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def set_done(self):
+        with self._lock:
+            self._done = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception(f"执行记录 {self.execution.id} 写回后的回调失败")
+
+
+class CompletionWriter:
+    """
+    执行结果的延迟批量写回（write-behind）：执行结束后只登记结果，由后台线程攒批写回
+    - 每批在一个事务中锁住涉及的执行记录，按仍由本执行者持有的记录分组 bulk_update
+    - 写回后的汇总工作（脚本计数、耗时统计、调度后续执行）按批合并，由 on_flushed 回调完成
+    - 缓冲满 batch_size 条立即写回，否则最多等待 flush_interval 秒；flush_interval 不大于 0 时同步写回
+    - 进程退出时写回缓冲中剩余的结果；进程被强制终止时未写回的记录保持 running，由租约回收或取消处理
+    - 每条结果写回或被丢弃后调用其 done 回调，执行进程据此在写回前继续为记录续租
+    - 写回遇到 OperationalError 时退避重试；单条结果仍无法写回时，改为只把记录标记为失败并写入原因，
+      不让记录一直停留在 running
+    """
+
+    def __init__(self, on_flushed, batch_size: int, flush_interval: float):
+        self.on_flushed = on_flushed
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._thread = None
+        self._flushed_count = 0
+        self._discarded_count = 0
+        self._batch_count = 0
+
+    def submit(self, completion: ExecutionCompletion) -> ExecutionCompletion:
+        """登记一条执行结果"""
+        if self.flush_interval <= 0:
+            self._flush([completion])
+            return completion
+        self._ensure_thread()
+        with self._changed:
+            self._buffer.append(completion)
+            self._changed.notify()
+        return completion
+
+    def flush(self):
+        """立即写回缓冲中的全部结果"""
+        while True:
+            with self._lock:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:self.batch_size]
+            if not batch:
+                return
+            self._flush(batch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'completion_buffered': len(self._buffer),
+                'completion_flushed_count': self._flushed_count,
+                'completion_discarded_count': self._discarded_count,
+                'completion_batch_count': self._batch_count,
+            }
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            first_start = self._thread is None
+            self._thread = threading.Thread(target=self._flush_loop, name='script-completion-writer', daemon=True)
+            self._thread.start()
+        if first_start:
+            atexit.register(self.flush)
+
+    def _flush_loop(self):
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._buffer)
+                # 攒批：缓冲满或等待 flush_interval 后写回
+                self._changed.wait_for(lambda: len(self._buffer) >= self.batch_size, timeout=self.flush_interval)
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception:
+                logger.exception("写回执行结果失败")
+            finally:
+                close_old_connections()
+
+    def _flush(self, batch):
+        try:
+            finished = self._retry(self._write, batch)
+        except Exception as e:
+            if len(batch) > 1:
+                # 整批失败时逐条重试，避免一条异常数据拖累同批的其他结果
+                logger.exception(f"批量写回 {len(batch)} 条执行结果失败，改为逐条写回")
+                for completion in batch:
+                    self._flush([completion])
+                return
+            logger.exception(f"写回执行记录 {batch[0].execution.id} 的结果失败，改为标记为失败")
+            finished = self._write_failure(batch[0], e)
+
+        for completion in batch:
+            completion.set_done()
+        with self._lock:
+            self._batch_count += 1
+            self._flushed_count += len(finished)
+        if finished:
+            try:
+                self.on_flushed(finished)
+            except Exception:
+                logger.exception("执行结果写回后的统计和后续调度失败")
+
+    def _write(self, batch):
+        """在一个事务中写回一批结果，返回实际生效的结果"""
+        with transaction.atomic():
+            current = dict(
+                (execution_id, (status, worker_id)) for execution_id, status, worker_id in
+                ScriptExecution.objects.select_for_update().filter(
+                    id__in=[completion.execution.id for completion in batch]
+                ).values_list('id', 'status', 'worker_id')
+            )
+            finished, discarded, groups = [], [], {}
+            for completion in batch:
+                execution = completion.execution
+                status, worker_id = current.get(execution.id, (None, None))
+                if status not in completion.expected_statuses or worker_id != execution.worker_id:
+                    discarded.append(completion)
+                    continue
+                finished.append(completion)
+                groups.setdefault(tuple(sorted(completion.fields)), []).append(completion)
+
+            for names, group in groups.items():
+                rows = []
+                for completion in group:
+                    row = ScriptExecution(id=completion.execution.id)
+                    for name, value in completion.fields.items():
+                        setattr(row, name, value)
+                    rows.append(row)
+                ScriptExecution.objects.bulk_update(
+                    rows, [ScriptExecution._meta.get_field(name).name for name in names]
+                )
+
+        for completion in finished:
+            for name, value in completion.fields.items():
+                setattr(completion.execution, name, value)
+        if discarded:
+            logger.warning(
+                f"执行记录 {', '.join(str(completion.execution.id) for completion in discarded)} "
+                f"已被回收或状态已变更，丢弃本次结果"
+            )
+            self._discard(discarded)
+        return finished
+
+    @staticmethod
+    def _retry(write, *args, **kwargs):
+        """执行写回，OperationalError 时按 WRITE_RETRY_DELAY 起加倍退避重试"""
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                return write(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == WRITE_RETRIES:
+                    raise
+                logger.warning(f"写回执行结果时数据库暂时不可用，第 {attempt + 1} 次重试: {e}")
+                # 出错的连接在重试前关闭，下次查询时重新连接（处于外层事务中时不能关闭）
+                if not transaction.get_connection().in_atomic_block:
+                    close_old_connections()
+                time.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+
+    def _write_failure(self, completion, error):
+        """
+        完整结果无法写回时的兜底：只把仍在执行中的记录标记为失败并写入原因，输出不再保留
+        返回: 实际生效的结果列表（后续仍计入统计并调度后续执行）
+        """
+        self._release_storage([completion])
+        if 'running' not in completion.expected_statuses:
+            # 已取消等已结束的记录状态无需再改
+            return []
+        fields = {
+            'status': 'failed',
+            'error_message': f"执行结果写回失败: {error}"[:2000],
+            'finished_at': completion.fields.get('finished_at') or timezone.now(),
+        }
+        execution = completion.execution
+        try:
+            updated = self._retry(
+                ScriptExecution.objects.filter(id=execution.id, status='running', worker_id=execution.worker_id).update,
+                **fields
+            )
+        except Exception:
+            logger.exception(f"标记执行记录 {execution.id} 为失败时出错，记录仍为 running")
+            return []
+        if not updated:
+            return []
+        completion.fields = fields
+        for name, value in fields.items():
+            setattr(execution, name, value)
+        return [completion]
+
+    def _discard(self, completions):
+        """丢弃结果"""
+        with self._lock:
+            self._discarded_count += len(completions)
+        self._release_storage(completions)
+
+    @staticmethod
+    def _release_storage(completions):
+        """未写回的结果已转存的输出不再被引用，释放存储"""
+        for completion in completions:
+            try:
+                delete_output_blob(completion.fields.get('output_blob'))
+                release_output_refs([completion.fields.get('output_ref_id')])
+            except Exception:
+                logger.exception(f"释放执行记录 {completion.execution.id} 的输出存储失败")
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_completion_writer(on_flushed) -> CompletionWriter:
+    """获取进程内共享的执行结果写回器，首次调用时绑定写回后的回调"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = CompletionWriter(
+                    on_flushed=on_flushed,
+                    batch_size=settings.SCRIPT_COMPLETION_BATCH_SIZE,
+                    flush_interval=settings.SCRIPT_COMPLETION_FLUSH_INTERVAL
+                )
+    return _writer